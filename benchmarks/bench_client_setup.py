@@ -0,0 +1,100 @@
+"""
+Benchmark: per-account YouTube client setup.
+
+Compares build('youtube', 'v3') per account with YouTubeClientFactory for a
+synthetic run of many accounts. Every client sends a few subscriptions.list
+requests to a local keep-alive HTTP server, so the benchmark reports both
+the time spent building clients and the number of TCP connections opened.
+
+Usage:
+    python benchmarks/bench_client_setup.py [--accounts N] [--requests-per-account N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from client_factory import YouTubeClientFactory  # noqa: E402
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    wbufsize = 65536
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with _Handler.lock:
+            _Handler.connections += 1
+
+    def do_GET(self):
+        body = json.dumps({'items': []}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _credentials():
+    from google.oauth2.credentials import Credentials
+    return Credentials(token='benchmark-token')
+
+
+def run(build_client, accounts: int, requests_per_account: int):
+    _Handler.connections = 0
+    build_seconds = 0.0
+    start = time.perf_counter()
+    for _ in range(accounts):
+        build_start = time.perf_counter()
+        youtube = build_client(_credentials())
+        build_seconds += time.perf_counter() - build_start
+        for _ in range(requests_per_account):
+            youtube.subscriptions().list(part='snippet', mine=True, maxResults=50).execute()
+    return build_seconds, time.perf_counter() - start, _Handler.connections
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--accounts', type=int, default=50)
+    parser.add_argument('--requests-per-account', type=int, default=3)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f'http://127.0.0.1:{server.server_address[1]}/'
+
+    from googleapiclient.discovery import build
+
+    def build_per_account(creds):
+        return build('youtube', 'v3', credentials=creds, client_options={'api_endpoint': endpoint})
+
+    factory = YouTubeClientFactory(cache_dir=None, api_endpoint=endpoint)
+
+    print(f"{args.accounts} accounts x {args.requests_per_account} requests")
+    for label, build_client in (('build() per account', build_per_account),
+                                ('YouTubeClientFactory', factory.build)):
+        build_seconds, total_seconds, connections = run(
+            build_client, args.accounts, args.requests_per_account
+        )
+        print(
+            f"  {label:22s} setup {build_seconds / args.accounts * 1000:7.2f} ms/account  "
+            f"total {total_seconds:6.2f}s  connections {connections}"
+        )
+
+    server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
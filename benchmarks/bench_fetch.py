@@ -0,0 +1,264 @@
+"""
+Benchmark: fetch, enrichment and export at scale against a fake YouTube API.
+
+Runs the real fetch path (fetch_subscriptions, batched category lookups and
+the streaming per-account CSV export) against the deterministic fake API in
+benchmarks/fake_youtube.py, either in-process or over a local HTTP server,
+for scenarios from 1 account x 100 channels up to 200 accounts x 2,000
+channels. Each scenario runs in its own subprocess so that peak RSS is
+measured per scenario. Results are printed and written to a JSON file so
+that runs can be compared over time.
+
+Usage:
+    python benchmarks/bench_fetch.py [--scenarios 1x100,10x500] [--transport inprocess|http]
+        [--engine threads|async|pipeline] [--latency-ms N] [--error-rate F] [--output FILE]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Any
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+import api_executor  # noqa: E402
+import metrics  # noqa: E402
+import pipeline  # noqa: E402
+import runner  # noqa: E402
+import youtube_api  # noqa: E402
+from fake_youtube import FakeDataset, FaultInjector, FakeYouTube, FakeYouTubeServer  # noqa: E402
+
+DEFAULT_SCENARIOS = '1x100,10x500,50x1000,200x2000'
+CLIENT_KEY = 'bench_client'
+
+
+class _BenchCredentials:
+    """Credentials stand-in for the in-process transport."""
+
+    valid = True
+
+    def __init__(self, token: str) -> None:
+        self.token = token
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[int(round(fraction * (len(sorted_values) - 1)))]
+
+
+def _peak_rss_mib() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def run_scenario(accounts: int, per_account: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run one scenario in this process and return its measurements."""
+    dataset = FakeDataset(accounts, per_account, page_size=args.page_size, seed=args.seed)
+    faults = FaultInjector(args.latency_ms, args.error_rate, seed=args.seed)
+    api_executor.BASE_DELAY_SECONDS = args.retry_base_delay
+
+    latencies: List[float] = []
+    latencies_lock = threading.Lock()
+
+    def record(seconds: float) -> None:
+        with latencies_lock:
+            latencies.append(seconds * 1000.0)
+
+    execute_request = youtube_api.execute_request
+
+    def timed_execute_request(*call_args: Any, **call_kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return execute_request(*call_args, **call_kwargs)
+        finally:
+            record(time.perf_counter() - start)
+
+    youtube_api.execute_request = timed_execute_request
+
+    server = None
+    if args.transport == 'http':
+        from google.oauth2.credentials import Credentials
+        from client_factory import YouTubeClientFactory
+
+        server = FakeYouTubeServer(dataset, faults).start()
+        factory = YouTubeClientFactory(cache_dir=None, api_endpoint=server.url)
+        runner.build_youtube_client = pipeline.build_youtube_client = factory.build
+        account_credentials = [
+            (username, CLIENT_KEY, Credentials(token=username)) for username in dataset.usernames()
+        ]
+    else:
+        runner.build_youtube_client = pipeline.build_youtube_client = (
+            lambda creds: FakeYouTube(dataset, faults, creds.token)
+        )
+        account_credentials = [
+            (username, CLIENT_KEY, _BenchCredentials(username)) for username in dataset.usernames()
+        ]
+
+    try:
+        with tempfile.TemporaryDirectory() as output_dir, \
+                contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            if args.engine == 'async':
+                import async_engine
+
+                get = async_engine.AsyncFetchEngine._get
+
+                async def timed_get(self: Any, *call_args: Any, **call_kwargs: Any) -> Any:
+                    started = time.perf_counter()
+                    try:
+                        return await get(self, *call_args, **call_kwargs)
+                    finally:
+                        record(time.perf_counter() - started)
+
+                async_engine.AsyncFetchEngine._get = timed_get
+                account_counts = async_engine.fetch_all_accounts_async(
+                    account_credentials,
+                    workers=args.workers,
+                    output_dir=output_dir,
+                    api_root=server.url + 'youtube/v3/'
+                )
+            elif args.engine == 'pipeline':
+                account_counts = pipeline.fetch_all_accounts_pipeline(
+                    account_credentials,
+                    workers=args.workers,
+                    output_dir=output_dir,
+                    batch_enrichment=args.batch_enrichment,
+                    enrich_workers=args.enrich_workers,
+                    write_workers=args.write_workers,
+                    queue_size=args.queue_size
+                )
+            else:
+                account_counts = runner.fetch_all_accounts(
+                    account_credentials,
+                    workers=args.workers,
+                    output_dir=output_dir,
+                    batch_enrichment=args.batch_enrichment
+                )
+            elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.stop()
+
+    channels = sum(account_counts.values())
+    latencies.sort()
+    report = metrics.get_metrics().report()
+    return {
+        'scenario': f'{accounts}x{per_account}',
+        'accounts': accounts,
+        'channels_per_account': per_account,
+        'channels_exported': channels,
+        'seconds': round(elapsed, 4),
+        'channels_per_second': round(channels / elapsed, 1) if elapsed else None,
+        'api_calls': dict(sorted(faults.calls.items())),
+        'injected_errors': faults.errors,
+        'latency_ms': {
+            'p50': round(_percentile(latencies, 0.50), 3),
+            'p95': round(_percentile(latencies, 0.95), 3),
+            'p99': round(_percentile(latencies, 0.99), 3),
+        },
+        'response_bytes': {'wire': report['wire_bytes'], 'payload': report['response_bytes']},
+        'peak_rss_mib': round(_peak_rss_mib(), 1),
+    }
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scenarios', default=DEFAULT_SCENARIOS,
+                        help=f"Comma-separated ACCOUNTSxCHANNELS list (default: {DEFAULT_SCENARIOS})")
+    parser.add_argument('--transport', choices=['inprocess', 'http'], default='inprocess')
+    parser.add_argument('--engine', choices=['threads', 'async', 'pipeline'], default='threads')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--enrich-workers', type=int, default=pipeline.DEFAULT_ENRICH_WORKERS)
+    parser.add_argument('--write-workers', type=int, default=pipeline.DEFAULT_WRITE_WORKERS)
+    parser.add_argument('--queue-size', type=int, default=pipeline.DEFAULT_QUEUE_SIZE)
+    parser.add_argument('--batch-enrichment', action='store_true')
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--retry-base-delay', type=float, default=0.01,
+                        help="Base backoff delay in seconds while benchmarking (default: 0.01)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Results JSON file (default: benchmarks/results/bench_fetch_<time>.json)")
+    parser.add_argument('--run-one', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.engine == 'async' and args.transport != 'http':
+        parser.error("--engine async requires --transport http")
+    return args
+
+
+def main() -> int:
+    args = parse_args()
+
+    if args.run_one:
+        accounts, per_account = (int(part) for part in args.run_one.split('x'))
+        print(json.dumps(run_scenario(accounts, per_account, args)))
+        return 0
+
+    print(
+        f"transport={args.transport} engine={args.engine} workers={args.workers} "
+        f"latency={args.latency_ms}ms error_rate={args.error_rate}"
+    )
+    results = []
+    passthrough = [
+        f'--transport={args.transport}', f'--engine={args.engine}', f'--workers={args.workers}',
+        f'--page-size={args.page_size}', f'--latency-ms={args.latency_ms}',
+        f'--error-rate={args.error_rate}', f'--retry-base-delay={args.retry_base_delay}',
+        f'--seed={args.seed}', f'--enrich-workers={args.enrich_workers}',
+        f'--write-workers={args.write_workers}', f'--queue-size={args.queue_size}',
+    ]
+    if args.batch_enrichment:
+        passthrough.append('--batch-enrichment')
+    for scenario in args.scenarios.split(','):
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), *passthrough, '--run-one', scenario.strip()],
+            capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            print(f"  {scenario:>10}  failed:\n{completed.stderr}")
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        results.append(result)
+        calls = sum(result['api_calls'].values())
+        print(
+            f"  {result['scenario']:>10}  {result['seconds']:8.2f}s  "
+            f"{result['channels_per_second']:10.0f} ch/s  calls {calls:6d}  "
+            f"p50 {result['latency_ms']['p50']:7.2f}ms  p95 {result['latency_ms']['p95']:7.2f}ms  "
+            f"p99 {result['latency_ms']['p99']:7.2f}ms  rss {result['peak_rss_mib']:7.1f} MiB  "
+            f"wire {result['response_bytes']['wire'] / 2**20:7.2f} MiB  "
+            f"payload {result['response_bytes']['payload'] / 2**20:7.2f} MiB"
+        )
+
+    output = args.output or os.path.join(
+        BENCH_DIR, 'results',
+        f"bench_fetch_{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'benchmark': 'bench_fetch',
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': {key: value for key, value in vars(args).items() if key not in ('run_one', 'output')},
+            'results': results,
+        }, f, indent=2)
+    print(f"Results written to: {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,93 @@
+"""
+Benchmark: memory of channel records for a large multi-account run.
+
+Compares the legacy six-key dict rows with ChannelRecord for a synthetic
+run of 100 accounts x 2,000 subscriptions (200k rows) drawn from a shared
+pool of channels, the way overlapping accounts look in practice. Strings
+are rebuilt for every row, as they are when parsed from API responses.
+
+Usage:
+    python benchmarks/bench_records.py [--accounts N] [--channels-per-account N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from records import ChannelRecord  # noqa: E402
+
+CATEGORIES = ['Music', 'Video game', 'Entertainment', 'Technology', 'Lifestyle (sociology)', 'General']
+
+
+def _source_rows(accounts: int, per_account: int, pool_size: int):
+    """Yield (account, channel_id, title, category) with freshly built strings."""
+    rng = random.Random(42)
+    for account in range(accounts):
+        for idx in rng.sample(range(pool_size), per_account):
+            yield (
+                f'account{account}@example.com',
+                ''.join(['UC', f'{idx:022d}']),
+                f'Channel title number {idx}',
+                ''.join([CATEGORIES[idx % len(CATEGORIES)]]),
+            )
+
+
+def build_dicts(accounts: int, per_account: int, pool_size: int):
+    account_channels = {}
+    for account, channel_id, title, category in _source_rows(accounts, per_account, pool_size):
+        account_channels.setdefault(account, []).append({
+            'channel_id': channel_id,
+            'name': title,
+            'category': category,
+            'type': 'Channel',
+            'link': f'https://www.youtube.com/channel/{channel_id}',
+            'is_new_to_merged_list': 'Yes'
+        })
+    return account_channels
+
+
+def build_records(accounts: int, per_account: int, pool_size: int):
+    account_channels = {}
+    for account, channel_id, title, category in _source_rows(accounts, per_account, pool_size):
+        account_channels.setdefault(account, []).append(ChannelRecord(channel_id, title, category))
+    return account_channels
+
+
+def measure(builder, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    data = builder(*args)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return current, elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--accounts', type=int, default=100)
+    parser.add_argument('--channels-per-account', type=int, default=2000)
+    parser.add_argument('--pool-size', type=int, default=50000)
+    args = parser.parse_args()
+
+    params = (args.accounts, args.channels_per_account, args.pool_size)
+    rows = args.accounts * args.channels_per_account
+    print(f"{args.accounts} accounts x {args.channels_per_account} channels = {rows} rows")
+
+    dict_bytes, dict_time = measure(build_dicts, *params)
+    record_bytes, record_time = measure(build_records, *params)
+
+    print(f"  dict rows:      {dict_bytes / 2**20:8.1f} MiB  ({dict_bytes / rows:6.0f} B/row)  {dict_time:.2f}s")
+    print(f"  ChannelRecord:  {record_bytes / 2**20:8.1f} MiB  ({record_bytes / rows:6.0f} B/row)  {record_time:.2f}s")
+    print(f"  reduction:      {dict_bytes / record_bytes:.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,537 @@
+"""
+Deterministic fake YouTube Data API for benchmarks.
+
+Provides the same data in two forms:
+
+- FakeYouTube: an in-process stand-in for the Resource returned by build(),
+  with subscriptions().list(), channels().list(), playlistItems().list()
+  and new_batch_http_request().
+- FakeYouTubeServer: a local HTTP server that answers the REST endpoints
+  (including multipart batch requests), for use with YouTubeClientFactory
+  or the asyncio engine via their api_endpoint/api_root options.
+
+Every account's subscriptions are drawn from a shared channel pool with a
+fixed seed, so the same configuration always produces the same data. Each
+channel has an uploads playlist of up to MAX_UPLOADS videos, newest first
+(some channels have none, like real channels that never uploaded). Page
+size, latency and an error rate (503 backendError responses) are
+configurable, and errors with a given status can be queued for the next
+calls of an endpoint. The server also answers If-None-Match with 304 and
+401 for revoked bearer tokens. Resources have the shape and size of real API responses
+(descriptions, thumbnails, localized text), requests honour the fields=
+partial-response parameter, and the server gzips responses for clients that
+accept it.
+"""
+
+import email
+import gzip
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional, Set
+from urllib.parse import parse_qs, urlparse
+
+TOPICS = [
+    'Music', 'Video_game', 'Entertainment', 'Technology', 'Lifestyle_(sociology)',
+    'Sport', 'Food', 'Knowledge', 'Film', 'Politics',
+]
+
+WORDS = [
+    'daily', 'videos', 'about', 'music', 'games', 'reviews', 'and', 'tutorials', 'new',
+    'every', 'week', 'subscribe', 'for', 'more', 'live', 'streams', 'tech', 'news',
+]
+
+
+def _description(index: int, words: int) -> str:
+    rng = random.Random(index)
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _thumbnails(channel_id: str) -> Dict[str, Any]:
+    return {
+        size: {'url': f'https://yt3.ggpht.com/{channel_id}=s{px}-c-k-c0x00ffffff-no-rj',
+               'width': px, 'height': px}
+        for size, px in (('default', 88), ('medium', 240), ('high', 800))
+    }
+
+
+def _parse_fields(spec: str, pos: int = 0) -> tuple:
+    """Parse a fields= selector list into a tree (None selects a whole value)."""
+    tree: Dict[str, Any] = {}
+    while True:
+        pos = _parse_selector(spec, pos, tree)
+        if pos < len(spec) and spec[pos] == ',':
+            pos += 1
+            continue
+        return tree, pos
+
+
+def _parse_selector(spec: str, pos: int, tree: Dict[str, Any]) -> int:
+    end = pos
+    while end < len(spec) and spec[end] not in ',()/':
+        end += 1
+    name = spec[pos:end].strip()
+    if end < len(spec) and spec[end] == '/':
+        subtree = tree.setdefault(name, {})
+        return end + 1 if subtree is None else _parse_selector(spec, end + 1, subtree)
+    if end < len(spec) and spec[end] == '(':
+        subtree, end = _parse_fields(spec, end + 1)
+        if tree.get(name, {}) is not None:
+            tree.setdefault(name, {}).update(subtree)
+        return end + 1
+    tree[name] = None
+    return end
+
+
+def _select(value: Any, tree: Optional[Dict[str, Any]]) -> Any:
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [_select(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: _select(item, tree[key]) for key, item in value.items() if key in tree}
+    return value
+
+
+def apply_fields(response: Dict[str, Any], fields: Optional[str]) -> Dict[str, Any]:
+    """Reduce a response to a fields= partial-response selection."""
+    return _select(response, _parse_fields(fields)[0]) if fields else response
+
+
+# Uploads of the busiest fake channel, and the publish time of the newest upload
+MAX_UPLOADS = 240
+NEWEST_UPLOAD = 1_767_225_600  # 2026-01-01T00:00:00Z
+
+NOT_FOUND_BODY = json.dumps({
+    'error': {
+        'code': 404,
+        'message': 'The playlist identified with the request\'s playlistId parameter cannot be found.',
+        'errors': [{'reason': 'playlistNotFound', 'message': 'Playlist not found'}],
+    }
+}).encode('utf-8')
+
+
+class FakeDataset:
+    """Subscription lists and channel metadata of a synthetic run."""
+
+    def __init__(
+        self,
+        accounts: int,
+        channels_per_account: int,
+        pool_size: Optional[int] = None,
+        page_size: int = 50,
+        seed: int = 42,
+    ) -> None:
+        self.accounts = accounts
+        self.channels_per_account = channels_per_account
+        self.pool_size = pool_size or max(channels_per_account * 4, 1000)
+        self.page_size = page_size
+        self.seed = seed
+        self._subscriptions: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def usernames(self) -> List[str]:
+        return [f'account{idx}@example.com' for idx in range(self.accounts)]
+
+    def subscriptions(self, username: str) -> List[int]:
+        """Channel pool indexes followed by an account (stable per seed)."""
+        with self._lock:
+            if username not in self._subscriptions:
+                rng = random.Random(f'{self.seed}:{username}')
+                self._subscriptions[username] = rng.sample(
+                    range(self.pool_size), min(self.channels_per_account, self.pool_size)
+                )
+            return self._subscriptions[username]
+
+    @staticmethod
+    def channel_id(index: int) -> str:
+        return f'UC{index:022d}'
+
+    def subscriptions_page(self, username: str, page_token: Optional[str]) -> Dict[str, Any]:
+        """Build a subscriptions.list response."""
+        indexes = self.subscriptions(username)
+        start = int(page_token or 0)
+        page = indexes[start:start + self.page_size]
+        items = [
+            {
+                'kind': 'youtube#subscription',
+                'etag': f'{zlib.crc32(f"{username}:{index}".encode()):08x}',
+                'id': f'sub{zlib.crc32(username.encode()):08x}{index:012d}',
+                'snippet': {
+                    'publishedAt': '2021-03-14T15:09:26Z',
+                    'title': f'Channel {index}',
+                    'description': _description(index, 40),
+                    'resourceId': {'kind': 'youtube#channel', 'channelId': self.channel_id(index)},
+                    'channelId': 'UC' + 'x' * 22,
+                    'thumbnails': _thumbnails(self.channel_id(index)),
+                },
+            }
+            for index in page
+        ]
+        response = {
+            'kind': 'youtube#SubscriptionListResponse',
+            'etag': f'{zlib.crc32(json.dumps(page).encode()):08x}',
+            'pageInfo': {'totalResults': len(indexes), 'resultsPerPage': self.page_size},
+            'items': items,
+        }
+        if start + self.page_size < len(indexes):
+            response['nextPageToken'] = str(start + self.page_size)
+        return response
+
+    def channels(self, ids: List[str]) -> Dict[str, Any]:
+        """Build a channels.list response."""
+        items = []
+        for channel_id in ids:
+            index = int(channel_id[2:])
+            topics = [TOPICS[index % len(TOPICS)], TOPICS[(index // 7) % len(TOPICS)]]
+            items.append({
+                'kind': 'youtube#channel',
+                'etag': f'{zlib.crc32(channel_id.encode()):08x}',
+                'id': channel_id,
+                'snippet': {
+                    'title': f'Channel {index}',
+                    'description': _description(index, 60),
+                    'customUrl': f'@channel{index}',
+                    'publishedAt': '2015-06-01T12:00:00Z',
+                    'thumbnails': _thumbnails(channel_id),
+                    'localized': {'title': f'Channel {index}', 'description': _description(index, 60)},
+                    'country': 'US',
+                },
+                'contentDetails': {'relatedPlaylists': {'likes': '', 'uploads': 'UU' + channel_id[2:]}},
+                'topicDetails': {
+                    'topicIds': [f'/m/0{index % 97:02d}x{topic_idx}' for topic_idx in range(len(topics))],
+                    'topicCategories': [f'https://en.wikipedia.org/wiki/{topic}' for topic in topics]
+                },
+            })
+        return {'kind': 'youtube#channelListResponse', 'items': items}
+
+    @staticmethod
+    def upload_count(index: int) -> int:
+        """Number of uploads of a pool channel; every 11th channel has none."""
+        return 0 if index % 11 == 0 else (index * 37) % MAX_UPLOADS
+
+    def playlist_items_page(
+        self, playlist_id: str, page_token: Optional[str], max_results: int = 5
+    ) -> Optional[Dict[str, Any]]:
+        """Build a playlistItems.list response, or None for a missing playlist."""
+        index = int(playlist_id[2:])
+        count = self.upload_count(index)
+        if not playlist_id.startswith('UU') or not count:
+            return None
+        start = int(page_token or 0)
+        positions = range(start, min(start + max(1, min(max_results, 50)), count))
+        items = []
+        for position in positions:
+            # One upload every 1-4 days (per channel), newest first; every
+            # 25th video is private and has no publish time
+            published = NEWEST_UPLOAD - (index % 5) * 3600 - position * (1 + index % 4) * 86400
+            video_id = f'v{index:06d}{position:04d}'
+            published_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(published))
+            content_details = {'videoId': video_id}
+            if position % 25 != 24:
+                content_details['videoPublishedAt'] = published_at
+            items.append({
+                'kind': 'youtube#playlistItem',
+                'etag': f'{zlib.crc32(video_id.encode()):08x}',
+                'id': f'pli{video_id}',
+                'snippet': {
+                    'publishedAt': published_at,
+                    'channelId': self.channel_id(index),
+                    'title': f'Video {position} of channel {index}',
+                    'description': _description(index + position, 50),
+                    'thumbnails': _thumbnails(video_id),
+                    'channelTitle': f'Channel {index}',
+                    'playlistId': playlist_id,
+                    'position': position,
+                    'resourceId': {'kind': 'youtube#video', 'videoId': video_id},
+                },
+                'contentDetails': content_details,
+            })
+        response = {
+            'kind': 'youtube#playlistItemListResponse',
+            'etag': f'{zlib.crc32(f"{playlist_id}:{start}".encode()):08x}',
+            'pageInfo': {'totalResults': count, 'resultsPerPage': len(items)},
+            'items': items,
+        }
+        if positions.stop < count:
+            response['nextPageToken'] = str(positions.stop)
+        return response
+
+
+class FaultInjector:
+    """Shared latency, error injection and call counting."""
+
+    def __init__(self, latency_ms: float = 0.0, error_rate: float = 0.0, seed: int = 42) -> None:
+        self.latency = latency_ms / 1000.0
+        self.error_rate = error_rate
+        self.calls: Dict[str, int] = {}
+        self.errors = 0
+        self._queued: Dict[str, List[int]] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def fail_next(self, endpoint: str, *statuses: int) -> None:
+        """Answer the next calls of an endpoint with these error statuses."""
+        with self._lock:
+            self._queued.setdefault(endpoint, []).extend(statuses)
+
+    def before_call(self, endpoint: str) -> Optional[int]:
+        """Count a call, sleep for the latency and return the error status if it fails."""
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            queued = self._queued.get(endpoint)
+            if queued:
+                status = queued.pop(0)
+            else:
+                status = 503 if self._rng.random() < self.error_rate else None
+            if status is not None:
+                self.errors += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return status
+
+
+ERROR_REASONS = {
+    401: ('authError', 'Invalid Credentials'),
+    403: ('quotaExceeded', 'Injected quota exhaustion'),
+    429: ('rateLimitExceeded', 'Injected rate limit'),
+    503: ('backendError', 'Injected backend error'),
+}
+
+
+def error_body(status: int) -> bytes:
+    """Build the JSON error body of an injected error response."""
+    reason, message = ERROR_REASONS.get(status, ('backendError', 'Injected error'))
+    return json.dumps({
+        'error': {
+            'code': status,
+            'message': message,
+            'errors': [{'reason': reason, 'message': message}],
+        }
+    }).encode('utf-8')
+
+
+class _Resp(dict):
+    def __init__(self, status: int) -> None:
+        super().__init__(status=str(status))
+        self.status = status
+        self.reason = 'Service Unavailable'
+
+
+class FakeHttpError(Exception):
+    """Mimics googleapiclient.errors.HttpError closely enough for api_executor."""
+
+    def __init__(self, status: int, content: bytes) -> None:
+        super().__init__(f'<HttpError {status} "Injected error">')
+        self.resp = _Resp(status)
+        self.content = content
+
+
+class _FakeRequest:
+    def __init__(self, fake: 'FakeYouTube', endpoint: str, build) -> None:
+        self.fake = fake
+        self.endpoint = endpoint
+        self.build = build
+        self.headers: Dict[str, str] = {}
+
+    def execute(self, http: Any = None, num_retries: int = 0) -> Dict[str, Any]:
+        status = self.fake.faults.before_call(self.endpoint)
+        if status:
+            raise FakeHttpError(status, error_body(status))
+        return self.build()
+
+
+class _FakeCollection:
+    def __init__(self, fake: 'FakeYouTube', name: str) -> None:
+        self.fake = fake
+        self.name = name
+
+    def list(self, **kwargs: Any) -> _FakeRequest:
+        dataset = self.fake.dataset
+        fields = kwargs.get('fields')
+        if self.name == 'subscriptions':
+            return _FakeRequest(
+                self.fake, 'subscriptions.list',
+                lambda: apply_fields(
+                    dataset.subscriptions_page(self.fake.username, kwargs.get('pageToken')), fields
+                )
+            )
+        if self.name == 'playlistItems':
+            def build() -> Dict[str, Any]:
+                response = dataset.playlist_items_page(
+                    kwargs['playlistId'], kwargs.get('pageToken'), kwargs.get('maxResults', 5)
+                )
+                if response is None:
+                    raise FakeHttpError(404, NOT_FOUND_BODY)
+                return apply_fields(response, fields)
+            return _FakeRequest(self.fake, 'playlistItems.list', build)
+        ids = kwargs['id'].split(',')
+        return _FakeRequest(
+            self.fake, 'channels.list', lambda: apply_fields(dataset.channels(ids), fields)
+        )
+
+
+class _FakeBatch:
+    def __init__(self, fake: 'FakeYouTube') -> None:
+        self.fake = fake
+        self.requests: List[Any] = []
+
+    def add(self, request: _FakeRequest, callback: Any = None, request_id: Optional[str] = None) -> None:
+        self.requests.append((request, callback, request_id or str(len(self.requests))))
+
+    def execute(self, http: Any = None) -> None:
+        status = self.fake.faults.before_call('batch')
+        if status:
+            raise FakeHttpError(status, error_body(status))
+        for request, callback, request_id in self.requests:
+            try:
+                response = request.build()
+                exception = None
+                status = self.fake.faults.before_call(request.endpoint)
+                if status:
+                    response, exception = None, FakeHttpError(status, error_body(status))
+            except Exception as e:
+                response, exception = None, e
+            if callback is not None:
+                callback(request_id, response, exception)
+
+
+class FakeYouTube:
+    """In-process stand-in for the YouTube Resource of one account."""
+
+    def __init__(self, dataset: FakeDataset, faults: FaultInjector, username: str) -> None:
+        self.dataset = dataset
+        self.faults = faults
+        self.username = username
+
+    def subscriptions(self) -> _FakeCollection:
+        return _FakeCollection(self, 'subscriptions')
+
+    def channels(self) -> _FakeCollection:
+        return _FakeCollection(self, 'channels')
+
+    def playlistItems(self) -> _FakeCollection:
+        return _FakeCollection(self, 'playlistItems')
+
+    def new_batch_http_request(self) -> _FakeBatch:
+        return _FakeBatch(self)
+
+
+class FakeYouTubeServer:
+    """
+    Local HTTP server that serves the fake dataset on the REST endpoints.
+
+    The account is identified by its bearer token, which must be the
+    account's username; tokens in revoked_tokens are answered with 401.
+    GET requests whose If-None-Match matches the response's etag are
+    answered with an empty 304.
+    """
+
+    def __init__(self, dataset: FakeDataset, faults: FaultInjector) -> None:
+        self.dataset = dataset
+        self.faults = faults
+        self.revoked_tokens: Set[str] = set()
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            wbufsize = 65536
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str = 'application/json') -> None:
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                if body and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    body = gzip.compress(body, compresslevel=6)
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                status, body = server.handle_get(
+                    self.path, self.headers.get('Authorization', ''), self.headers.get('If-None-Match')
+                )
+                self._send(status, body)
+
+            def do_POST(self) -> None:
+                content = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                status = server.faults.before_call('batch')
+                if status:
+                    self._send(status, error_body(status))
+                    return
+                boundary, body = server.handle_batch(self.headers['Content-Type'], content)
+                self._send(200, body, f'multipart/mixed; boundary={boundary}')
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}/'
+
+    def handle_get(self, path: str, authorization: str, if_none_match: Optional[str] = None) -> tuple:
+        parsed = urlparse(path)
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        endpoint = parsed.path.rstrip('/').split('/')[-1] + '.list'
+        token = authorization.split(' ', 1)[-1]
+        status = 401 if token in self.revoked_tokens else self.faults.before_call(endpoint)
+        if status:
+            return status, error_body(status)
+        if endpoint == 'subscriptions.list':
+            username = token
+            response = self.dataset.subscriptions_page(username, query.get('pageToken'))
+        elif endpoint == 'channels.list':
+            response = self.dataset.channels(query.get('id', '').split(','))
+        elif endpoint == 'playlistItems.list':
+            response = self.dataset.playlist_items_page(
+                query.get('playlistId', ''), query.get('pageToken'), int(query.get('maxResults', 5))
+            )
+            if response is None:
+                return 404, NOT_FOUND_BODY
+        else:
+            return 404, b'{"error": {"code": 404, "message": "Not found"}}'
+        if if_none_match is not None and if_none_match == response.get('etag'):
+            with self._lock:
+                self.not_modified += 1
+            return 304, b''
+        return 200, json.dumps(apply_fields(response, query.get('fields'))).encode('utf-8')
+
+    def handle_batch(self, content_type: str, content: bytes) -> tuple:
+        message = email.message_from_bytes(
+            b'Content-Type: ' + content_type.encode('utf-8') + b'\r\n\r\n' + content
+        )
+        boundary = 'fake_batch_boundary'
+        parts = []
+        for part in message.get_payload():
+            request_line, _, rest = part.get_payload().partition('\n')
+            authorization = ''
+            for line in rest.splitlines():
+                if line.lower().startswith('authorization:'):
+                    authorization = line.split(':', 1)[1].strip()
+            status, body = self.handle_get(request_line.split(' ')[1], authorization)
+            reason = 'OK' if status == 200 else 'Error'
+            content_id = part['Content-ID'].strip('<>')
+            parts.append(
+                f'--{boundary}\r\nContent-Type: application/http\r\n'
+                f'Content-ID: <response-{content_id}>\r\n\r\n'
+                f'HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n\r\n'
+                f'{body.decode("utf-8")}\r\n'
+            )
+        return boundary, (''.join(parts) + f'--{boundary}--').encode('utf-8')
+
+    def start(self) -> 'FakeYouTubeServer':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,438 @@
+"""
+Request execution module for YouTube Data API calls.
+
+Every API request goes through execute_request(), which classifies errors as
+retryable or fatal, retries transient failures with capped exponential
+backoff and full jitter (honouring Retry-After), and keeps one circuit
+breaker per OAuth client so that a throttled project is not hit over and
+over by every worker.
+"""
+
+import http.client
+import json
+import random
+import socket
+import ssl
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from metrics import get_metrics
+
+# Client key used when the caller does not say which OAuth client it uses
+DEFAULT_CLIENT_KEY = 'default_client'
+
+# Retry policy
+MAX_RETRIES = 5
+BASE_DELAY_SECONDS = 1.0
+MAX_DELAY_SECONDS = 32.0
+
+# Circuit breaker policy
+FAILURE_THRESHOLD = 5
+COOLDOWN_SECONDS = 60.0
+
+# HTTP statuses that indicate a transient server-side problem
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# 403 reasons that mean "slow down" rather than "not allowed"
+RETRYABLE_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded', 'backendError'}
+
+# 403 reasons that mean the project's daily quota is gone
+QUOTA_REASONS = {'quotaExceeded', 'dailyLimitExceeded'}
+
+# Transport failures without an HTTP status that may succeed when sent again:
+# timeouts, refused/reset connections, TLS hiccups and truncated responses
+TRANSPORT_ERRORS = (socket.timeout, ConnectionError, ssl.SSLError, http.client.HTTPException)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a request is refused because its client's circuit is open."""
+
+
+def _error_status(error: Exception) -> Optional[int]:
+    """
+    Get the HTTP status of an API error, if it has one.
+
+    Args:
+        error (Exception): The exception raised by request.execute().
+
+    Returns:
+        int, optional: The HTTP status code.
+    """
+    resp = getattr(error, 'resp', None)
+    status = getattr(resp, 'status', None)
+    return int(status) if status is not None else None
+
+
+def _error_reason(error: Exception) -> Optional[str]:
+    """
+    Get the API error reason (e.g. 'rateLimitExceeded') of an HttpError.
+
+    Args:
+        error (Exception): The exception raised by request.execute().
+
+    Returns:
+        str, optional: The first error reason in the response body.
+    """
+    content = getattr(error, 'content', None)
+    if not content:
+        return None
+    try:
+        if isinstance(content, bytes):
+            content = content.decode('utf-8')
+        errors = json.loads(content).get('error', {}).get('errors', [])
+        return errors[0].get('reason') if errors else None
+    except (ValueError, AttributeError, IndexError):
+        return None
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    Get the Retry-After delay sent with an error response.
+
+    Args:
+        error (Exception): The exception raised by request.execute().
+
+    Returns:
+        float, optional: Seconds to wait, if the server said so.
+    """
+    resp = getattr(error, 'resp', None)
+    if resp is None or not hasattr(resp, 'get'):
+        return None
+    value = resp.get('retry-after')
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_transport_error(error: Exception) -> bool:
+    """
+    Check whether a request failed in transit rather than on the server.
+
+    Local problems such as a missing file or a permission error are not
+    transport errors, and neither is a certificate that fails verification.
+
+    Args:
+        error (Exception): The exception raised by request.execute().
+
+    Returns:
+        bool: True for timeouts, connection, TLS and DNS failures.
+    """
+    if isinstance(error, ssl.SSLCertVerificationError):
+        return False
+    if isinstance(error, TRANSPORT_ERRORS):
+        return True
+
+    # httplib2 turns DNS lookup failures into its own error type
+    import httplib2
+    return isinstance(error, httplib2.ServerNotFoundError)
+
+
+def classify_error(error: Exception) -> Tuple[bool, bool]:
+    """
+    Decide how to handle a failed request.
+
+    Args:
+        error (Exception): The exception raised by request.execute().
+
+    Returns:
+        Tuple[bool, bool]: (retryable, throttled). retryable means the same
+            request may succeed if sent again; throttled means the failure
+            counts against the client's circuit breaker.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False, False
+
+    status = _error_status(error)
+    if status is None:
+        return is_transport_error(error), False
+
+    if status in RETRYABLE_STATUSES:
+        return True, True
+    if status == 403:
+        reason = _error_reason(error)
+        if reason in RETRYABLE_REASONS:
+            return True, True
+        if reason in QUOTA_REASONS:
+            return False, True
+    return False, False
+
+
+class CircuitBreaker:
+    """
+    Per-client circuit breaker.
+
+    After FAILURE_THRESHOLD consecutive throttling failures the circuit opens
+    and requests fail fast for the cooldown period. Afterwards one trial
+    request is let through (half-open); success closes the circuit again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        cooldown_seconds: float = COOLDOWN_SECONDS,
+    ) -> None:
+        """
+        Create a closed circuit breaker.
+
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit.
+            cooldown_seconds (float): How long the circuit stays open.
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.failures = 0
+        self.open_until = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Check whether a request may be sent now.
+
+        Returns:
+            bool: False while the circuit is open.
+        """
+        with self._lock:
+            if self.failures < self.failure_threshold:
+                return True
+            if time.monotonic() < self.open_until or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful request."""
+        with self._lock:
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def release(self) -> None:
+        """End a trial request whose outcome says nothing about throttling."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self, cooldown: Optional[float] = None) -> None:
+        """
+        Count a throttling failure and open the circuit if needed.
+
+        Args:
+            cooldown (float, optional): Minimum time to stay open, e.g. from
+                a Retry-After header.
+        """
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.failure_threshold:
+                self.open_until = time.monotonic() + max(
+                    self.cooldown_seconds, cooldown or 0.0
+                )
+
+    def trip(self, cooldown: float) -> None:
+        """
+        Open the circuit immediately, e.g. when the daily quota is exhausted.
+
+        Args:
+            cooldown (float): How long the circuit stays open.
+        """
+        with self._lock:
+            self.failures = max(self.failures, self.failure_threshold)
+            self._trial_in_flight = False
+            self.open_until = time.monotonic() + cooldown
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(client_key: str) -> CircuitBreaker:
+    """
+    Get the shared circuit breaker of an OAuth client.
+
+    Args:
+        client_key (str): The OAuth client key.
+
+    Returns:
+        CircuitBreaker: The client's breaker (created on first use).
+    """
+    with _breakers_lock:
+        if client_key not in _breakers:
+            _breakers[client_key] = CircuitBreaker()
+        return _breakers[client_key]
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Compute the wait before a retry.
+
+    Uses capped exponential backoff with full jitter; a Retry-After value
+    from the server acts as a lower bound.
+
+    Args:
+        attempt (int): Zero-based retry number.
+        retry_after (float, optional): Server-requested delay in seconds.
+
+    Returns:
+        float: Seconds to wait.
+    """
+    delay = random.uniform(0, min(MAX_DELAY_SECONDS, BASE_DELAY_SECONDS * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, MAX_DELAY_SECONDS * 4))
+    return delay
+
+
+def record_error(
+    breaker: CircuitBreaker,
+    error: Exception,
+    client_key: str = DEFAULT_CLIENT_KEY,
+) -> bool:
+    """
+    Update a client's circuit breaker after a failed request.
+
+    Args:
+        breaker (CircuitBreaker): The breaker of the request's OAuth client.
+        error (Exception): The error the request failed with.
+        client_key (str): OAuth client the request is billed to.
+
+    Returns:
+        bool: True if the request may be retried.
+    """
+    retryable, throttled = classify_error(error)
+    if throttled:
+        if _error_reason(error) in QUOTA_REASONS:
+            # No point retrying anything on this project until tomorrow
+            breaker.trip(COOLDOWN_SECONDS * 60)
+            get_metrics().record_quota_exhausted(client_key)
+        else:
+            breaker.record_failure(retry_after(error))
+    elif _error_status(error) is not None:
+        # The server answered (e.g. 304 or 404), so the client is not throttled
+        breaker.record_success()
+    else:
+        breaker.release()
+    return retryable
+
+
+def circuit_open_error(client_key: str) -> CircuitOpenError:
+    """
+    Build the error raised when a client's circuit refuses a request.
+
+    Args:
+        client_key (str): The OAuth client key.
+
+    Returns:
+        CircuitOpenError: The error to raise.
+    """
+    return CircuitOpenError(
+        f"Circuit open for OAuth client '{client_key}' after repeated throttling; "
+        "skipping request"
+    )
+
+
+def request_endpoint(request: Any) -> str:
+    """
+    Get the API method name of a request, for metrics.
+
+    Args:
+        request (HttpRequest): A googleapiclient request, or an object with
+            an 'endpoint' attribute.
+
+    Returns:
+        str: The method name, e.g. 'subscriptions.list'.
+    """
+    method_id = getattr(request, 'methodId', None)
+    if method_id:
+        return method_id.split('.', 1)[-1]
+    return getattr(request, 'endpoint', None) or type(request).__name__
+
+
+def error_outcome(error: Exception) -> str:
+    """
+    Describe a failed request attempt for metrics.
+
+    Args:
+        error (Exception): The error the attempt failed with.
+
+    Returns:
+        str: 'http_<status>' or 'transport_error'.
+    """
+    status = _error_status(error)
+    return f'http_{status}' if status is not None else 'transport_error'
+
+
+def retry_message(error: Exception, attempt: int, max_retries: int, delay: float) -> str:
+    """
+    Format the progress line logged before a retry.
+
+    Args:
+        error (Exception): The error being retried.
+        attempt (int): Zero-based retry number.
+        max_retries (int): Maximum number of retries.
+        delay (float): Seconds until the retry.
+
+    Returns:
+        str: The log line.
+    """
+    return (
+        f"  ↻ Retrying after error ({str(error).strip()[:80]}); "
+        f"attempt {attempt + 1}/{max_retries} in {delay:.1f}s"
+    )
+
+
+def execute_request(
+    request: Any,
+    client_key: str = DEFAULT_CLIENT_KEY,
+    max_retries: int = MAX_RETRIES,
+    log: Callable[[str], None] = print,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Any:
+    """
+    Execute an API request with retries and the client's circuit breaker.
+
+    Args:
+        request (HttpRequest): A googleapiclient request (anything with execute()).
+        client_key (str): OAuth client the request is billed to.
+        max_retries (int): Maximum number of retries for retryable errors.
+        log (Callable[[str], None]): Function used to report retries.
+        sleep (Callable[[float], None]): Function used to wait between retries.
+
+    Returns:
+        Any: The parsed API response.
+
+    Raises:
+        CircuitOpenError: If the client's circuit is open.
+        Exception: The last error if it is fatal or retries are exhausted.
+    """
+    breaker = get_circuit_breaker(client_key)
+    metrics = get_metrics()
+    endpoint = request_endpoint(request)
+    quota_units = getattr(request, 'quota_units', 1)
+    attempt = 0
+
+    while True:
+        if not breaker.allow():
+            metrics.record_api_call(endpoint, client_key, 'circuit_open')
+            raise circuit_open_error(client_key)
+
+        start = time.perf_counter()
+        try:
+            response = request.execute()
+        except Exception as e:
+            metrics.record_api_call(
+                endpoint, client_key, error_outcome(e), time.perf_counter() - start, quota_units
+            )
+            retryable = record_error(breaker, e, client_key)
+            if not retryable or attempt >= max_retries:
+                raise
+
+            delay = backoff_delay(attempt, retry_after(e))
+            log(retry_message(e, attempt, max_retries, delay))
+            metrics.record_retry(endpoint, client_key)
+            sleep(delay)
+            attempt += 1
+            continue
+
+        metrics.record_api_call(endpoint, client_key, 'ok', time.perf_counter() - start, quota_units)
+        breaker.record_success()
+        return response
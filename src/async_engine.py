@@ -0,0 +1,599 @@
+"""
+Asyncio fetch engine for the YouTube Data API.
+
+An alternative to the threaded runner that talks to the YouTube Data API
+REST endpoints directly with aiohttp. Many accounts are paginated at once
+on one event loop, and the channel enrichment of each page overlaps with the
+download of the next page. Concurrency is limited per host (by the
+connection pool) and per OAuth client (by a semaphore per client), and the
+per-client circuit breakers of api_executor are shared with the threaded
+path. Records, output files and checkpoints are identical to the threaded
+runner's.
+
+aiohttp is optional and only needed when this engine is selected.
+"""
+
+import asyncio
+import json
+import zlib
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from api_executor import (
+    MAX_RETRIES,
+    backoff_delay,
+    circuit_open_error,
+    error_outcome,
+    get_circuit_breaker,
+    record_error,
+    retry_after,
+    retry_message,
+)
+from channel_cache import ChannelCache
+from checkpoint import RunCheckpoint
+from metrics import account_scope, get_metrics
+from records import ChannelRecord
+from runner import AccountRun, pending_accounts
+from snapshots import SubscriptionSnapshot
+from youtube_api import (
+    CHANNELS_BATCH_SIZE,
+    CHANNELS_FIELDS,
+    SUBSCRIPTIONS_FIELDS,
+    apply_channel_items,
+    cached_categories,
+    log_fetch_error,
+    page_channel_ids,
+    page_records,
+)
+
+API_ROOT = 'https://www.googleapis.com/youtube/v3/'
+
+# Concurrency limits
+DEFAULT_PER_HOST_LIMIT = 32
+DEFAULT_PER_CLIENT_LIMIT = 8
+DEFAULT_TIMEOUT_SECONDS = 60
+
+# Google APIs only compress responses for user agents that mention gzip
+REQUEST_HEADERS = {'Accept-Encoding': 'gzip', 'User-Agent': 'youtube-subscriptions (gzip)'}
+
+
+def _import_aiohttp() -> Any:
+    """
+    Import aiohttp lazily.
+
+    Returns:
+        module: The aiohttp module.
+
+    Raises:
+        Exception: If aiohttp is not installed.
+    """
+    try:
+        import aiohttp
+        return aiohttp
+    except ImportError as ie:
+        raise Exception(
+            "\n❌ The asyncio engine requires aiohttp.\n\n"
+            "Install it with:\n\n"
+            "    pip install aiohttp\n\n"
+            f"Original ImportError: {ie}"
+        )
+
+
+def _decompress(content: bytes, encoding: Optional[str]) -> bytes:
+    """
+    Decompress a response body.
+
+    Args:
+        content (bytes): The body as transferred.
+        encoding (str, optional): The response's Content-Encoding.
+
+    Returns:
+        bytes: The decompressed body.
+    """
+    if not content or encoding not in ('gzip', 'deflate'):
+        return content
+    try:
+        # wbits 47 accepts both gzip and zlib headers
+        return zlib.decompress(content, 47)
+    except zlib.error:
+        # Some servers send raw deflate streams
+        return zlib.decompress(content, -zlib.MAX_WBITS)
+
+
+class ResponseInfo(dict):
+    """Response headers plus status, shaped like httplib2's response object."""
+
+    def __init__(self, status: int, headers: Dict[str, str]) -> None:
+        super().__init__((key.lower(), value) for key, value in headers.items())
+        self.status = status
+
+
+class AsyncHttpError(Exception):
+    """
+    Error response from the REST API.
+
+    Carries resp and content like googleapiclient's HttpError, so that the
+    retry and circuit breaker logic of api_executor classifies both alike.
+    """
+
+    def __init__(self, resp: ResponseInfo, content: bytes, url: str) -> None:
+        self.resp = resp
+        self.content = content
+        message = ''
+        try:
+            message = json.loads(content.decode('utf-8')).get('error', {}).get('message', '')
+        except (ValueError, AttributeError, UnicodeDecodeError):
+            pass
+        super().__init__(f"HTTP {resp.status} when requesting {url}: {message}".strip())
+
+
+class AsyncFetchEngine:
+    """
+    Fetches subscriptions of many accounts concurrently on one event loop.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[ChannelCache] = None,
+        api_root: str = API_ROOT,
+        per_host_limit: int = DEFAULT_PER_HOST_LIMIT,
+        per_client_limit: int = DEFAULT_PER_CLIENT_LIMIT,
+        max_retries: int = MAX_RETRIES,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    ) -> None:
+        """
+        Create an engine.
+
+        Args:
+            cache (ChannelCache, optional): Persistent channel metadata cache.
+            api_root (str): Root URL of the YouTube Data API.
+            per_host_limit (int): Maximum open connections to the API host.
+            per_client_limit (int): Maximum requests in flight per OAuth client.
+            max_retries (int): Maximum number of retries for retryable errors.
+            timeout (float): Total timeout of one request in seconds.
+        """
+        self.cache = cache
+        self.api_root = api_root if api_root.endswith('/') else api_root + '/'
+        self.per_host_limit = per_host_limit
+        self.per_client_limit = per_client_limit
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._client_limits: Dict[str, asyncio.Semaphore] = {}
+        self._refresh_locks: Dict[str, asyncio.Lock] = {}
+        self._session: Any = None
+
+    async def __aenter__(self) -> 'AsyncFetchEngine':
+        aiohttp = _import_aiohttp()
+        # Bodies are decompressed in _get so that transferred bytes can be counted
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=self.per_host_limit),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers=REQUEST_HEADERS,
+            auto_decompress=False
+        )
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self._session.close()
+        self._session = None
+
+    def _client_limit(self, client_key: str) -> asyncio.Semaphore:
+        """Get the request semaphore of an OAuth client."""
+        if client_key not in self._client_limits:
+            self._client_limits[client_key] = asyncio.Semaphore(self.per_client_limit)
+        return self._client_limits[client_key]
+
+    async def _refresh(self, username: str, creds: Any, force: bool = False) -> None:
+        """
+        Refresh an account's token off the event loop if it is not valid.
+
+        Args:
+            username (str): The account username/email.
+            creds (Credentials): The account's credentials.
+            force (bool): Refresh even if the token looks valid (after a 401).
+        """
+        lock = self._refresh_locks.setdefault(username, asyncio.Lock())
+        async with lock:
+            if creds.valid and not force:
+                return
+            from google.auth.transport.requests import Request
+
+            with get_metrics().auth_step('refresh'):
+                await asyncio.get_running_loop().run_in_executor(None, creds.refresh, Request())
+
+    async def _get(
+        self,
+        resource: str,
+        params: Dict[str, Any],
+        username: str,
+        client_key: str,
+        creds: Any,
+        log: Callable[[str], None],
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, Dict[str, Any]]:
+        """
+        Send one GET request with retries and the client's circuit breaker.
+
+        Args:
+            resource (str): API collection, e.g. 'subscriptions'.
+            params (Dict[str, Any]): Query parameters.
+            username (str): The account the request is made for.
+            client_key (str): OAuth client the request is billed to.
+            creds (Credentials): The account's credentials.
+            log (Callable[[str], None]): Function used to report retries.
+            headers (Dict[str, str], optional): Extra request headers.
+
+        Returns:
+            Tuple[int, Dict[str, Any]]: HTTP status (200 or 304) and the
+                parsed response ({} for 304).
+
+        Raises:
+            Exception: The last error if it is fatal or retries are exhausted.
+        """
+        aiohttp = _import_aiohttp()
+        breaker = get_circuit_breaker(client_key)
+        metrics = get_metrics()
+        endpoint = f'{resource}.list'
+        url = self.api_root + resource
+        query = {key: str(value) for key, value in params.items() if value is not None}
+        attempt = 0
+        refreshed = False
+
+        while True:
+            await self._refresh(username, creds)
+            if not breaker.allow():
+                metrics.record_api_call(endpoint, client_key, 'circuit_open')
+                raise circuit_open_error(client_key)
+
+            request_headers = dict(headers or {})
+            request_headers['Authorization'] = f'Bearer {creds.token}'
+            try:
+                async with self._client_limit(client_key):
+                    start = asyncio.get_running_loop().time()
+                    async with self._session.get(url, params=query, headers=request_headers) as resp:
+                        raw = await resp.read()
+                        seconds = asyncio.get_running_loop().time() - start
+                        content = _decompress(raw, resp.headers.get('Content-Encoding'))
+                        metrics.record_bytes(len(content), endpoint, len(raw))
+                        if resp.status == 304:
+                            metrics.record_api_call(endpoint, client_key, 'http_304', seconds)
+                            breaker.record_success()
+                            return 304, {}
+                        if resp.status >= 400:
+                            raise AsyncHttpError(
+                                ResponseInfo(resp.status, dict(resp.headers)), content, url
+                            )
+                        metrics.record_api_call(endpoint, client_key, 'ok', seconds)
+                        breaker.record_success()
+                        return resp.status, json.loads(content.decode('utf-8'))
+            except (AsyncHttpError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # Transport errors are retried like connection errors in execute_request
+                error = e if isinstance(e, AsyncHttpError) else ConnectionError(str(e) or type(e).__name__)
+                metrics.record_api_call(
+                    endpoint, client_key, error_outcome(error), asyncio.get_running_loop().time() - start
+                )
+                if isinstance(e, AsyncHttpError) and e.resp.status == 401 and not refreshed:
+                    # Token revoked or expired early: refresh once and try again
+                    breaker.release()
+                    refreshed = True
+                    await self._refresh(username, creds, force=True)
+                    continue
+
+                retryable = record_error(breaker, error, client_key)
+                if not retryable or attempt >= self.max_retries:
+                    raise error
+
+                delay = backoff_delay(attempt, retry_after(error))
+                log(retry_message(error, attempt, self.max_retries, delay))
+                metrics.record_retry(endpoint, client_key)
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _enrich(
+        self,
+        items: List[Dict[str, Any]],
+        username: str,
+        client_key: str,
+        creds: Any,
+        log: Callable[[str], None],
+    ) -> List[ChannelRecord]:
+        """
+        Resolve the categories of a subscriptions page and build its records.
+
+        Args:
+            items (List[Dict]): Items of a subscriptions.list response.
+            username (str): The account the page belongs to.
+            client_key (str): OAuth client the requests are billed to.
+            creds (Credentials): The account's credentials.
+            log (Callable[[str], None]): Function used to report warnings.
+
+        Returns:
+            List[ChannelRecord]: The page's records.
+        """
+        # Cache reads and writes are SQLite calls, so they run off the event loop
+        categories, missing_ids = await asyncio.to_thread(
+            cached_categories, page_channel_ids(items), self.cache
+        )
+
+        async def lookup(batch: List[str]) -> None:
+            try:
+                _, response = await self._get(
+                    'channels',
+                    {'part': 'topicDetails,snippet', 'id': ','.join(batch),
+                     'maxResults': CHANNELS_BATCH_SIZE, 'fields': CHANNELS_FIELDS},
+                    username, client_key, creds, log
+                )
+                await asyncio.to_thread(apply_channel_items, response, categories, self.cache)
+            except Exception as e:
+                log(f"Warning: Error fetching categories for {len(batch)} channel(s): {str(e)}")
+
+        await asyncio.gather(*(
+            lookup(missing_ids[start:start + CHANNELS_BATCH_SIZE])
+            for start in range(0, len(missing_ids), CHANNELS_BATCH_SIZE)
+        ))
+        return page_records(items, categories)
+
+    async def fetch_subscriptions(
+        self,
+        username: str,
+        client_key: str,
+        creds: Any,
+        log: Callable[[str], None] = print,
+        snapshot_dir: Optional[str] = None,
+        on_page: Optional[Callable[[List[ChannelRecord], Optional[str]], None]] = None,
+        start_page_token: Optional[str] = None,
+    ) -> Tuple[List[str], Dict[str, List[ChannelRecord]]]:
+        """
+        Fetch all subscriptions of one account.
+
+        Behaves like youtube_api.fetch_subscriptions, except that each page's
+        enrichment runs while the next page is being downloaded. Pages are
+        still handed to on_page in order.
+
+        Args:
+            username (str): The account username/email.
+            client_key (str): OAuth client the account's requests are billed to.
+            creds (Credentials): Valid OAuth 2.0 credentials for the account.
+            log (Callable[[str], None]): Function used to report progress.
+            snapshot_dir (str, optional): Directory of per-account snapshots.
+            on_page (Callable, optional): Called with the records of each page
+                and the next page token (None after the last page).
+            start_page_token (str, optional): Page token to resume from.
+
+        Returns:
+            tuple: (subscriptions list, account_channels dict), as returned by
+                youtube_api.fetch_subscriptions.
+        """
+        subscriptions: List[str] = []
+        account_channels_list: List[ChannelRecord] = []
+        snapshot = (
+            await asyncio.to_thread(SubscriptionSnapshot.load, snapshot_dir, username)
+            if snapshot_dir and start_page_token is None else None
+        )
+        fetched_pages: List[Dict[str, Any]] = []
+        reused_pages = 0
+        page_count = 0
+        pending: Optional[Tuple[asyncio.Future, Dict[str, Any]]] = None
+
+        async def emit(records: List[ChannelRecord], entry: Dict[str, Any]) -> None:
+            subscriptions.extend(channel.name for channel in records)
+            if on_page is not None:
+                # Output writes and checkpoint saves block, so keep them off the loop
+                await asyncio.to_thread(on_page, records, entry['next_page_token'])
+            else:
+                account_channels_list.extend(records)
+            if snapshot is not None:
+                fetched_pages.append(dict(entry, channels=records))
+
+        log(f"Fetching subscriptions for account: {username}")
+
+        try:
+            next_page_token = start_page_token
+            while True:
+                page_token = next_page_token
+                stored_page = snapshot.stored_page(page_count, page_token) if snapshot else None
+                page_count += 1
+                headers = {'If-None-Match': stored_page['etag']} if stored_page else None
+                status, response = await self._get(
+                    'subscriptions',
+                    {'part': 'snippet', 'mine': 'true', 'maxResults': 50, 'pageToken': page_token,
+                     'fields': SUBSCRIPTIONS_FIELDS},
+                    username, client_key, creds, log, headers
+                )
+
+                if stored_page is not None and (
+                    status == 304 or response.get('etag') == stored_page['etag']
+                ):
+                    # Page unchanged since the last run: reuse the stored records
+                    reused_pages += 1
+                    get_metrics().record_page('snapshot')
+                    enrichment = asyncio.get_running_loop().create_future()
+                    enrichment.set_result(stored_page['channels'])
+                    next_page_token = stored_page.get('next_page_token')
+                    entry = {
+                        'page_token': page_token,
+                        'etag': stored_page['etag'],
+                        'next_page_token': next_page_token,
+                    }
+                else:
+                    get_metrics().record_page('api')
+                    enrichment = asyncio.ensure_future(self._enrich(
+                        response.get('items', []), username, client_key, creds, log
+                    ))
+                    next_page_token = response.get('nextPageToken')
+                    entry = {
+                        'page_token': page_token,
+                        'etag': response.get('etag'),
+                        'next_page_token': next_page_token,
+                    }
+
+                # Hand over the previous page while this one is being enriched
+                if pending is not None:
+                    await emit(await pending[0], pending[1])
+                pending = (enrichment, entry)
+                if not next_page_token:
+                    break
+
+            await emit(await pending[0], pending[1])
+            pending = None
+
+            if snapshot is not None:
+                await asyncio.to_thread(snapshot.save, fetched_pages)
+                log(f"  Reused {reused_pages}/{page_count} unchanged page(s) from snapshot")
+            log(f"  Found {len(subscriptions)} subscriptions")
+            return subscriptions, {username: account_channels_list}
+
+        except Exception as e:
+            if pending is not None:
+                pending[0].cancel()
+            log_fetch_error(username, e, log)
+            return [], {username: []}
+
+    async def _fetch_account(
+        self,
+        username: str,
+        client_key: str,
+        creds: Any,
+        account_counts: Dict[str, int],
+        account_channels: Optional[Dict[str, List[ChannelRecord]]],
+        account_limit: asyncio.Semaphore,
+        account_idx: int,
+        total_accounts: int,
+        snapshot_dir: Optional[str],
+        output_dir: Optional[str],
+        checkpoint: Optional[RunCheckpoint],
+        output_format: str = 'csv',
+    ) -> None:
+        """Fetch one account and record its results (see runner._fetch_account)."""
+        async with account_limit:
+            with account_scope(username):
+                # Opening, publishing and closing the output block on disk I/O;
+                # to_thread copies the context, so metrics keep the account
+                run = await asyncio.to_thread(
+                    AccountRun,
+                    username, account_idx, total_accounts, output_dir, checkpoint, output_format
+                )
+                try:
+                    subs: List[str] = []
+                    new_account_channels: Dict[str, List[ChannelRecord]] = {}
+                    if not run.finished:
+                        with get_metrics().stage('fetch'):
+                            subs, new_account_channels = await self.fetch_subscriptions(
+                                username,
+                                client_key,
+                                creds,
+                                log=run.log,
+                                snapshot_dir=snapshot_dir,
+                                on_page=run.on_page,
+                                start_page_token=run.start_page_token
+                            )
+                    account_counts[username] = await asyncio.to_thread(run.complete, len(subs))
+                    if account_channels is not None:
+                        account_channels.update(new_account_channels)
+                except Exception as e:
+                    run.log(f"❌ Failed to process account '{username}': {str(e)}")
+                finally:
+                    await asyncio.to_thread(run.close)
+
+    async def fetch_all_accounts(
+        self,
+        account_credentials: List[Tuple[str, str, Any]],
+        account_channels: Optional[Dict[str, List[ChannelRecord]]] = None,
+        workers: int = 1,
+        snapshot_dir: Optional[str] = None,
+        output_dir: Optional[str] = None,
+        checkpoint: Optional[RunCheckpoint] = None,
+        output_format: str = 'csv',
+    ) -> Dict[str, int]:
+        """
+        Fetch subscriptions for all authenticated accounts concurrently.
+
+        Takes the same arguments as runner.fetch_all_accounts, except that
+        the cache is given to the engine.
+
+        Args:
+            account_credentials (List[Tuple[str, str, Credentials]]): Output of
+                resolve_credentials.
+            account_channels (Dict, optional): Dictionary that receives each
+                account's channel records.
+            workers (int): Maximum number of accounts fetched at the same time.
+            snapshot_dir (str, optional): Directory of per-account snapshots.
+            output_dir (str, optional): If given, each account's output is
+                written here in streaming fashion.
+            checkpoint (RunCheckpoint, optional): Checkpoint of the run.
+            output_format (str): Output sink used with output_dir, one of
+                sinks.SINK_FORMATS.
+
+        Returns:
+            Dict[str, int]: Number of channels fetched per account.
+        """
+        account_credentials, account_counts = pending_accounts(account_credentials, checkpoint)
+        account_limit = asyncio.Semaphore(max(1, workers))
+        total_accounts = len(account_credentials)
+
+        await asyncio.gather(*(
+            self._fetch_account(
+                username,
+                client_key,
+                creds,
+                account_counts,
+                account_channels,
+                account_limit,
+                idx,
+                total_accounts,
+                snapshot_dir,
+                output_dir,
+                checkpoint,
+                output_format,
+            )
+            for idx, (username, client_key, creds) in enumerate(account_credentials, 1)
+        ))
+        return account_counts
+
+
+def fetch_all_accounts_async(
+    account_credentials: List[Tuple[str, str, Any]],
+    account_channels: Optional[Dict[str, List[ChannelRecord]]] = None,
+    workers: int = 1,
+    cache: Optional[ChannelCache] = None,
+    snapshot_dir: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    checkpoint: Optional[RunCheckpoint] = None,
+    output_format: str = 'csv',
+    api_root: str = API_ROOT,
+) -> Dict[str, int]:
+    """
+    Run the asyncio engine with the interface of runner.fetch_all_accounts.
+
+    Args:
+        account_credentials (List[Tuple[str, str, Credentials]]): Output of
+            resolve_credentials.
+        account_channels (Dict, optional): Dictionary that receives each
+            account's channel records.
+        workers (int): Maximum number of accounts fetched at the same time.
+        cache (ChannelCache, optional): Persistent channel metadata cache.
+        snapshot_dir (str, optional): Directory of per-account snapshots.
+        output_dir (str, optional): If given, each account's output is
+            written here in streaming fashion.
+        checkpoint (RunCheckpoint, optional): Checkpoint of the run.
+        output_format (str): Output sink used with output_dir, one of
+            sinks.SINK_FORMATS.
+        api_root (str): Root URL of the YouTube Data API.
+
+    Returns:
+        Dict[str, int]: Number of channels fetched per account.
+    """
+    _import_aiohttp()
+
+    async def run() -> Dict[str, int]:
+        async with AsyncFetchEngine(cache=cache, api_root=api_root) as engine:
+            return await engine.fetch_all_accounts(
+                account_credentials,
+                account_channels=account_channels,
+                workers=workers,
+                snapshot_dir=snapshot_dir,
+                output_dir=output_dir,
+                checkpoint=checkpoint,
+                output_format=output_format
+            )
+
+    return asyncio.run(run())
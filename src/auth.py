@@ -7,13 +7,21 @@ It supports multiple accounts with different OAuth clients.
 
 import os
 import json
-import pickle
-import tempfile
-from typing import Optional, Dict, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Dict, Any
+
+from metrics import get_metrics
+from token_store import TokenStore, TOKEN_STORE_FILE
 
 # YouTube API scopes
 SCOPES = ['https://www.googleapis.com/auth/youtube.readonly']
 
+# Proactive token refresh
+DEFAULT_REFRESH_WORKERS = 4
+DEFAULT_REFRESH_MARGIN_SECONDS = 300
+
 
 def load_credentials_config(config_file: str = 'credentials_config.json') -> Dict[str, Any]:
     """
@@ -52,6 +60,21 @@ def load_credentials_config(config_file: str = 'credentials_config.json') -> Dic
         )
 
 
+def get_client_key(config: Dict[str, Any], username: str) -> str:
+    """
+    Get the name of the OAuth client an account is mapped to.
+    
+    Args:
+        config (Dict[str, Any]): The credentials configuration.
+        username (str): The YouTube account username/email.
+    
+    Returns:
+        str: The client key, or 'default_client' if the account is not mapped.
+    """
+    mapping = config.get('account_to_client_mapping', {})
+    return mapping.get(username, 'default_client')
+
+
 def get_client_config(config: Dict[str, Any], username: str) -> Dict[str, Any]:
     """
     Get the appropriate OAuth client config for an account.
@@ -66,8 +89,7 @@ def get_client_config(config: Dict[str, Any], username: str) -> Dict[str, Any]:
     Raises:
         ValueError: If the client configuration is not found.
     """
-    mapping = config.get('account_to_client_mapping', {})
-    client_key = mapping.get(username, 'default_client')
+    client_key = get_client_key(config, username)
     
     if client_key not in config:
         raise ValueError(
@@ -77,48 +99,267 @@ def get_client_config(config: Dict[str, Any], username: str) -> Dict[str, Any]:
     return config[client_key]
 
 
-def create_temp_client_secret(client_config: Dict[str, Any]) -> str:
+def _import_google_libraries() -> None:
+    """
+    Verify that the Google API libraries are importable.
+    
+    Raises:
+        Exception: If the required libraries are not installed.
+    """
+    try:
+        import googleapiclient.discovery  # noqa: F401
+        import google_auth_oauthlib.flow  # noqa: F401
+        import google.auth.transport.requests  # noqa: F401
+    except ImportError as ie:
+        raise Exception(
+            "\n❌ Missing required Google API libraries.\n\n"
+            "Install them with:\n\n"
+            "    pip install --upgrade google-api-python-client "
+            "google-auth-httplib2 google-auth-oauthlib\n\n"
+            f"Original ImportError: {ie}"
+        )
+
+
+def _needs_refresh(creds: Any, margin_seconds: float) -> bool:
     """
-    Create a temporary client_secret.json file for a specific OAuth client.
+    Check whether credentials are expired or about to expire.
     
     Args:
-        client_config (Dict[str, Any]): The OAuth client configuration.
+        creds (Credentials): OAuth 2.0 credentials.
+        margin_seconds (float): Refresh tokens that expire within this time.
     
     Returns:
-        str: Path to the temporary file.
+        bool: True if the credentials should be refreshed now.
     """
-    temp_file = tempfile.NamedTemporaryFile(
-        mode='w',
-        suffix='.json',
-        delete=False,
-        dir='.'
-    )
-    
-    client_secret_data = {'installed': client_config}
-    json.dump(client_secret_data, temp_file)
-    temp_file.close()
-    
-    return temp_file.name
+    if not creds.valid:
+        return True
+    expiry = getattr(creds, 'expiry', None)
+    if expiry is None:
+        return False
+    # google-auth stores expiry as a naive UTC datetime
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return expiry - now < timedelta(seconds=margin_seconds)
 
 
-def cleanup_temp_file(file_path: str) -> None:
+class CredentialManager:
     """
-    Clean up a temporary file.
+    In-process manager for the OAuth credentials of many accounts.
     
-    Args:
-        file_path (str): Path to the file to delete.
+    Tokens live in the shared token store (secret/tokens.sqlite3); legacy
+    per-account pickle files are moved into it on first use. Every saved
+    token is loaded once. Tokens that are expired or close to
+    expiry are refreshed concurrently on a small thread pool, and browser
+    consent is only started (one account at a time) for accounts whose
+    token is missing or cannot be refreshed. OAuth flows are built from the
+    in-memory client configuration, so no client secret file is written.
     """
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    
+    def __init__(
+        self,
+        credentials_config: Dict[str, Any],
+        token_dir: str = 'secret',
+        refresh_workers: int = DEFAULT_REFRESH_WORKERS,
+        refresh_margin_seconds: float = DEFAULT_REFRESH_MARGIN_SECONDS,
+    ) -> None:
+        """
+        Create a credential manager.
+        
+        Args:
+            credentials_config (Dict[str, Any]): The credentials configuration.
+            token_dir (str): Directory holding the token store.
+            refresh_workers (int): Number of tokens refreshed at the same time.
+            refresh_margin_seconds (float): Tokens expiring within this time
+                are refreshed ahead of use.
+        """
+        self.credentials_config = credentials_config
+        self.token_dir = token_dir
+        self.refresh_workers = refresh_workers
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.failures: Dict[str, str] = {}
+        self._credentials: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.store = TokenStore(os.path.join(token_dir, TOKEN_STORE_FILE))
+        migrated = self.store.migrate_pickles(token_dir)
+        if migrated:
+            print(f"📦 Moved {migrated} token file(s) into {self.store.db_path}")
+    
+    def _refresh(self, username: str, creds: Any) -> Any:
+        """
+        Refresh one account's token and save it.
+        
+        The refresh runs under the account's lease in the token store, so
+        concurrent runs never refresh the same token twice: a run that had
+        to wait picks up the token the other run just saved instead.
+        
+        Args:
+            username (str): The YouTube account username/email.
+            creds (Credentials): Credentials with a refresh token.
+        
+        Returns:
+            Credentials: The refreshed credentials.
+        """
+        from google.auth.transport.requests import Request
+        
+        with self.store.refresh_lease(username):
+            stored = self.store.load(username)
+            if stored is not None and not _needs_refresh(stored, self.refresh_margin_seconds):
+                return stored
+            with get_metrics().auth_step('refresh'):
+                creds.refresh(Request())
+            self.store.save(username, creds)
+        return creds
+    
+    def _run_consent_flow(self, username: str) -> Any:
+        """
+        Obtain new credentials for an account through browser consent.
+        
+        Args:
+            username (str): The YouTube account username/email.
+        
+        Returns:
+            Credentials: The new credentials.
+        
+        Raises:
+            Exception: If authentication fails.
+        """
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        
+        client_config = get_client_config(self.credentials_config, username)
+        print("🔐 Starting OAuth authentication...")
+        print("📋 A browser window will open for authentication.")
+        try:
+            with get_metrics().auth_step('consent'):
+                flow = InstalledAppFlow.from_client_config({'installed': client_config}, SCOPES)
+                creds = flow.run_local_server(
+                    port=0,
+                    open_browser=True,
+                    prompt='consent'
+                )
+            print("✅ Authentication successful!")
+        except Exception as oauth_error:
+            raise _handle_oauth_error(oauth_error, username)
+        
+        self.store.save(username, creds)
+        return creds
+    
+    def refresh_due(self, usernames: List[str]) -> Dict[str, str]:
+        """
+        Concurrently refresh the loaded tokens that are expired or near expiry.
+        
+        Args:
+            usernames (List[str]): Accounts to check.
+        
+        Returns:
+            Dict[str, str]: Error messages of accounts whose refresh failed.
+                They keep their old credentials, which are still usable if
+                they have not expired yet.
+        """
+        with self._lock:
+            due = [
+                (username, self._credentials[username])
+                for username in usernames
+                if self._credentials.get(username) is not None
+                and self._credentials[username].refresh_token
+                and _needs_refresh(self._credentials[username], self.refresh_margin_seconds)
+            ]
+        if not due:
+            return {}
+        
+        _import_google_libraries()
+        print(f"🔄 Refreshing {len(due)} token(s)...")
+        failures = {}
+        with ThreadPoolExecutor(max_workers=max(1, self.refresh_workers)) as executor:
+            futures = {
+                executor.submit(self._refresh, username, creds): username
+                for username, creds in due
+            }
+            for future in as_completed(futures):
+                username = futures[future]
+                try:
+                    creds = future.result()
+                except Exception as e:
+                    failures[username] = str(e)
+                    continue
+                with self._lock:
+                    self._credentials[username] = creds
+        return failures
+    
+    def prepare(self, usernames: List[str]) -> Dict[str, Any]:
+        """
+        Make credentials for all accounts ready before any fetching starts.
+        
+        Loads every saved token in one query, refreshes due tokens concurrently and runs
+        the browser consent flow serially for accounts that still have no
+        usable credentials. Accounts that fail are listed in self.failures.
+        
+        Args:
+            usernames (List[str]): Accounts to prepare.
+        
+        Returns:
+            Dict[str, Credentials]: Ready credentials of the accounts that
+                authenticated successfully.
+        """
+        with self._lock:
+            missing = [username for username in usernames if username not in self._credentials]
+        if missing:
+            loaded = self.store.load_all(missing)
+            with self._lock:
+                for username in missing:
+                    self._credentials.setdefault(username, loaded.get(username))
+        
+        for username, error in self.refresh_due(usernames).items():
+            print(f"⚠️  Could not refresh token for {username}: {error}")
+        
+        ready: Dict[str, Any] = {}
+        for idx, username in enumerate(usernames, 1):
+            creds = self._credentials.get(username)
+            if creds is None or not creds.valid:
+                print(f"\n[{idx}/{len(usernames)}] Authenticating account: {username}")
+                try:
+                    _import_google_libraries()
+                    creds = self._run_consent_flow(username)
+                except Exception as e:
+                    self.failures[username] = str(e)
+                    continue
+                with self._lock:
+                    self._credentials[username] = creds
+            self.failures.pop(username, None)
+            ready[username] = creds
+        return ready
+    
+    def get(self, username: str) -> Any:
+        """
+        Get ready credentials for one account, refreshing them if needed.
+        
+        Args:
+            username (str): The YouTube account username/email.
+        
+        Returns:
+            Credentials: Valid OAuth 2.0 credentials for the account.
+        
+        Raises:
+            Exception: If authentication fails.
+        """
+        ready = self.prepare([username])
+        if username not in ready:
+            raise Exception(self.failures.get(username, 'Authentication failed'))
+        return ready[username]
+    
+    def close(self) -> None:
+        """Close the token store."""
+        self.store.close()
 
 
-def authenticate(
+def get_credentials(
     username: str,
     credentials_config: Dict[str, Any],
     token_dir: str = 'secret',
 ) -> Any:
     """
-    Authenticate with YouTube API using OAuth 2.0 for a specific account.
+    Load, refresh or obtain OAuth 2.0 credentials for a specific account.
+    
+    A browser consent flow is only started when there is no usable saved
+    token and it cannot be refreshed.
     
     Args:
         username (str): The YouTube account username/email.
@@ -126,78 +367,64 @@ def authenticate(
         token_dir (str): Directory to store authentication tokens.
     
     Returns:
-        Resource: Authenticated YouTube API service object.
+        Credentials: Valid OAuth 2.0 credentials for the account.
     
     Raises:
         Exception: If authentication fails or required libraries are not installed.
     """
-    creds = None
-    token_file = os.path.join(token_dir, f'token_{username}.pickle')
-
-    # Import Google API libraries lazily
+    _import_google_libraries()
+    manager = CredentialManager(credentials_config, token_dir)
     try:
-        from googleapiclient.discovery import build
-        from google_auth_oauthlib.flow import InstalledAppFlow
-        from google.auth.transport.requests import Request
-    except ImportError as ie:
-        raise Exception(
-            "\n❌ Missing required Google API libraries.\n\n"
-            "Install them with:\n\n"
-            "    pip install --upgrade google-api-python-client "
-            "google-auth-httplib2 google-auth-oauthlib\n\n"
-            f"Original ImportError: {ie}"
-        )
-    
-    try:
-        # Create token directory if it doesn't exist
-        os.makedirs(token_dir, exist_ok=True)
-        
-        # Get the appropriate OAuth client for this account
-        client_config = get_client_config(credentials_config, username)
-        temp_secret_file = create_temp_client_secret(client_config)
-        
-        try:
-            # Load saved credentials if they exist
-            if os.path.exists(token_file):
-                with open(token_file, 'rb') as token:
-                    creds = pickle.load(token)
-            
-            # If credentials are invalid or don't exist, get new ones
-            if not creds or not creds.valid:
-                if creds and creds.expired and creds.refresh_token:
-                    print("🔄 Refreshing expired credentials...")
-                    creds.refresh(Request())
-                else:
-                    print("🔐 Starting OAuth authentication...")
-                    print("📋 A browser window will open for authentication.")
-                    try:
-                        flow = InstalledAppFlow.from_client_secrets_file(
-                            temp_secret_file, SCOPES)
-                        creds = flow.run_local_server(
-                            port=0,
-                            open_browser=True,
-                            prompt='consent'
-                        )
-                        print("✅ Authentication successful!")
-                    except Exception as oauth_error:
-                        raise _handle_oauth_error(oauth_error, username)
-                
-                # Save credentials for future use
-                os.makedirs(token_dir, exist_ok=True)
-                with open(token_file, 'wb') as token:
-                    pickle.dump(creds, token)
-            
-            return build('youtube', 'v3', credentials=creds)
-            
-        finally:
-            # Clean up temporary client secret file
-            cleanup_temp_file(temp_secret_file)
-        
+        return manager.get(username)
     except Exception as e:
         raise Exception(
             f"\n❌ Authentication failed: {str(e)}\n"
             "Please check your credentials and try again."
         )
+    finally:
+        manager.close()
+
+
+def build_youtube_client(creds: Any) -> Any:
+    """
+    Build a YouTube API service object for the given credentials.
+    
+    Service objects are not thread-safe, so each worker thread should build
+    its own client. Clients come from the shared factory, which reuses the
+    discovery document and the thread's HTTP connections.
+    
+    Args:
+        creds (Credentials): Valid OAuth 2.0 credentials.
+    
+    Returns:
+        Resource: Authenticated YouTube API service object.
+    """
+    from client_factory import get_client_factory
+    
+    return get_client_factory().build(creds)
+
+
+def authenticate(
+    username: str,
+    credentials_config: Dict[str, Any],
+    token_dir: str = 'secret',
+) -> Any:
+    """
+    Authenticate with YouTube API using OAuth 2.0 for a specific account.
+    
+    Args:
+        username (str): The YouTube account username/email.
+        credentials_config (Dict[str, Any]): The credentials configuration.
+        token_dir (str): Directory to store authentication tokens.
+    
+    Returns:
+        Resource: Authenticated YouTube API service object.
+    
+    Raises:
+        Exception: If authentication fails or required libraries are not installed.
+    """
+    creds = get_credentials(username, credentials_config, token_dir)
+    return build_youtube_client(creds)
 
 
 def _handle_oauth_error(error: Exception, username: str) -> Exception:
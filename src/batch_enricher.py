@@ -0,0 +1,307 @@
+"""
+Batched channel enrichment module.
+
+Sends channels.list lookups as googleapiclient BatchHttpRequests: many
+channels.list calls travel in one multipart HTTP request. One enricher
+exists per OAuth client and is shared by every account that uses the
+client, so lookups from several accounts fetched at the same time are
+combined into the same batch. Channel IDs that another account is already
+looking up are not requested twice. Each sub-request succeeds, is retried
+or fails on its own, so one bad call does not fail the whole batch; a
+retried call waits out its backoff in the queue, so lookups of other
+accounts keep going out in the meantime.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Dict, Any, Callable, Optional
+
+from api_executor import (
+    MAX_RETRIES,
+    backoff_delay,
+    execute_request,
+    get_circuit_breaker,
+    record_error,
+)
+from channel_cache import ChannelCache
+from metrics import MeteredHttp, get_metrics
+from youtube_api import CHANNELS_BATCH_SIZE, CHANNELS_FIELDS, apply_channel_items, cached_categories
+
+# Most channels.list calls packed into one batch HTTP request
+DEFAULT_MAX_CALLS_PER_BATCH = 50
+
+# How long the first queued lookup waits for others to join its batch
+DEFAULT_BATCH_WINDOW_SECONDS = 0.05
+
+
+class _Lookup:
+    """One channels.list call waiting to be sent: up to 50 channel IDs."""
+
+    def __init__(self, channel_ids: List[str], youtube: Any, log: Callable[[str], None]) -> None:
+        self.channel_ids = channel_ids
+        self.youtube = youtube
+        self.log = log
+        self.attempt = 0
+        # Monotonic time before which a retried call must not be sent
+        self.not_before = 0.0
+        self.future: Future = Future()
+
+
+class _BatchCall:
+    """Adapts a BatchHttpRequest to execute_request with the dispatcher's transport."""
+
+    endpoint = 'batch'
+
+    def __init__(self, batch: Any, http: Any, quota_units: int) -> None:
+        self.batch = batch
+        self.http = http
+        # Every channels.list call in the batch is charged on its own
+        self.quota_units = quota_units
+
+    def execute(self) -> None:
+        self.batch.execute(http=self.http)
+
+
+class BatchEnricher:
+    """
+    Shared, batching channel category lookup for one OAuth client.
+
+    Worker threads call lookup(); a dispatcher thread collects the queued
+    channels.list calls for a short window and sends them as one batch.
+    Requests are built on the worker's own client (so each sub-request
+    carries that account's credentials), while the batch itself is sent
+    over the dispatcher's transport, because httplib2 transports must not
+    be shared between threads.
+    """
+
+    def __init__(
+        self,
+        client_key: str,
+        cache: Optional[ChannelCache] = None,
+        max_calls_per_batch: int = DEFAULT_MAX_CALLS_PER_BATCH,
+        window_seconds: float = DEFAULT_BATCH_WINDOW_SECONDS,
+        max_retries: int = MAX_RETRIES,
+    ) -> None:
+        """
+        Create an enricher and start its dispatcher thread.
+
+        Args:
+            client_key (str): OAuth client the lookups are billed to.
+            cache (ChannelCache, optional): Persistent channel metadata cache.
+            max_calls_per_batch (int): Most channels.list calls per batch.
+            window_seconds (float): Time a batch waits for more lookups.
+            max_retries (int): Maximum retries of a failed sub-request.
+        """
+        self.client_key = client_key
+        self.cache = cache
+        self.max_calls_per_batch = max_calls_per_batch
+        self.window_seconds = window_seconds
+        self.max_retries = max_retries
+        self.batches_sent = 0
+        self.calls_sent = 0
+        self._queue: List[_Lookup] = []
+        self._inflight: Dict[str, Future] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._http: Any = None
+        self._thread = threading.Thread(
+            target=self._dispatch_loop, name=f'batch-enricher-{client_key}', daemon=True
+        )
+        self._thread.start()
+
+    def lookup(
+        self,
+        channel_ids: List[str],
+        youtube: Any,
+        log: Callable[[str], None] = print,
+    ) -> Dict[str, str]:
+        """
+        Resolve channel categories, batched with other accounts' lookups.
+
+        Args:
+            channel_ids (List[str]): The YouTube channel IDs to look up.
+            youtube (Resource): The calling account's YouTube client.
+            log (Callable[[str], None]): Function used to report warnings.
+
+        Returns:
+            Dict[str, str]: Mapping of channel ID to its category string, with
+                'Unknown' for IDs whose lookup failed.
+        """
+        categories, missing_ids = cached_categories(channel_ids, self.cache)
+        waiting: Dict[str, Future] = {}
+
+        with self._condition:
+            new_ids = []
+            for channel_id in missing_ids:
+                if channel_id in self._inflight:
+                    waiting[channel_id] = self._inflight[channel_id]
+                else:
+                    new_ids.append(channel_id)
+            for start in range(0, len(new_ids), CHANNELS_BATCH_SIZE):
+                lookup = _Lookup(new_ids[start:start + CHANNELS_BATCH_SIZE], youtube, log)
+                for channel_id in lookup.channel_ids:
+                    self._inflight[channel_id] = lookup.future
+                    waiting[channel_id] = lookup.future
+                self._queue.append(lookup)
+            if new_ids:
+                self._condition.notify()
+
+        for channel_id, future in waiting.items():
+            categories[channel_id] = future.result().get(channel_id, 'Unknown')
+        return categories
+
+    def close(self) -> None:
+        """Stop the dispatcher after the queued lookups have been sent."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _ready_lookups(self) -> List[_Lookup]:
+        """Get the queued lookups that may be sent now; the caller must hold the condition."""
+        now = time.monotonic()
+        return [lookup for lookup in self._queue if lookup.not_before <= now]
+
+    def _dispatch_loop(self) -> None:
+        """Collect queued lookups and send them in batches until closed."""
+        while True:
+            with self._condition:
+                ready = self._ready_lookups()
+                while not ready:
+                    if self._queue:
+                        # Only retries are queued: sleep until the first is due
+                        self._condition.wait(
+                            min(lookup.not_before for lookup in self._queue) - time.monotonic()
+                        )
+                    elif self._closed:
+                        return
+                    else:
+                        self._condition.wait()
+                    ready = self._ready_lookups()
+                # Give lookups from other accounts a moment to join the batch
+                deadline = time.monotonic() + self.window_seconds
+                while len(ready) < self.max_calls_per_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                    ready = self._ready_lookups()
+                lookups = ready[:self.max_calls_per_batch]
+                sent = set(map(id, lookups))
+                self._queue = [lookup for lookup in self._queue if id(lookup) not in sent]
+
+            try:
+                self._send(lookups)
+            except Exception as e:
+                # Never leave a worker waiting on a lookup that will not be sent
+                for lookup in lookups:
+                    if not lookup.future.done():
+                        self._fail(lookup, e)
+
+    def _send(self, lookups: List[_Lookup]) -> None:
+        """
+        Send lookups as one batch request and settle or requeue each of them.
+
+        Args:
+            lookups (List[_Lookup]): The calls to send together.
+        """
+        import httplib2
+
+        if self._http is None:
+            self._http = MeteredHttp(httplib2.Http())
+
+        breaker = get_circuit_breaker(self.client_key)
+        batch = lookups[0].youtube.new_batch_http_request()
+        outcomes: Dict[str, Any] = {}
+
+        def callback(request_id: str, response: Any, exception: Optional[Exception]) -> None:
+            outcomes[request_id] = exception if exception is not None else response
+
+        for idx, lookup in enumerate(lookups):
+            batch.add(
+                lookup.youtube.channels().list(
+                    part='topicDetails,snippet',
+                    id=','.join(lookup.channel_ids),
+                    maxResults=CHANNELS_BATCH_SIZE,
+                    fields=CHANNELS_FIELDS
+                ),
+                callback=callback,
+                request_id=str(idx)
+            )
+
+        try:
+            execute_request(_BatchCall(batch, self._http, len(lookups)), self.client_key, log=lookups[0].log)
+        except Exception as e:
+            for lookup in lookups:
+                self._fail(lookup, e)
+            return
+
+        self.batches_sent += 1
+        self.calls_sent += len(lookups)
+        retry = []
+        for idx, lookup in enumerate(lookups):
+            outcome = outcomes.get(str(idx), Exception('No response for the call in the batch'))
+            if isinstance(outcome, Exception):
+                if record_error(breaker, outcome, self.client_key) and lookup.attempt < self.max_retries:
+                    get_metrics().record_retry('channels.list', self.client_key)
+                    retry.append(lookup)
+                else:
+                    self._fail(lookup, outcome)
+                continue
+
+            categories = {channel_id: 'Unknown' for channel_id in lookup.channel_ids}
+            apply_channel_items(outcome, categories, self.cache)
+            self._settle(lookup, categories)
+
+        if retry:
+            # Requeue the failed calls behind their backoff instead of
+            # sleeping, which would hold up every other account's lookups
+            now = time.monotonic()
+            for lookup in retry:
+                lookup.not_before = now + backoff_delay(lookup.attempt)
+                lookup.attempt += 1
+            with self._condition:
+                self._queue.extend(retry)
+                self._condition.notify()
+
+    def _settle(self, lookup: _Lookup, categories: Dict[str, str]) -> None:
+        """Resolve a lookup's future and forget its in-flight IDs."""
+        with self._condition:
+            for channel_id in lookup.channel_ids:
+                if self._inflight.get(channel_id) is lookup.future:
+                    del self._inflight[channel_id]
+        lookup.future.set_result(categories)
+
+    def _fail(self, lookup: _Lookup, error: Exception) -> None:
+        """Report a failed lookup and resolve its channels as 'Unknown'."""
+        lookup.log(
+            f"Warning: Error fetching categories for {len(lookup.channel_ids)} channel(s): {str(error)}"
+        )
+        self._settle(lookup, {channel_id: 'Unknown' for channel_id in lookup.channel_ids})
+
+    def summary(self) -> str:
+        """
+        Describe how much batching happened.
+
+        Returns:
+            str: Human-readable call and batch counts.
+        """
+        return f"{self.calls_sent} channels.list call(s) in {self.batches_sent} batch request(s)"
+
+
+def start_batch_enrichers(
+    client_keys: List[str],
+    cache: Optional[ChannelCache] = None,
+) -> Dict[str, BatchEnricher]:
+    """
+    Start one shared enricher per OAuth client.
+
+    Args:
+        client_keys (List[str]): OAuth client keys of the accounts in a run.
+        cache (ChannelCache, optional): Persistent channel metadata cache.
+
+    Returns:
+        Dict[str, BatchEnricher]: Enricher per client key.
+    """
+    return {client_key: BatchEnricher(client_key, cache) for client_key in dict.fromkeys(client_keys)}
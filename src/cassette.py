@@ -0,0 +1,480 @@
+"""
+API record/replay module.
+
+With --record DIR every response the YouTube API clients receive is saved in
+a cassette: a directory with a manifest (cassette.json) and the requests and
+responses as gzip-compressed JSON Lines (interactions.jsonl.gz). Requests are
+normalized so that they match across runs and machines: the host is dropped,
+query parameters (and the channel IDs of channels.list) are sorted, and only
+the headers that change a response (If-None-Match; status, Content-Type,
+ETag and Retry-After of the response) are kept. Authorization headers and
+OAuth token requests are never recorded.
+
+With --replay DIR the same runs are served from the cassette without network
+access or OAuth tokens. Responses are matched per account, in the order they
+were recorded, so retries and errors play back as they happened. Category
+lookups whose channel ID batches differ from the recording, e.g. because the
+channel cache was warmer, are answered from the recorded channels. Recorded
+latencies can be reproduced to profile a run against production-shaped data.
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from client_factory import YouTubeClientFactory, set_client_factory
+from metrics import MeteredHttp, current_account
+
+CASSETTE_VERSION = 1
+
+MANIFEST_FILENAME = 'cassette.json'
+INTERACTIONS_FILENAME = 'interactions.jsonl.gz'
+
+# Only requests below this path are recorded
+API_PATH = '/youtube/v3/'
+
+# Query parameters that never change a response
+IGNORED_PARAMS = {'key', 'quotaUser', 'prettyPrint'}
+
+# Response headers kept in the cassette
+RECORDED_HEADERS = ('content-type', 'etag', 'retry-after')
+
+
+class CassetteMissError(Exception):
+    """Raised on replay when the cassette has no response for a request."""
+
+
+def _import_httplib2() -> Any:
+    """
+    Import httplib2 lazily.
+
+    Returns:
+        module: The httplib2 module.
+
+    Raises:
+        Exception: If httplib2 is not installed.
+    """
+    try:
+        import httplib2
+        return httplib2
+    except ImportError as ie:
+        raise Exception(
+            "httplib2 is required to record or replay API responses.\n"
+            "Install it with: pip install -r requirements.txt"
+        ) from ie
+
+
+def normalize_request(uri: str) -> Optional[str]:
+    """
+    Reduce a request URI to the part that decides the response.
+
+    Args:
+        uri (str): The full request URI.
+
+    Returns:
+        str, optional: 'path?sorted-query' relative to the API path, or None
+            if the URI is not a YouTube Data API request.
+    """
+    parts = urlsplit(uri)
+    if API_PATH not in parts.path or '/batch' in parts.path:
+        return None
+    path = parts.path[parts.path.index(API_PATH) + len(API_PATH):]
+    params = []
+    for name, value in parse_qsl(parts.query, keep_blank_values=True):
+        if name in IGNORED_PARAMS:
+            continue
+        if name == 'id':
+            value = ','.join(sorted(value.split(',')))
+        params.append((name, value))
+    return f"{path}?{urlencode(sorted(params))}" if params else path
+
+
+def _header(headers: Optional[Dict[str, str]], name: str) -> Optional[str]:
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _parse_body(content: bytes) -> Any:
+    """Parse a JSON response body, or keep it as text if it is not JSON."""
+    text = (content or b'').decode('utf-8', errors='replace')
+    try:
+        return {'json': json.loads(text)} if text else {'text': ''}
+    except ValueError:
+        return {'text': text}
+
+
+def _render_body(body: Dict[str, Any]) -> bytes:
+    if 'json' in body:
+        return json.dumps(body['json'], separators=(',', ':')).encode('utf-8')
+    return body['text'].encode('utf-8')
+
+
+class CassetteRecorder:
+    """Appends normalized API interactions to a cassette directory."""
+
+    def __init__(self, directory: str) -> None:
+        """
+        Start a new cassette, replacing any earlier one in the directory
+        once the recording is finished.
+
+        Args:
+            directory (str): The cassette directory.
+        """
+        self.directory = directory
+        self.account_clients: Dict[str, str] = {}
+        self.interactions = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._temp_path = os.path.join(directory, f"{INTERACTIONS_FILENAME}.tmp")
+        self._file = gzip.open(self._temp_path, 'wt', encoding='utf-8')
+
+    def wrap(self, http: Any) -> '_RecordingHttp':
+        """Wrap a worker thread's transport so that its responses are recorded."""
+        return _RecordingHttp(http, self)
+
+    def add_accounts(self, account_credentials: List[Tuple[str, str, Any]]) -> None:
+        """
+        Remember the OAuth client of every account, for replay.
+
+        Args:
+            account_credentials (List[Tuple[str, str, Credentials]]): Output
+                of runner.resolve_credentials.
+        """
+        for username, client_key, _ in account_credentials:
+            self.account_clients[username] = client_key
+
+    def record(
+        self,
+        request: str,
+        method: str,
+        if_none_match: Optional[str],
+        resp: Any,
+        content: bytes,
+        elapsed: float,
+    ) -> None:
+        """Append one interaction to the cassette."""
+        line = json.dumps({
+            'account': current_account(),
+            'method': method,
+            'request': request,
+            'if_none_match': if_none_match,
+            'status': int(resp.status),
+            'headers': {name: resp[name] for name in RECORDED_HEADERS if name in resp},
+            'body': _parse_body(content),
+            'elapsed': round(elapsed, 6),
+        }, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + '\n')
+            self.interactions += 1
+
+    def finish(self, run_info: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Close the cassette and write its manifest.
+
+        Args:
+            run_info (Dict, optional): Details of the recorded run.
+        """
+        with self._lock:
+            self._file.close()
+            os.replace(self._temp_path, os.path.join(self.directory, INTERACTIONS_FILENAME))
+            manifest = {
+                'version': CASSETTE_VERSION,
+                'recorded_at': datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+                'duration_seconds': round(time.time() - self.started, 3),
+                'interactions': self.interactions,
+                'account_to_client_mapping': dict(sorted(self.account_clients.items())),
+                'run': run_info or {},
+            }
+        temp_path = os.path.join(self.directory, f"{MANIFEST_FILENAME}.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, os.path.join(self.directory, MANIFEST_FILENAME))
+        print(f"📼 Recorded {self.interactions} API response(s) to: {self.directory}")
+
+
+class _RecordingHttp:
+    """httplib2.Http-like transport that records API responses."""
+
+    def __init__(self, http: Any, recorder: CassetteRecorder) -> None:
+        self.http = http
+        self.recorder = recorder
+
+    def request(
+        self,
+        uri: str,
+        method: str = 'GET',
+        body: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        start = time.perf_counter()
+        resp, content = self.http.request(uri, method, body, headers, *args, **kwargs)
+        request = normalize_request(uri)
+        if request is not None:
+            self.recorder.record(
+                request, method, _header(headers, 'if-none-match'), resp, content,
+                time.perf_counter() - start
+            )
+        return resp, content
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.http, name)
+
+
+class Cassette:
+    """Recorded interactions of a cassette, served in recording order."""
+
+    def __init__(self, directory: str, reproduce_latency: bool = False) -> None:
+        """
+        Load a cassette.
+
+        Args:
+            directory (str): The cassette directory.
+            reproduce_latency (bool): Wait as long as each recorded response
+                took before returning it.
+
+        Raises:
+            Exception: If the cassette is missing or of another version.
+        """
+        manifest_path = os.path.join(directory, MANIFEST_FILENAME)
+        if not os.path.exists(manifest_path):
+            raise Exception(f"No cassette found in '{directory}' (missing {MANIFEST_FILENAME})")
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != CASSETTE_VERSION:
+            raise Exception(
+                f"Cassette '{directory}' has version {self.manifest.get('version')}, "
+                f"expected {CASSETTE_VERSION}"
+            )
+
+        self.directory = directory
+        self.reproduce_latency = reproduce_latency
+        self.misses = 0
+        self.synthesized = 0
+        self._interactions: Dict[Tuple[Any, str, str], List[Dict[str, Any]]] = {}
+        self._positions: Dict[Tuple[Any, ...], int] = {}
+        self._channels: Dict[str, Dict[str, Any]] = {}
+        self._channel_latencies: List[float] = []
+        self._lock = threading.Lock()
+
+        with gzip.open(os.path.join(directory, INTERACTIONS_FILENAME), 'rt', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                key = (entry['account'], entry['method'], entry['request'])
+                self._interactions.setdefault(key, []).append(entry)
+                if entry['request'].startswith('channels?') and entry['status'] == 200:
+                    self._channel_latencies.append(entry['elapsed'])
+                    for item in entry['body'].get('json', {}).get('items', []):
+                        self._channels[item['id']] = item
+        self._channel_latencies.sort()
+
+    @property
+    def account_clients(self) -> Dict[str, str]:
+        """Dict[str, str]: OAuth client key of every recorded account."""
+        return self.manifest.get('account_to_client_mapping', {})
+
+    def respond(
+        self,
+        request: str,
+        method: str,
+        if_none_match: Optional[str],
+    ) -> Tuple[int, Dict[str, str], bytes, float]:
+        """
+        Find the recorded response to a request.
+
+        Recorded responses are returned in order; the last one is repeated
+        once a request is made more often than it was recorded.
+
+        Args:
+            request (str): The normalized request (see normalize_request).
+            method (str): The HTTP method.
+            if_none_match (str, optional): The request's If-None-Match header.
+
+        Returns:
+            tuple: (status, headers, body, elapsed seconds)
+
+        Raises:
+            CassetteMissError: If the cassette has no matching response.
+        """
+        account = current_account()
+        entries = self._interactions.get((account, method, request), [])
+        # A conditional request the recording did not make gets the full
+        # response; the caller compares its ETag itself
+        candidates = [e for e in entries if e['if_none_match'] == if_none_match]
+        if not candidates:
+            candidates = [e for e in entries if e['status'] != 304]
+        if candidates:
+            position_key = (account, method, request, if_none_match)
+            with self._lock:
+                position = self._positions.get(position_key, 0)
+                self._positions[position_key] = position + 1
+            entry = candidates[min(position, len(candidates) - 1)]
+            return entry['status'], entry['headers'], _render_body(entry['body']), entry['elapsed']
+
+        if request.startswith('channels?'):
+            return self._channels_response(request)
+
+        with self._lock:
+            self.misses += 1
+        raise CassetteMissError(
+            f"No recorded response for {method} {request} (account {account}) "
+            f"in cassette '{self.directory}'"
+        )
+
+    def _channels_response(self, request: str) -> Tuple[int, Dict[str, str], bytes, float]:
+        """Build a channels.list response from the channels recorded for any call."""
+        ids = dict(parse_qsl(request.split('?', 1)[1])).get('id', '').split(',')
+        items = [self._channels[channel_id] for channel_id in ids if channel_id in self._channels]
+        latencies = self._channel_latencies
+        elapsed = latencies[len(latencies) // 2] if latencies else 0.0
+        with self._lock:
+            self.synthesized += 1
+        body = {
+            'kind': 'youtube#channelListResponse',
+            'pageInfo': {'totalResults': len(items), 'resultsPerPage': len(items)},
+            'items': items,
+        }
+        return 200, {'content-type': 'application/json; charset=UTF-8'}, \
+            json.dumps(body, separators=(',', ':')).encode('utf-8'), elapsed
+
+    def summary(self) -> str:
+        """
+        Describe how the cassette was used.
+
+        Returns:
+            str: Human-readable counts.
+        """
+        return (
+            f"{sum(self._positions.values())} recorded response(s) replayed, "
+            f"{self.synthesized} channels.list response(s) rebuilt, {self.misses} miss(es)"
+        )
+
+
+class _ReplayHttp:
+    """httplib2.Http-like transport that answers from a cassette."""
+
+    def __init__(self, cassette: Cassette) -> None:
+        self.cassette = cassette
+        self.httplib2 = _import_httplib2()
+
+    def request(
+        self,
+        uri: str,
+        method: str = 'GET',
+        body: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        request = normalize_request(uri)
+        if request is None:
+            raise CassetteMissError(f"Only YouTube Data API requests can be replayed, not {uri}")
+        status, response_headers, content, elapsed = self.cassette.respond(
+            request, method, _header(headers, 'if-none-match')
+        )
+        if self.cassette.reproduce_latency and elapsed:
+            time.sleep(elapsed)
+        return self.httplib2.Response(dict(response_headers, status=str(status))), content
+
+
+class ReplayClientFactory(YouTubeClientFactory):
+    """Client factory whose clients are served from a cassette without credentials."""
+
+    def __init__(self, cassette: Cassette) -> None:
+        super().__init__()
+        self.cassette = cassette
+
+    def _thread_http(self) -> Any:
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = MeteredHttp(_ReplayHttp(self.cassette))
+        return http
+
+    def build(self, creds: Any) -> Any:
+        """
+        Build a YouTube API client that replays the cassette.
+
+        Args:
+            creds: Ignored; replayed runs need no credentials.
+
+        Returns:
+            Resource: YouTube API service object.
+        """
+        from googleapiclient.discovery import build_from_document
+
+        return build_from_document(self.discovery_document(), http=self._thread_http())
+
+
+def start_recording(directory: str) -> CassetteRecorder:
+    """
+    Record the responses of every client built from now on.
+
+    Args:
+        directory (str): The cassette directory.
+
+    Returns:
+        CassetteRecorder: The recorder; call finish() after the run.
+    """
+    recorder = CassetteRecorder(directory)
+    set_client_factory(YouTubeClientFactory(http_wrapper=recorder.wrap))
+    print(f"📼 Recording API responses to: {directory}\n")
+    return recorder
+
+
+def start_replay(directory: str, reproduce_latency: bool = False) -> Cassette:
+    """
+    Serve every client built from now on from a cassette.
+
+    Args:
+        directory (str): The cassette directory.
+        reproduce_latency (bool): Wait as long as each recorded response took.
+
+    Returns:
+        Cassette: The loaded cassette.
+    """
+    cassette = Cassette(directory, reproduce_latency)
+    set_client_factory(ReplayClientFactory(cassette))
+    print(
+        f"📼 Replaying {cassette.manifest.get('interactions', 0)} recorded API response(s) "
+        f"from: {directory}"
+        + (" with recorded latencies" if reproduce_latency else "") + "\n"
+    )
+    return cassette
+
+
+def replay_credentials(
+    accounts: List[Dict[str, str]],
+    cassette: Cassette,
+) -> List[Tuple[str, str, Any]]:
+    """
+    Stand in for runner.resolve_credentials on replay; no tokens are loaded.
+
+    Accounts that are not in the cassette are skipped.
+
+    Args:
+        accounts (List[Dict]): Account dictionaries with 'username' key.
+        cassette (Cassette): The loaded cassette.
+
+    Returns:
+        List[Tuple[str, str, None]]: (username, client_key, None) per account.
+    """
+    resolved = []
+    for account in accounts:
+        username = account.get('username', '').strip()
+        if not username:
+            continue
+        if username not in cassette.account_clients:
+            print(f"⊘ Skipping {username}: not in the cassette")
+            continue
+        resolved.append((username, cassette.account_clients[username], None))
+    print(f"✓ {len(resolved)} account(s) in the cassette\n")
+    return resolved
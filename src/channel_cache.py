@@ -0,0 +1,241 @@
+"""
+Channel metadata cache module.
+
+This module keeps a persistent, on-disk SQLite cache of channel metadata
+(topic categories and title) keyed by channel ID, so that channels shared
+between accounts and between runs are only looked up once.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any
+
+from metrics import get_metrics
+
+# Default lifetime of a cached entry (7 days)
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Default maximum number of cached channels before LRU eviction kicks in
+DEFAULT_MAX_ENTRIES = 200_000
+
+# Inserted entries between two sweeps of expired entries
+EXPIRY_SWEEP_INSERTS = 10_000
+
+
+class ChannelCache:
+    """
+    SQLite-backed cache of channel metadata with TTL expiry and LRU eviction.
+
+    Each entry stores the channel's topicCategories, its snippet title, the
+    time it was fetched and the time it was last read. Entries older than the
+    TTL are treated as misses; when the cache grows past max_entries the least
+    recently read entries are evicted. The row count is kept in memory so
+    that inserts never scan the table; expired rows are only deleted every
+    EXPIRY_SWEEP_INSERTS inserts, or by evict().
+
+    A single instance may be shared between worker threads; all database
+    access is serialized with an internal lock.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> None:
+        """
+        Open (or create) the cache database.
+
+        Args:
+            db_path (str): Path to the SQLite database file.
+            ttl_seconds (int): Seconds after which an entry is considered stale.
+            max_entries (int): Maximum number of entries kept on disk.
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS channels (
+                channel_id TEXT PRIMARY KEY,
+                title TEXT,
+                topic_categories TEXT,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_channels_last_access ON channels (last_access)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_channels_fetched_at ON channels (fetched_at)"
+        )
+        self._conn.commit()
+        (self._row_count,) = self._conn.execute("SELECT COUNT(*) FROM channels").fetchone()
+        self._inserts_since_sweep = 0
+
+    def get_many(self, channel_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Look up fresh cache entries for the given channel IDs.
+
+        Args:
+            channel_ids (List[str]): Channel IDs to look up.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Mapping of channel ID to a dict with
+                'title', 'topic_categories' (list or None) and 'fetched_at'.
+                Missing and expired IDs are left out.
+        """
+        unique_ids = list(dict.fromkeys(channel_ids))
+        if not unique_ids:
+            return {}
+
+        now = time.time()
+        oldest_allowed = now - self.ttl_seconds
+        found: Dict[str, Dict[str, Any]] = {}
+
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(unique_ids), 500):
+                chunk = unique_ids[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT channel_id, title, topic_categories, fetched_at FROM channels "
+                    f"WHERE channel_id IN ({placeholders}) AND fetched_at >= ?",
+                    (*chunk, oldest_allowed)
+                ).fetchall()
+                for channel_id, title, topic_categories, fetched_at in rows:
+                    found[channel_id] = {
+                        'title': title,
+                        'topic_categories': (
+                            json.loads(topic_categories) if topic_categories is not None else None
+                        ),
+                        'fetched_at': fetched_at,
+                    }
+
+            if found:
+                self._conn.executemany(
+                    "UPDATE channels SET last_access = ? WHERE channel_id = ?",
+                    [(now, channel_id) for channel_id in found]
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(unique_ids) - len(found)
+        get_metrics().inc('channel_cache_lookups_total', len(found), result='hit')
+        get_metrics().inc('channel_cache_lookups_total', len(unique_ids) - len(found), result='miss')
+        return found
+
+    def put_many(self, items: List[Dict[str, Any]]) -> None:
+        """
+        Store channels.list resource items in the cache.
+
+        Args:
+            items (List[Dict[str, Any]]): Channel resources with 'id' and
+                optionally 'snippet' and 'topicDetails' parts.
+        """
+        if not items:
+            return
+
+        now = time.time()
+        rows = []
+        for item in items:
+            topic_details = item.get('topicDetails', {})
+            topic_categories = topic_details.get('topicCategories')
+            rows.append((
+                item['id'],
+                item.get('snippet', {}).get('title'),
+                json.dumps(topic_categories) if topic_categories is not None else None,
+                now,
+                now,
+            ))
+
+        new_ids = list(dict.fromkeys(row[0] for row in rows))
+        with self._lock:
+            # Count the IDs already cached so the row count stays exact
+            existing = 0
+            for start in range(0, len(new_ids), 500):
+                chunk = new_ids[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                (count,) = self._conn.execute(
+                    f"SELECT COUNT(*) FROM channels WHERE channel_id IN ({placeholders})",
+                    chunk
+                ).fetchone()
+                existing += count
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO channels "
+                "(channel_id, title, topic_categories, fetched_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._row_count += len(new_ids) - existing
+            self._inserts_since_sweep += len(new_ids) - existing
+            if self._inserts_since_sweep >= EXPIRY_SWEEP_INSERTS:
+                self._evict()
+            elif self._row_count > self.max_entries:
+                self._trim()
+            self._conn.commit()
+
+    def evict(self) -> int:
+        """
+        Drop expired entries and trim the cache to max_entries in LRU order.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        with self._lock:
+            return self._evict()
+
+    def _evict(self) -> int:
+        """Evict entries; the caller must hold the lock."""
+        removed = self._conn.execute(
+            "DELETE FROM channels WHERE fetched_at < ?",
+            (time.time() - self.ttl_seconds,)
+        ).rowcount
+        self._row_count -= removed
+        self._inserts_since_sweep = 0
+        removed += self._trim()
+        self._conn.commit()
+        return removed
+
+    def _trim(self) -> int:
+        """Evict least recently read entries over max_entries; the caller must hold the lock."""
+        overflow = self._row_count - self.max_entries
+        if overflow <= 0:
+            return 0
+        removed = self._conn.execute(
+            "DELETE FROM channels WHERE channel_id IN ("
+            "SELECT channel_id FROM channels ORDER BY last_access ASC LIMIT ?)",
+            (overflow,)
+        ).rowcount
+        self._row_count -= removed
+        return removed
+
+    def summary(self) -> str:
+        """
+        Describe the hit/miss counts for this run.
+
+        Returns:
+            str: Human-readable cache statistics.
+        """
+        lookups = self.hits + self.misses
+        hit_rate = (self.hits / lookups * 100) if lookups else 0.0
+        return f"{self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate)"
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,175 @@
+"""
+Checkpoint module for resumable extraction runs.
+
+This module records the progress of a run after every page and every
+account: which accounts are complete, and for accounts in progress the next
+page token plus how many rows (and spill file bytes) have been written. A
+run started with --resume skips completed accounts and continues partially
+fetched accounts from their next page, so only unfinished work is fetched
+again.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import List, Dict, Any, Optional
+
+
+def run_fingerprint(usernames: List[str], output_dir: str, output_format: str = 'csv') -> str:
+    """
+    Identify a run by its accounts, output directory and output format.
+
+    Args:
+        usernames (List[str]): Account usernames of the run.
+        output_dir (str): Directory the run writes to.
+        output_format (str): Output sink of the run.
+
+    Returns:
+        str: A stable hash of the run's inputs.
+    """
+    payload = json.dumps([sorted(usernames), os.path.abspath(output_dir), output_format])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RunCheckpoint:
+    """
+    Persistent progress record of one extraction run.
+
+    The checkpoint file is rewritten atomically after every update, so a
+    crash at any point leaves a consistent checkpoint behind.
+    """
+
+    def __init__(self, checkpoint_file: str, fingerprint: str) -> None:
+        """
+        Create an empty checkpoint for a run.
+
+        Args:
+            checkpoint_file (str): Path of the checkpoint JSON file.
+            fingerprint (str): Fingerprint of the run (see run_fingerprint).
+        """
+        self.checkpoint_file = checkpoint_file
+        self.fingerprint = fingerprint
+        self.completed: Dict[str, int] = {}
+        self.in_progress: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, checkpoint_file: str, fingerprint: str) -> 'RunCheckpoint':
+        """
+        Load the checkpoint of an interrupted run.
+
+        Args:
+            checkpoint_file (str): Path of the checkpoint JSON file.
+            fingerprint (str): Fingerprint of the run being resumed.
+
+        Returns:
+            RunCheckpoint: The saved progress, or an empty checkpoint if none
+                exists or it belongs to a different run.
+        """
+        checkpoint = cls(checkpoint_file, fingerprint)
+        if not os.path.exists(checkpoint_file):
+            print("⚠️  No checkpoint found; starting from the beginning")
+            return checkpoint
+
+        try:
+            with open(checkpoint_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️  Ignoring unreadable checkpoint '{checkpoint_file}': {str(e)}")
+            return checkpoint
+
+        if state.get('fingerprint') != fingerprint:
+            print("⚠️  Checkpoint belongs to a different account list; starting from the beginning")
+            return checkpoint
+
+        checkpoint.completed = state.get('completed', {})
+        checkpoint.in_progress = state.get('in_progress', {})
+        return checkpoint
+
+    def record_page(
+        self,
+        username: str,
+        next_page_token: Optional[str],
+        row_count: int,
+        spill_offset: int,
+    ) -> None:
+        """
+        Record that a page of an account has been written to its spill file.
+
+        Args:
+            username (str): The account username/email.
+            next_page_token (str, optional): Token of the next page, or None
+                if the page was the last one.
+            row_count (int): Rows written to the spill file so far.
+            spill_offset (int): Size of the spill file after the page.
+        """
+        with self._lock:
+            self.in_progress[username] = {
+                'next_page_token': next_page_token,
+                'finished': next_page_token is None,
+                'row_count': row_count,
+                'spill_offset': spill_offset,
+            }
+            self._save()
+
+    def record_account(self, username: str, count: int) -> None:
+        """
+        Record that an account's output file has been published.
+
+        Args:
+            username (str): The account username/email.
+            count (int): Number of channels exported for the account.
+        """
+        with self._lock:
+            self.in_progress.pop(username, None)
+            self.completed[username] = count
+            self._save()
+
+    def discard_account(self, username: str) -> None:
+        """
+        Forget an account's partial progress so it is fetched from scratch.
+
+        Args:
+            username (str): The account username/email.
+        """
+        with self._lock:
+            if self.in_progress.pop(username, None) is not None:
+                self._save()
+
+    def progress(self, username: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the saved progress of a partially fetched account.
+
+        Args:
+            username (str): The account username/email.
+
+        Returns:
+            Dict[str, Any], optional: Progress with 'next_page_token',
+                'finished', 'row_count' and 'spill_offset', or None.
+        """
+        with self._lock:
+            return self.in_progress.get(username)
+
+    def clear(self) -> None:
+        """Delete the checkpoint after a run finished completely."""
+        with self._lock:
+            self.completed = {}
+            self.in_progress = {}
+            if os.path.exists(self.checkpoint_file):
+                os.remove(self.checkpoint_file)
+
+    def _save(self) -> None:
+        """Write the checkpoint atomically; the caller must hold the lock."""
+        directory = os.path.dirname(self.checkpoint_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temp_file = f"{self.checkpoint_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'fingerprint': self.fingerprint,
+                'completed': self.completed,
+                'in_progress': self.in_progress,
+            }, f)
+        os.replace(temp_file, self.checkpoint_file)
@@ -0,0 +1,281 @@
+"""
+YouTube client factory module.
+
+Building a client with build('youtube', 'v3') reads and parses the discovery
+document and opens a fresh HTTP transport for every account. The factory
+reads and parses the discovery document once per process and builds clients
+with build_from_document. Each worker thread keeps one keep-alive httplib2
+connection pool that is reused for every account the thread processes;
+credentials stay separate because every client wraps the shared pool in its
+own AuthorizedHttp.
+
+Responses are requested gzip-compressed (httplib2 and the library's user
+agent take care of that); the connections count the compressed bytes they
+read so that transferred and decompressed sizes can be compared.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from auth import _import_google_libraries
+from metrics import MeteredHttp, record_wire_read
+
+API_NAME = 'youtube'
+API_VERSION = 'v3'
+DISCOVERY_URL = 'https://www.googleapis.com/discovery/v1/apis/youtube/v3/rest'
+
+# Local copy of the discovery document, shared by all runs
+DEFAULT_DISCOVERY_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'discovery'
+)
+
+DEFAULT_TIMEOUT_SECONDS = 60
+
+_counting_http_class: Optional[type] = None
+_counting_http_lock = threading.Lock()
+
+
+def _counting_http(timeout: float) -> Any:
+    """
+    Create an httplib2.Http whose connections count the bytes they read.
+
+    httplib2 decompresses gzip responses and rewrites Content-Length, so the
+    transferred size is only known while the body is read from the socket.
+
+    Args:
+        timeout (float): Socket timeout in seconds.
+
+    Returns:
+        httplib2.Http: The transport.
+    """
+    global _counting_http_class
+    with _counting_http_lock:
+        if _counting_http_class is None:
+            import http.client
+            import httplib2
+
+            class CountingResponse(http.client.HTTPResponse):
+                def read(self, amt: Optional[int] = None) -> bytes:
+                    data = super().read(amt)
+                    record_wire_read(len(data))
+                    return data
+
+            class CountingHTTPConnection(httplib2.HTTPConnectionWithTimeout):
+                response_class = CountingResponse
+
+            class CountingHTTPSConnection(httplib2.HTTPSConnectionWithTimeout):
+                response_class = CountingResponse
+
+            connection_types = {'http': CountingHTTPConnection, 'https': CountingHTTPSConnection}
+
+            class CountingHttp(httplib2.Http):
+                def request(self, uri: str, method: str = 'GET', body: Any = None,
+                            headers: Any = None, redirections: int = httplib2.DEFAULT_MAX_REDIRECTS,
+                            connection_type: Any = None) -> Any:
+                    if connection_type is None:
+                        connection_type = connection_types.get(uri.split(':', 1)[0].lower())
+                    return super().request(uri, method, body, headers, redirections, connection_type)
+
+            _counting_http_class = CountingHttp
+    return _counting_http_class(timeout=timeout)
+
+
+class YouTubeClientFactory:
+    """
+    Builds YouTube API clients from a cached discovery document.
+
+    httplib2.Http objects are not thread-safe, so connection pools are kept
+    per thread rather than shared by every worker.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = DEFAULT_DISCOVERY_CACHE_DIR,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        api_endpoint: Optional[str] = None,
+        http_wrapper: Optional[Callable[[Any], Any]] = None,
+    ) -> None:
+        """
+        Create a client factory.
+
+        Args:
+            cache_dir (str, optional): Directory holding the local copy of the
+                discovery document. None disables the file cache.
+            timeout (float): Socket timeout of the HTTP transport in seconds.
+            api_endpoint (str, optional): Override of the API root URL, e.g.
+                for a local test server.
+            http_wrapper (Callable, optional): Called with every new
+                httplib2.Http; the transport it returns is used instead,
+                e.g. to record the API responses.
+        """
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.api_endpoint = api_endpoint
+        self.http_wrapper = http_wrapper
+        self._document: Optional[Dict[str, Any]] = None
+        self._document_lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def cache_file(self) -> Optional[str]:
+        """str, optional: Path of the cached discovery document."""
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f'{API_NAME}.{API_VERSION}.json')
+
+    def discovery_document(self) -> Dict[str, Any]:
+        """
+        Get the parsed discovery document, loading it on first use.
+
+        The document is looked up in the local cache, then in the copy that
+        ships with google-api-python-client, and is only downloaded (and
+        saved to the local cache) if neither exists.
+
+        Returns:
+            Dict[str, Any]: The parsed discovery document.
+
+        Raises:
+            Exception: If the document cannot be loaded.
+        """
+        with self._document_lock:
+            if self._document is None:
+                self._document = self._prepare_document(self._load_discovery_document())
+            return self._document
+
+    def _prepare_document(self, document: str) -> Dict[str, Any]:
+        """
+        Parse the discovery document and apply the library's fix-ups once.
+
+        build_from_document fills in method parameters of the document it is
+        given the first time each collection is used. Doing that once here,
+        on a single thread, leaves a document that later builds on worker
+        threads only read.
+
+        Args:
+            document (str): The discovery document JSON.
+
+        Returns:
+            Dict[str, Any]: The parsed, fixed-up document.
+        """
+        from googleapiclient.discovery import build_from_document
+        import httplib2
+
+        parsed = json.loads(document)
+        if self.api_endpoint:
+            # Batch requests are sent to rootUrl, not to the client's endpoint
+            parsed['rootUrl'] = self.api_endpoint
+        client = build_from_document(parsed, http=httplib2.Http())
+        for collection in parsed.get('resources', {}):
+            getattr(client, collection)()
+        return parsed
+
+    def _load_discovery_document(self) -> str:
+        """
+        Load the discovery document from the first source that has it.
+
+        Returns:
+            str: The discovery document JSON.
+        """
+        cache_file = self.cache_file
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                return f.read()
+
+        _import_google_libraries()
+        from googleapiclient.discovery_cache import get_static_doc
+
+        document = get_static_doc(API_NAME, API_VERSION)
+        if document:
+            return document
+
+        import httplib2
+
+        resp, content = httplib2.Http(timeout=self.timeout).request(DISCOVERY_URL)
+        if resp.status != 200:
+            raise Exception(
+                f"Could not download the {API_NAME} {API_VERSION} discovery document "
+                f"(HTTP {resp.status})"
+            )
+        document = content.decode('utf-8')
+        if cache_file:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_file = f"{cache_file}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(document)
+            os.replace(temp_file, cache_file)
+        return document
+
+    def _thread_http(self) -> Any:
+        """
+        Get the calling thread's keep-alive HTTP transport.
+
+        Returns:
+            MeteredHttp: The transport (an httplib2.Http that counts response
+                bytes), created on first use by the thread.
+        """
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = _counting_http(self.timeout)
+            if self.http_wrapper is not None:
+                http = self.http_wrapper(http)
+            http = MeteredHttp(http)
+            self._local.http = http
+        return http
+
+    def build(self, creds: Any) -> Any:
+        """
+        Build a YouTube API client for one account.
+
+        The client must only be used on the thread that built it.
+
+        Args:
+            creds (Credentials): Valid OAuth 2.0 credentials for the account.
+
+        Returns:
+            Resource: Authenticated YouTube API service object.
+        """
+        _import_google_libraries()
+        import google_auth_httplib2
+        from googleapiclient.discovery import build_from_document
+
+        http = google_auth_httplib2.AuthorizedHttp(creds, http=self._thread_http())
+        client_options = {'api_endpoint': self.api_endpoint} if self.api_endpoint else None
+        return build_from_document(
+            self.discovery_document(),
+            http=http,
+            client_options=client_options
+        )
+
+
+_default_factory: Optional[YouTubeClientFactory] = None
+_default_factory_lock = threading.Lock()
+
+
+def get_client_factory() -> YouTubeClientFactory:
+    """
+    Get the process-wide client factory.
+
+    Returns:
+        YouTubeClientFactory: The shared factory (created on first use).
+    """
+    global _default_factory
+    with _default_factory_lock:
+        if _default_factory is None:
+            _default_factory = YouTubeClientFactory()
+        return _default_factory
+
+
+def set_client_factory(factory: Optional[YouTubeClientFactory]) -> None:
+    """
+    Replace the process-wide client factory, e.g. to record or replay API
+    responses.
+
+    Args:
+        factory (YouTubeClientFactory, optional): The factory to use, or None
+            to go back to the default factory.
+    """
+    global _default_factory
+    with _default_factory_lock:
+        _default_factory = factory
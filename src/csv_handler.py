@@ -2,12 +2,18 @@
 CSV handler module for YouTube subscription data.
 
 This module handles reading input CSV files with account emails and exporting
-subscription data to CSV format.
+subscription data to CSV format. Account files are written in streaming
+fashion and published atomically, so memory stays flat and a crash never
+leaves a half-written file behind.
 """
 
 import csv
+import heapq
 import os
-from typing import List, Dict, Any
+from contextlib import contextmanager
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional
+
+from records import ChannelRecord
 
 
 def read_accounts_csv(csv_file: str) -> List[Dict[str, str]]:
@@ -61,10 +67,312 @@ def read_accounts_csv(csv_file: str) -> List[Dict[str, str]]:
         raise Exception(f"Error reading CSV file '{csv_file}': {str(e)}")
 
 
+# Column headers of the per-account channel files
+CSV_FIELDNAMES = [
+    'Channel ID',
+    'Channel Name',
+    'Category',
+    'Type',
+    'Channel Link',
+    'New to List'
+]
+
+# Rows held in memory per sorted run during the external merge sort
+DEFAULT_SORT_BUFFER_ROWS = 50_000
+
+
+def account_output_file(account_name: str, output_dir: str = 'output') -> str:
+    """
+    Get the CSV file path for an account.
+    
+    Args:
+        account_name (str): The account name/email.
+        output_dir (str): Directory to store output files.
+    
+    Returns:
+        str: Path of the account's channels_<name>.csv file.
+    """
+    # Create filename from account email (remove domain for cleaner names)
+    safe_name = account_name.split('@')[0] if '@' in account_name else account_name
+    return os.path.join(output_dir, f"channels_{safe_name}.csv")
+
+
+def _channel_row(channel_data: ChannelRecord) -> List[str]:
+    """
+    Convert a channel record into CSV column values.
+    
+    The channel link is only built here, at export time.
+    
+    Args:
+        channel_data (ChannelRecord): A channel record.
+    
+    Returns:
+        List[str]: Values in CSV_FIELDNAMES order.
+    """
+    return [
+        channel_data.channel_id,
+        channel_data.name,
+        channel_data.category,
+        channel_data.type,
+        channel_data.link,
+        channel_data.is_new_to_merged_list
+    ]
+
+
+def _write_sorted_run(
+    rows: List[List[str]],
+    run_file: str,
+    key: Callable[[List[str]], Any],
+) -> None:
+    """
+    Sort a chunk of rows and write it out as one sorted run.
+    
+    Args:
+        rows (List[List[str]]): Rows to sort.
+        run_file (str): Path of the run file to write.
+        key (Callable): Sort key applied to each row.
+    """
+    rows.sort(key=key)
+    with open(run_file, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+
+
+def _read_run(run_file: str) -> Iterator[List[str]]:
+    """
+    Stream rows back from a run or spill file.
+    
+    Args:
+        run_file (str): Path of the file.
+    
+    Yields:
+        List[str]: Rows in file order.
+    """
+    with open(run_file, 'r', newline='', encoding='utf-8') as f:
+        yield from csv.reader(f)
+
+
+@contextmanager
+def external_sort(
+    rows: Iterable[List[str]],
+    key: Callable[[List[str]], Any],
+    temp_prefix: str,
+    max_rows_in_memory: int = DEFAULT_SORT_BUFFER_ROWS,
+) -> Iterator[Iterator[List[str]]]:
+    """
+    Sort CSV rows with a bounded memory budget.
+    
+    Rows are split into sorted runs of at most max_rows_in_memory rows that
+    are written next to temp_prefix, then lazily k-way merged. Run files are
+    removed when the context exits.
+    
+    Args:
+        rows (Iterable[List[str]]): Rows to sort.
+        key (Callable): Sort key applied to each row.
+        temp_prefix (str): Path prefix for the temporary run files.
+        max_rows_in_memory (int): Maximum rows held in memory at once.
+    
+    Yields:
+        Iterator[List[str]]: The rows in sorted order (stable for equal keys).
+    """
+    run_files: List[str] = []
+    max_rows_in_memory = max(1, max_rows_in_memory)
+    
+    try:
+        chunk: List[List[str]] = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= max_rows_in_memory:
+                run_files.append(f"{temp_prefix}.run{len(run_files)}")
+                _write_sorted_run(chunk, run_files[-1], key)
+                chunk = []
+        if len(run_files) == 0:
+            # Everything fits in memory: skip the run files entirely
+            chunk.sort(key=key)
+            yield iter(chunk)
+            return
+        if chunk:
+            run_files.append(f"{temp_prefix}.run{len(run_files)}")
+            _write_sorted_run(chunk, run_files[-1], key)
+        
+        yield heapq.merge(*(_read_run(run_file) for run_file in run_files), key=key)
+    finally:
+        for run_file in run_files:
+            if os.path.exists(run_file):
+                os.remove(run_file)
+
+
+class AccountCsvWriter:
+    """
+    Streaming, constant-memory writer for one account's channels file.
+    
+    Rows are appended to a spill file as each page arrives. finalize() turns
+    the spill file into the final file sorted by channel name using an
+    external merge sort that holds at most max_rows_in_memory rows at a time,
+    then atomically renames the result into place. Until then only hidden
+    temporary files exist, so a crash never leaves a half-written
+    channels_*.csv behind.
+    
+    Subclasses for other file formats override file_extension and
+    _write_sorted; writers of other record types override fieldnames,
+    row_label, _sort_key and _columns.
+    """
+    
+    file_extension = '.csv'
+    fieldnames = CSV_FIELDNAMES
+    row_label = 'channels'
+    
+    def __init__(
+        self,
+        account_name: str,
+        output_dir: str = 'output',
+        max_rows_in_memory: int = DEFAULT_SORT_BUFFER_ROWS,
+        resume_rows: int = 0,
+        resume_offset: Optional[int] = None,
+        output_name: Optional[str] = None,
+    ) -> None:
+        """
+        Start (or reopen) a spill file for an account.
+        
+        Args:
+            account_name (str): The account name/email.
+            output_dir (str): Directory to store output files.
+            max_rows_in_memory (int): Memory budget of the external sort, in rows.
+            resume_rows (int): Rows already in the spill file when resuming.
+            resume_offset (int, optional): Spill file size recorded in a
+                checkpoint. When given, the existing spill file is truncated
+                to this size and appended to instead of being started afresh.
+            output_name (str, optional): File name without extension to
+                publish to instead of the account's channels_<name> file.
+        """
+        self.account_name = account_name
+        if output_name is None:
+            output_name = os.path.splitext(os.path.basename(account_output_file(account_name)))[0]
+        self.output_file = os.path.join(output_dir, output_name + self.file_extension)
+        self.max_rows_in_memory = max(1, max_rows_in_memory)
+        self.row_count = 0
+        
+        os.makedirs(output_dir, exist_ok=True)
+        directory, filename = os.path.split(self.output_file)
+        self._temp_prefix = os.path.join(directory, f".{filename}")
+        self.spill_file = f"{self._temp_prefix}.spill"
+        
+        if resume_offset is not None and os.path.exists(self.spill_file):
+            # Drop anything written after the last checkpointed page
+            self._spill = open(self.spill_file, 'r+', newline='', encoding='utf-8')
+            self._spill.truncate(resume_offset)
+            self._spill.seek(resume_offset)
+            self.row_count = resume_rows
+        else:
+            self._spill = open(self.spill_file, 'w', newline='', encoding='utf-8')
+        self._spill_writer = csv.writer(self._spill)
+    
+    def write_rows(self, channels: List[ChannelRecord]) -> None:
+        """
+        Append channel records to the spill file.
+        
+        Args:
+            channels (List[ChannelRecord]): Channel records of one page.
+        """
+        for channel_data in channels:
+            self._spill_writer.writerow(
+                [self._sort_key(channel_data), self.row_count] + self._columns(channel_data)
+            )
+            self.row_count += 1
+        self._spill.flush()
+    
+    def _sort_key(self, record: Any) -> str:
+        """
+        Get the string the published file is sorted by.
+        
+        Args:
+            record (ChannelRecord): A record passed to write_rows.
+        
+        Returns:
+            str: The lowercased channel name; ties keep arrival order.
+        """
+        return record.name.lower()
+    
+    def _columns(self, record: Any) -> List[str]:
+        """
+        Convert a record into the values of the published columns.
+        
+        Args:
+            record (ChannelRecord): A record passed to write_rows.
+        
+        Returns:
+            List[str]: Values in fieldnames order.
+        """
+        return _channel_row(record)
+    
+    @property
+    def spill_offset(self) -> int:
+        """int: Current size of the spill file, for checkpoints."""
+        return self._spill.tell()
+    
+    def finalize(self, log: Callable[[str], None] = print) -> Optional[str]:
+        """
+        Sort the spilled rows and atomically publish the account's CSV file.
+        
+        Args:
+            log (Callable[[str], None]): Function used to report progress.
+        
+        Returns:
+            str, optional: Path of the written file, or None if the account
+                had no channels.
+        """
+        self._spill.close()
+        temp_output = f"{self._temp_prefix}.tmp"
+        
+        try:
+            if self.row_count == 0:
+                log(f"  ⊘ Skipped {self.account_name} (no {self.row_label})")
+                return None
+            
+            # Sort by the sort key; the sequence number keeps ties in arrival order
+            with external_sort(
+                _read_run(self.spill_file),
+                key=lambda row: (row[0], int(row[1])),
+                temp_prefix=self._temp_prefix,
+                max_rows_in_memory=self.max_rows_in_memory
+            ) as sorted_rows:
+                self._write_sorted((row[2:] for row in sorted_rows), temp_output)
+            
+            # Publish atomically
+            os.replace(temp_output, self.output_file)
+            log(f"  ✓ Exported {self.row_count} {self.row_label} to: {self.output_file}")
+            return self.output_file
+        finally:
+            for path in (temp_output, self.spill_file):
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    def _write_sorted(self, rows: Iterator[List[str]], temp_output: str) -> None:
+        """
+        Write the sorted rows to the temporary output file.
+        
+        Args:
+            rows (Iterator[List[str]]): Rows in fieldnames order, sorted by
+                the sort key.
+            temp_output (str): Path of the file to write.
+        """
+        with open(temp_output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.fieldnames)
+            writer.writerows(rows)
+    
+    def suspend(self) -> None:
+        """Close the spill file but keep it so that a resumed run can continue it."""
+        self._spill.close()
+    
+    def abort(self) -> None:
+        """Discard the spill file without publishing anything."""
+        self._spill.close()
+        if os.path.exists(self.spill_file):
+            os.remove(self.spill_file)
 
 
 def export_account_files(
-    account_channels: Dict[str, List[Dict[str, Any]]],
+    account_channels: Dict[str, List[ChannelRecord]],
     output_dir: str = 'output'
 ) -> None:
     """
@@ -81,46 +389,12 @@ def export_account_files(
         print("⚠️  No account channels to export!")
         return
     
-    # Create output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
-    
     print("\nExporting individual account subscription files...")
     
     try:
         for account_name, channels in account_channels.items():
-            if not channels:
-                print(f"  ⊘ Skipped {account_name} (no channels)")
-                continue
-            
-            # Create filename from account email (remove domain for cleaner names)
-            safe_name = account_name.split('@')[0] if '@' in account_name else account_name
-            output_file = os.path.join(output_dir, f"channels_{safe_name}.csv")
-            
-            with open(output_file, 'w', newline='', encoding='utf-8') as f:
-                fieldnames = [
-                    'Channel ID',
-                    'Channel Name',
-                    'Category',
-                    'Type',
-                    'Channel Link',
-                    'New to List'
-                ]
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                
-                writer.writeheader()
-                for channel_data in sorted(
-                    channels,
-                    key=lambda x: x['name'].lower()
-                ):
-                    writer.writerow({
-                        'Channel ID': channel_data['channel_id'],
-                        'Channel Name': channel_data['name'],
-                        'Category': channel_data['category'],
-                        'Type': channel_data['type'],
-                        'Channel Link': channel_data['link'],
-                        'New to List': channel_data['is_new_to_merged_list']
-                    })
-            
-            print(f"  ✓ Exported {len(channels)} channels to: {output_file}")
+            writer = AccountCsvWriter(account_name, output_dir)
+            writer.write_rows(channels)
+            writer.finalize()
     except Exception as e:
         raise Exception(f"Error exporting account files: {str(e)}")
@@ -0,0 +1,552 @@
+"""
+Sync daemon module.
+
+A long-running alternative to starting the extractor from cron. The process
+stays up, so the discovery document, each worker thread's keep-alive
+connection pool, the loaded tokens and every account's built YouTube client
+are reused from one sync to the next instead of being set up again.
+
+Every account has its own schedule: it is synced again one interval after
+its last sync finished, with random jitter so that accounts drift apart and
+the API sees a steady trickle of requests instead of bursts. Accounts that
+have never been synced are spread evenly over an initial window. Tokens are
+refreshed in the background before they expire, each sync publishes the
+account's output in place (atomically, as in a normal run), and a status
+file records when every account was last synced and how long it took.
+"""
+
+import heapq
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple
+
+from auth import CredentialManager, get_client_key, build_youtube_client
+from channel_cache import ChannelCache
+from metrics import account_scope, get_metrics, write_run_report, write_prometheus_file
+from quota import (
+    QuotaLedger, estimate_account_cost, get_client_budget, next_quota_reset, quota_day,
+    DEFAULT_DAILY_BUDGET
+)
+from runner import AccountRun
+from youtube_api import fetch_subscriptions
+
+# Default time between two syncs of an account (6 hours)
+DEFAULT_INTERVAL_SECONDS = 6 * 60 * 60
+
+# Default jitter, as a fraction of the interval
+DEFAULT_JITTER = 0.1
+
+# Default window over which never-synced accounts are spread at startup
+DEFAULT_INITIAL_SPREAD_SECONDS = 10 * 60
+
+# First retry delay after a failed sync; doubles per consecutive failure,
+# capped at the account's interval
+FAILURE_RETRY_SECONDS = 5 * 60
+
+# How often tokens are checked, and how long before expiry they are refreshed
+TOKEN_CHECK_SECONDS = 60
+TOKEN_REFRESH_MARGIN_SECONDS = 10 * 60
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    """Format a Unix time for the status file."""
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='seconds')
+
+
+def _parse_isoformat(value: Optional[str]) -> Optional[float]:
+    """Parse a status file time back into a Unix time."""
+    if not value:
+        return None
+    return datetime.fromisoformat(value).timestamp()
+
+
+class AccountSchedule:
+    """Schedule and sync history of one account."""
+
+    def __init__(self, username: str, client_key: str, interval: float, position: int) -> None:
+        self.username = username
+        self.client_key = client_key
+        self.interval = interval
+        self.position = position
+        self.state = 'scheduled'
+        self.next_sync_at: Optional[float] = None
+        self.last_started_at: Optional[float] = None
+        self.last_synced_at: Optional[float] = None
+        self.last_duration_seconds: Optional[float] = None
+        self.last_channels: Optional[int] = None
+        self.last_error: Optional[str] = None
+        self.syncs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+
+    def to_status(self) -> Dict[str, Any]:
+        """
+        Describe the account for the status file.
+
+        Returns:
+            Dict[str, Any]: The account's state, times and counters.
+        """
+        return {
+            'client': self.client_key,
+            'state': self.state,
+            'interval_seconds': round(self.interval, 1),
+            'last_started_at': _isoformat(self.last_started_at),
+            'last_synced_at': _isoformat(self.last_synced_at),
+            'last_duration_seconds': self.last_duration_seconds,
+            'last_channels': self.last_channels,
+            'last_error': self.last_error,
+            'next_sync_at': _isoformat(self.next_sync_at),
+            'syncs': self.syncs,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+        }
+
+    def restore(self, status: Dict[str, Any]) -> None:
+        """
+        Take over the history recorded by an earlier daemon process.
+
+        Args:
+            status (Dict[str, Any]): The account's entry in the status file.
+        """
+        self.last_synced_at = _parse_isoformat(status.get('last_synced_at'))
+        self.last_duration_seconds = status.get('last_duration_seconds')
+        self.last_channels = status.get('last_channels')
+        self.syncs = status.get('syncs', 0)
+        self.failures = status.get('failures', 0)
+
+
+class SyncDaemon:
+    """
+    Keeps every account's output up to date on its own schedule.
+
+    Due accounts are taken from a heap ordered by their next sync time and
+    run on a fixed pool of worker threads, at most one sync per account at a
+    time. The main thread sleeps until the next account is due, a sync
+    finishes or the next token check, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        accounts: List[Dict[str, str]],
+        credentials_config: Dict[str, Any],
+        token_dir: str = 'secret',
+        output_dir: str = 'output',
+        status_file: Optional[str] = None,
+        interval_seconds: float = DEFAULT_INTERVAL_SECONDS,
+        jitter: float = DEFAULT_JITTER,
+        initial_spread_seconds: float = DEFAULT_INITIAL_SPREAD_SECONDS,
+        workers: int = 4,
+        cache: Optional[ChannelCache] = None,
+        snapshot_dir: Optional[str] = None,
+        output_format: str = 'csv',
+        ledger: Optional[QuotaLedger] = None,
+        daily_quota: int = DEFAULT_DAILY_BUDGET,
+        report_path: Optional[str] = None,
+        prometheus_path: Optional[str] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Create a daemon.
+
+        Args:
+            accounts (List[Dict]): Account dictionaries with 'username' key.
+            credentials_config (Dict[str, Any]): The credentials configuration.
+                An optional 'sync_interval_minutes' section overrides the
+                interval per account, e.g. {"user@example.com": 60}.
+            token_dir (str): Directory holding the token store.
+            output_dir (str): Directory the account outputs are written to.
+            status_file (str, optional): JSON status file path.
+            interval_seconds (float): Default time between two syncs of an account.
+            jitter (float): Random change of every interval, as a fraction of it.
+            initial_spread_seconds (float): Window over which accounts without
+                an earlier sync are spread at startup.
+            workers (int): Maximum number of accounts synced at the same time.
+            cache (ChannelCache, optional): Persistent channel metadata cache.
+            snapshot_dir (str, optional): Directory of per-account snapshots
+                for incremental sync.
+            output_format (str): Output sink, one of sinks.SINK_FORMATS.
+            ledger (QuotaLedger, optional): Quota ledger; when given, syncs
+                that would exceed a client's daily budget wait for the reset.
+            daily_quota (int): Budget for clients without an explicit entry.
+            report_path (str, optional): JSON run report, rewritten after
+                every sync.
+            prometheus_path (str, optional): Prometheus text-format file,
+                rewritten after every sync.
+            seed (int, optional): Seed of the jitter, for reproducible schedules.
+        """
+        self.credentials_config = credentials_config
+        self.output_dir = output_dir
+        self.status_file = status_file
+        self.jitter = max(0.0, min(jitter, 1.0))
+        self.initial_spread_seconds = initial_spread_seconds
+        self.workers = max(1, workers)
+        self.cache = cache
+        self.snapshot_dir = snapshot_dir
+        self.output_format = output_format
+        self.ledger = ledger
+        self.daily_quota = daily_quota
+        self.report_path = report_path
+        self.prometheus_path = prometheus_path
+        self.started_at = time.time()
+        self.manager = CredentialManager(
+            credentials_config,
+            token_dir=token_dir,
+            refresh_margin_seconds=TOKEN_REFRESH_MARGIN_SECONDS
+        )
+
+        intervals = credentials_config.get('sync_interval_minutes', {})
+        usernames = [a['username'].strip() for a in accounts if a.get('username', '').strip()]
+        self.accounts: Dict[str, AccountSchedule] = {}
+        for position, username in enumerate(usernames, 1):
+            interval = intervals.get(username)
+            self.accounts[username] = AccountSchedule(
+                username,
+                get_client_key(credentials_config, username),
+                float(interval) * 60 if interval else interval_seconds,
+                position
+            )
+
+        self._credentials: Dict[str, Any] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._planned_units: Dict[str, int] = {}
+        self._charged_usage: Dict[str, Dict[str, int]] = {}
+        self._running = 0
+        self._lock = threading.Lock()
+        self._output_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._local = threading.local()
+        self._random = random.Random(seed)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _jittered(self, seconds: float) -> float:
+        """Spread a delay by up to +/- the jitter fraction."""
+        return seconds * (1 + self._random.uniform(-self.jitter, self.jitter))
+
+    def _schedule(self, account: AccountSchedule, when: float) -> None:
+        """Put an account on the heap; the caller holds self._lock."""
+        account.next_sync_at = when
+        heapq.heappush(self._heap, (when, account.position, account.username))
+        self._wake.set()
+
+    def start(self) -> None:
+        """
+        Authenticate every account and build the initial schedule.
+
+        Browser consent may open here for accounts without a usable token;
+        once the daemon runs, it only refreshes tokens and never prompts.
+        """
+        self._load_status()
+        ready = self.manager.prepare(list(self.accounts))
+        self._credentials.update(ready)
+
+        now = time.time()
+        never_synced = [
+            account for account in self.accounts.values()
+            if account.username in ready and account.last_synced_at is None
+        ]
+        with self._lock:
+            for username, account in self.accounts.items():
+                if username not in ready:
+                    account.state = 'auth_failed'
+                    account.last_error = self.manager.failures.get(username, 'Authentication failed')
+                    print(f"❌ Not scheduling '{username}': {account.last_error}")
+                elif account.last_synced_at is not None:
+                    # Keep the schedule of the previous daemon process
+                    due = account.last_synced_at + self._jittered(account.interval)
+                    self._schedule(account, max(now, due))
+            for idx, account in enumerate(never_synced):
+                offset = self.initial_spread_seconds * idx / max(1, len(never_synced))
+                self._schedule(account, now + offset)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='sync')
+        self._write_status()
+
+    def _load_status(self) -> None:
+        """Restore the accounts' history from an earlier daemon's status file."""
+        if not self.status_file or not os.path.exists(self.status_file):
+            return
+        try:
+            with open(self.status_file, 'r', encoding='utf-8') as f:
+                status = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️  Ignoring unreadable status file '{self.status_file}': {str(e)}")
+            return
+        for username, entry in status.get('accounts', {}).items():
+            if username in self.accounts:
+                self.accounts[username].restore(entry)
+
+    def run(self) -> None:
+        """Run until stop() is called; running syncs are allowed to finish."""
+        if self._executor is None:
+            self.start()
+        next_token_check = time.time() + TOKEN_CHECK_SECONDS
+        try:
+            while not self._stop.is_set():
+                now = time.time()
+                if now >= next_token_check:
+                    self._refresh_tokens()
+                    next_token_check = now + TOKEN_CHECK_SECONDS
+                self._roll_quota_day()
+
+                with self._lock:
+                    self._wake.clear()
+                    while self._heap and self._heap[0][0] <= now and self._running < self.workers:
+                        _, _, username = heapq.heappop(self._heap)
+                        self._dispatch(self.accounts[username], now)
+                    next_due = self._heap[0][0] if self._heap and self._running < self.workers else None
+
+                timeout = next_token_check - now
+                if next_due is not None:
+                    timeout = min(timeout, next_due - now)
+                self._wake.wait(max(0.0, timeout))
+        finally:
+            self._executor.shutdown(wait=True)
+            self._write_status()
+            self._write_metrics()
+            self.manager.close()
+
+    def stop(self) -> None:
+        """Ask run() to return after the running syncs have finished."""
+        self._stop.set()
+        self._wake.set()
+
+    def _dispatch(self, account: AccountSchedule, now: float) -> None:
+        """Start a due account's sync, or defer it; the caller holds self._lock."""
+        estimate = 0
+        if self.ledger is not None:
+            estimate = estimate_account_cost(self.ledger.subscription_counts.get(account.username))
+            budget = get_client_budget(self.credentials_config, account.client_key, self.daily_quota)
+            if estimate > budget:
+                # Would be deferred after every reset without ever running
+                account.state = 'over_budget'
+                account.last_error = (
+                    f"Needs ~{estimate} quota units, more than the daily budget of {budget} for "
+                    f"{account.client_key}; raise it in 'quota_budgets' or --daily-quota and restart"
+                )
+                account.next_sync_at = None
+                print(f"❌ Not syncing '{account.username}': {account.last_error}")
+                return
+            remaining = 0 if self.ledger.is_exhausted(account.client_key) else (
+                budget - self.ledger.spent_today(account.client_key)
+                - self._planned_units.get(account.client_key, 0)
+            )
+            if estimate > remaining:
+                account.state = 'deferred'
+                if self.ledger.is_exhausted(account.client_key):
+                    account.last_error = f"Quota of {account.client_key} is exhausted until the reset"
+                else:
+                    account.last_error = (
+                        f"Needs ~{estimate} quota units, {max(0, remaining)} left today for "
+                        f"{account.client_key}"
+                    )
+                self._schedule(account, next_quota_reset() + self._jittered(60))
+                return
+            self._planned_units[account.client_key] = (
+                self._planned_units.get(account.client_key, 0) + estimate
+            )
+
+        account.state = 'running'
+        account.last_started_at = now
+        self._running += 1
+        self._executor.submit(self._sync, account, estimate)
+
+    def _sync(self, account: AccountSchedule, estimate: int) -> None:
+        """Sync one account on a worker thread and schedule its next sync."""
+        started = time.time()
+        error: Optional[str] = None
+        count = 0
+        with account_scope(account.username):
+            run = AccountRun(
+                account.username, account.position, len(self.accounts),
+                self.output_dir, None, self.output_format
+            )
+            try:
+                creds = self._ready_credentials(account.username)
+                with get_metrics().stage('fetch'):
+                    subs, _ = fetch_subscriptions(
+                        self._client(account.username, creds),
+                        account.username,
+                        self.cache,
+                        log=run.log,
+                        snapshot_dir=self.snapshot_dir,
+                        on_page=run.on_page,
+                        client_key=account.client_key
+                    )
+                count = run.complete(len(subs))
+                if not run.finished:
+                    error = 'The fetch stopped before the last page'
+            except Exception as e:
+                error = str(e)
+                run.log(f"❌ Failed to sync account '{account.username}': {error}")
+            finally:
+                run.close()
+
+        finished = time.time()
+        with self._lock:
+            # The ledger is swapped under the lock when the quota day rolls over
+            if self.ledger is not None:
+                if error is None and count:
+                    self.ledger.record_account(account.username, count)
+                self._charge_usage()
+
+            self._running -= 1
+            self._planned_units[account.client_key] = (
+                self._planned_units.get(account.client_key, 0) - estimate
+            )
+            account.last_duration_seconds = round(finished - started, 3)
+            if error is None:
+                account.state = 'idle'
+                account.last_synced_at = finished
+                account.last_channels = count
+                account.last_error = None
+                account.syncs += 1
+                account.consecutive_failures = 0
+                delay = self._jittered(account.interval)
+            else:
+                account.state = 'failed'
+                account.last_error = error
+                account.failures += 1
+                account.consecutive_failures += 1
+                delay = self._jittered(min(
+                    account.interval,
+                    FAILURE_RETRY_SECONDS * 2 ** (account.consecutive_failures - 1)
+                ))
+            if not self._stop.is_set():
+                self._schedule(account, finished + delay)
+            else:
+                account.next_sync_at = None
+
+        outcome = f"{count} channels" if error is None else f"failed: {error}"
+        print(
+            f"🕒 {_isoformat(finished)} synced {account.username} in "
+            f"{finished - started:.1f}s ({outcome}); next sync at {_isoformat(account.next_sync_at)}"
+        )
+        self._write_status()
+        self._write_metrics()
+
+    def _ready_credentials(self, username: str) -> Any:
+        """
+        Get an account's credentials, refreshing them if they are due.
+
+        Raises:
+            Exception: If the token is no longer valid and cannot be refreshed.
+        """
+        creds = self._credentials[username]
+        if not creds.valid:
+            failures = self.manager.refresh_due([username])
+            if username in failures or not creds.valid:
+                raise Exception(
+                    failures.get(username, 'Token is no longer valid')
+                    + "; run the extractor once to authenticate the account again"
+                )
+        return creds
+
+    def _client(self, username: str, creds: Any) -> Any:
+        """
+        Get the calling thread's warm YouTube client for an account.
+
+        Clients use the thread's connection pool, so they are kept per
+        thread; refreshed tokens are picked up because the client holds the
+        same credentials object.
+        """
+        clients = getattr(self._local, 'clients', None)
+        if clients is None:
+            clients = self._local.clients = {}
+        entry = clients.get(username)
+        if entry is None or entry[0] is not creds:
+            entry = clients[username] = (creds, build_youtube_client(creds))
+        return entry[1]
+
+    def _refresh_tokens(self) -> None:
+        """Refresh the tokens that expire within the refresh margin."""
+        failures = self.manager.refresh_due(list(self._credentials))
+        for username, error in failures.items():
+            print(f"⚠️  Could not refresh token for {username}: {error}")
+
+    def _charge_usage(self) -> None:
+        """
+        Charge the units spent since the last charge and save the ledger;
+        the caller holds self._lock.
+        """
+        # Covers every sync, failed ones included
+        self.ledger.record_usage(get_metrics().quota_usage(), self._charged_usage)
+        try:
+            self.ledger.save()
+        except OSError as e:
+            print(f"⚠️  Could not save quota state: {str(e)}")
+
+    def _roll_quota_day(self) -> None:
+        """Start a new quota ledger day once the quota has reset."""
+        with self._lock:
+            if self.ledger is not None and self.ledger.usage_day != quota_day():
+                # Units spent before the reset still belong to the old day
+                self._charge_usage()
+                self.ledger = QuotaLedger(self.ledger.state_file)
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Describe the daemon and every account.
+
+        Returns:
+            Dict[str, Any]: The content of the status file.
+        """
+        with self._lock:
+            accounts = {username: account.to_status() for username, account in self.accounts.items()}
+            running = self._running
+        return {
+            'daemon': {
+                'pid': os.getpid(),
+                'started_at': _isoformat(self.started_at),
+                'updated_at': _isoformat(time.time()),
+                'workers': self.workers,
+                'running': running,
+                'output_format': self.output_format,
+                'stopping': self._stop.is_set(),
+            },
+            'accounts': accounts,
+        }
+
+    def _write_status(self) -> None:
+        """Replace the status file atomically."""
+        if not self.status_file:
+            return
+        status = self.status()
+        try:
+            directory = os.path.dirname(os.path.abspath(self.status_file))
+            os.makedirs(directory, exist_ok=True)
+            temp_file = f"{self.status_file}.tmp"
+            with self._output_lock:
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(status, f, indent=2)
+                os.replace(temp_file, self.status_file)
+        except OSError as e:
+            print(f"⚠️  Could not write status file '{self.status_file}': {str(e)}")
+
+    def _write_metrics(self) -> None:
+        """Rewrite the run report and Prometheus file with the daemon's metrics."""
+        with self._lock:
+            run_info = {
+                'command': 'youtube_daemon',
+                'workers': self.workers,
+                'output_format': self.output_format,
+                'accounts': len(self.accounts),
+                'syncs': sum(account.syncs for account in self.accounts.values()),
+                'failures': sum(account.failures for account in self.accounts.values()),
+                'exit_code': 0,
+            }
+        outputs = ((self.report_path, write_run_report), (self.prometheus_path, write_prometheus_file))
+        for path, write in outputs:
+            if not path:
+                continue
+            try:
+                with self._output_lock:
+                    write(path, run_info)
+            except OSError as e:
+                print(f"⚠️  Could not write run metrics to '{path}': {str(e)}")
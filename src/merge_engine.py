@@ -0,0 +1,161 @@
+"""
+Merge engine module for combining per-account channel files.
+
+This module merges existing output/channels_*.csv files into one
+deduplicated merged_channels.csv without calling the YouTube API. Rows are
+externally sorted by channel ID into runs that are combined with a k-way
+merge, so memory stays bounded no matter how many accounts or channels are
+merged.
+"""
+
+import csv
+import glob
+import os
+from typing import List, Dict, Any, Iterator, Tuple
+
+from csv_handler import external_sort, DEFAULT_SORT_BUFFER_ROWS
+
+# Column headers of the merged channel file
+MERGED_FIELDNAMES = [
+    'Channel ID',
+    'Channel Name',
+    'Category',
+    'Type',
+    'Channel Link',
+    'Accounts',
+    'Account Count'
+]
+
+MERGED_FILENAME = 'merged_channels.csv'
+
+
+def account_file_label(path: str) -> str:
+    """
+    Get the account label of a channels_<label>.csv file.
+
+    Args:
+        path (str): Path of an account file.
+
+    Returns:
+        str: The account label used in the merged file.
+    """
+    return os.path.basename(path)[len('channels_'):-len('.csv')]
+
+
+def find_account_files(output_dir: str = 'output') -> List[Tuple[str, str]]:
+    """
+    Find the per-account channel files in an output directory.
+
+    Args:
+        output_dir (str): Directory containing channels_*.csv files.
+
+    Returns:
+        List[Tuple[str, str]]: (account label, file path) pairs sorted by label.
+    """
+    account_files = []
+    for path in glob.glob(os.path.join(output_dir, 'channels_*.csv')):
+        account_files.append((account_file_label(path), path))
+    return sorted(account_files)
+
+
+def _read_account_rows(path: str) -> Iterator[List[str]]:
+    """
+    Stream the data rows of an account file.
+
+    Args:
+        path (str): Path of a channels_*.csv file.
+
+    Yields:
+        List[str]: Rows without the header.
+    """
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if row:
+                yield row
+
+
+def _tagged_rows(account_files: List[Tuple[str, str]]) -> Iterator[List[str]]:
+    """
+    Stream the rows of all account files, tagged with their account label.
+
+    Args:
+        account_files (List[Tuple[str, str]]): (account label, file path) pairs.
+
+    Yields:
+        List[str]: [account label] followed by the account file's columns.
+    """
+    for label, path in account_files:
+        for row in _read_account_rows(path):
+            yield [label] + row
+
+
+def merge_account_files(
+    account_files: List[Tuple[str, str]],
+    merged_file: str,
+    max_rows_in_memory: int = DEFAULT_SORT_BUFFER_ROWS,
+) -> Dict[str, Any]:
+    """
+    Merge per-account channel files into one deduplicated channel file.
+
+    Rows of all account files are tagged with their account and sorted by
+    (channel ID, account) with a bounded-memory external sort; the sorted
+    runs are then combined with a k-way merge and grouped by channel ID.
+    Each output row lists the accounts that follow the channel and their
+    count. The name and category are taken from the first account in label
+    order. The merged file is written to a temporary file and renamed into
+    place.
+
+    Args:
+        account_files (List[Tuple[str, str]]): (account label, file path) pairs.
+        merged_file (str): Path of the merged CSV file to write.
+        max_rows_in_memory (int): Memory budget of the sort, in rows.
+
+    Returns:
+        Dict[str, Any]: Statistics with 'accounts', 'rows' and 'unique_channels'.
+
+    Raises:
+        Exception: If merging fails.
+    """
+    directory = os.path.dirname(merged_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_file = f"{merged_file}.tmp"
+    stats = {'accounts': len(account_files), 'rows': 0, 'unique_channels': 0}
+
+    try:
+        with external_sort(
+            _tagged_rows(sorted(account_files)),
+            key=lambda row: (row[1], row[0]),
+            temp_prefix=f"{os.path.join(directory, '.' + os.path.basename(merged_file))}",
+            max_rows_in_memory=max_rows_in_memory
+        ) as sorted_rows:
+            with open(temp_file, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(MERGED_FIELDNAMES)
+
+                current_id = None
+                current_row: List[str] = []
+                accounts: List[str] = []
+
+                for row in sorted_rows:
+                    label, channel_id = row[0], row[1]
+                    stats['rows'] += 1
+                    if channel_id != current_id:
+                        if current_id is not None:
+                            writer.writerow(current_row + [';'.join(accounts), len(accounts)])
+                            stats['unique_channels'] += 1
+                        current_id, current_row, accounts = channel_id, row[1:6], []
+                    if not accounts or accounts[-1] != label:
+                        accounts.append(label)
+                if current_id is not None:
+                    writer.writerow(current_row + [';'.join(accounts), len(accounts)])
+                    stats['unique_channels'] += 1
+
+        os.replace(temp_file, merged_file)
+        return stats
+    except Exception as e:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise Exception(f"Error merging account files: {str(e)}")
@@ -0,0 +1,832 @@
+"""
+Run metrics module.
+
+Instrumentation hooks for API calls, authentication and export steps record
+into one process-wide MetricsRegistry: counters (requests, retries, quota
+units, pages, cache lookups, response bytes) and latency histograms, each
+keyed by a metric name and a few labels such as endpoint, OAuth client,
+stage or account. At the end of a run the registry is written as a JSON run
+report and, optionally, as a Prometheus text-format file for the node
+exporter's textfile collector, so a slow run can be traced to an account,
+endpoint or stage afterwards.
+
+The account a hook runs for is taken from account_scope(), which the
+runners enter around each account's fetch; it follows worker threads and
+asyncio tasks alike because it is a context variable.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+# Prefix of every metric name in the Prometheus file
+METRIC_PREFIX = 'youtube_subs_'
+
+# Upper bounds of the latency histogram buckets, in seconds
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+
+# Upper bounds of the queue depth histogram buckets, in items
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+HELP = {
+    'api_requests_total': 'API request attempts by endpoint, OAuth client and outcome.',
+    'api_request_seconds': 'Latency of API request attempts.',
+    'api_retries_total': 'Retried API request attempts.',
+    'quota_units_total': 'YouTube Data API quota units spent per OAuth client.',
+    'quota_exhausted_total': 'quotaExceeded errors per OAuth client.',
+    'pages_total': 'Subscriptions pages by source (api or snapshot).',
+    'channel_cache_lookups_total': 'Channel metadata cache lookups by result.',
+    'response_bytes_total': 'Bytes of API response bodies received.',
+    'api_wire_bytes_total': 'Response body bytes per endpoint as transferred, before decompression.',
+    'api_payload_bytes_total': 'Response body bytes per endpoint after decompression.',
+    'auth_total': 'Authentication steps by outcome.',
+    'auth_seconds': 'Duration of authentication steps.',
+    'stage_seconds': 'Duration of run and per-account stages.',
+    'account_api_requests_total': 'API request attempts per account.',
+    'account_api_seconds_total': 'Time spent in API requests per account.',
+    'account_retries_total': 'Retried API request attempts per account.',
+    'account_pages_total': 'Subscriptions pages per account.',
+    'account_channels_total': 'Channels exported per account.',
+    'account_response_bytes_total': 'Bytes of API response bodies received per account.',
+    'account_fetch_seconds_total': 'Time spent fetching per account.',
+    'account_export_seconds_total': 'Time spent exporting per account.',
+    'pipeline_items_total': 'Items processed per pipeline stage.',
+    'pipeline_stage_seconds_total': 'Pipeline worker time per stage: busy, idle (input queue empty) '
+                                    'or blocked (output queue full).',
+    'pipeline_queue_depth': 'Pipeline queue depth, sampled whenever an item is queued.',
+    'uploads_channels_total': 'Channels handled by the uploads crawler by result.',
+    'uploads_videos_total': 'Uploads written by the uploads crawler.',
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_current_account: ContextVar[Optional[str]] = ContextVar('current_account', default=None)
+
+
+@contextmanager
+def account_scope(username: str) -> Iterator[None]:
+    """
+    Attribute the metrics recorded inside the block to an account.
+
+    Args:
+        username (str): The account username/email.
+    """
+    token = _current_account.set(username)
+    try:
+        yield
+    finally:
+        _current_account.reset(token)
+
+
+def current_account() -> Optional[str]:
+    """
+    Get the account metrics are currently attributed to.
+
+    Returns:
+        str, optional: The account username/email, if inside account_scope().
+    """
+    return _current_account.get()
+
+
+class Histogram:
+    """Fixed-bucket histogram of durations, like a Prometheus histogram."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """
+        Create an empty histogram.
+
+        Args:
+            buckets (Tuple[float, ...]): Ascending upper bounds of the
+                buckets, in seconds; larger values land in the last bucket.
+        """
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Add a value to the first bucket whose bound is not below it.
+
+        Args:
+            value (float): The observed duration in seconds.
+        """
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+                break
+
+    def quantile(self, fraction: float) -> float:
+        """
+        Estimate a quantile by linear interpolation inside its bucket.
+
+        Args:
+            fraction (float): Quantile between 0 and 1, e.g. 0.95.
+
+        Returns:
+            float: The estimated value (0.0 for an empty histogram).
+        """
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                return min(lower + (bound - lower) * (rank - seen) / count, self.max)
+            seen += count
+            lower = bound
+        # The quantile lies above the last bucket
+        return self.max
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    """
+    Turn labels into the key that identifies a series.
+
+    Args:
+        labels (Dict[str, Any]): Label names and values.
+
+    Returns:
+        LabelKey: (name, value) pairs sorted by name, values as strings.
+    """
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    """
+    Format a series' labels in Prometheus text format.
+
+    Args:
+        labels (LabelKey): The series' label key.
+        extra (Tuple[str, str], optional): Another (name, value) pair to
+            append, e.g. a histogram's 'le' bound.
+
+    Returns:
+        str: '{name="value",...}' with escaped values, or '' without labels.
+    """
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (
+        f'{key}="' + value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') + '"'
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_bytes(count: float) -> str:
+    """
+    Format a byte count for the run summary.
+
+    Args:
+        count (float): Number of bytes.
+
+    Returns:
+        str: The count in B, KiB, MiB or GiB, e.g. '1.5 MiB'.
+    """
+    for unit in ('B', 'KiB', 'MiB'):
+        if count < 1024:
+            return f"{count:.0f} {unit}" if unit == 'B' else f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.2f} GiB"
+
+
+def _format_value(value: float) -> str:
+    """
+    Format a sample value for the Prometheus file.
+
+    Args:
+        value (float): Counter or histogram value.
+
+    Returns:
+        str: Whole numbers without a decimal point, others in full precision.
+    """
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    Thread-safe store of counters and histograms for one run.
+
+    Metrics are created on first use; a metric name plus its labels
+    identifies one series.
+    """
+
+    def __init__(self) -> None:
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        """
+        Add to a counter.
+
+        Args:
+            name (str): Metric name, ending in '_total'.
+            value (float): Amount to add.
+            **labels: Label values of the series.
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(
+        self,
+        name: str,
+        seconds: float,
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+        **labels: Any,
+    ) -> None:
+        """
+        Record a duration (or another value) in a histogram.
+
+        Args:
+            name (str): Metric name, ending in '_seconds' for durations.
+            seconds (float): The observed value.
+            buckets (Tuple[float, ...]): Bucket bounds, used when the series
+                is created.
+            **labels: Label values of the series.
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(seconds)
+
+    def _inc_account(self, name: str, value: float = 1) -> None:
+        account = current_account()
+        if account is not None:
+            self.inc(name, value, account=account)
+
+    def record_api_call(
+        self,
+        endpoint: str,
+        client_key: str,
+        outcome: str,
+        seconds: Optional[float] = None,
+        quota_units: int = 1,
+    ) -> None:
+        """
+        Record one API request attempt.
+
+        Args:
+            endpoint (str): API method, e.g. 'subscriptions.list' or 'batch'.
+            client_key (str): OAuth client the request is billed to.
+            outcome (str): 'ok', 'http_<status>', 'transport_error' or
+                'circuit_open'.
+            seconds (float, optional): Duration, if the request was sent.
+            quota_units (int): Quota units the attempt cost.
+        """
+        self.inc('api_requests_total', endpoint=endpoint, client=client_key, outcome=outcome)
+        if seconds is None:
+            return
+        self.observe('api_request_seconds', seconds, endpoint=endpoint)
+        if quota_units:
+            self.inc('quota_units_total', quota_units, client=client_key)
+        self._inc_account('account_api_requests_total')
+        self._inc_account('account_api_seconds_total', seconds)
+
+    def record_retry(self, endpoint: str, client_key: str) -> None:
+        """
+        Record that a failed request attempt will be retried.
+
+        Args:
+            endpoint (str): API method of the request.
+            client_key (str): OAuth client the request is billed to.
+        """
+        self.inc('api_retries_total', endpoint=endpoint, client=client_key)
+        self._inc_account('account_retries_total')
+
+    def record_quota_exhausted(self, client_key: str) -> None:
+        """
+        Record that a client's project ran out of daily quota.
+
+        Args:
+            client_key (str): OAuth client the request was billed to.
+        """
+        self.inc('quota_exhausted_total', client=client_key)
+
+    def quota_usage(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get the quota units spent and quotaExceeded errors seen per client.
+
+        Returns:
+            Dict[str, Dict[str, int]]: 'units' and 'exhausted' counts per
+                OAuth client.
+        """
+        usage: Dict[str, Dict[str, int]] = {}
+        with self._lock:
+            for labels, value in self._counter_items('quota_units_total'):
+                usage.setdefault(labels['client'], {'units': 0, 'exhausted': 0})['units'] = int(value)
+            for labels, value in self._counter_items('quota_exhausted_total'):
+                usage.setdefault(labels['client'], {'units': 0, 'exhausted': 0})['exhausted'] = int(value)
+        return usage
+
+    def record_page(self, source: str) -> None:
+        """
+        Record a subscriptions page.
+
+        Args:
+            source (str): 'api' for a downloaded page, 'snapshot' for a page
+                reused from the snapshot.
+        """
+        self.inc('pages_total', source=source)
+        self._inc_account('account_pages_total')
+
+    def record_bytes(
+        self,
+        count: int,
+        endpoint: Optional[str] = None,
+        wire_count: Optional[int] = None,
+    ) -> None:
+        """
+        Record received response body bytes.
+
+        Args:
+            count (int): Number of bytes after decompression.
+            endpoint (str, optional): API method the response belongs to.
+            wire_count (int, optional): Number of bytes as transferred
+                (compressed); defaults to count.
+        """
+        self.inc('response_bytes_total', count)
+        self._inc_account('account_response_bytes_total', count)
+        if endpoint is not None:
+            self.inc('api_payload_bytes_total', count, endpoint=endpoint)
+            self.inc('api_wire_bytes_total', count if wire_count is None else wire_count, endpoint=endpoint)
+
+    def record_channels(self, count: int) -> None:
+        """
+        Record channels exported for the current account.
+
+        Args:
+            count (int): Number of channels.
+        """
+        self._inc_account('account_channels_total', count)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Time a stage such as 'credentials', 'fetch', 'export' or 'merge'.
+
+        Inside account_scope() the time is also added to the account's
+        account_<stage>_seconds_total counter.
+
+        Args:
+            name (str): The stage name.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+
+    def record_stage(self, name: str, seconds: float) -> None:
+        """
+        Record a stage timed elsewhere, e.g. one that spans several threads.
+
+        Args:
+            name (str): The stage name.
+            seconds (float): The stage's duration.
+        """
+        self.observe('stage_seconds', seconds, stage=name)
+        self._inc_account(f'account_{name}_seconds_total', seconds)
+
+    @contextmanager
+    def auth_step(self, step: str) -> Iterator[None]:
+        """
+        Time an authentication step and count it by outcome.
+
+        Args:
+            step (str): The step, e.g. 'refresh' or 'consent'.
+        """
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            yield
+            outcome = 'ok'
+        finally:
+            self.observe('auth_seconds', time.perf_counter() - start, step=step)
+            self.inc('auth_total', step=step, outcome=outcome)
+
+    def _counter_items(self, name: str) -> List[Tuple[Dict[str, str], float]]:
+        return [(dict(key), value) for key, value in self._counters.get(name, {}).items()]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get every series as plain data.
+
+        Returns:
+            Dict[str, Any]: 'counters' and 'histograms' lists of series.
+        """
+        with self._lock:
+            return {
+                'counters': [
+                    {'name': name, 'labels': dict(key), 'value': value}
+                    for name, series in sorted(self._counters.items())
+                    for key, value in sorted(series.items())
+                ],
+                'histograms': [
+                    {
+                        'name': name,
+                        'labels': dict(key),
+                        'count': histogram.count,
+                        'sum': round(histogram.sum, 6),
+                        'max': round(histogram.max, 6),
+                        'buckets': dict(zip(map(str, histogram.buckets), histogram.counts)),
+                    }
+                    for name, series in sorted(self._histograms.items())
+                    for key, histogram in sorted(series.items())
+                ],
+            }
+
+    def merge_snapshot(self, snapshot: Dict[str, Any]) -> None:
+        """
+        Add the series of a snapshot, e.g. from another run's report.
+
+        Counters are summed and histograms are merged bucket by bucket, so
+        the registry reports as if every run had recorded into it.
+
+        Args:
+            snapshot (Dict[str, Any]): Output of snapshot().
+        """
+        with self._lock:
+            for entry in snapshot.get('counters', []):
+                series = self._counters.setdefault(entry['name'], {})
+                key = _label_key(entry['labels'])
+                series[key] = series.get(key, 0) + entry['value']
+            for entry in snapshot.get('histograms', []):
+                series = self._histograms.setdefault(entry['name'], {})
+                key = _label_key(entry['labels'])
+                if key not in series:
+                    series[key] = Histogram(tuple(float(bound) for bound in entry['buckets']))
+                histogram = series[key]
+                histogram.count += entry['count']
+                histogram.sum += entry['sum']
+                histogram.max = max(histogram.max, entry['max'])
+                # Snapshots list the buckets in bound order
+                for idx, count in enumerate(entry['buckets'].values()):
+                    histogram.counts[idx] += count
+
+    def report(self, run_info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Build the run report: per-endpoint, per-client, per-account and
+        per-stage summaries plus every raw series.
+
+        Latency percentiles are estimated from the histogram buckets.
+
+        Args:
+            run_info (Dict[str, Any], optional): Run details to include, e.g.
+                the command, exit code and account counts.
+
+        Returns:
+            Dict[str, Any]: The JSON-serializable report.
+        """
+        def latency(histogram: Histogram) -> Dict[str, Any]:
+            return {
+                'count': histogram.count,
+                'seconds_total': round(histogram.sum, 3),
+                'mean_ms': round(histogram.sum / histogram.count * 1000, 2) if histogram.count else 0.0,
+                'p50_ms': round(histogram.quantile(0.50) * 1000, 2),
+                'p95_ms': round(histogram.quantile(0.95) * 1000, 2),
+                'p99_ms': round(histogram.quantile(0.99) * 1000, 2),
+                'max_ms': round(histogram.max * 1000, 2),
+            }
+
+        with self._lock:
+            endpoints: Dict[str, Dict[str, Any]] = {}
+            for key, histogram in self._histograms.get('api_request_seconds', {}).items():
+                endpoints[dict(key)['endpoint']] = latency(histogram)
+            for labels, value in self._counter_items('api_requests_total'):
+                entry = endpoints.setdefault(labels['endpoint'], {})
+                outcomes = entry.setdefault('outcomes', {})
+                outcomes[labels['outcome']] = outcomes.get(labels['outcome'], 0) + int(value)
+            for labels, value in self._counter_items('api_retries_total'):
+                entry = endpoints.setdefault(labels['endpoint'], {})
+                entry['retries'] = entry.get('retries', 0) + int(value)
+            for labels, value in self._counter_items('api_wire_bytes_total'):
+                endpoints.setdefault(labels['endpoint'], {})['wire_bytes'] = int(value)
+            for labels, value in self._counter_items('api_payload_bytes_total'):
+                endpoints.setdefault(labels['endpoint'], {})['payload_bytes'] = int(value)
+
+            clients: Dict[str, Dict[str, int]] = {}
+            for labels, value in self._counter_items('quota_units_total'):
+                clients.setdefault(labels['client'], {})['quota_units'] = int(value)
+            for labels, value in self._counter_items('quota_exhausted_total'):
+                clients.setdefault(labels['client'], {})['quota_exhausted'] = int(value)
+            for labels, value in self._counter_items('api_requests_total'):
+                entry = clients.setdefault(labels['client'], {})
+                entry['requests'] = entry.get('requests', 0) + int(value)
+            for labels, value in self._counter_items('api_retries_total'):
+                entry = clients.setdefault(labels['client'], {})
+                entry['retries'] = entry.get('retries', 0) + int(value)
+
+            accounts: Dict[str, Dict[str, float]] = {}
+            for name, series in self._counters.items():
+                if not name.startswith('account_'):
+                    continue
+                field = name[len('account_'):-len('_total')]
+                for key, value in series.items():
+                    accounts.setdefault(dict(key)['account'], {})[field] = (
+                        round(value, 3) if name.endswith('_seconds_total') else int(value)
+                    )
+
+            stages = {
+                dict(key)['stage']: latency(histogram)
+                for key, histogram in self._histograms.get('stage_seconds', {}).items()
+            }
+            auth = {
+                dict(key)['step']: latency(histogram)
+                for key, histogram in self._histograms.get('auth_seconds', {}).items()
+            }
+            pages = {labels['source']: int(value) for labels, value in self._counter_items('pages_total')}
+            cache = {
+                labels['result']: int(value)
+                for labels, value in self._counter_items('channel_cache_lookups_total')
+            }
+            response_bytes = int(sum(self._counters.get('response_bytes_total', {}).values()))
+            wire_bytes = int(sum(self._counters.get('api_wire_bytes_total', {}).values()))
+
+            pipeline: Dict[str, Dict[str, Any]] = {}
+            for labels, value in self._counter_items('pipeline_items_total'):
+                pipeline.setdefault('stages', {}).setdefault(labels['stage'], {})['items'] = int(value)
+            for labels, value in self._counter_items('pipeline_stage_seconds_total'):
+                entry = pipeline.setdefault('stages', {}).setdefault(labels['stage'], {})
+                entry[f"{labels['state']}_seconds"] = round(value, 3)
+            for key, histogram in self._histograms.get('pipeline_queue_depth', {}).items():
+                pipeline.setdefault('queues', {})[dict(key)['queue']] = {
+                    'samples': histogram.count,
+                    'mean_depth': round(histogram.sum / histogram.count, 2) if histogram.count else 0.0,
+                    'p95_depth': round(histogram.quantile(0.95), 1),
+                    'max_depth': int(histogram.max),
+                }
+
+        finished_at = self.finished_at or time.time()
+        return {
+            'run': dict(
+                run_info or {},
+                started_at=self.started_at,
+                finished_at=finished_at,
+                duration_seconds=round(finished_at - self.started_at, 3),
+            ),
+            'endpoints': dict(sorted(endpoints.items())),
+            'clients': dict(sorted(clients.items())),
+            'accounts': dict(sorted(accounts.items())),
+            'stages': dict(sorted(stages.items())),
+            'auth': dict(sorted(auth.items())),
+            'pages': pages,
+            'channel_cache': cache,
+            'response_bytes': response_bytes,
+            'wire_bytes': wire_bytes,
+            'pipeline': pipeline,
+            'metrics': self.snapshot(),
+        }
+
+    def transfer_summary(self) -> List[str]:
+        """
+        Describe the response bytes of each endpoint, for the run summary.
+
+        Returns:
+            List[str]: One line per endpoint with transferred and
+                decompressed bytes, or no lines if nothing was recorded.
+        """
+        with self._lock:
+            wire = {labels['endpoint']: value for labels, value in self._counter_items('api_wire_bytes_total')}
+            payload = {
+                labels['endpoint']: value for labels, value in self._counter_items('api_payload_bytes_total')
+            }
+        lines = []
+        for endpoint in sorted(payload):
+            ratio = payload[endpoint] / wire[endpoint] if wire.get(endpoint) else 1.0
+            lines.append(
+                f"  {endpoint}: {_format_bytes(wire.get(endpoint, 0))} transferred, "
+                f"{_format_bytes(payload[endpoint])} decompressed ({ratio:.1f}x)"
+            )
+        return ["Response bytes per endpoint:"] + lines if lines else []
+
+    def prometheus_text(self, run_info: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Render every series in the Prometheus text exposition format.
+
+        Args:
+            run_info (Dict[str, Any], optional): Run details; a numeric
+                'exit_code' is exported as youtube_subs_last_run_success.
+
+        Returns:
+            str: The text-format metrics.
+        """
+        lines: List[str] = []
+
+        def header(name: str, kind: str) -> str:
+            full_name = METRIC_PREFIX + name
+            lines.append(f'# HELP {full_name} {HELP.get(name, name)}')
+            lines.append(f'# TYPE {full_name} {kind}')
+            return full_name
+
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full_name = header(name, 'counter')
+                for key, value in sorted(series.items()):
+                    lines.append(f'{full_name}{_format_labels(key)} {_format_value(value)}')
+
+            for name, series in sorted(self._histograms.items()):
+                full_name = header(name, 'histogram')
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        le = _format_labels(key, ('le', _format_value(bound)))
+                        lines.append(f'{full_name}_bucket{le} {cumulative}')
+                    le = _format_labels(key, ('le', '+Inf'))
+                    lines.append(f'{full_name}_bucket{le} {histogram.count}')
+                    lines.append(f'{full_name}_sum{_format_labels(key)} {repr(histogram.sum)}')
+                    lines.append(f'{full_name}_count{_format_labels(key)} {histogram.count}')
+
+        finished_at = self.finished_at or time.time()
+        gauges = {
+            'last_run_timestamp_seconds': ('Unix time the last run finished.', finished_at),
+            'last_run_duration_seconds': ('Duration of the last run.', finished_at - self.started_at),
+        }
+        if run_info and isinstance(run_info.get('exit_code'), int):
+            gauges['last_run_success'] = (
+                'Whether the last run succeeded (1) or failed (0).', int(run_info['exit_code'] == 0)
+            )
+        for name, (help_text, value) in gauges.items():
+            lines.append(f'# HELP {METRIC_PREFIX}{name} {help_text}')
+            lines.append(f'# TYPE {METRIC_PREFIX}{name} gauge')
+            lines.append(f'{METRIC_PREFIX}{name} {_format_value(round(value, 3))}')
+        return '\n'.join(lines) + '\n'
+
+
+def _write_atomic(path: str, content: str) -> None:
+    """Write a file through a temporary file so readers never see it half-written."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_file = f"{path}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(temp_file, path)
+
+
+def write_run_report(
+    path: str,
+    run_info: Optional[Dict[str, Any]] = None,
+    registry: Optional[MetricsRegistry] = None,
+) -> None:
+    """
+    Write the JSON run report.
+
+    Args:
+        path (str): Report file path.
+        run_info (Dict[str, Any], optional): Run details to include.
+        registry (MetricsRegistry, optional): Registry to report (defaults
+            to the process-wide one).
+    """
+    registry = registry or get_metrics()
+    _write_atomic(path, json.dumps(registry.report(run_info), indent=2))
+
+
+def write_prometheus_file(
+    path: str,
+    run_info: Optional[Dict[str, Any]] = None,
+    registry: Optional[MetricsRegistry] = None,
+) -> None:
+    """
+    Write the metrics as a Prometheus text-format file.
+
+    The file is replaced atomically, as the node exporter's textfile
+    collector requires; give it a '.prom' name in the collector's directory.
+
+    Args:
+        path (str): Output file path.
+        run_info (Dict[str, Any], optional): Run details.
+        registry (MetricsRegistry, optional): Registry to export (defaults
+            to the process-wide one).
+    """
+    registry = registry or get_metrics()
+    _write_atomic(path, registry.prometheus_text(run_info))
+
+
+def write_run_files(
+    run_info: Dict[str, Any],
+    report_path: Optional[str] = None,
+    prometheus_path: Optional[str] = None,
+) -> None:
+    """
+    Write the run report and the Prometheus file at the end of a run.
+
+    A failure to write them is reported but never fails the run itself.
+
+    Args:
+        run_info (Dict[str, Any]): Run details, e.g. command and exit code.
+        report_path (str, optional): JSON run report path.
+        prometheus_path (str, optional): Prometheus text-format file path.
+    """
+    for path, write in ((report_path, write_run_report), (prometheus_path, write_prometheus_file)):
+        if not path:
+            continue
+        try:
+            write(path, run_info)
+            print(f"📊 Run metrics written to: {path}")
+        except OSError as e:
+            print(f"⚠️  Could not write run metrics to '{path}': {str(e)}")
+
+
+# Bytes read from the network by the current thread's HTTP connections
+_wire_reads = threading.local()
+
+# REST method name of each HTTP method on a collection
+_HTTP_METHODS = {'GET': 'list', 'POST': 'insert', 'PUT': 'update', 'DELETE': 'delete'}
+
+
+def record_wire_read(count: int) -> None:
+    """
+    Count response bytes read from a connection before decompression.
+
+    Called by the counting connections of client_factory on the thread
+    that sends the request.
+
+    Args:
+        count (int): Number of bytes read.
+    """
+    _wire_reads.count = getattr(_wire_reads, 'count', 0) + count
+
+
+def uri_endpoint(uri: str, method: str = 'GET') -> str:
+    """
+    Get the API method name of a REST request, for metrics.
+
+    Args:
+        uri (str): The request URI.
+        method (str): The HTTP method.
+
+    Returns:
+        str: The method name, e.g. 'subscriptions.list', or 'batch'.
+    """
+    path = uri.split('?', 1)[0].rstrip('/')
+    if '/batch' in path:
+        return 'batch'
+    return f"{path.rsplit('/', 1)[-1]}.{_HTTP_METHODS.get(method.upper(), method.lower())}"
+
+
+class MeteredHttp:
+    """
+    Wraps an httplib2.Http-like transport and counts response body bytes per
+    endpoint, both as transferred and after decompression.
+    """
+
+    def __init__(self, http: Any) -> None:
+        self.http = http
+
+    def request(self, uri: str, method: str = 'GET', *args: Any, **kwargs: Any) -> Any:
+        _wire_reads.count = 0
+        resp, content = self.http.request(uri, method, *args, **kwargs)
+        payload = len(content or b'')
+        # Transports that do not read from a counting connection (e.g. a
+        # replayed cassette) report the decompressed size
+        wire = getattr(_wire_reads, 'count', 0) or payload
+        get_metrics().record_bytes(payload, uri_endpoint(uri, method), wire)
+        return resp, content
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.http, name)
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """
+    Get the process-wide metrics registry.
+
+    Returns:
+        MetricsRegistry: The shared registry.
+    """
+    return _registry
+
+
+def reset_metrics() -> MetricsRegistry:
+    """
+    Replace the process-wide registry with an empty one, e.g. between
+    benchmark runs or daemon cycles.
+
+    Returns:
+        MetricsRegistry: The new registry.
+    """
+    global _registry
+    _registry = MetricsRegistry()
+    return _registry
@@ -0,0 +1,559 @@
+"""
+Staged extraction pipeline module.
+
+An alternative to the threaded runner in which fetching, enrichment and
+writing overlap instead of running one after another inside each account's
+loop:
+
+1. Fetch stage: workers paginate subscriptions.list, one account at a time
+   per worker, and queue every page as soon as it arrives. Pages that are
+   unchanged since the snapshot are queued with their stored records.
+2. Enrich stage: workers resolve the channel categories of each page
+   (channels.list, the channel cache or a batch enricher) and build the
+   channel records.
+3. Write stage: workers write each account's pages to its output in page
+   order, checkpoint them and publish the account after its last page.
+
+The stages are connected by bounded queues, so a slow stage makes the
+stages before it wait (backpressure) instead of letting pages pile up in
+memory. Every stage has its own number of workers. Items, busy time, idle
+time (input queue empty) and blocked time (output queue full) per stage, and
+the depth of every queue, are recorded in the run metrics and printed as a
+summary that shows which stage is the bottleneck.
+
+Records, output files, snapshots and checkpoints are identical to the
+threaded runner's.
+"""
+
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+from auth import build_youtube_client
+from batch_enricher import start_batch_enrichers
+from channel_cache import ChannelCache
+from checkpoint import RunCheckpoint
+from metrics import account_scope, get_metrics, DEPTH_BUCKETS
+from records import ChannelRecord
+from runner import AccountRun, pending_accounts
+from snapshots import SubscriptionSnapshot
+from youtube_api import (
+    fetch_subscriptions_page,
+    get_channel_categories,
+    log_fetch_error,
+    page_channel_ids,
+    page_records,
+)
+
+# Default number of workers of the enrich and write stages
+DEFAULT_ENRICH_WORKERS = 4
+DEFAULT_WRITE_WORKERS = 1
+
+# Default capacity of each queue between stages, in pages
+DEFAULT_QUEUE_SIZE = 32
+
+# YouTube clients kept per enrich worker thread
+CLIENTS_PER_THREAD = 8
+
+STAGES = ('fetch', 'enrich', 'write')
+
+# Queued after the last item to stop a stage's workers
+_STOP = object()
+
+
+class StageStats:
+    """Thread-safe time accounting of one stage's workers."""
+
+    def __init__(self, name: str, workers: int) -> None:
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        self.idle = 0.0
+        self.blocked = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, field: str, seconds: float) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + seconds)
+        get_metrics().inc('pipeline_stage_seconds_total', seconds, stage=self.name, state=field)
+
+    def item(self) -> None:
+        with self._lock:
+            self.items += 1
+        get_metrics().inc('pipeline_items_total', stage=self.name)
+
+
+class StageQueue:
+    """Bounded queue between two stages that measures waiting on both ends."""
+
+    def __init__(self, name: str, maxsize: int) -> None:
+        self.name = name
+        self.capacity = max(1, maxsize)
+        self.max_depth = 0
+        self._depth_total = 0
+        self._samples = 0
+        self._queue: 'queue.Queue[Any]' = queue.Queue(self.capacity)
+        self._lock = threading.Lock()
+
+    def put(self, item: Any, producer: StageStats) -> None:
+        """Queue an item, charging the time spent waiting for room to the producer."""
+        start = time.perf_counter()
+        self._queue.put(item)
+        producer.add('blocked', time.perf_counter() - start)
+        depth = self._queue.qsize()
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+            self._depth_total += depth
+            self._samples += 1
+        get_metrics().observe('pipeline_queue_depth', depth, buckets=DEPTH_BUCKETS, queue=self.name)
+
+    def get(self, consumer: StageStats) -> Any:
+        """Take the next item, charging the time spent waiting to the consumer."""
+        start = time.perf_counter()
+        item = self._queue.get()
+        consumer.add('idle', time.perf_counter() - start)
+        return item
+
+    @property
+    def mean_depth(self) -> float:
+        """float: Average depth right after an item was queued."""
+        with self._lock:
+            return self._depth_total / self._samples if self._samples else 0.0
+
+
+class _AccountJob:
+    """Shared state of one account as its pages move through the stages."""
+
+    def __init__(
+        self,
+        username: str,
+        client_key: str,
+        creds: Any,
+        run: AccountRun,
+        snapshot: Optional[SubscriptionSnapshot],
+    ) -> None:
+        self.username = username
+        self.client_key = client_key
+        self.creds = creds
+        self.run = run
+        self.snapshot = snapshot
+        self.started = time.perf_counter()
+        self.error: Optional[Exception] = None
+        self.subscriptions = 0
+        self.page_count = 0
+        self.reused_pages = 0
+        self.fetched_pages: List[Dict[str, Any]] = []
+        # Pages that arrived at the write stage ahead of an earlier page
+        self.pending: Dict[int, '_Page'] = {}
+        self.next_index = 0
+        self.lock = threading.Lock()
+
+
+class _Page:
+    """One subscriptions page, or the end marker of an account (items is None)."""
+
+    __slots__ = ('job', 'index', 'page_token', 'next_page_token', 'etag', 'items', 'records')
+
+    def __init__(
+        self,
+        job: _AccountJob,
+        index: int,
+        page_token: Optional[str] = None,
+        next_page_token: Optional[str] = None,
+        etag: Optional[str] = None,
+        items: Optional[List[Dict[str, Any]]] = None,
+        records: Optional[List[ChannelRecord]] = None,
+    ) -> None:
+        self.job = job
+        self.index = index
+        self.page_token = page_token
+        self.next_page_token = next_page_token
+        self.etag = etag
+        self.items = items
+        self.records = records
+
+    @property
+    def is_end(self) -> bool:
+        return self.items is None and self.records is None
+
+
+class ExtractionPipeline:
+    """
+    Fetch, enrich and write stages connected by bounded queues.
+
+    Use run() once per set of accounts.
+    """
+
+    def __init__(
+        self,
+        fetch_workers: int = 4,
+        enrich_workers: int = DEFAULT_ENRICH_WORKERS,
+        write_workers: int = DEFAULT_WRITE_WORKERS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        cache: Optional[ChannelCache] = None,
+        snapshot_dir: Optional[str] = None,
+        output_dir: str = 'output',
+        checkpoint: Optional[RunCheckpoint] = None,
+        output_format: str = 'csv',
+        batch_enrichment: bool = False,
+    ) -> None:
+        """
+        Configure the pipeline.
+
+        Args:
+            fetch_workers (int): Accounts paginated at the same time.
+            enrich_workers (int): Pages enriched at the same time.
+            write_workers (int): Accounts written at the same time.
+            queue_size (int): Capacity of each queue between stages, in pages.
+            cache (ChannelCache, optional): Persistent channel metadata cache.
+            snapshot_dir (str, optional): Directory of per-account snapshots
+                for incremental sync.
+            output_dir (str): Directory the account outputs are written to.
+            checkpoint (RunCheckpoint, optional): Checkpoint of the run.
+            output_format (str): Output sink, one of sinks.SINK_FORMATS.
+            batch_enrichment (bool): Send category lookups as batch HTTP
+                requests shared by the accounts of each OAuth client.
+        """
+        self.stats = {
+            'fetch': StageStats('fetch', max(1, fetch_workers)),
+            'enrich': StageStats('enrich', max(1, enrich_workers)),
+            'write': StageStats('write', max(1, write_workers)),
+        }
+        self.queue_size = queue_size
+        self.cache = cache
+        self.snapshot_dir = snapshot_dir
+        self.output_dir = output_dir
+        self.checkpoint = checkpoint
+        self.output_format = output_format
+        self.batch_enrichment = batch_enrichment
+        self.elapsed = 0.0
+        self._enrichers: Dict[str, Any] = {}
+        self._local = threading.local()
+
+    def run(self, account_credentials: List[Tuple[str, str, Any]]) -> Dict[str, int]:
+        """
+        Extract every account through the pipeline.
+
+        Args:
+            account_credentials (List[Tuple[str, str, Credentials]]): Output
+                of runner.resolve_credentials.
+
+        Returns:
+            Dict[str, int]: Number of channels per account, including
+                accounts completed before a resume.
+        """
+        account_credentials, self.account_counts = pending_accounts(
+            account_credentials, self.checkpoint
+        )
+        self.total_accounts = len(account_credentials)
+        self._results_lock = threading.Lock()
+        self._accounts: 'queue.Queue[Any]' = queue.Queue()
+        for idx, entry in enumerate(account_credentials, 1):
+            self._accounts.put((idx, entry))
+        self.enrich_queue = StageQueue('enrich', self.queue_size)
+        self.write_queue = StageQueue('write', self.queue_size)
+        if self.batch_enrichment:
+            self._enrichers = start_batch_enrichers(
+                [entry[1] for entry in account_credentials], self.cache
+            )
+
+        start = time.perf_counter()
+        try:
+            fetchers = self._start('fetch', self._fetch_worker)
+            enrichers = self._start('enrich', self._enrich_worker)
+            writers = self._start('write', self._write_worker)
+            for thread in fetchers:
+                thread.join()
+            for _ in enrichers:
+                self.enrich_queue.put(_STOP, self.stats['fetch'])
+            for thread in enrichers:
+                thread.join()
+            for _ in writers:
+                self.write_queue.put(_STOP, self.stats['enrich'])
+            for thread in writers:
+                thread.join()
+        finally:
+            self.elapsed = time.perf_counter() - start
+            for enricher in self._enrichers.values():
+                enricher.close()
+                print(f"Batched enrichment ({enricher.client_key}): {enricher.summary()}")
+        return self.account_counts
+
+    def _start(self, stage: str, target: Any) -> List[threading.Thread]:
+        threads = [
+            threading.Thread(target=target, name=f'pipeline-{stage}-{idx}', daemon=True)
+            for idx in range(self.stats[stage].workers)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def _client(self, job: _AccountJob) -> Any:
+        """
+        Get the calling thread's YouTube client for an account.
+
+        Service objects are not thread-safe, so every thread keeps its own
+        few most recently used clients.
+        """
+        clients = getattr(self._local, 'clients', None)
+        if clients is None:
+            clients = self._local.clients = OrderedDict()
+        client = clients.get(job.username)
+        if client is None:
+            client = clients[job.username] = build_youtube_client(job.creds)
+            if len(clients) > CLIENTS_PER_THREAD:
+                clients.popitem(last=False)
+        else:
+            clients.move_to_end(job.username)
+        return client
+
+    def _fetch_worker(self) -> None:
+        """Paginate accounts until none are left."""
+        stats = self.stats['fetch']
+        while True:
+            try:
+                account_idx, (username, client_key, creds) = self._accounts.get_nowait()
+            except queue.Empty:
+                return
+            with account_scope(username):
+                try:
+                    run = AccountRun(
+                        username, account_idx, self.total_accounts,
+                        self.output_dir, self.checkpoint, self.output_format
+                    )
+                except Exception as e:
+                    print(f"❌ Failed to process account '{username}': {str(e)}")
+                    continue
+                start_page_token = run.start_page_token
+                job = _AccountJob(username, client_key, creds, run, None)
+                try:
+                    if self.snapshot_dir and start_page_token is None:
+                        job.snapshot = SubscriptionSnapshot.load(self.snapshot_dir, username)
+                except Exception as e:
+                    # Reported and counted by the write stage like any other failure
+                    job.error = e
+                if not run.finished and job.error is None:
+                    run.log(f"Fetching subscriptions for account: {username}")
+                    self._paginate(job, start_page_token, stats)
+                self.enrich_queue.put(_Page(job, job.page_count), stats)
+
+    def _paginate(self, job: _AccountJob, next_page_token: Optional[str], stats: StageStats) -> None:
+        """Fetch an account's pages and queue each one for enrichment."""
+        while True:
+            if job.error is not None:
+                # A later stage failed: the rest of the pages would be thrown away
+                return
+            start = time.perf_counter()
+            try:
+                page_token = next_page_token
+                stored_page = (
+                    job.snapshot.stored_page(job.page_count, page_token) if job.snapshot else None
+                )
+                response = fetch_subscriptions_page(
+                    self._client(job), page_token, stored_page, job.client_key, job.run.log
+                )
+            except Exception as e:
+                job.error = e
+                stats.add('busy', time.perf_counter() - start)
+                return
+            if response is None:
+                # Unchanged since the last run: the stored records skip enrichment
+                get_metrics().record_page('snapshot')
+                job.reused_pages += 1
+                next_page_token = stored_page.get('next_page_token')
+                page = _Page(
+                    job, job.page_count, page_token, next_page_token, stored_page['etag'],
+                    records=stored_page['channels']
+                )
+            else:
+                get_metrics().record_page('api')
+                next_page_token = response.get('nextPageToken')
+                page = _Page(
+                    job, job.page_count, page_token, next_page_token, response.get('etag'),
+                    items=response.get('items', [])
+                )
+            job.page_count += 1
+            stats.add('busy', time.perf_counter() - start)
+            stats.item()
+            self.enrich_queue.put(page, stats)
+            if not next_page_token:
+                return
+
+    def _enrich_worker(self) -> None:
+        """Resolve categories and build records for queued pages."""
+        stats = self.stats['enrich']
+        while True:
+            page = self.enrich_queue.get(stats)
+            if page is _STOP:
+                return
+            if page.items is not None and page.job.error is None:
+                start = time.perf_counter()
+                job = page.job
+                with account_scope(job.username):
+                    try:
+                        categories = get_channel_categories(
+                            page_channel_ids(page.items),
+                            self._client(job),
+                            self.cache,
+                            job.run.log,
+                            job.client_key,
+                            self._enrichers.get(job.client_key)
+                        )
+                        page.records = page_records(page.items, categories)
+                    except Exception as e:
+                        job.error = e
+                        # Without records the page would pass for the end marker
+                        page.records = []
+                page.items = None
+                stats.add('busy', time.perf_counter() - start)
+                stats.item()
+            self.write_queue.put(page, stats)
+
+    def _write_worker(self) -> None:
+        """Write pages in page order and finish accounts after their last page."""
+        stats = self.stats['write']
+        while True:
+            page = self.write_queue.get(stats)
+            if page is _STOP:
+                return
+            start = time.perf_counter()
+            job = page.job
+            with job.lock, account_scope(job.username):
+                job.pending[page.index] = page
+                while job.next_index in job.pending:
+                    ready = job.pending.pop(job.next_index)
+                    job.next_index += 1
+                    if ready.is_end:
+                        self._finish(job)
+                    elif job.error is None and ready.records is not None:
+                        self._write(job, ready)
+                        stats.item()
+            stats.add('busy', time.perf_counter() - start)
+
+    def _write(self, job: _AccountJob, page: _Page) -> None:
+        """Write one page to the account's output."""
+        try:
+            if job.run.on_page is not None:
+                job.run.handle_page(page.records, page.next_page_token)
+        except Exception as e:
+            job.error = e
+            return
+        job.subscriptions += len(page.records)
+        if job.snapshot is not None:
+            job.fetched_pages.append({
+                'page_token': page.page_token,
+                'etag': page.etag,
+                'next_page_token': page.next_page_token,
+                'channels': page.records,
+            })
+
+    def _finish(self, job: _AccountJob) -> None:
+        """Publish (or abandon) an account once its pages are written."""
+        run = job.run
+        try:
+            if job.error is not None:
+                log_fetch_error(job.username, job.error, run.log)
+                count = run.complete(0)
+            else:
+                if job.page_count:
+                    if job.snapshot is not None:
+                        job.snapshot.save(job.fetched_pages)
+                        run.log(
+                            f"  Reused {job.reused_pages}/{job.page_count} unchanged page(s) "
+                            "from snapshot"
+                        )
+                    run.log(f"  Found {job.subscriptions} subscriptions")
+                count = run.complete(job.subscriptions)
+            with self._results_lock:
+                self.account_counts[job.username] = count
+        except Exception as e:
+            run.log(f"❌ Failed to process account '{job.username}': {str(e)}")
+        finally:
+            get_metrics().record_stage('fetch', time.perf_counter() - job.started)
+            run.close()
+
+    def summary(self) -> List[str]:
+        """
+        Describe each stage's load and each queue's depth.
+
+        Utilization is a stage's busy time divided by its workers' total
+        time; the stage with the highest utilization is the bottleneck.
+
+        Returns:
+            List[str]: Summary lines.
+        """
+        lines = ["Pipeline stages:"]
+        utilization: Dict[str, float] = {}
+        for stage in STAGES:
+            stats = self.stats[stage]
+            capacity = self.elapsed * stats.workers
+            utilization[stage] = stats.busy / capacity if capacity else 0.0
+            lines.append(
+                f"  {stage:<6} {stats.workers:>3} worker(s) {stats.items:>7} item(s)  "
+                f"busy {stats.busy:8.2f}s ({utilization[stage]:6.1%})  "
+                f"idle {stats.idle:8.2f}s  blocked {stats.blocked:8.2f}s"
+            )
+        for stage_queue in (self.enrich_queue, self.write_queue):
+            lines.append(
+                f"  queue to {stage_queue.name:<6} capacity {stage_queue.capacity:>4}  "
+                f"mean depth {stage_queue.mean_depth:6.1f}  max depth {stage_queue.max_depth:>4}"
+            )
+        lines.append(f"  Bottleneck: {max(utilization, key=utilization.get)} stage")
+        return lines
+
+
+def fetch_all_accounts_pipeline(
+    account_credentials: List[Tuple[str, str, Any]],
+    workers: int = 4,
+    cache: Optional[ChannelCache] = None,
+    snapshot_dir: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    checkpoint: Optional[RunCheckpoint] = None,
+    output_format: str = 'csv',
+    batch_enrichment: bool = False,
+    enrich_workers: int = DEFAULT_ENRICH_WORKERS,
+    write_workers: int = DEFAULT_WRITE_WORKERS,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+) -> Dict[str, int]:
+    """
+    Fetch subscriptions for all accounts through the staged pipeline.
+
+    Drop-in replacement for runner.fetch_all_accounts when streaming to an
+    output directory.
+
+    Args:
+        account_credentials (List[Tuple[str, str, Credentials]]): Output of
+            runner.resolve_credentials.
+        workers (int): Workers of the fetch stage.
+        cache (ChannelCache, optional): Persistent channel metadata cache.
+        snapshot_dir (str, optional): Directory of per-account snapshots for
+            incremental sync.
+        output_dir (str, optional): Directory the account outputs are written to.
+        checkpoint (RunCheckpoint, optional): Checkpoint of the run.
+        output_format (str): Output sink, one of sinks.SINK_FORMATS.
+        batch_enrichment (bool): Send category lookups as batch HTTP requests.
+        enrich_workers (int): Workers of the enrich stage.
+        write_workers (int): Workers of the write stage.
+        queue_size (int): Capacity of each queue between stages, in pages.
+
+    Returns:
+        Dict[str, int]: Number of channels fetched per account.
+    """
+    pipeline = ExtractionPipeline(
+        fetch_workers=workers,
+        enrich_workers=enrich_workers,
+        write_workers=write_workers,
+        queue_size=queue_size,
+        cache=cache,
+        snapshot_dir=snapshot_dir,
+        output_dir=output_dir or 'output',
+        checkpoint=checkpoint,
+        output_format=output_format,
+        batch_enrichment=batch_enrichment,
+    )
+    account_counts = pipeline.run(account_credentials)
+    print("\n".join(pipeline.summary()))
+    return account_counts
@@ -0,0 +1,335 @@
+"""
+Quota planning module for the YouTube Data API.
+
+Each OAuth client in credentials_config.json belongs to its own Google Cloud
+project with its own daily YouTube Data API quota. This module estimates how
+many quota units each account will cost, keeps a ledger of units already
+spent today per client, and schedules accounts so that no client's project
+goes over its daily budget. Accounts that do not fit are deferred.
+"""
+
+import json
+import math
+import os
+import threading
+from datetime import datetime, timezone, timedelta
+from typing import List, Dict, Any, Optional
+
+from auth import get_client_key
+
+# Quota cost of one call, per the YouTube Data API quota calculator
+SUBSCRIPTIONS_LIST_COST = 1
+CHANNELS_LIST_COST = 1
+PLAYLIST_ITEMS_LIST_COST = 1
+
+# subscriptions.list and channels.list both return at most 50 items per call
+ITEMS_PER_CALL = 50
+
+# Default daily quota of a Google Cloud project
+DEFAULT_DAILY_BUDGET = 10000
+
+# Assumed subscription count for accounts never seen before
+DEFAULT_ESTIMATED_SUBSCRIPTIONS = 1000
+
+
+def quota_day() -> str:
+    """
+    Get the current quota day.
+
+    YouTube Data API quotas reset at midnight Pacific Time; a fixed UTC-8
+    offset is used so that the day never rolls over early.
+
+    Returns:
+        str: The quota day in YYYY-MM-DD format.
+    """
+    return datetime.now(timezone(timedelta(hours=-8))).strftime('%Y-%m-%d')
+
+
+def next_quota_reset() -> float:
+    """
+    Get the time of the next quota reset.
+
+    Returns:
+        float: Unix time of the next midnight in the quota day's UTC-8 offset.
+    """
+    now = datetime.now(timezone(timedelta(hours=-8)))
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    return midnight.timestamp()
+
+
+def estimate_account_cost(subscription_count: Optional[int]) -> int:
+    """
+    Estimate the quota units needed to extract one account.
+
+    Args:
+        subscription_count (int, optional): Subscriptions seen on the last run,
+            or None if the account has not been extracted before.
+
+    Returns:
+        int: Estimated quota units (subscriptions.list pages plus
+            channels.list calls for category lookups).
+    """
+    if subscription_count is None:
+        subscription_count = DEFAULT_ESTIMATED_SUBSCRIPTIONS
+
+    calls = max(1, math.ceil(subscription_count / ITEMS_PER_CALL))
+    return calls * SUBSCRIPTIONS_LIST_COST + calls * CHANNELS_LIST_COST
+
+
+class QuotaLedger:
+    """
+    Persistent record of subscription counts and quota spent per OAuth client.
+
+    The ledger is stored as JSON and survives between runs, so several runs
+    on the same day share one budget per client.
+    """
+
+    def __init__(self, state_file: str) -> None:
+        """
+        Load the ledger from disk (or start an empty one).
+
+        Args:
+            state_file (str): Path to the JSON state file.
+        """
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self.subscription_counts: Dict[str, int] = {}
+        self.usage_day = quota_day()
+        self.usage: Dict[str, int] = {}
+        self.exhausted: List[str] = []
+
+        if os.path.exists(state_file):
+            try:
+                with open(state_file, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                self.subscription_counts = state.get('subscription_counts', {})
+                if state.get('usage_day') == self.usage_day:
+                    self.usage = state.get('usage', {})
+                    self.exhausted = state.get('exhausted', [])
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️  Ignoring unreadable quota state '{state_file}': {str(e)}")
+
+    def spent_today(self, client_key: str) -> int:
+        """
+        Get the quota units already spent today by a client.
+
+        Args:
+            client_key (str): The OAuth client key.
+
+        Returns:
+            int: Units spent since the last quota reset.
+        """
+        return self.usage.get(client_key, 0)
+
+    def is_exhausted(self, client_key: str) -> bool:
+        """
+        Check whether a client's project ran out of quota today.
+
+        Args:
+            client_key (str): The OAuth client key.
+
+        Returns:
+            bool: True if the API answered quotaExceeded since the last reset.
+        """
+        return client_key in self.exhausted
+
+    def record_account(self, username: str, subscription_count: int) -> None:
+        """
+        Remember a finished account's size for the next estimate.
+
+        Args:
+            username (str): The account username/email.
+            subscription_count (int): Number of subscriptions fetched.
+        """
+        with self._lock:
+            self.subscription_counts[username] = subscription_count
+
+    def record_units(self, client_key: str, units: int) -> None:
+        """
+        Charge quota units to a client.
+
+        Args:
+            client_key (str): The OAuth client key.
+            units (int): Units spent.
+        """
+        with self._lock:
+            self.usage[client_key] = self.usage.get(client_key, 0) + units
+
+    def mark_exhausted(self, client_key: str) -> None:
+        """
+        Stop planning work for a client until the quota resets.
+
+        Args:
+            client_key (str): The OAuth client key.
+        """
+        with self._lock:
+            if client_key not in self.exhausted:
+                self.exhausted.append(client_key)
+
+    def record_usage(
+        self,
+        usage: Dict[str, Dict[str, int]],
+        charged: Optional[Dict[str, Dict[str, int]]] = None,
+    ) -> None:
+        """
+        Charge the quota actually spent, as counted by the run's metrics.
+
+        Every request that reached the API is charged, including those of
+        accounts that failed part way. Clients that got a quotaExceeded
+        answer are marked exhausted for the rest of the quota day.
+
+        Args:
+            usage (Dict[str, Dict[str, int]]): 'units' and 'exhausted' counts
+                per client, from MetricsRegistry.quota_usage().
+            charged (Dict[str, Dict[str, int]], optional): Counts already
+                charged from the same metrics. Updated in place, so that a
+                long-running process only charges what was spent since its
+                previous call.
+        """
+        charged = {} if charged is None else charged
+        for client_key, spent in usage.items():
+            previous = charged.get(client_key, {})
+            units = spent['units'] - previous.get('units', 0)
+            if units:
+                self.record_units(client_key, units)
+            if spent['exhausted'] > previous.get('exhausted', 0):
+                self.mark_exhausted(client_key)
+            charged[client_key] = dict(spent)
+
+    def record_results(self, account_counts: Dict[str, int]) -> None:
+        """
+        Remember the size of every extracted account of a run.
+
+        Accounts that returned no channels are skipped so that a failed fetch
+        does not overwrite the size remembered from an earlier run. Quota is
+        charged separately with record_usage().
+
+        Args:
+            account_counts (Dict[str, int]): Channels fetched per account.
+        """
+        for username, count in account_counts.items():
+            if count:
+                self.record_account(username, count)
+
+    def save(self) -> None:
+        """Write the ledger to disk atomically."""
+        directory = os.path.dirname(self.state_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            state = {
+                'subscription_counts': self.subscription_counts,
+                'usage_day': self.usage_day,
+                'usage': self.usage,
+                'exhausted': sorted(self.exhausted),
+            }
+        # Several runs may share the ledger, so each writes its own temp file
+        temp_file = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(temp_file, self.state_file)
+
+
+def get_client_budget(
+    credentials_config: Dict[str, Any],
+    client_key: str,
+    default_budget: int = DEFAULT_DAILY_BUDGET,
+) -> int:
+    """
+    Get the daily quota budget configured for an OAuth client.
+
+    Budgets are read from an optional 'quota_budgets' section of
+    credentials_config.json, e.g. {"quota_budgets": {"client_1": 50000}}.
+
+    Args:
+        credentials_config (Dict[str, Any]): The credentials configuration.
+        client_key (str): The OAuth client key.
+        default_budget (int): Budget for clients without an explicit entry.
+
+    Returns:
+        int: The daily budget in quota units.
+    """
+    return int(credentials_config.get('quota_budgets', {}).get(client_key, default_budget))
+
+
+def plan_quota(
+    accounts: List[Dict[str, str]],
+    credentials_config: Dict[str, Any],
+    ledger: QuotaLedger,
+    default_budget: int = DEFAULT_DAILY_BUDGET,
+) -> Dict[str, Any]:
+    """
+    Schedule accounts so that no OAuth client exceeds its daily budget.
+
+    Accounts are considered in input order; an account is scheduled if its
+    estimated cost fits in what is left of its client's budget, otherwise it
+    is deferred. Every account of a client that ran out of quota today is
+    deferred.
+
+    Args:
+        accounts (List[Dict]): Account dictionaries with 'username' key.
+        credentials_config (Dict[str, Any]): The credentials configuration.
+        ledger (QuotaLedger): Ledger with last-run counts and today's usage.
+        default_budget (int): Budget for clients without an explicit entry.
+
+    Returns:
+        Dict[str, Any]: Plan with keys:
+            - scheduled: accounts to run now
+            - deferred: list of (account, client_key, estimate, remaining)
+            - clients: per-client dict of budget, spent and planned units
+              and whether the quota is exhausted
+    """
+    scheduled: List[Dict[str, str]] = []
+    deferred: List[tuple] = []
+    clients: Dict[str, Dict[str, int]] = {}
+
+    for account in accounts:
+        username = account.get('username', '').strip()
+        if not username:
+            continue
+
+        client_key = get_client_key(credentials_config, username)
+        if client_key not in clients:
+            clients[client_key] = {
+                'budget': get_client_budget(credentials_config, client_key, default_budget),
+                'spent': ledger.spent_today(client_key),
+                'planned': 0,
+                'exhausted': ledger.is_exhausted(client_key),
+            }
+        client = clients[client_key]
+
+        estimate = estimate_account_cost(ledger.subscription_counts.get(username))
+        remaining = 0 if client['exhausted'] else client['budget'] - client['spent'] - client['planned']
+        if estimate <= remaining:
+            client['planned'] += estimate
+            scheduled.append(account)
+        else:
+            deferred.append((account, client_key, estimate, remaining))
+
+    return {'scheduled': scheduled, 'deferred': deferred, 'clients': clients}
+
+
+def print_quota_plan(plan: Dict[str, Any]) -> None:
+    """
+    Print a per-client quota report and the list of deferred accounts.
+
+    Args:
+        plan (Dict[str, Any]): A plan returned by plan_quota.
+    """
+    print("Quota plan per OAuth client:")
+    for client_key, client in sorted(plan['clients'].items()):
+        print(
+            f"  {client_key}: {client['planned']} planned + {client['spent']} spent today "
+            f"of {client['budget']} units" + (" (quota exhausted)" if client['exhausted'] else "")
+        )
+
+    if plan['deferred']:
+        print(f"\n⚠️  Deferred {len(plan['deferred'])} account(s) to stay within daily quota:")
+        for account, client_key, estimate, remaining in plan['deferred']:
+            print(
+                f"  ⊘ {account['username']} ({client_key}): needs ~{estimate} units, "
+                f"{max(0, remaining)} left"
+            )
+        print("  Run again after the quota resets (midnight Pacific Time).")
+    print()
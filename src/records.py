@@ -0,0 +1,164 @@
+"""
+Channel record module.
+
+This module defines the compact in-memory representation of one subscribed
+channel. Records only store what differs between channels; constant columns
+are class attributes and the channel link is derived when it is exported.
+Uploads found by the uploads crawler use the same layout.
+"""
+
+import sys
+from typing import List, Dict, Any
+
+CHANNEL_LINK_PREFIX = 'https://www.youtube.com/channel/'
+
+
+class ChannelRecord:
+    """
+    One subscribed channel.
+
+    Uses __slots__ so that a record costs three references instead of a
+    six-key dict. Channel IDs and categories are interned because the same
+    values repeat across accounts and rows.
+    """
+
+    __slots__ = ('channel_id', 'name', 'category')
+
+    # Constant columns shared by every record
+    type = 'Channel'
+    is_new_to_merged_list = 'Yes'
+
+    def __init__(self, channel_id: str, name: str, category: str) -> None:
+        """
+        Create a channel record.
+
+        Args:
+            channel_id (str): The YouTube channel ID.
+            name (str): The channel title.
+            category (str): Comma-separated category string.
+        """
+        self.channel_id = sys.intern(channel_id)
+        self.name = name
+        self.category = sys.intern(category)
+
+    @property
+    def link(self) -> str:
+        """str: The channel URL, built on demand."""
+        return f'{CHANNEL_LINK_PREFIX}{self.channel_id}'
+
+    def to_row(self) -> List[str]:
+        """
+        Serialize the record's own fields.
+
+        Returns:
+            List[str]: [channel_id, name, category].
+        """
+        return [self.channel_id, self.name, self.category]
+
+    @classmethod
+    def from_row(cls, row: List[str]) -> 'ChannelRecord':
+        """
+        Rebuild a record serialized with to_row.
+
+        Args:
+            row (List[str]): [channel_id, name, category].
+
+        Returns:
+            ChannelRecord: The record.
+        """
+        return cls(row[0], row[1], row[2])
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Expand the record into the legacy six-key channel dict.
+
+        Returns:
+            Dict[str, Any]: Dict with channel_id, name, category, type, link
+                and is_new_to_merged_list keys.
+        """
+        return {
+            'channel_id': self.channel_id,
+            'name': self.name,
+            'category': self.category,
+            'type': self.type,
+            'link': self.link,
+            'is_new_to_merged_list': self.is_new_to_merged_list,
+        }
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ChannelRecord):
+            return NotImplemented
+        return self.to_row() == other.to_row()
+
+    def __hash__(self) -> int:
+        return hash(tuple(self.to_row()))
+
+    def __repr__(self) -> str:
+        return f"ChannelRecord({self.channel_id!r}, {self.name!r}, {self.category!r})"
+
+
+VIDEO_LINK_PREFIX = 'https://www.youtube.com/watch?v='
+
+
+class UploadRecord:
+    """
+    One video uploaded by a subscribed channel.
+
+    Like ChannelRecord, uses __slots__; the channel ID and name are interned
+    because every upload of a channel repeats them.
+    """
+
+    __slots__ = ('video_id', 'title', 'published_at', 'channel_id', 'channel_name')
+
+    def __init__(
+        self,
+        video_id: str,
+        title: str,
+        published_at: str,
+        channel_id: str,
+        channel_name: str,
+    ) -> None:
+        """
+        Create an upload record.
+
+        Args:
+            video_id (str): The YouTube video ID.
+            title (str): The video title.
+            published_at (str): RFC 3339 time the video was published.
+            channel_id (str): ID of the channel that uploaded the video.
+            channel_name (str): Title of that channel.
+        """
+        self.video_id = video_id
+        self.title = title
+        self.published_at = published_at
+        self.channel_id = sys.intern(channel_id)
+        self.channel_name = sys.intern(channel_name)
+
+    @property
+    def link(self) -> str:
+        """str: The video URL, built on demand."""
+        return f'{VIDEO_LINK_PREFIX}{self.video_id}'
+
+    def to_row(self) -> List[str]:
+        """
+        Serialize the record into export columns.
+
+        Returns:
+            List[str]: [video_id, title, published_at, channel_id,
+                channel_name, link].
+        """
+        return [
+            self.video_id, self.title, self.published_at,
+            self.channel_id, self.channel_name, self.link
+        ]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, UploadRecord):
+            return NotImplemented
+        return self.to_row() == other.to_row()
+
+    def __hash__(self) -> int:
+        return hash(tuple(self.to_row()))
+
+    def __repr__(self) -> str:
+        return f"UploadRecord({self.video_id!r}, {self.title!r}, {self.published_at!r})"
@@ -0,0 +1,373 @@
+"""
+Account runner module for multi-account extraction.
+
+This module splits a run into two phases:
+
+1. Credential phase: tokens for every account are loaded once, and expired
+   or soon-to-expire tokens are refreshed concurrently. Browser consent is
+   interactive, so it runs serially and only for accounts that truly need it.
+2. Fetch phase: subscriptions for all authenticated accounts are fetched
+   concurrently on a bounded worker pool. Each worker builds its own YouTube
+   client, and each account's console output is buffered and printed as one
+   block so that accounts do not interleave. Records can be streamed straight
+   into each account's CSV file so that memory stays flat.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from auth import CredentialManager, get_client_key, build_youtube_client
+from batch_enricher import BatchEnricher, start_batch_enrichers
+from channel_cache import ChannelCache
+from checkpoint import RunCheckpoint
+from metrics import account_scope, get_metrics
+from records import ChannelRecord
+from sinks import open_account_sink
+from youtube_api import fetch_subscriptions
+
+# Serializes console output from worker threads
+_print_lock = threading.Lock()
+
+
+def resolve_credentials(
+    accounts: List[Dict[str, str]],
+    credentials_config: Dict[str, Any],
+    token_dir: str = 'secret',
+) -> List[Tuple[str, str, Any]]:
+    """
+    Resolve OAuth credentials for every account before any fetching starts.
+
+    Args:
+        accounts (List[Dict]): Account dictionaries with 'username' key.
+        credentials_config (Dict): OAuth credentials configuration.
+        token_dir (str): Directory holding the token store.
+
+    Returns:
+        List[Tuple[str, str, Credentials]]: (username, client key, credentials)
+            for the accounts that authenticated successfully, in input order.
+    """
+    usernames = [
+        account.get('username', '').strip()
+        for account in accounts
+        if account.get('username', '').strip()
+    ]
+
+    print("Resolving credentials for all accounts...")
+    manager = CredentialManager(credentials_config, token_dir=token_dir)
+    try:
+        ready = manager.prepare(usernames)
+    finally:
+        manager.close()
+    for username, error in manager.failures.items():
+        print(f"❌ Failed to authenticate account '{username}': {error}")
+
+    resolved = [
+        (username, get_client_key(credentials_config, username), ready[username])
+        for username in usernames
+        if username in ready
+    ]
+    print(f"\n✓ {len(resolved)}/{len(usernames)} account(s) ready\n")
+    return resolved
+
+
+class AccountRun:
+    """
+    Output, checkpoint and console bookkeeping of one account's fetch.
+
+    Used by both the threaded runner and the asyncio engine, so that either
+    way of fetching writes the same files and checkpoints.
+    """
+
+    def __init__(
+        self,
+        username: str,
+        account_idx: int,
+        total_accounts: int,
+        output_dir: Optional[str] = None,
+        checkpoint: Optional[RunCheckpoint] = None,
+        output_format: str = 'csv',
+    ) -> None:
+        """
+        Prepare an account's fetch, resuming from the checkpoint if possible.
+
+        Args:
+            username (str): The account username/email.
+            account_idx (int): Current account index (for display).
+            total_accounts (int): Total number of accounts to process.
+            output_dir (str, optional): If given, records are streamed into
+                the account's output in this directory as pages arrive.
+            checkpoint (RunCheckpoint, optional): Run checkpoint updated after
+                every page and account when streaming to output_dir.
+            output_format (str): Output sink, one of sinks.SINK_FORMATS.
+        """
+        self.username = username
+        self.checkpoint = checkpoint
+        self.lines = [
+            f"\n[{account_idx}/{total_accounts}] Processing account: {username}",
+            "=" * 60,
+        ]
+        progress = checkpoint.progress(username) if checkpoint and output_dir else None
+        self.finished = bool(progress and progress['finished'])
+        self.start_page_token = progress['next_page_token'] if progress else None
+        self.writer: Optional[Any] = None
+
+        if output_dir and progress:
+            self.writer = open_account_sink(
+                output_format,
+                username,
+                output_dir,
+                resume_rows=progress['row_count'],
+                resume_offset=progress['spill_offset']
+            )
+            self.log(f"  ↻ Resuming after {progress['row_count']} checkpointed rows")
+        elif output_dir:
+            self.writer = open_account_sink(output_format, username, output_dir)
+
+    def log(self, message: str) -> None:
+        """Buffer a line of console output."""
+        self.lines.append(message)
+
+    @property
+    def on_page(self) -> Optional[Callable[[List[ChannelRecord], Optional[str]], None]]:
+        """Callable, optional: Page callback for fetch_subscriptions, if streaming."""
+        return self.handle_page if self.writer is not None else None
+
+    def handle_page(self, records: List[ChannelRecord], next_page_token: Optional[str]) -> None:
+        """
+        Write a page of records and checkpoint the account's progress.
+
+        Args:
+            records (List[ChannelRecord]): The page's channel records.
+            next_page_token (str, optional): Token of the next page, or None.
+        """
+        self.writer.write_rows(records)
+        self.finished = next_page_token is None
+        if self.checkpoint is not None:
+            self.checkpoint.record_page(
+                self.username, next_page_token, self.writer.row_count, self.writer.spill_offset
+            )
+
+    def complete(self, fetched_count: int) -> int:
+        """
+        Publish the account's file once the fetch has returned.
+
+        Args:
+            fetched_count (int): Number of subscriptions the fetch returned.
+
+        Returns:
+            int: Number of channels to report for the account.
+        """
+        if self.writer is None:
+            return fetched_count
+
+        count = self.writer.row_count
+        if self.finished:
+            if self.writer.row_count:
+                with get_metrics().stage('export'):
+                    self.writer.finalize(log=self.log)
+                get_metrics().record_channels(self.writer.row_count)
+            else:
+                self.writer.abort()
+                self.log(f"  ⊘ Skipped {self.username} (no channels)")
+            if self.checkpoint is not None:
+                self.checkpoint.record_account(self.username, self.writer.row_count)
+        else:
+            # The fetch failed partway; never publish partial files
+            count = 0
+            if self.checkpoint is not None:
+                self.writer.suspend()
+                self.log("  💾 Progress saved; run again with --resume to continue")
+            else:
+                self.writer.abort()
+        self.writer = None
+        return count
+
+    def close(self) -> None:
+        """Release an unfinished spill file and print the buffered output."""
+        if self.writer is not None:
+            if self.checkpoint is not None:
+                self.writer.suspend()
+            else:
+                self.writer.abort()
+            self.writer = None
+        with _print_lock:
+            print("\n".join(self.lines))
+
+
+def _fetch_account(
+    username: str,
+    client_key: str,
+    creds: Any,
+    account_counts: Dict[str, int],
+    account_channels: Optional[Dict[str, List[ChannelRecord]]],
+    results_lock: threading.Lock,
+    account_idx: int,
+    total_accounts: int,
+    cache: Optional[ChannelCache],
+    snapshot_dir: Optional[str],
+    output_dir: Optional[str],
+    checkpoint: Optional[RunCheckpoint],
+    enricher: Optional[BatchEnricher],
+    output_format: str = 'csv',
+) -> None:
+    """
+    Fetch one account's subscriptions on a worker thread.
+
+    Args:
+        username (str): The account username/email.
+        client_key (str): The OAuth client the account is mapped to.
+        creds (Credentials): Valid OAuth 2.0 credentials for the account.
+        account_counts (Dict[str, int]): Shared dictionary of channel counts.
+        account_channels (Dict, optional): Shared dictionary mapping accounts
+            to their channel records, if records should be kept in memory.
+        results_lock (threading.Lock): Lock guarding the shared dictionaries.
+        account_idx (int): Current account index (for display).
+        total_accounts (int): Total number of accounts to process.
+        cache (ChannelCache, optional): Persistent channel metadata cache.
+        snapshot_dir (str, optional): Directory of per-account snapshots for
+            incremental sync.
+        output_dir (str, optional): If given, records are streamed into the
+            account's output in this directory as pages arrive.
+        checkpoint (RunCheckpoint, optional): Run checkpoint updated after
+            every page and account when streaming to output_dir.
+        enricher (BatchEnricher, optional): Shared batching enricher of the
+            account's OAuth client.
+        output_format (str): Output sink, one of sinks.SINK_FORMATS.
+    """
+    with account_scope(username):
+        run = AccountRun(
+            username, account_idx, total_accounts, output_dir, checkpoint, output_format
+        )
+
+        try:
+            subs: List[str] = []
+            new_account_channels: Dict[str, List[ChannelRecord]] = {}
+            if not run.finished:
+                with get_metrics().stage('fetch'):
+                    # Service objects are not thread-safe, so build one per worker task
+                    youtube = build_youtube_client(creds)
+                    subs, new_account_channels = fetch_subscriptions(
+                        youtube,
+                        username,
+                        cache,
+                        log=run.log,
+                        snapshot_dir=snapshot_dir,
+                        on_page=run.on_page,
+                        client_key=client_key,
+                        start_page_token=run.start_page_token,
+                        enricher=enricher
+                    )
+            count = run.complete(len(subs))
+
+            with results_lock:
+                account_counts[username] = count
+                if account_channels is not None:
+                    account_channels.update(new_account_channels)
+
+        except Exception as e:
+            run.log(f"❌ Failed to process account '{username}': {str(e)}")
+
+        finally:
+            run.close()
+
+
+def pending_accounts(
+    account_credentials: List[Tuple[str, str, Any]],
+    checkpoint: Optional[RunCheckpoint] = None,
+) -> Tuple[List[Tuple[str, str, Any]], Dict[str, int]]:
+    """
+    Split off the accounts a checkpoint already lists as completed.
+
+    Args:
+        account_credentials (List[Tuple[str, str, Credentials]]): Output of
+            resolve_credentials.
+        checkpoint (RunCheckpoint, optional): Checkpoint of the run.
+
+    Returns:
+        tuple: (pending, account_counts)
+            - pending: Entries of the accounts that still need fetching
+            - account_counts: Channel counts of the completed accounts
+    """
+    if checkpoint is None:
+        return account_credentials, {}
+    pending = [entry for entry in account_credentials if entry[0] not in checkpoint.completed]
+    return pending, dict(checkpoint.completed)
+
+
+def fetch_all_accounts(
+    account_credentials: List[Tuple[str, str, Any]],
+    account_channels: Optional[Dict[str, List[ChannelRecord]]] = None,
+    workers: int = 1,
+    cache: Optional[ChannelCache] = None,
+    snapshot_dir: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    checkpoint: Optional[RunCheckpoint] = None,
+    batch_enrichment: bool = False,
+    output_format: str = 'csv',
+) -> Dict[str, int]:
+    """
+    Fetch subscriptions for all authenticated accounts concurrently.
+
+    Args:
+        account_credentials (List[Tuple[str, str, Credentials]]): Output of
+            resolve_credentials.
+        account_channels (Dict, optional): Dictionary that receives each
+            account's channel records. Leave out when streaming to output_dir
+            so that memory stays flat.
+        workers (int): Maximum number of accounts fetched at the same time.
+        cache (ChannelCache, optional): Persistent channel metadata cache.
+        snapshot_dir (str, optional): Directory of per-account snapshots for
+            incremental sync.
+        output_dir (str, optional): If given, each account's output is
+            written here in streaming fashion.
+        checkpoint (RunCheckpoint, optional): Checkpoint of the run. Accounts
+            it lists as completed are skipped and partially fetched accounts
+            continue from their next page.
+        batch_enrichment (bool): Send channel category lookups as batch HTTP
+            requests shared by all accounts of the same OAuth client.
+        output_format (str): Output sink used with output_dir, one of
+            sinks.SINK_FORMATS.
+
+    Returns:
+        Dict[str, int]: Number of channels fetched per account, including
+            accounts completed before a resume.
+    """
+    results_lock = threading.Lock()
+    account_credentials, account_counts = pending_accounts(account_credentials, checkpoint)
+    total_accounts = len(account_credentials)
+    enrichers = (
+        start_batch_enrichers([entry[1] for entry in account_credentials], cache)
+        if batch_enrichment else {}
+    )
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [
+                executor.submit(
+                    _fetch_account,
+                    username,
+                    client_key,
+                    creds,
+                    account_counts,
+                    account_channels,
+                    results_lock,
+                    idx,
+                    total_accounts,
+                    cache,
+                    snapshot_dir,
+                    output_dir,
+                    checkpoint,
+                    enrichers.get(client_key),
+                    output_format,
+                )
+                for idx, (username, client_key, creds) in enumerate(account_credentials, 1)
+            ]
+            for future in as_completed(futures):
+                future.result()
+    finally:
+        for enricher in enrichers.values():
+            enricher.close()
+            print(f"Batched enrichment ({enricher.client_key}): {enricher.summary()}")
+
+    return account_counts
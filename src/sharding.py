@@ -0,0 +1,473 @@
+"""
+Sharding module for runs split across machines.
+
+YouTube Data API quotas belong to the Google Cloud project of each OAuth
+client, so accounts are partitioned by their client in
+account_to_client_mapping: all accounts of a client always land on the same
+shard, and no two machines ever spend the same project's quota. Clients are
+spread over the shards with a greedy bin-packing on their estimated quota
+cost (largest client first, onto the least loaded shard).
+
+Every shard writes into its own namespace, output/shards/shard_<i>_of_<N>/,
+together with a shard.json manifest. combine_shards() checks that the
+manifests belong to one plan, then publishes the account files, merges the
+SQLite databases and merges the run reports into the output folder, so the
+result matches a single-node run.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from auth import get_client_key
+from metrics import reset_metrics, write_run_files
+from quota import QuotaLedger, estimate_account_cost, get_client_budget, DEFAULT_DAILY_BUDGET
+from sinks import account_sink_file, create_sqlite_schema, SQLITE_FILENAME
+
+# Folder of the shard namespaces, inside the output folder
+SHARDS_DIRNAME = 'shards'
+
+# Manifest written into every shard's namespace
+MANIFEST_FILENAME = 'shard.json'
+
+# Run report written into every shard's namespace
+SHARD_REPORT_FILENAME = 'run_report.json'
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """
+    Parse a shard specification such as '2/4'.
+
+    Args:
+        spec (str): 'i/N' with 1 <= i <= N.
+
+    Returns:
+        Tuple[int, int]: (shard index, shard count), the index 1-based.
+
+    Raises:
+        ValueError: If the specification is malformed or out of range.
+    """
+    try:
+        index, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{spec}': expected i/N, e.g. 1/4")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard '{spec}': i must be between 1 and N")
+    return index, count
+
+
+def shard_name(index: int, count: int) -> str:
+    """
+    Get the namespace name of a shard.
+
+    Args:
+        index (int): 1-based shard index.
+        count (int): Number of shards.
+
+    Returns:
+        str: e.g. 'shard_2_of_4'.
+    """
+    return f"shard_{index}_of_{count}"
+
+
+def shard_output_dir(output_dir: str, index: int, count: int) -> str:
+    """
+    Get the directory a shard writes its output to.
+
+    Args:
+        output_dir (str): The output folder of a single-node run.
+        index (int): 1-based shard index.
+        count (int): Number of shards.
+
+    Returns:
+        str: output_dir/shards/shard_<i>_of_<N>.
+    """
+    return os.path.join(output_dir, SHARDS_DIRNAME, shard_name(index, count))
+
+
+def plan_shards(
+    accounts: List[Dict[str, str]],
+    credentials_config: Dict[str, Any],
+    ledger: Optional[QuotaLedger],
+    shard_count: int,
+    default_budget: int = DEFAULT_DAILY_BUDGET,
+) -> Dict[str, Any]:
+    """
+    Assign every OAuth client, with all of its accounts, to one shard.
+
+    A client's weight is the estimated quota cost of its accounts, capped at
+    its daily budget since accounts over the budget are deferred anyway.
+    Clients are placed heaviest first onto the shard with the least weight
+    so far; ties are broken by client key and shard index so that every
+    machine computes the same plan from the same inputs.
+
+    Ledgers differ between machines, since each only records the accounts
+    it ran. Without a ledger every account is weighted with the default
+    estimate, so the plan only depends on the accounts and the credentials
+    configuration and every machine can compute it on its own.
+
+    Args:
+        accounts (List[Dict]): Account dictionaries with 'username' key.
+        credentials_config (Dict[str, Any]): The credentials configuration.
+        ledger (QuotaLedger, optional): Ledger with last-run subscription
+            counts; only for plans that are shared as a file.
+        shard_count (int): Number of shards.
+        default_budget (int): Budget for clients without an explicit entry.
+
+    Returns:
+        Dict[str, Any]: Plan with keys:
+            - shards: the shard count
+            - plan_id: hash of the client assignment
+            - clients: client key -> 1-based shard index
+            - shard_units: estimated quota units per shard
+            - shard_accounts: number of accounts per shard
+    """
+    weights: Dict[str, int] = {}
+    account_counts: Dict[str, int] = {}
+    for account in accounts:
+        username = account.get('username', '').strip()
+        if not username:
+            continue
+        client_key = get_client_key(credentials_config, username)
+        subscription_count = ledger.subscription_counts.get(username) if ledger else None
+        weights[client_key] = weights.get(client_key, 0) + estimate_account_cost(subscription_count)
+        account_counts[client_key] = account_counts.get(client_key, 0) + 1
+
+    shard_units = [0] * shard_count
+    shard_accounts = [0] * shard_count
+    clients: Dict[str, int] = {}
+    for client_key in sorted(weights, key=lambda key: (-weights[key], key)):
+        weight = min(
+            weights[client_key],
+            get_client_budget(credentials_config, client_key, default_budget)
+        )
+        target = min(range(shard_count), key=lambda idx: (shard_units[idx], idx))
+        clients[client_key] = target + 1
+        shard_units[target] += weight
+        shard_accounts[target] += account_counts[client_key]
+
+    return {
+        'shards': shard_count,
+        'plan_id': _plan_id(shard_count, clients),
+        'clients': dict(sorted(clients.items())),
+        'shard_units': shard_units,
+        'shard_accounts': shard_accounts,
+    }
+
+
+def _plan_id(shard_count: int, clients: Dict[str, int]) -> str:
+    """Hash a client assignment so that shards of different plans can be told apart."""
+    payload = json.dumps([shard_count, sorted(clients.items())])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def save_shard_plan(plan: Dict[str, Any], path: str) -> None:
+    """
+    Write a shard plan to share it with every machine.
+
+    Args:
+        plan (Dict[str, Any]): A plan returned by plan_shards.
+        path (str): Plan JSON file path.
+    """
+    directory, filename = os.path.split(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_file = os.path.join(directory, f".{filename}.tmp")
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, indent=2)
+    os.replace(temp_file, path)
+
+
+def load_shard_plan(path: str) -> Dict[str, Any]:
+    """
+    Read a shard plan written by save_shard_plan.
+
+    Args:
+        path (str): Plan JSON file path.
+
+    Returns:
+        Dict[str, Any]: The plan.
+
+    Raises:
+        Exception: If the file is missing or not a shard plan.
+    """
+    if not os.path.exists(path):
+        raise Exception(f"Shard plan '{path}' not found")
+    with open(path, 'r', encoding='utf-8') as f:
+        plan = json.load(f)
+    if 'clients' not in plan or 'shards' not in plan:
+        raise Exception(f"'{path}' is not a shard plan")
+    plan['plan_id'] = _plan_id(plan['shards'], plan['clients'])
+    return plan
+
+
+def select_shard(
+    accounts: List[Dict[str, str]],
+    credentials_config: Dict[str, Any],
+    plan: Dict[str, Any],
+    index: int,
+) -> List[Dict[str, str]]:
+    """
+    Keep the accounts whose OAuth client is assigned to one shard.
+
+    Args:
+        accounts (List[Dict]): Account dictionaries with 'username' key.
+        credentials_config (Dict[str, Any]): The credentials configuration.
+        plan (Dict[str, Any]): The shard plan.
+        index (int): 1-based shard index.
+
+    Returns:
+        List[Dict[str, str]]: The shard's accounts, in input order.
+
+    Raises:
+        Exception: If an account's client is missing from the plan.
+    """
+    selected = []
+    for account in accounts:
+        username = account.get('username', '').strip()
+        if not username:
+            continue
+        client_key = get_client_key(credentials_config, username)
+        if client_key not in plan['clients']:
+            raise Exception(
+                f"OAuth client '{client_key}' of {username} is not in the shard plan; "
+                "create the plan again"
+            )
+        if plan['clients'][client_key] == index:
+            selected.append(account)
+    return selected
+
+
+def write_shard_manifest(
+    shard_dir: str,
+    plan: Dict[str, Any],
+    index: int,
+    usernames: List[str],
+    output_format: str,
+) -> None:
+    """
+    Record what a shard is responsible for in its namespace.
+
+    Args:
+        shard_dir (str): The shard's output directory.
+        plan (Dict[str, Any]): The shard plan.
+        index (int): 1-based shard index.
+        usernames (List[str]): The shard's accounts.
+        output_format (str): The shard's output format.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    manifest = {
+        'shard': index,
+        'shards': plan['shards'],
+        'plan_id': plan['plan_id'],
+        'clients': sorted(key for key, shard in plan['clients'].items() if shard == index),
+        'accounts': usernames,
+        'output_format': output_format,
+        'started_at': time.time(),
+    }
+    temp_file = os.path.join(shard_dir, f".{MANIFEST_FILENAME}.tmp")
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_file, os.path.join(shard_dir, MANIFEST_FILENAME))
+
+
+def load_shard_manifests(shards_root: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Find the shard namespaces of one plan and check that none is missing.
+
+    Args:
+        shards_root (str): Folder holding the shard_<i>_of_<N> directories.
+
+    Returns:
+        List[Tuple[str, Dict[str, Any]]]: (shard directory, manifest) pairs
+            ordered by shard index.
+
+    Raises:
+        Exception: If there are no shards, shards of several plans, a shard
+            found twice, missing shards, or an account that belongs to two
+            shards.
+    """
+    manifests = []
+    if os.path.isdir(shards_root):
+        for name in sorted(os.listdir(shards_root)):
+            path = os.path.join(shards_root, name, MANIFEST_FILENAME)
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    manifests.append((os.path.join(shards_root, name), json.load(f)))
+    if not manifests:
+        raise Exception(f"No shard outputs found in '{shards_root}'")
+
+    plan_ids = {manifest['plan_id'] for _, manifest in manifests}
+    if len(plan_ids) > 1:
+        raise Exception(
+            f"Shard outputs in '{shards_root}' come from {len(plan_ids)} different shard plans; "
+            "run every shard with the same --shard-plan file"
+        )
+    shard_count = manifests[0][1]['shards']
+    found: Dict[int, str] = {}
+    for shard_dir, manifest in manifests:
+        if manifest['shard'] in found:
+            raise Exception(
+                f"Shard {manifest['shard']}/{shard_count} was found twice, in "
+                f"'{found[manifest['shard']]}' and '{shard_dir}'; keep one of them"
+            )
+        found[manifest['shard']] = shard_dir
+    missing = sorted(set(range(1, shard_count + 1)) - {manifest['shard'] for _, manifest in manifests})
+    if missing:
+        raise Exception(
+            f"Missing output of shard(s) {', '.join(f'{idx}/{shard_count}' for idx in missing)}"
+        )
+
+    seen: Dict[str, int] = {}
+    for _, manifest in manifests:
+        for username in manifest['accounts']:
+            if username in seen:
+                raise Exception(
+                    f"Account {username} is in shards {seen[username]} and {manifest['shard']}"
+                )
+            seen[username] = manifest['shard']
+    return sorted(manifests, key=lambda item: item[1]['shard'])
+
+
+def _copy_atomic(source: str, destination: str) -> None:
+    """Copy a file so that readers of the destination never see it half-written."""
+    directory, filename = os.path.split(destination)
+    temp_file = os.path.join(directory, f".{filename}.tmp")
+    shutil.copy2(source, temp_file)
+    os.replace(temp_file, destination)
+
+
+def _merge_sqlite(shard_database: str, database: str) -> int:
+    """
+    Merge one shard's sqlite output into the combined database.
+
+    The shard's accounts are replaced as a whole: their rows are upserted,
+    keeping the earliest first_seen_at, and channels the shard no longer
+    has for them are deleted, just as a sync on a single node would.
+
+    Args:
+        shard_database (str): The shard's subscriptions.sqlite3.
+        database (str): The combined subscriptions.sqlite3.
+
+    Returns:
+        int: Rows in the shard database.
+    """
+    conn = sqlite3.connect(database, timeout=60)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("ATTACH DATABASE ? AS shard", (shard_database,))
+        with conn:
+            create_sqlite_schema(conn)
+            conn.execute(
+                """
+                DELETE FROM main.subscriptions
+                WHERE account IN (SELECT account FROM shard.account_syncs)
+                    AND NOT EXISTS (
+                        SELECT 1 FROM shard.subscriptions AS s
+                        WHERE s.account = subscriptions.account
+                            AND s.channel_id = subscriptions.channel_id
+                    )
+                """
+            )
+            conn.execute(
+                """
+                INSERT INTO main.subscriptions
+                SELECT * FROM shard.subscriptions WHERE true
+                ON CONFLICT(account, channel_id) DO UPDATE SET
+                    channel_name = excluded.channel_name,
+                    category = excluded.category,
+                    type = excluded.type,
+                    channel_link = excluded.channel_link,
+                    first_seen_at = MIN(first_seen_at, excluded.first_seen_at),
+                    synced_at = excluded.synced_at
+                """
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO main.account_syncs SELECT * FROM shard.account_syncs"
+            )
+        rows = conn.execute("SELECT COUNT(*) FROM shard.subscriptions").fetchone()[0]
+        conn.execute("DETACH DATABASE shard")
+        return rows
+    finally:
+        conn.close()
+
+
+def combine_shards(
+    output_dir: str,
+    report_path: Optional[str] = None,
+    prometheus_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Combine the outputs of every shard into the output folder.
+
+    Account files are copied next to where a single-node run would have
+    written them, SQLite outputs are merged into one database, and the
+    shards' run reports are merged into one report whose counters and
+    latency histograms cover every shard.
+
+    Args:
+        output_dir (str): The output folder holding shards/.
+        report_path (str, optional): Combined JSON run report path.
+        prometheus_path (str, optional): Combined Prometheus file path.
+
+    Returns:
+        Dict[str, Any]: 'shards', 'accounts', 'files', 'sqlite_rows',
+            'reports' and 'missing' (accounts without output).
+    """
+    manifests = load_shard_manifests(os.path.join(output_dir, SHARDS_DIRNAME))
+    stats: Dict[str, Any] = {
+        'shards': len(manifests), 'accounts': 0, 'files': 0, 'sqlite_rows': 0,
+        'reports': 0, 'missing': [],
+    }
+
+    for shard_dir, manifest in manifests:
+        output_format = manifest['output_format']
+        if output_format == 'sqlite':
+            shard_database = os.path.join(shard_dir, SQLITE_FILENAME)
+            if os.path.exists(shard_database):
+                stats['sqlite_rows'] += _merge_sqlite(
+                    shard_database, os.path.join(output_dir, SQLITE_FILENAME)
+                )
+                stats['accounts'] += len(manifest['accounts'])
+            else:
+                stats['missing'].extend(manifest['accounts'])
+            continue
+        for username in manifest['accounts']:
+            source = account_sink_file(output_format, username, shard_dir)
+            if os.path.exists(source):
+                _copy_atomic(source, account_sink_file(output_format, username, output_dir))
+                stats['files'] += 1
+                stats['accounts'] += 1
+            else:
+                stats['missing'].append(username)
+
+    # Merge the run reports as if every shard had recorded into one registry
+    registry = reset_metrics()
+    run_info: Dict[str, Any] = {'shards': len(manifests), 'exit_code': 0, 'accounts': 0, 'channels': 0}
+    started, finished = [], []
+    for shard_dir, manifest in manifests:
+        path = os.path.join(shard_dir, SHARD_REPORT_FILENAME)
+        if not os.path.exists(path):
+            run_info['exit_code'] = 1
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        registry.merge_snapshot(report.get('metrics', {}))
+        shard_run = report.get('run', {})
+        for key in ('command', 'engine', 'workers', 'output_format'):
+            if key in shard_run:
+                run_info.setdefault(key, shard_run[key])
+        run_info['exit_code'] = max(run_info['exit_code'], shard_run.get('exit_code', 1))
+        run_info['accounts'] += shard_run.get('accounts', 0)
+        run_info['channels'] += shard_run.get('channels', 0)
+        started.append(shard_run.get('started_at', registry.started_at))
+        finished.append(shard_run.get('finished_at', registry.started_at))
+        stats['reports'] += 1
+    if started:
+        registry.started_at = min(started)
+        registry.finished_at = max(finished)
+        write_run_files(run_info, report_path, prometheus_path)
+    return stats
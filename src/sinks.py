@@ -0,0 +1,521 @@
+"""
+Output sink module.
+
+An account's channels can be written in several formats, chosen with
+--format. Every sink has the interface of csv_handler.AccountCsvWriter
+(write_rows, row_count, spill_offset, finalize, suspend and abort), so the
+threaded runner, the asyncio engine and run checkpoints work with any of
+them:
+
+- csv: output/channels_<name>.csv
+- jsonl: output/channels_<name>.jsonl, one JSON object per channel
+- parquet: output/channels_<name>.parquet, written in column batches
+  (needs pyarrow)
+- sqlite: one indexed subscriptions table in output/subscriptions.sqlite3,
+  upserted page by page
+
+The file sinks share the CSV writer's spill file and external sort, so every
+file is sorted by channel name, published atomically and resumable. The
+SQLite sink writes each page in one transaction as it arrives; re-running an
+account only touches its changed rows and deletes the channels it no longer
+follows.
+
+Uploads found by the uploads crawler go through the same sinks, into
+output/uploads.<ext> or the uploads table of the SQLite database.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from typing import List, Any, Callable, Iterator, Optional
+
+from csv_handler import AccountCsvWriter, DEFAULT_SORT_BUFFER_ROWS, account_output_file
+from records import ChannelRecord, UploadRecord
+
+SINK_FORMATS = ['csv', 'jsonl', 'parquet', 'sqlite']
+
+# Keys of the JSON Lines objects and columns of the Parquet files, in
+# csv_handler.CSV_FIELDNAMES order
+FIELD_NAMES = ['channel_id', 'channel_name', 'category', 'type', 'channel_link', 'new_to_list']
+
+# Columns of the uploads file, and keys of its JSON Lines and Parquet form
+UPLOADS_CSV_FIELDNAMES = [
+    'Video ID', 'Title', 'Published At', 'Channel ID', 'Channel Name', 'Video Link'
+]
+UPLOAD_FIELD_NAMES = ['video_id', 'title', 'published_at', 'channel_id', 'channel_name', 'video_link']
+
+# File name of the uploads output, without extension
+UPLOADS_FILENAME = 'uploads'
+
+# Rows per Parquet row group
+PARQUET_BATCH_ROWS = 50_000
+
+# Database of the sqlite sink, inside the output directory
+SQLITE_FILENAME = 'subscriptions.sqlite3'
+
+
+def _import_pyarrow() -> Any:
+    """
+    Import pyarrow lazily.
+
+    Returns:
+        module: The pyarrow module.
+
+    Raises:
+        Exception: If pyarrow is not installed.
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+        return pyarrow
+    except ImportError as ie:
+        raise Exception(
+            "\n❌ The parquet output format requires pyarrow.\n\n"
+            "Install it with:\n\n"
+            "    pip install pyarrow\n\n"
+            f"Original ImportError: {ie}"
+        )
+
+
+def create_sqlite_schema(conn: sqlite3.Connection) -> None:
+    """
+    Create the tables of the sqlite sink if they do not exist yet.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the database.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS subscriptions (
+            account TEXT NOT NULL,
+            channel_id TEXT NOT NULL,
+            channel_name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            type TEXT NOT NULL,
+            channel_link TEXT NOT NULL,
+            first_seen_at REAL NOT NULL,
+            synced_at REAL NOT NULL,
+            PRIMARY KEY (account, channel_id)
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_subscriptions_channel_id ON subscriptions (channel_id)"
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS account_syncs (
+            account TEXT PRIMARY KEY,
+            started_at REAL NOT NULL,
+            finished_at REAL
+        )
+        """
+    )
+
+
+class JsonlAccountWriter(AccountCsvWriter):
+    """Streaming writer of an account's channels as JSON Lines."""
+
+    file_extension = '.jsonl'
+    field_names = FIELD_NAMES
+
+    def _write_sorted(self, rows: Iterator[List[str]], temp_output: str) -> None:
+        with open(temp_output, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(dict(zip(self.field_names, row)), ensure_ascii=False))
+                f.write('\n')
+
+
+class ParquetAccountWriter(AccountCsvWriter):
+    """Streaming writer of an account's channels as a Parquet file."""
+
+    file_extension = '.parquet'
+    field_names = FIELD_NAMES
+
+    def __init__(self, account_name: str, output_dir: str = 'output', **kwargs: Any) -> None:
+        # Fail before any page is fetched rather than at the end of the account
+        _import_pyarrow()
+        super().__init__(account_name, output_dir, **kwargs)
+
+    def _write_sorted(self, rows: Iterator[List[str]], temp_output: str) -> None:
+        pyarrow = _import_pyarrow()
+        schema = pyarrow.schema([(name, pyarrow.string()) for name in self.field_names])
+        with pyarrow.parquet.ParquetWriter(temp_output, schema) as writer:
+            batch: List[List[str]] = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= PARQUET_BATCH_ROWS:
+                    writer.write_table(self._table(pyarrow, schema, batch))
+                    batch = []
+            if batch:
+                writer.write_table(self._table(pyarrow, schema, batch))
+
+    @staticmethod
+    def _table(pyarrow: Any, schema: Any, batch: List[List[str]]) -> Any:
+        """Turn a batch of rows into a column-oriented table."""
+        columns = list(zip(*batch))
+        return pyarrow.table(
+            {name: list(column) for name, column in zip(schema.names, columns)}, schema=schema
+        )
+
+
+class SqliteAccountWriter:
+    """
+    Upserts an account's channels into a shared SQLite subscriptions table.
+
+    Every write_rows() call is one transaction. Rows are keyed by (account,
+    channel_id); a row that already exists keeps its first_seen_at and is
+    only updated when its name or category changed. finalize() deletes the
+    account's rows that were not seen in this sync. Each writer has its own
+    connection, so accounts fetched on different threads can write at the
+    same time (the database uses WAL mode).
+    """
+
+    def __init__(
+        self,
+        account_name: str,
+        output_dir: str = 'output',
+        max_rows_in_memory: int = DEFAULT_SORT_BUFFER_ROWS,
+        resume_rows: int = 0,
+        resume_offset: Optional[int] = None,
+    ) -> None:
+        """
+        Open the database and start (or continue) the account's sync.
+
+        Args:
+            account_name (str): The account name/email.
+            output_dir (str): Directory holding the database.
+            max_rows_in_memory (int): Unused; accepted for interface
+                compatibility with the file sinks.
+            resume_rows (int): Rows already written when resuming.
+            resume_offset (int, optional): Set when resuming from a
+                checkpoint; the sync then keeps its original start time so
+                that rows from before the interruption count as seen.
+        """
+        self.account_name = account_name
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_file = os.path.join(output_dir, SQLITE_FILENAME)
+        self.row_count = resume_rows
+        self._conn = sqlite3.connect(self.output_file, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            create_sqlite_schema(self._conn)
+
+            started_at = None
+            if resume_offset is not None:
+                row = self._conn.execute(
+                    "SELECT started_at FROM account_syncs WHERE account = ?", (account_name,)
+                ).fetchone()
+                started_at = row[0] if row else None
+            if started_at is None:
+                started_at = time.time()
+                self._conn.execute(
+                    "INSERT INTO account_syncs (account, started_at, finished_at) VALUES (?, ?, NULL) "
+                    "ON CONFLICT(account) DO UPDATE SET started_at = excluded.started_at, finished_at = NULL",
+                    (account_name, started_at)
+                )
+        self.started_at = started_at
+
+    def write_rows(self, channels: List[ChannelRecord]) -> None:
+        """
+        Upsert one page of channel records in a single transaction.
+
+        Args:
+            channels (List[ChannelRecord]): Channel records of one page.
+        """
+        with self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO subscriptions (
+                    account, channel_id, channel_name, category, type, channel_link,
+                    first_seen_at, synced_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(account, channel_id) DO UPDATE SET
+                    channel_name = excluded.channel_name,
+                    category = excluded.category,
+                    synced_at = excluded.synced_at
+                WHERE synced_at < excluded.synced_at
+                    OR channel_name != excluded.channel_name
+                    OR category != excluded.category
+                """,
+                [
+                    (
+                        self.account_name, channel.channel_id, channel.name, channel.category,
+                        channel.type, channel.link, self.started_at, self.started_at
+                    )
+                    for channel in channels
+                ]
+            )
+        self.row_count += len(channels)
+
+    @property
+    def spill_offset(self) -> int:
+        """
+        int: Always 0, recorded in checkpoints in place of a spill file size.
+
+        Every page is committed as it arrives, so there is no spill file to
+        truncate on resume. Pages written after the last checkpoint stay in
+        the table and are upserted again by the resumed sync, which leaves
+        the same rows. A non-None resume_offset only tells the resumed writer
+        to keep the sync's original started_at.
+        """
+        return 0
+
+    def finalize(self, log: Callable[[str], None] = print) -> Optional[str]:
+        """
+        Delete the account's channels that were not seen in this sync.
+
+        Args:
+            log (Callable[[str], None]): Function used to report progress.
+
+        Returns:
+            str: Path of the database.
+        """
+        try:
+            with self._conn:
+                removed = self._conn.execute(
+                    "DELETE FROM subscriptions WHERE account = ? AND synced_at < ?",
+                    (self.account_name, self.started_at)
+                ).rowcount
+                self._conn.execute(
+                    "UPDATE account_syncs SET finished_at = ? WHERE account = ?",
+                    (time.time(), self.account_name)
+                )
+        finally:
+            self._conn.close()
+        log(
+            f"  ✓ Upserted {self.row_count} channels into: {self.output_file}"
+            + (f" ({removed} unsubscribed channel(s) removed)" if removed else "")
+        )
+        return self.output_file
+
+    def suspend(self) -> None:
+        """Close the connection; written pages stay committed for a resumed run."""
+        self._conn.close()
+
+    def abort(self) -> None:
+        """Close the connection without removing anything."""
+        self._conn.close()
+
+
+SINKS = {
+    'csv': AccountCsvWriter,
+    'jsonl': JsonlAccountWriter,
+    'parquet': ParquetAccountWriter,
+    'sqlite': SqliteAccountWriter,
+}
+
+
+def account_sink_file(output_format: str, account_name: str, output_dir: str = 'output') -> str:
+    """
+    Get the file an account's output is published to.
+
+    Args:
+        output_format (str): One of SINK_FORMATS.
+        account_name (str): The account name/email.
+        output_dir (str): Directory the output is stored in.
+
+    Returns:
+        str: The account's channels_<name> file, or the shared database for
+            the sqlite format.
+    """
+    if output_format == 'sqlite':
+        return os.path.join(output_dir, SQLITE_FILENAME)
+    return (
+        os.path.splitext(account_output_file(account_name, output_dir))[0]
+        + SINKS[output_format].file_extension
+    )
+
+
+def open_account_sink(
+    output_format: str,
+    account_name: str,
+    output_dir: str = 'output',
+    **kwargs: Any,
+) -> Any:
+    """
+    Create the writer of one account for an output format.
+
+    Args:
+        output_format (str): One of SINK_FORMATS.
+        account_name (str): The account name/email.
+        output_dir (str): Directory to store output in.
+        **kwargs: resume_rows, resume_offset or max_rows_in_memory.
+
+    Returns:
+        AccountCsvWriter or SqliteAccountWriter: The account's sink.
+
+    Raises:
+        Exception: If the format is unknown.
+    """
+    if output_format not in SINKS:
+        raise Exception(
+            f"Unknown output format '{output_format}' (choose from {', '.join(SINK_FORMATS)})"
+        )
+    return SINKS[output_format](account_name, output_dir, **kwargs)
+
+
+def create_uploads_schema(conn: sqlite3.Connection) -> None:
+    """
+    Create the uploads table of the sqlite sink if it does not exist yet.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the database.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS uploads (
+            video_id TEXT PRIMARY KEY,
+            channel_id TEXT NOT NULL,
+            channel_name TEXT NOT NULL,
+            title TEXT NOT NULL,
+            published_at TEXT NOT NULL,
+            crawled_at REAL NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_uploads_channel_published "
+        "ON uploads (channel_id, published_at)"
+    )
+
+
+class _UploadColumns:
+    """Column layout shared by the file sinks of the uploads crawler."""
+
+    fieldnames = UPLOADS_CSV_FIELDNAMES
+    field_names = UPLOAD_FIELD_NAMES
+    row_label = 'uploads'
+
+    def _sort_key(self, record: UploadRecord) -> str:
+        # Uploads of a channel stay together, newest first as crawled
+        return record.channel_id
+
+    def _columns(self, record: UploadRecord) -> List[str]:
+        return record.to_row()
+
+
+class UploadsCsvWriter(_UploadColumns, AccountCsvWriter):
+    """Streaming writer of crawled uploads as output/uploads.csv."""
+
+
+class UploadsJsonlWriter(_UploadColumns, JsonlAccountWriter):
+    """Streaming writer of crawled uploads as output/uploads.jsonl."""
+
+
+class UploadsParquetWriter(_UploadColumns, ParquetAccountWriter):
+    """Streaming writer of crawled uploads as output/uploads.parquet."""
+
+
+class SqliteUploadsWriter:
+    """
+    Upserts crawled uploads into the uploads table of the SQLite output.
+
+    Every write_rows() call is one transaction keyed by video ID, so crawls
+    with overlapping cutoffs only update titles. Uploads from earlier crawls
+    are kept.
+    """
+
+    def __init__(self, account_name: str, output_dir: str = 'output', **kwargs: Any) -> None:
+        """
+        Open the database.
+
+        Args:
+            account_name (str): Label of the writer, used in log lines.
+            output_dir (str): Directory holding the database.
+            **kwargs: Accepted for interface compatibility with the file sinks.
+        """
+        self.account_name = account_name
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_file = os.path.join(output_dir, SQLITE_FILENAME)
+        self.row_count = 0
+        # Crawler workers share the writer and call it under their own lock
+        self._conn = sqlite3.connect(self.output_file, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            create_uploads_schema(self._conn)
+
+    def write_rows(self, uploads: List[UploadRecord]) -> None:
+        """
+        Upsert one page of uploads in a single transaction.
+
+        Args:
+            uploads (List[UploadRecord]): Uploads of one playlistItems page.
+        """
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO uploads (
+                    video_id, channel_id, channel_name, title, published_at, crawled_at
+                ) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(video_id) DO UPDATE SET
+                    channel_name = excluded.channel_name,
+                    title = excluded.title,
+                    crawled_at = excluded.crawled_at
+                """,
+                [
+                    (
+                        upload.video_id, upload.channel_id, upload.channel_name,
+                        upload.title, upload.published_at, now
+                    )
+                    for upload in uploads
+                ]
+            )
+        self.row_count += len(uploads)
+
+    def finalize(self, log: Callable[[str], None] = print) -> Optional[str]:
+        """
+        Close the database.
+
+        Args:
+            log (Callable[[str], None]): Function used to report progress.
+
+        Returns:
+            str: Path of the database.
+        """
+        self._conn.close()
+        log(f"  ✓ Upserted {self.row_count} uploads into: {self.output_file}")
+        return self.output_file
+
+    def abort(self) -> None:
+        """Close the connection; written pages stay committed."""
+        self._conn.close()
+
+
+UPLOAD_SINKS = {
+    'csv': UploadsCsvWriter,
+    'jsonl': UploadsJsonlWriter,
+    'parquet': UploadsParquetWriter,
+    'sqlite': SqliteUploadsWriter,
+}
+
+
+def open_uploads_sink(output_format: str, output_dir: str = 'output', **kwargs: Any) -> Any:
+    """
+    Create the writer of the uploads crawler for an output format.
+
+    Args:
+        output_format (str): One of SINK_FORMATS.
+        output_dir (str): Directory to store output in.
+        **kwargs: max_rows_in_memory.
+
+    Returns:
+        AccountCsvWriter or SqliteUploadsWriter: The uploads sink, publishing
+            to output/uploads.<ext> or the uploads table of the database.
+
+    Raises:
+        Exception: If the format is unknown.
+    """
+    if output_format not in UPLOAD_SINKS:
+        raise Exception(
+            f"Unknown output format '{output_format}' (choose from {', '.join(SINK_FORMATS)})"
+        )
+    if output_format == 'sqlite':
+        return SqliteUploadsWriter(UPLOADS_FILENAME, output_dir, **kwargs)
+    return UPLOAD_SINKS[output_format](
+        UPLOADS_FILENAME, output_dir, output_name=UPLOADS_FILENAME, **kwargs
+    )
@@ -0,0 +1,120 @@
+"""
+Subscription snapshot module for incremental sync.
+
+This module stores, per account, the ETag of every subscriptions page and
+the channel records built from it. On the next run each page is requested
+conditionally with If-None-Match, and pages the API reports as unchanged are
+taken from the snapshot instead of being downloaded and enriched again.
+"""
+
+import json
+import os
+import re
+from typing import List, Dict, Any, Optional
+
+from records import ChannelRecord
+
+# Bumped whenever the on-disk layout changes; older snapshots are ignored
+SNAPSHOT_VERSION = 2
+
+
+def snapshot_path(snapshot_dir: str, account_name: str) -> str:
+    """
+    Get the snapshot file path for an account.
+
+    Args:
+        snapshot_dir (str): Directory holding snapshot files.
+        account_name (str): The account name/email.
+
+    Returns:
+        str: Path to the account's snapshot JSON file.
+    """
+    safe_name = re.sub(r'[^A-Za-z0-9._-]', '_', account_name)
+    return os.path.join(snapshot_dir, f"snapshot_{safe_name}.json")
+
+
+class SubscriptionSnapshot:
+    """
+    Stored subscriptions pages of one account.
+
+    Each page entry holds the page token used to request it, the ETag the
+    API returned, the next page token and the ChannelRecords of that page.
+    """
+
+    def __init__(self, path: str, pages: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        Create a snapshot.
+
+        Args:
+            path (str): Path of the snapshot file.
+            pages (List[Dict], optional): Stored page entries.
+        """
+        self.path = path
+        self.pages: List[Dict[str, Any]] = pages or []
+
+    @classmethod
+    def load(cls, snapshot_dir: str, account_name: str) -> 'SubscriptionSnapshot':
+        """
+        Load an account's snapshot, or return an empty one.
+
+        Args:
+            snapshot_dir (str): Directory holding snapshot files.
+            account_name (str): The account name/email.
+
+        Returns:
+            SubscriptionSnapshot: The stored snapshot (empty if none exists
+                or the file cannot be read).
+        """
+        path = snapshot_path(snapshot_dir, account_name)
+        if not os.path.exists(path):
+            return cls(path)
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != SNAPSHOT_VERSION:
+                return cls(path)
+            pages = data.get('pages', [])
+            for page in pages:
+                page['channels'] = [ChannelRecord.from_row(row) for row in page['channels']]
+            return cls(path, pages)
+        except (OSError, json.JSONDecodeError, AttributeError, KeyError, IndexError):
+            return cls(path)
+
+    def stored_page(self, index: int, page_token: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Get the stored page at a position if it was requested with the same token.
+
+        Args:
+            index (int): Zero-based page position.
+            page_token (str, optional): Page token of the current request.
+
+        Returns:
+            Dict[str, Any], optional: The stored page entry, or None.
+        """
+        if index < len(self.pages):
+            page = self.pages[index]
+            if page.get('page_token') == page_token and page.get('etag'):
+                return page
+        return None
+
+    def save(self, pages: List[Dict[str, Any]]) -> None:
+        """
+        Replace the stored pages and write the snapshot atomically.
+
+        Args:
+            pages (List[Dict]): Page entries of the latest complete fetch.
+        """
+        self.pages = pages
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        serialized_pages = [
+            dict(page, channels=[channel.to_row() for channel in page['channels']])
+            for page in pages
+        ]
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': SNAPSHOT_VERSION, 'pages': serialized_pages}, f)
+        os.replace(temp_path, self.path)
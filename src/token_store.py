@@ -0,0 +1,331 @@
+"""
+OAuth token store module.
+
+This module keeps the OAuth credentials of every account in one SQLite
+database (secret/tokens.sqlite3) instead of one pickle file per account.
+The database runs in WAL mode so several processes can read it while one
+writes, all tokens are loaded with a single query, and a per-account
+refresh lease makes sure only one process refreshes a given token at a
+time. Legacy token_<account>.pickle files are imported automatically.
+"""
+
+import glob
+import json
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# File name of the token database inside the token directory
+TOKEN_STORE_FILE = 'tokens.sqlite3'
+
+# Time after which the refresh lease of a crashed process can be taken over
+DEFAULT_LEASE_SECONDS = 60
+
+# Interval between two attempts to take a lease held by another process
+LEASE_POLL_SECONDS = 0.2
+
+
+def _serialize(creds: Any) -> str:
+    """
+    Convert credentials to the JSON text stored in the database.
+
+    Args:
+        creds (Credentials): OAuth 2.0 credentials.
+
+    Returns:
+        str: The authorized-user JSON of the credentials.
+    """
+    return creds.to_json()
+
+
+def _deserialize(token_json: str) -> Any:
+    """
+    Rebuild credentials from their stored JSON text.
+
+    Args:
+        token_json (str): The authorized-user JSON of the credentials.
+
+    Returns:
+        Credentials: The OAuth 2.0 credentials.
+    """
+    from google.oauth2.credentials import Credentials
+
+    info = json.loads(token_json)
+    return Credentials.from_authorized_user_info(info, info.get('scopes'))
+
+
+class TokenStore:
+    """
+    SQLite-backed store of OAuth credentials with one row per account.
+
+    Credentials are stored as authorized-user JSON. Refreshes are guarded by
+    a lease row per account: the holder's ID and an expiry time, taken and
+    released in short IMMEDIATE transactions so that concurrent processes
+    see each other's leases. A lease left behind by a crashed process
+    expires after lease_seconds.
+
+    A single instance may be shared between worker threads; all database
+    access is serialized with an internal lock.
+    """
+
+    def __init__(self, db_path: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> None:
+        """
+        Open (or create) the token database.
+
+        Args:
+            db_path (str): Path to the SQLite database file.
+            lease_seconds (float): Seconds after which a refresh lease that
+                was never released can be taken over.
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self._owner_prefix = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Transactions are managed explicitly so leases can use BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(
+            db_path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tokens (
+                username TEXT PRIMARY KEY,
+                token_json TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS refresh_leases (
+                username TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+
+    def load_all(self, usernames: List[str]) -> Dict[str, Any]:
+        """
+        Load the stored credentials of many accounts at once.
+
+        Args:
+            usernames (List[str]): Accounts to load.
+
+        Returns:
+            Dict[str, Credentials]: Credentials of the accounts that have a
+                readable token. Missing accounts are left out; unreadable
+                tokens are reported and left out.
+        """
+        unique_names = list(dict.fromkeys(usernames))
+        rows = []
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(unique_names), 500):
+                chunk = unique_names[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows.extend(self._conn.execute(
+                    f"SELECT username, token_json FROM tokens WHERE username IN ({placeholders})",
+                    chunk
+                ).fetchall())
+
+        credentials: Dict[str, Any] = {}
+        for username, token_json in rows:
+            try:
+                credentials[username] = _deserialize(token_json)
+            except (ValueError, KeyError) as e:
+                print(f"⚠️  Ignoring unreadable token for {username}: {str(e)}")
+        return credentials
+
+    def load(self, username: str) -> Any:
+        """
+        Load one account's stored credentials.
+
+        Args:
+            username (str): The YouTube account username/email.
+
+        Returns:
+            Credentials: The stored credentials, or None.
+        """
+        return self.load_all([username]).get(username)
+
+    def save(self, username: str, creds: Any) -> None:
+        """
+        Store an account's credentials, replacing any previous token.
+
+        Args:
+            username (str): The YouTube account username/email.
+            creds (Credentials): The credentials to store.
+        """
+        token_json = _serialize(creds)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tokens (username, token_json, updated_at) VALUES (?, ?, ?)",
+                (username, token_json, time.time())
+            )
+
+    def delete(self, username: str) -> bool:
+        """
+        Remove an account's token so the next run asks for consent again.
+
+        Args:
+            username (str): The YouTube account username/email.
+
+        Returns:
+            bool: True if a token was removed.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM tokens WHERE username = ?", (username,)
+            ).rowcount > 0
+
+    def _try_acquire(self, username: str, owner: str) -> bool:
+        """
+        Take an account's refresh lease if nobody else holds it.
+
+        Args:
+            username (str): The YouTube account username/email.
+            owner (str): ID of the lease holder.
+
+        Returns:
+            bool: True if the lease was taken.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT owner, expires_at FROM refresh_leases WHERE username = ?",
+                    (username,)
+                ).fetchone()
+                if row is not None and row[0] != owner and row[1] > now:
+                    self._conn.execute("ROLLBACK")
+                    return False
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO refresh_leases (username, owner, expires_at) "
+                    "VALUES (?, ?, ?)",
+                    (username, owner, now + self.lease_seconds)
+                )
+                self._conn.execute("COMMIT")
+                return True
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _release(self, username: str, owner: str) -> None:
+        """
+        Give up an account's refresh lease.
+
+        Args:
+            username (str): The YouTube account username/email.
+            owner (str): ID of the lease holder.
+        """
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM refresh_leases WHERE username = ? AND owner = ?",
+                (username, owner)
+            )
+
+    @contextmanager
+    def refresh_lease(self, username: str, timeout: Optional[float] = None) -> Iterator[None]:
+        """
+        Hold an account's refresh lease for the duration of the block.
+
+        Waits while another thread or process holds the lease. Callers
+        should re-read the token inside the block, since the previous
+        holder has usually refreshed it already.
+
+        Args:
+            username (str): The YouTube account username/email.
+            timeout (float, optional): Maximum wait in seconds (defaults to
+                the lease time, after which an abandoned lease expires).
+
+        Raises:
+            Exception: If the lease could not be taken in time.
+        """
+        owner = f"{self._owner_prefix}:{threading.get_ident()}"
+        deadline = time.monotonic() + (self.lease_seconds if timeout is None else timeout)
+        while not self._try_acquire(username, owner):
+            if time.monotonic() >= deadline:
+                raise Exception(f"Timed out waiting for another process to refresh {username}'s token")
+            time.sleep(LEASE_POLL_SECONDS)
+        try:
+            yield
+        finally:
+            self._release(username, owner)
+
+    def migrate_pickles(self, token_dir: str) -> int:
+        """
+        Import legacy token_<account>.pickle files into the store.
+
+        Tokens already in the store win over their pickle file. Imported
+        files are renamed to token_<account>.pickle.migrated; unreadable
+        files are reported and left in place.
+
+        Args:
+            token_dir (str): Directory holding the pickle files.
+
+        Returns:
+            int: Number of tokens imported.
+        """
+        migrated = 0
+        for path in sorted(glob.glob(os.path.join(token_dir, 'token_*.pickle'))):
+            username = os.path.basename(path)[len('token_'):-len('.pickle')]
+            try:
+                modified_at = os.path.getmtime(path)
+                with open(path, 'rb') as token:
+                    creds = pickle.load(token)
+                token_json = _serialize(creds)
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+                print(f"⚠️  Could not migrate token file {path}: {str(e)}")
+                continue
+
+            with self._lock:
+                imported = self._conn.execute(
+                    "INSERT OR IGNORE INTO tokens (username, token_json, updated_at) VALUES (?, ?, ?)",
+                    (username, token_json, modified_at)
+                ).rowcount
+            try:
+                os.replace(path, path + '.migrated')
+            except FileNotFoundError:
+                # Another process migrated the same file at the same time
+                pass
+            migrated += imported
+        return migrated
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def forget_tokens(db_path: str, usernames: List[str]) -> None:
+    """
+    Remove saved tokens so the accounts go through browser consent again.
+
+    Args:
+        db_path (str): Path to the token database.
+        usernames (List[str]): Accounts whose tokens are removed.
+    """
+    store = TokenStore(db_path)
+    try:
+        # Otherwise a leftover pickle file would bring the token back
+        store.migrate_pickles(os.path.dirname(db_path))
+        for username in usernames:
+            if store.delete(username):
+                print(f"🗑  Removed saved token of {username}")
+            else:
+                print(f"⚠️  No saved token for {username}")
+    finally:
+        store.close()
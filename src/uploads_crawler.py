@@ -0,0 +1,444 @@
+"""
+Uploads crawler module.
+
+This module fetches the recent uploads of every channel in the merged
+subscription set of a list of accounts. Each unique channel is crawled once,
+no matter how many accounts follow it:
+
+1. The channel set is read from the accounts' existing output (channel
+   files or the SQLite database), so no subscriptions are fetched again.
+2. Uploads-playlist IDs are resolved with channels.list(part=contentDetails)
+   calls of CHANNELS_BATCH_SIZE channels each.
+3. A bounded pool of workers pages through each uploads playlist with
+   playlistItems.list, newest first, until the per-channel cutoff (publish
+   date and/or video count) is reached.
+
+Pages are streamed into an uploads sink (see sinks.open_uploads_sink) as
+they arrive. Channels are spread over one account per OAuth client, so the
+quota cost is shared between the clients' projects.
+"""
+
+import csv
+import os
+import queue
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from api_executor import execute_request
+from auth import build_youtube_client
+from csv_handler import account_output_file
+from metrics import get_metrics
+from quota import CHANNELS_LIST_COST, PLAYLIST_ITEMS_LIST_COST
+from records import UploadRecord
+from youtube_api import CHANNELS_BATCH_SIZE
+
+# Partial-response field masks of the crawler's requests
+CONTENT_DETAILS_FIELDS = 'items(id,contentDetails/relatedPlaylists/uploads)'
+PLAYLIST_ITEMS_FIELDS = (
+    'nextPageToken,items(snippet(title,resourceId/videoId),contentDetails/videoPublishedAt)'
+)
+
+# playlistItems.list returns at most 50 items per call
+PLAYLIST_PAGE_SIZE = 50
+
+# Default per-channel cutoff and concurrency
+DEFAULT_MAX_VIDEOS = 50
+DEFAULT_CRAWL_WORKERS = 8
+
+# Channels crawled between two progress lines
+PROGRESS_EVERY = 500
+
+# Marks the end of the channel queue
+_STOP = object()
+
+
+def load_channel_set(
+    usernames: List[str],
+    output_dir: str = 'output',
+    database: Optional[str] = None,
+    log: Callable[[str], None] = print,
+) -> Dict[str, str]:
+    """
+    Build the deduplicated set of channels the accounts subscribe to.
+
+    Args:
+        usernames (List[str]): Accounts whose subscriptions are combined.
+        output_dir (str): Directory with the accounts' channels_*.csv files.
+        database (str, optional): Read the subscriptions table of this
+            SQLite output instead of the CSV files.
+        log (Callable[[str], None]): Function used to report missing output.
+
+    Returns:
+        Dict[str, str]: Channel title per unique channel ID, sorted by ID.
+
+    Raises:
+        Exception: If the SQLite output does not exist.
+    """
+    channels: Dict[str, str] = {}
+
+    if database is not None:
+        if not os.path.exists(database):
+            raise Exception(f"SQLite output '{database}' not found")
+        conn = sqlite3.connect(database)
+        try:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(usernames), 500):
+                chunk = usernames[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                for channel_id, channel_name in conn.execute(
+                    f"SELECT channel_id, channel_name FROM subscriptions "
+                    f"WHERE account IN ({placeholders})",
+                    chunk
+                ):
+                    channels.setdefault(channel_id, channel_name)
+        finally:
+            conn.close()
+        return dict(sorted(channels.items()))
+
+    for username in usernames:
+        path = account_output_file(username, output_dir)
+        if not os.path.exists(path):
+            log(f"⚠️  No channel file for {username} ({path}); run the extractor first")
+            continue
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                if row:
+                    channels.setdefault(row[0], row[1])
+    return dict(sorted(channels.items()))
+
+
+def parse_since(value: str) -> datetime:
+    """
+    Parse the publish-date cutoff of the crawl.
+
+    Args:
+        value (str): A date (2026-01-31), an ISO 8601 time, or a number of
+            days back from now (30d).
+
+    Returns:
+        datetime: The cutoff as an aware UTC datetime.
+
+    Raises:
+        ValueError: If the value cannot be parsed.
+    """
+    days = re.fullmatch(r'(\d+)d', value.strip())
+    if days:
+        return datetime.now(timezone.utc) - timedelta(days=int(days.group(1)))
+    try:
+        cutoff = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid cutoff '{value}' (use YYYY-MM-DD, an ISO 8601 time or Nd)")
+    if cutoff.tzinfo is None:
+        cutoff = cutoff.replace(tzinfo=timezone.utc)
+    return cutoff.astimezone(timezone.utc)
+
+
+def _published_at(value: str) -> datetime:
+    """
+    Parse an RFC 3339 time returned by the API.
+
+    Args:
+        value (str): The time, e.g. '2026-03-14T15:09:26Z'.
+
+    Returns:
+        datetime: The time as an aware datetime.
+    """
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _is_not_found(error: Exception) -> bool:
+    """
+    Check whether an API error is a 404, e.g. a channel without uploads.
+
+    Args:
+        error (Exception): The exception raised by request.execute().
+
+    Returns:
+        bool: True if the server answered 404.
+    """
+    resp = getattr(error, 'resp', None)
+    return getattr(resp, 'status', None) == 404
+
+
+class UploadsCrawler:
+    """
+    Crawls the recent uploads of a set of channels into an uploads sink.
+
+    The calling thread resolves uploads playlists in batches and feeds a
+    bounded queue; workers take channels off the queue and page through
+    their playlists, so resolving and crawling overlap and memory stays
+    bounded however many channels are crawled. The sink is shared by all
+    workers and only written under a lock.
+    """
+
+    def __init__(
+        self,
+        account_credentials: List[Tuple[str, str, Any]],
+        sink: Any,
+        since: Optional[datetime] = None,
+        max_videos: Optional[int] = DEFAULT_MAX_VIDEOS,
+        workers: int = DEFAULT_CRAWL_WORKERS,
+        log: Callable[[str], None] = print,
+    ) -> None:
+        """
+        Prepare a crawl.
+
+        Args:
+            account_credentials (List[Tuple[str, str, Credentials]]): Output
+                of runner.resolve_credentials; the first account of every
+                OAuth client is used to call the API.
+            sink (AccountCsvWriter or SqliteUploadsWriter): Uploads sink.
+            since (datetime, optional): Skip uploads published before this.
+            max_videos (int, optional): Maximum uploads per channel; None or
+                0 for no limit.
+            workers (int): Channels crawled concurrently.
+            log (Callable[[str], None]): Function used to report progress.
+
+        Raises:
+            Exception: If no account is given.
+        """
+        self.callers: List[Tuple[str, str, Any]] = []
+        seen_clients = set()
+        for username, client_key, creds in account_credentials:
+            if client_key not in seen_clients:
+                seen_clients.add(client_key)
+                self.callers.append((username, client_key, creds))
+        if not self.callers:
+            raise Exception("No authenticated account to crawl uploads with")
+
+        self.sink = sink
+        self.since = since
+        self.max_videos = max_videos or None
+        self.workers = max(1, workers)
+        self._log = log
+        self.units: Dict[str, int] = {}
+        self.stats = {
+            'channels': 0, 'crawled': 0, 'without_uploads': 0, 'failed': 0, 'pages': 0, 'videos': 0,
+        }
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+
+    def log(self, message: str) -> None:
+        """Print a line without interleaving it with other workers' output."""
+        with self._lock:
+            self._log(message)
+
+    def crawl(self, channels: Dict[str, str]) -> Dict[str, int]:
+        """
+        Crawl the uploads of every channel.
+
+        Args:
+            channels (Dict[str, str]): Channel title per channel ID, e.g.
+                from load_channel_set().
+
+        Returns:
+            Dict[str, int]: Counts of channels (total, crawled, without
+                uploads, failed), playlist pages and uploads written.
+        """
+        self.stats['channels'] = len(channels)
+        jobs: 'queue.Queue[Any]' = queue.Queue(maxsize=max(CHANNELS_BATCH_SIZE, self.workers * 2))
+        threads = [
+            threading.Thread(target=self._worker, args=(jobs,), name=f'uploads-{idx}', daemon=True)
+            for idx in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            channel_ids = list(channels)
+            for batch_idx, start in enumerate(range(0, len(channel_ids), CHANNELS_BATCH_SIZE)):
+                batch = channel_ids[start:start + CHANNELS_BATCH_SIZE]
+                # Spread the batches, and so the crawl, over the OAuth clients
+                caller = self.callers[batch_idx % len(self.callers)]
+                for channel_id, playlist_id in self._resolve(batch, caller).items():
+                    jobs.put((channel_id, channels[channel_id], playlist_id, caller))
+        finally:
+            for _ in threads:
+                jobs.put(_STOP)
+            for thread in threads:
+                thread.join()
+        return dict(self.stats)
+
+    def _client(self, caller: Tuple[str, str, Any]) -> Any:
+        """Get the calling thread's YouTube client of an account."""
+        clients = getattr(self._local, 'clients', None)
+        if clients is None:
+            clients = self._local.clients = {}
+        if caller[0] not in clients:
+            # Service objects are not thread-safe, so every thread builds its own
+            clients[caller[0]] = build_youtube_client(caller[2])
+        return clients[caller[0]]
+
+    def _count(self, client_key: str, units: int, **stats: int) -> int:
+        """
+        Add to the quota units of a client and to the crawl statistics.
+
+        Returns:
+            int: Channels finished so far, for progress lines.
+        """
+        with self._lock:
+            self.units[client_key] = self.units.get(client_key, 0) + units
+            for name, value in stats.items():
+                self.stats[name] += value
+            return self.stats['crawled'] + self.stats['without_uploads'] + self.stats['failed']
+
+    def _resolve(self, channel_ids: List[str], caller: Tuple[str, str, Any]) -> Dict[str, str]:
+        """
+        Look up the uploads playlists of up to CHANNELS_BATCH_SIZE channels.
+
+        Args:
+            channel_ids (List[str]): Channel IDs to resolve.
+            caller (Tuple[str, str, Credentials]): Account making the call.
+
+        Returns:
+            Dict[str, str]: Uploads playlist ID per channel ID, in input
+                order. Channels that were not found or whose lookup failed
+                are counted and left out.
+        """
+        client_key = caller[1]
+        try:
+            request = self._client(caller).channels().list(
+                part='contentDetails',
+                id=','.join(channel_ids),
+                maxResults=CHANNELS_BATCH_SIZE,
+                fields=CONTENT_DETAILS_FIELDS
+            )
+            response = execute_request(request, client_key, log=self.log)
+        except Exception as e:
+            self.log(f"Warning: Error resolving uploads playlists of {len(channel_ids)} channel(s): {str(e)}")
+            self._count(client_key, CHANNELS_LIST_COST, failed=len(channel_ids))
+            get_metrics().inc('uploads_channels_total', len(channel_ids), result='failed')
+            return {}
+
+        playlists = {
+            item['id']: item['contentDetails']['relatedPlaylists']['uploads']
+            for item in response.get('items', [])
+            if item.get('contentDetails', {}).get('relatedPlaylists', {}).get('uploads')
+        }
+        missing = len(channel_ids) - sum(1 for channel_id in channel_ids if channel_id in playlists)
+        self._count(client_key, CHANNELS_LIST_COST, without_uploads=missing)
+        get_metrics().inc('uploads_channels_total', missing, result='without_uploads')
+        return {channel_id: playlists[channel_id] for channel_id in channel_ids if channel_id in playlists}
+
+    def _worker(self, jobs: 'queue.Queue[Any]') -> None:
+        """Crawl channels from the queue until the end marker."""
+        while True:
+            job = jobs.get()
+            if job is _STOP:
+                return
+            channel_id, channel_name, playlist_id, caller = job
+            try:
+                videos = self._crawl_channel(channel_id, channel_name, playlist_id, caller)
+            except Exception as e:
+                self.log(f"Warning: Error crawling uploads of {channel_id}: {str(e)}")
+                self._count(caller[1], 0, failed=1)
+                get_metrics().inc('uploads_channels_total', result='failed')
+                continue
+
+            result = 'crawled' if videos else 'without_uploads'
+            done = self._count(caller[1], 0, **{result: 1})
+            get_metrics().inc('uploads_channels_total', result=result)
+            if done % PROGRESS_EVERY == 0:
+                self.log(f"  … {done}/{self.stats['channels']} channel(s) done")
+
+    def _crawl_channel(
+        self,
+        channel_id: str,
+        channel_name: str,
+        playlist_id: str,
+        caller: Tuple[str, str, Any],
+    ) -> int:
+        """
+        Page through one uploads playlist until the cutoff.
+
+        Uploads playlists list the newest video first, so paging stops at
+        the first page that reaches an upload older than the date cutoff.
+        Private and deleted videos, which have no publish time, are skipped.
+
+        Args:
+            channel_id (str): The channel ID.
+            channel_name (str): The channel title.
+            playlist_id (str): The channel's uploads playlist ID.
+            caller (Tuple[str, str, Credentials]): Account making the calls.
+
+        Returns:
+            int: Number of uploads written.
+        """
+        youtube = self._client(caller)
+        client_key = caller[1]
+        written = 0
+        page_token = None
+
+        while True:
+            page_size = PLAYLIST_PAGE_SIZE
+            if self.max_videos is not None:
+                page_size = min(page_size, self.max_videos - written)
+            request = youtube.playlistItems().list(
+                part='snippet,contentDetails',
+                playlistId=playlist_id,
+                maxResults=page_size,
+                pageToken=page_token,
+                fields=PLAYLIST_ITEMS_FIELDS
+            )
+            try:
+                response = execute_request(request, client_key, log=self.log)
+            except Exception as e:
+                self._count(client_key, PLAYLIST_ITEMS_LIST_COST)
+                if _is_not_found(e) and page_token is None:
+                    # Channels that never uploaded have no uploads playlist
+                    return 0
+                raise
+            self._count(client_key, PLAYLIST_ITEMS_LIST_COST, pages=1)
+
+            uploads: List[UploadRecord] = []
+            reached_cutoff = False
+            for item in response.get('items', []):
+                published_at = item.get('contentDetails', {}).get('videoPublishedAt')
+                if not published_at:
+                    continue
+                if self.since is not None and _published_at(published_at) < self.since:
+                    reached_cutoff = True
+                    continue
+                uploads.append(UploadRecord(
+                    item['snippet']['resourceId']['videoId'],
+                    item['snippet'].get('title', ''),
+                    published_at,
+                    channel_id,
+                    channel_name
+                ))
+
+            if uploads:
+                with self._write_lock:
+                    self.sink.write_rows(uploads)
+                written += len(uploads)
+                self._count(client_key, 0, videos=len(uploads))
+                get_metrics().inc('uploads_videos_total', len(uploads))
+
+            page_token = response.get('nextPageToken')
+            if (
+                reached_cutoff
+                or not page_token
+                or (self.max_videos is not None and written >= self.max_videos)
+            ):
+                return written
+
+    def summary(self) -> str:
+        """
+        Describe the crawl.
+
+        Returns:
+            str: Human-readable crawl statistics.
+        """
+        stats = self.stats
+        return (
+            f"{stats['videos']} upload(s) from {stats['crawled']} channel(s) in "
+            f"{stats['pages']} playlist page(s); {stats['without_uploads']} channel(s) without "
+            f"uploads in range, {stats['failed']} failed; "
+            f"{sum(self.units.values())} quota unit(s)"
+        )
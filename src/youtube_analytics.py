@@ -0,0 +1,118 @@
+"""
+YouTube Subscription Analytics - Main Entry Point
+
+Analyses how the subscriptions of several accounts overlap, using the
+results of a previous extractor or merger run.
+
+Modules:
+    - analytics: Builds the channel/account bitset index and writes the
+      overlap reports
+    - merge_engine: Finds the per-account CSV files in the output folder
+"""
+
+import argparse
+import os
+import time
+from typing import List, Optional
+
+from analytics import (
+    load_index, write_overlap_reports, DEFAULT_TOP_CHANNELS, DEFAULT_NEAR_DUPLICATE_JACCARD
+)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse command-line arguments.
+
+    Args:
+        argv (List[str], optional): Arguments to parse (defaults to sys.argv).
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Analyse how the YouTube subscriptions of several accounts overlap."
+    )
+    parser.add_argument(
+        '--sqlite',
+        metavar='FILE',
+        help="Read a subscriptions.sqlite3 written with --format sqlite instead "
+             "of the output/channels_*.csv files"
+    )
+    parser.add_argument(
+        '--top',
+        type=int,
+        default=DEFAULT_TOP_CHANNELS,
+        help=f"Number of most shared channels to list (default: {DEFAULT_TOP_CHANNELS})"
+    )
+    parser.add_argument(
+        '--min-accounts',
+        type=int,
+        metavar='N',
+        help="Also list every channel followed by at least N accounts"
+    )
+    parser.add_argument(
+        '--near-duplicate',
+        type=float,
+        default=DEFAULT_NEAR_DUPLICATE_JACCARD,
+        metavar='JACCARD',
+        help="Jaccard similarity from which two accounts are reported as near-"
+             f"duplicates (default: {DEFAULT_NEAR_DUPLICATE_JACCARD})"
+    )
+    return parser.parse_args(argv)
+
+
+def main() -> int:
+    """
+    Main execution function.
+
+    Builds the overlap index from the output folder (or the SQLite output)
+    and writes the CSV reports to output/analytics.
+
+    Returns:
+        int: 0 for success, 1 for failure.
+    """
+    print("YouTube Subscription Analytics")
+    print("=" * 60)
+
+    args = parse_args()
+
+    try:
+        # Get the root directory (parent of src)
+        root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output_dir = os.path.join(root_dir, 'output')
+        dest_dir = os.path.join(output_dir, 'analytics')
+
+        start = time.perf_counter()
+        index = load_index(output_dir, database=args.sqlite)
+        print(
+            f"✓ Indexed {len(index.channel_ids)} unique channels from "
+            f"{len(index.accounts)} account(s) in {time.perf_counter() - start:.2f}s\n"
+        )
+
+        start = time.perf_counter()
+        written = write_overlap_reports(
+            index,
+            dest_dir,
+            top_channels=args.top,
+            min_accounts=args.min_accounts,
+            near_duplicate_jaccard=args.near_duplicate
+        )
+        print(f"Computed overlap reports in {time.perf_counter() - start:.2f}s")
+        for name, rows in written.items():
+            print(f"  ✓ {name}: {rows} row(s)")
+
+        print("\n" + "=" * 60)
+        print("✅ Process completed successfully!")
+        print(f"\nAnalytics files are in: {dest_dir}")
+        return 0
+
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        print("\n" + "=" * 60)
+        print("❌ Process failed!")
+        return 1
+
+
+if __name__ == '__main__':
+    exit(main())
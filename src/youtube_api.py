@@ -5,7 +5,131 @@ This module handles interactions with the YouTube Data API v3 to read
 subscriptions from YouTube accounts.
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
+
+from api_executor import execute_request, DEFAULT_CLIENT_KEY
+from channel_cache import ChannelCache
+from metrics import get_metrics
+from records import ChannelRecord
+from snapshots import SubscriptionSnapshot
+
+
+# channels.list accepts at most 50 comma-separated IDs per request
+CHANNELS_BATCH_SIZE = 50
+
+# Partial-response field masks: responses only carry what the code reads
+# (page_records, page_channel_ids, _parse_channel_category and the channel
+# cache) instead of full snippets with descriptions, thumbnails and
+# localized text
+SUBSCRIPTIONS_FIELDS = 'etag,nextPageToken,items(snippet(title,resourceId/channelId))'
+CHANNELS_FIELDS = 'items(id,snippet/title,topicDetails/topicCategories)'
+
+
+def _parse_channel_category(item: Dict[str, Any]) -> str:
+    """
+    Build the category string from a channels.list resource item.
+    
+    Args:
+        item (Dict[str, Any]): A channel resource with 'topicDetails' part.
+    
+    Returns:
+        str: Comma-separated list of up to three categories, or 'General'.
+    """
+    topic_details = item.get('topicDetails', {})
+    if 'topicCategories' in topic_details:
+        categories = [
+            cat.split('/')[-1].replace('_', ' ')
+            for cat in topic_details.get('topicCategories', [])
+        ]
+        return ', '.join(categories[:3]) if categories else 'General'
+    return 'General'
+
+
+def cached_categories(
+    channel_ids: List[str],
+    cache: Optional[ChannelCache] = None,
+) -> tuple[Dict[str, str], List[str]]:
+    """
+    Resolve channel categories from the cache where possible.
+    
+    Args:
+        channel_ids (List[str]): The YouTube channel IDs to look up.
+        cache (ChannelCache, optional): Persistent channel metadata cache.
+    
+    Returns:
+        tuple: (categories, missing_ids)
+            - categories: Mapping of every unique channel ID to its cached
+              category string, or 'Unknown' if it is not cached
+            - missing_ids: Unique IDs that still need a channels.list lookup
+    """
+    unique_ids = list(dict.fromkeys(channel_ids))
+    categories = {channel_id: 'Unknown' for channel_id in unique_ids}
+    
+    if cache is not None:
+        cached = cache.get_many(unique_ids)
+        for channel_id, entry in cached.items():
+            topic_categories = entry['topic_categories']
+            topic_details = {} if topic_categories is None else {'topicCategories': topic_categories}
+            categories[channel_id] = _parse_channel_category({'topicDetails': topic_details})
+        unique_ids = [channel_id for channel_id in unique_ids if channel_id not in cached]
+    
+    return categories, unique_ids
+
+
+def apply_channel_items(
+    response: Dict[str, Any],
+    categories: Dict[str, str],
+    cache: Optional[ChannelCache] = None,
+) -> None:
+    """
+    Record the categories of a channels.list response.
+    
+    Args:
+        response (Dict[str, Any]): A channels.list response.
+        categories (Dict[str, str]): Category mapping to update in place;
+            only IDs already present in it are taken from the response.
+        cache (ChannelCache, optional): Cache that stores the returned items.
+    """
+    items = [item for item in response.get('items', []) if item.get('id') in categories]
+    for item in items:
+        categories[item['id']] = _parse_channel_category(item)
+    
+    if cache is not None:
+        cache.put_many(items)
+
+
+def page_channel_ids(items: List[Dict[str, Any]]) -> List[str]:
+    """
+    Get the subscribed channel IDs of a subscriptions page.
+    
+    Args:
+        items (List[Dict]): Items of a subscriptions.list response.
+    
+    Returns:
+        List[str]: Channel IDs in page order.
+    """
+    return [item['snippet']['resourceId']['channelId'] for item in items]
+
+
+def page_records(items: List[Dict[str, Any]], categories: Dict[str, str]) -> List[ChannelRecord]:
+    """
+    Build the channel records of a subscriptions page.
+    
+    Args:
+        items (List[Dict]): Items of a subscriptions.list response.
+        categories (Dict[str, str]): Category string per channel ID.
+    
+    Returns:
+        List[ChannelRecord]: One record per item, in page order.
+    """
+    return [
+        ChannelRecord(
+            item['snippet']['resourceId']['channelId'],
+            item['snippet']['title'],
+            categories[item['snippet']['resourceId']['channelId']]
+        )
+        for item in items
+    ]
 
 
 def get_channel_category(channel_id: str, youtube: Any) -> str:
@@ -19,109 +143,271 @@ def get_channel_category(channel_id: str, youtube: Any) -> str:
     Returns:
         str: Comma-separated list of categories, or 'General'/'Unknown' if not available.
     """
+    return get_channel_categories([channel_id], youtube)[channel_id]
+
+
+def get_channel_categories(
+    channel_ids: List[str],
+    youtube: Any,
+    cache: Optional[ChannelCache] = None,
+    log: Callable[[str], None] = print,
+    client_key: str = DEFAULT_CLIENT_KEY,
+    enricher: Optional[Any] = None,
+) -> Dict[str, str]:
+    """
+    Fetch categories for many channels using batched channel details requests.
+    
+    IDs are resolved in chunks of CHANNELS_BATCH_SIZE per channels.list call,
+    so a page of 50 subscriptions costs one request instead of fifty. When a
+    cache is given, fresh cached entries are used and only misses hit the API.
+    
+    Args:
+        channel_ids (List[str]): The YouTube channel IDs to look up.
+        youtube (Resource): Authenticated YouTube API service object.
+        cache (ChannelCache, optional): Persistent channel metadata cache.
+        log (Callable[[str], None]): Function used to report progress and warnings.
+        client_key (str): OAuth client the requests are billed to.
+        enricher (BatchEnricher, optional): Shared enricher of the OAuth
+            client. When given, lookups are sent as batch HTTP requests
+            together with those of other accounts.
+    
+    Returns:
+        Dict[str, str]: Mapping of channel ID to its category string. IDs that
+            are missing from the response or whose request failed map to 'Unknown'.
+    """
+    if enricher is not None:
+        return enricher.lookup(channel_ids, youtube, log)
+    
+    categories, unique_ids = cached_categories(channel_ids, cache)
+    
+    for start in range(0, len(unique_ids), CHANNELS_BATCH_SIZE):
+        batch = unique_ids[start:start + CHANNELS_BATCH_SIZE]
+        try:
+            request = youtube.channels().list(
+                part='topicDetails,snippet',
+                id=','.join(batch),
+                maxResults=CHANNELS_BATCH_SIZE,
+                fields=CHANNELS_FIELDS
+            )
+            response = execute_request(request, client_key, log=log)
+            apply_channel_items(response, categories, cache)
+        except Exception as e:
+            log(f"Warning: Error fetching categories for {len(batch)} channel(s): {str(e)}")
+    
+    return categories
+
+
+def _is_not_modified(error: Exception) -> bool:
+    """
+    Check whether an API error is a 304 Not Modified response.
+    
+    Args:
+        error (Exception): The exception raised by request.execute().
+    
+    Returns:
+        bool: True if the server answered 304 to a conditional request.
+    """
+    resp = getattr(error, 'resp', None)
+    return getattr(resp, 'status', None) == 304
+
+
+def fetch_subscriptions_page(
+    youtube: Any,
+    page_token: Optional[str],
+    stored_page: Optional[Dict[str, Any]],
+    client_key: str = DEFAULT_CLIENT_KEY,
+    log: Callable[[str], None] = print,
+) -> Optional[Dict[str, Any]]:
+    """
+    Fetch one subscriptions page, conditionally if a stored ETag is known.
+    
+    Args:
+        youtube (Resource): Authenticated YouTube API service object.
+        page_token (str, optional): Token of the page to fetch.
+        stored_page (Dict, optional): Snapshot entry for this page.
+        client_key (str): OAuth client the request is billed to.
+        log (Callable[[str], None]): Function used to report retries.
+    
+    Returns:
+        Dict[str, Any], optional: The API response, or None if the page is
+            unchanged since the snapshot (304 or identical ETag).
+    """
+    request = youtube.subscriptions().list(
+        part='snippet',
+        mine=True,
+        maxResults=50,
+        pageToken=page_token,
+        fields=SUBSCRIPTIONS_FIELDS
+    )
+    if stored_page is not None:
+        request.headers['If-None-Match'] = stored_page['etag']
+    
     try:
-        request = youtube.channels().list(
-            part='topicDetails,snippet',
-            id=channel_id
-        )
-        response = request.execute()
-        
-        if response['items']:
-            item = response['items'][0]
-            # Get topic categories if available
-            if 'topicDetails' in item and 'topicDetails' in item.get('topicDetails', {}):
-                categories = [
-                    cat.split('/')[-1].replace('_', ' ')
-                    for cat in item['topicDetails'].get('topicCategories', [])
-                ]
-                return ', '.join(categories[:3]) if categories else 'General'
-            return 'General'
-        return 'Unknown'
+        response = execute_request(request, client_key, log=log)
     except Exception as e:
-        print(f"Warning: Error fetching category for {channel_id}: {str(e)}")
-        return 'Unknown'
+        if stored_page is not None and _is_not_modified(e):
+            return None
+        raise
+    
+    if stored_page is not None and response.get('etag') == stored_page['etag']:
+        return None
+    return response
+
+
+def log_fetch_error(
+    account_name: str,
+    error: Exception,
+    log: Callable[[str], None] = print,
+) -> None:
+    """
+    Report a failed subscriptions fetch with hints for common causes.
+    
+    Args:
+        account_name (str): The account name/email.
+        error (Exception): The error the fetch failed with.
+        log (Callable[[str], None]): Function used to report the error.
+    """
+    error_msg = str(error)
+    log(f"\n⚠️  Error fetching subscriptions for {account_name}:")
+    log(f"   Error details: {error_msg}")
+    
+    # Check for common permission issues
+    if "forbidden" in error_msg.lower() or "403" in error_msg:
+        log(f"\n   💡 SOLUTION: Permission denied")
+        log(f"   🔧 Try these steps:")
+        log(f"   1. Run python src/youtube_extractor.py --reauth {account_name} to drop the saved token")
+        log(f"   2. Make sure '{account_name}' is added as a Test User:")
+        log(f"      - Go to Google Cloud Console → OAuth consent screen")
+        log(f"      - Add Test Users section → Add Users → {account_name}")
+        log(f"   3. Ensure YouTube Data API v3 is enabled")
+        log(f"   4. The next run re-authenticates the account with proper permissions\n")
+    elif "invalid_grant" in error_msg.lower():
+        log(f"\n   💡 SOLUTION: Invalid credentials - Token may have expired")
+        log(f"   🔧 Run python src/youtube_extractor.py --reauth {account_name}\n")
+    elif "notfound" in error_msg.lower() or "404" in error_msg:
+        log(f"\n   💡 NOTE: No subscriptions found (or subscriptions list is empty)\n")
 
 
 def fetch_subscriptions(
     youtube: Any,
     account_name: str,
-) -> tuple[List[str], Dict[str, List[Dict[str, Any]]]]:  
+    cache: Optional[ChannelCache] = None,
+    log: Callable[[str], None] = print,
+    snapshot_dir: Optional[str] = None,
+    on_page: Optional[Callable[[List[ChannelRecord], Optional[str]], None]] = None,
+    client_key: str = DEFAULT_CLIENT_KEY,
+    start_page_token: Optional[str] = None,
+    enricher: Optional[Any] = None,
+) -> tuple[List[str], Dict[str, List[ChannelRecord]]]:  
     """
     Fetch all subscriptions from a YouTube account.
     
     Args:
         youtube (Resource): Authenticated YouTube API service object.
         account_name (str): The account name/email for tracking.
+        cache (ChannelCache, optional): Persistent channel metadata cache used
+            in front of the channel category lookups.
+        log (Callable[[str], None]): Function used to report progress and
+            errors. Parallel runs pass a buffering logger so that output from
+            different accounts does not interleave.
+        snapshot_dir (str, optional): Directory of per-account snapshots. When
+            given, pages are requested with If-None-Match and unchanged pages
+            are reused from the snapshot without re-enrichment.
+        on_page (Callable, optional): Called with the channel records of each
+            page and the next page token (None after the last page) as soon as
+            the page is available. When given, records are streamed to it
+            instead of being collected in the returned account_channels.
+        client_key (str): OAuth client the account's requests are billed to;
+            selects the circuit breaker used for retries.
+        start_page_token (str, optional): Page token to start from when
+            resuming an interrupted fetch. Snapshots are not used or updated
+            for a resumed fetch because the earlier pages are not in memory.
+        enricher (BatchEnricher, optional): Shared batching enricher of the
+            account's OAuth client, used for the channel category lookups.
     
     Returns:
         tuple: (subscriptions list, account_channels dict)
             - subscriptions: List of channel titles
-            - account_channels: Dict mapping account to their channels
+            - account_channels: Dict mapping account to their ChannelRecords
     
     Raises:
         Exception: If API call fails with permission or other errors.
     """
     subscriptions = []
     account_channels_list = []
-    next_page_token = None
+    next_page_token = start_page_token
+    snapshot = (
+        SubscriptionSnapshot.load(snapshot_dir, account_name)
+        if snapshot_dir and start_page_token is None else None
+    )
+    fetched_pages: List[Dict[str, Any]] = []
+    page_count = 0
+    reused_pages = 0
     
-    print(f"Fetching subscriptions for account: {account_name}")
+    log(f"Fetching subscriptions for account: {account_name}")
     
     try:
         while True:
-            request = youtube.subscriptions().list(
-                part='snippet',
-                mine=True,
-                maxResults=50,
-                pageToken=next_page_token
+            page_token = next_page_token
+            stored_page = (
+                snapshot.stored_page(page_count, page_token) if snapshot else None
+            )
+            page_count += 1
+            response = fetch_subscriptions_page(
+                youtube, page_token, stored_page, client_key, log
             )
-            response = request.execute()
             
-            for item in response.get('items', []):
-                channel_id = item['snippet']['resourceId']['channelId']
-                channel_title = item['snippet']['title']
-                
-                # Get channel category
-                category = get_channel_category(channel_id, youtube)
-                
-                # Add to account's subscription list
-                account_channels_list.append({
-                    'channel_id': channel_id,
-                    'name': channel_title,
-                    'category': category,
-                    'type': 'Channel',
-                    'link': f'https://www.youtube.com/channel/{channel_id}',
-                    'is_new_to_merged_list': 'Yes'
-                })
-                
-                subscriptions.append(channel_title)
+            if response is None:
+                # Page unchanged since the last run: reuse the stored records
+                reused_pages += 1
+                get_metrics().record_page('snapshot')
+                fetched_pages.append(stored_page)
+                if on_page is not None:
+                    on_page(stored_page['channels'], stored_page.get('next_page_token'))
+                else:
+                    account_channels_list.extend(stored_page['channels'])
+                subscriptions.extend(channel.name for channel in stored_page['channels'])
+                next_page_token = stored_page.get('next_page_token')
+                if not next_page_token:
+                    break
+                continue
+            
+            items = response.get('items', [])
+            get_metrics().record_page('api')
+            
+            # Resolve categories for the whole page in batched requests
+            categories = get_channel_categories(
+                page_channel_ids(items),
+                youtube,
+                cache,
+                log,
+                client_key,
+                enricher
+            )
+            page_channels = page_records(items, categories)
+            subscriptions.extend(channel.name for channel in page_channels)
             
             next_page_token = response.get('nextPageToken')
+            if on_page is not None:
+                on_page(page_channels, next_page_token)
+            else:
+                account_channels_list.extend(page_channels)
+            if snapshot is not None:
+                fetched_pages.append({
+                    'page_token': page_token,
+                    'etag': response.get('etag'),
+                    'next_page_token': next_page_token,
+                    'channels': page_channels,
+                })
             if not next_page_token:
                 break
         
-        print(f"  Found {len(subscriptions)} subscriptions")
+        if snapshot is not None:
+            snapshot.save(fetched_pages)
+            log(f"  Reused {reused_pages}/{page_count} unchanged page(s) from snapshot")
+        log(f"  Found {len(subscriptions)} subscriptions")
         return subscriptions, {account_name: account_channels_list}
         
     except Exception as e:
-        error_msg = str(e)
-        print(f"\n⚠️  Error fetching subscriptions for {account_name}:")
-        print(f"   Error details: {error_msg}")
-        
-        # Check for common permission issues
-        if "forbidden" in error_msg.lower() or "403" in error_msg:
-            print(f"\n   💡 SOLUTION: Permission denied")
-            print(f"   🔧 Try these steps:")
-            print(f"   1. Delete token_{account_name}.pickle file from secret/ folder")
-            print(f"   2. Make sure '{account_name}' is added as a Test User:")
-            print(f"      - Go to Google Cloud Console → OAuth consent screen")
-            print(f"      - Add Test Users section → Add Users → {account_name}")
-            print(f"   3. Ensure YouTube Data API v3 is enabled")
-            print(f"   4. Re-run the script to re-authenticate with proper permissions\n")
-        elif "invalid_grant" in error_msg.lower():
-            print(f"\n   💡 SOLUTION: Invalid credentials - Token may have expired")
-            print(f"   🔧 Delete token_{account_name}.pickle and run again\n")
-        elif "notfound" in error_msg.lower() or "404" in error_msg:
-            print(f"\n   💡 NOTE: No subscriptions found (or subscriptions list is empty)\n")
-        
+        log_fetch_error(account_name, e, log)
         return [], {account_name: []}
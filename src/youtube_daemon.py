@@ -0,0 +1,188 @@
+"""
+YouTube Subscription Daemon - Main Entry Point
+
+Keeps every account's subscription output up to date from one long-running
+process instead of repeated cron runs.
+
+Modules:
+    - daemon: Schedules and runs the per-account syncs
+    - auth: Loads and refreshes the OAuth tokens
+    - channel_cache: Caches channel metadata across syncs and accounts
+    - sinks: Writes account output as CSV, JSON Lines, Parquet or SQLite
+"""
+
+import argparse
+import os
+import signal
+from typing import List, Optional
+
+from auth import load_credentials_config
+from channel_cache import ChannelCache
+from csv_handler import read_accounts_csv
+from daemon import SyncDaemon, DEFAULT_JITTER
+from quota import QuotaLedger, DEFAULT_DAILY_BUDGET
+from sinks import SINK_FORMATS
+
+# Get the root directory (parent of src)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Default location of the status file
+DEFAULT_STATUS_FILE = os.path.join(ROOT_DIR, 'output', 'daemon_status.json')
+
+# Default location of the JSON run report
+DEFAULT_REPORT_FILE = os.path.join(ROOT_DIR, 'output', 'run_report.json')
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse command-line arguments.
+
+    Args:
+        argv (List[str], optional): Arguments to parse (defaults to sys.argv).
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Keep YouTube subscription outputs up to date from a long-running process."
+    )
+    parser.add_argument('file_path', help="CSV file with the account email IDs")
+    parser.add_argument(
+        '--interval-minutes',
+        type=float,
+        default=360,
+        help="Time between two syncs of an account unless set in "
+             "'sync_interval_minutes' of credentials_config.json (default: 360)"
+    )
+    parser.add_argument(
+        '--jitter',
+        type=float,
+        default=DEFAULT_JITTER,
+        help=f"Random change of every interval, as a fraction of it (default: {DEFAULT_JITTER})"
+    )
+    parser.add_argument(
+        '--initial-spread-minutes',
+        type=float,
+        default=10,
+        help="Window over which accounts never synced before are spread at startup (default: 10)"
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help="Number of accounts synced concurrently (default: 4)"
+    )
+    parser.add_argument(
+        '--format',
+        dest='output_format',
+        choices=SINK_FORMATS,
+        default='csv',
+        help="Output format (default: csv)"
+    )
+    parser.add_argument(
+        '--daily-quota',
+        type=int,
+        default=DEFAULT_DAILY_BUDGET,
+        help="Daily quota budget per OAuth client unless set in 'quota_budgets' "
+             f"of credentials_config.json (default: {DEFAULT_DAILY_BUDGET})"
+    )
+    parser.add_argument(
+        '--full-sync',
+        action='store_true',
+        help="Ignore stored snapshots and download every page on every sync"
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help="Disable the persistent channel metadata cache"
+    )
+    parser.add_argument(
+        '--status',
+        default=DEFAULT_STATUS_FILE,
+        help="JSON status file with every account's last sync (default: output/daemon_status.json)"
+    )
+    parser.add_argument(
+        '--report',
+        default=DEFAULT_REPORT_FILE,
+        help="JSON run report, rewritten after every sync (default: output/run_report.json)"
+    )
+    parser.add_argument(
+        '--prometheus',
+        metavar='FILE',
+        help="Also write the metrics in Prometheus text format after every sync"
+    )
+    return parser.parse_args(argv)
+
+
+def main() -> int:
+    """
+    Main execution function.
+
+    Authenticates every account once, then syncs each account on its own
+    schedule until SIGINT or SIGTERM; running syncs finish before exit.
+
+    Returns:
+        int: 0 for success, 1 for failure.
+    """
+    print("YouTube Subscription Daemon")
+    print("=" * 60)
+
+    args = parse_args()
+    cache: Optional[ChannelCache] = None
+
+    try:
+        credentials_config = load_credentials_config(
+            os.path.join(ROOT_DIR, 'secret', 'credentials_config.json')
+        )
+        accounts = read_accounts_csv(args.file_path)
+        print(f"✓ Found {len(accounts)} account(s) to keep in sync\n")
+
+        if not args.no_cache:
+            cache = ChannelCache(os.path.join(ROOT_DIR, 'cache', 'channel_cache.sqlite3'))
+
+        daemon = SyncDaemon(
+            accounts,
+            credentials_config,
+            token_dir=os.path.join(ROOT_DIR, 'secret'),
+            output_dir=os.path.join(ROOT_DIR, 'output'),
+            status_file=args.status,
+            interval_seconds=args.interval_minutes * 60,
+            jitter=args.jitter,
+            initial_spread_seconds=args.initial_spread_minutes * 60,
+            workers=args.workers,
+            cache=cache,
+            snapshot_dir=None if args.full_sync else os.path.join(ROOT_DIR, 'cache', 'snapshots'),
+            output_format=args.output_format,
+            ledger=QuotaLedger(os.path.join(ROOT_DIR, 'cache', 'quota_state.json')),
+            daily_quota=args.daily_quota,
+            report_path=args.report,
+            prometheus_path=args.prometheus
+        )
+        daemon.start()
+
+        def request_stop(signum: int, frame: object) -> None:
+            print("\n⏹  Stopping after the running syncs finish...")
+            daemon.stop()
+
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+        print(f"🕒 Daemon running with {args.workers} worker(s); status in {args.status}\n")
+        daemon.run()
+
+        print("\n" + "=" * 60)
+        print("✅ Daemon stopped")
+        return 0
+
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        print("\n" + "=" * 60)
+        print("❌ Process failed!")
+        return 1
+
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -8,60 +8,211 @@ by using specialized modules for each functionality area.
 
 Modules:
     - auth: Handles OAuth 2.0 authentication with Google APIs
+    - token_store: Keeps every account's OAuth token in one locked SQLite store
     - youtube_api: Reads subscription data from YouTube
+    - channel_cache: Caches channel metadata across runs and accounts
+    - runner: Resolves credentials and fetches accounts concurrently
+    - pipeline: Fetches, enriches and writes pages in stages with bounded queues
     - csv_handler: Reads input and exports subscription data to CSV files
+    - sinks: Writes account output as CSV, JSON Lines, Parquet or SQLite
+    - sharding: Splits the accounts across machines by OAuth client
+    - cassette: Records API responses and replays them offline
 """
 
-import json
-import sys
+import argparse
+import functools
 import os
-from typing import Dict, Any, List
+from typing import List, Optional
 
-from auth import load_credentials_config, authenticate
-from youtube_api import fetch_subscriptions
-from csv_handler import read_accounts_csv, export_account_files
+from async_engine import fetch_all_accounts_async
+from auth import load_credentials_config
+from cassette import start_recording, start_replay, replay_credentials
+from channel_cache import ChannelCache, DEFAULT_MAX_ENTRIES
+from checkpoint import RunCheckpoint, run_fingerprint
+from csv_handler import read_accounts_csv
+from metrics import get_metrics, write_run_files
+from pipeline import (
+    fetch_all_accounts_pipeline, DEFAULT_ENRICH_WORKERS, DEFAULT_WRITE_WORKERS, DEFAULT_QUEUE_SIZE
+)
+from quota import QuotaLedger, plan_quota, print_quota_plan, DEFAULT_DAILY_BUDGET
+from runner import resolve_credentials, fetch_all_accounts
+from sharding import (
+    parse_shard, plan_shards, load_shard_plan, select_shard, shard_name, shard_output_dir,
+    write_shard_manifest, SHARD_REPORT_FILENAME
+)
+from sinks import SINK_FORMATS
+from token_store import forget_tokens, TOKEN_STORE_FILE
 
+# Default location of the JSON run report
+DEFAULT_REPORT_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'output', 'run_report.json'
+)
 
-def process_account(
-    account: Dict[str, str],
-    credentials_config: Dict[str, Any],
-    account_channels: Dict[str, List[Dict[str, Any]]],
-    account_idx: int,
-    total_accounts: int,
-) -> None:
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     """
-    Process a single YouTube account.
-    
-    Authenticates with the account and fetches its subscriptions,
-    then saves the subscription list to a file.
+    Parse command-line arguments.
     
     Args:
-        account (Dict): Account information with 'username' key.
-        credentials_config (Dict): OAuth credentials configuration.
-        account_channels (Dict): Dictionary mapping accounts to their channels.
-        account_idx (int): Current account index (for display).
-        total_accounts (int): Total number of accounts to process.
-    """
-    username = account.get('username', '').strip()
-    if not username:
-        return
-    
-    print(f"\n[{account_idx}/{total_accounts}] Processing account: {username}")
-    print("=" * 60)
+        argv (List[str], optional): Arguments to parse (defaults to sys.argv).
     
-    try:
-        # Authenticate with the account
-        print(f"Please authenticate with account: {username}")
-        youtube = authenticate(username, credentials_config, token_dir='secret')
-        
-        # Fetch subscriptions
-        subs, new_account_channels = fetch_subscriptions(youtube, username)
-        
-        # Store account subscriptions
-        account_channels.update(new_account_channels)
-        
-    except Exception as e:
-        print(f"❌ Failed to process account '{username}': {str(e)}")
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Extract YouTube subscriptions from multiple accounts into CSV files."
+    )
+    parser.add_argument('file_path', help="CSV file with the account email IDs")
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help="Number of accounts fetched concurrently (default: 4)"
+    )
+    parser.add_argument(
+        '--engine',
+        choices=['threads', 'async', 'pipeline'],
+        default='threads',
+        help="Fetch with a thread pool, with the asyncio engine, which needs "
+             "aiohttp, or with fetch, enrich and write stages connected by "
+             "bounded queues (default: threads)"
+    )
+    parser.add_argument(
+        '--batch-enrichment',
+        action='store_true',
+        help="Send channel lookups as batch HTTP requests shared by accounts "
+             "of the same OAuth client (threads and pipeline engines only)"
+    )
+    parser.add_argument(
+        '--enrich-workers',
+        type=int,
+        default=DEFAULT_ENRICH_WORKERS,
+        help=f"Pages enriched concurrently by the pipeline engine (default: {DEFAULT_ENRICH_WORKERS})"
+    )
+    parser.add_argument(
+        '--write-workers',
+        type=int,
+        default=DEFAULT_WRITE_WORKERS,
+        help=f"Accounts written concurrently by the pipeline engine (default: {DEFAULT_WRITE_WORKERS})"
+    )
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help="Pages buffered between two pipeline stages before the earlier "
+             f"stage waits (default: {DEFAULT_QUEUE_SIZE})"
+    )
+    parser.add_argument(
+        '--format',
+        dest='output_format',
+        choices=SINK_FORMATS,
+        default='csv',
+        help="Output format: one CSV, JSON Lines or Parquet file per account, or "
+             "one SQLite database with an upserted subscriptions table (default: csv)"
+    )
+    parser.add_argument(
+        '--daily-quota',
+        type=int,
+        default=DEFAULT_DAILY_BUDGET,
+        help="Daily quota budget per OAuth client unless set in 'quota_budgets' "
+             f"of credentials_config.json (default: {DEFAULT_DAILY_BUDGET})"
+    )
+    parser.add_argument(
+        '--full-sync',
+        action='store_true',
+        help="Ignore stored snapshots and download every page again"
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help="Continue an interrupted run from its checkpoint"
+    )
+    parser.add_argument(
+        '--cache-ttl-days',
+        type=float,
+        default=7,
+        help="Days before cached channel metadata is fetched again (default: 7)"
+    )
+    parser.add_argument(
+        '--cache-max-entries',
+        type=int,
+        default=DEFAULT_MAX_ENTRIES,
+        help=f"Maximum number of cached channels (default: {DEFAULT_MAX_ENTRIES})"
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help="Disable the persistent channel metadata cache"
+    )
+    parser.add_argument(
+        '--report',
+        default=DEFAULT_REPORT_FILE,
+        help="JSON run report with per-endpoint, per-client, per-account and "
+             "per-stage metrics (default: output/run_report.json)"
+    )
+    parser.add_argument(
+        '--prometheus',
+        metavar='FILE',
+        help="Also write the run metrics in Prometheus text format, e.g. into "
+             "the node exporter's textfile collector directory"
+    )
+    parser.add_argument(
+        '--shard',
+        metavar='I/N',
+        help="Only extract the accounts of shard I of N; accounts are split by "
+             "OAuth client and written to output/shards/shard_I_of_N"
+    )
+    parser.add_argument(
+        '--shard-plan',
+        metavar='FILE',
+        help="Shard plan from 'youtube_shards.py plan' shared by every machine "
+             "(default: split the clients by account count, which every machine "
+             "computes alike from the same accounts CSV and credentials config)"
+    )
+    parser.add_argument(
+        '--record',
+        metavar='DIR',
+        help="Save every API response of the run as a cassette in DIR"
+    )
+    parser.add_argument(
+        '--replay',
+        metavar='DIR',
+        help="Serve the API responses from the cassette in DIR, without "
+             "network access or OAuth tokens"
+    )
+    parser.add_argument(
+        '--replay-latency',
+        action='store_true',
+        help="With --replay, wait as long as each recorded response took"
+    )
+    parser.add_argument(
+        '--reauth',
+        metavar='EMAIL',
+        action='append',
+        default=[],
+        help="Drop the saved token of EMAIL so the account goes through browser "
+             "consent again (can be repeated)"
+    )
+    args = parser.parse_args(argv)
+    if args.batch_enrichment and args.engine == 'async':
+        parser.error("--batch-enrichment requires --engine threads or pipeline")
+    if args.record and args.replay:
+        parser.error("--record and --replay cannot be combined")
+    if (args.record or args.replay) and (args.engine == 'async' or args.batch_enrichment):
+        parser.error("--record and --replay require --engine threads or pipeline "
+                     "without --batch-enrichment")
+    if args.replay_latency and not args.replay:
+        parser.error("--replay-latency requires --replay")
+    if args.reauth and args.replay:
+        parser.error("--reauth cannot be combined with --replay")
+    if args.shard_plan and not args.shard:
+        parser.error("--shard-plan requires --shard")
+    if args.shard:
+        try:
+            args.shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    return args
 
 
 def main() -> int:
@@ -71,8 +222,10 @@ def main() -> int:
     Orchestrates the full workflow:
     1. Load credentials configuration
     2. Read accounts from CSV (file path from command-line argument)
-    3. Process each account (authenticate and fetch subscriptions)
-    4. Export individual account subscription files
+    3. With --shard, keep only the accounts of this machine's shard
+    4. Resolve credentials for every account (serial, may open a browser)
+    5. Fetch subscriptions for all accounts on a bounded worker pool,
+       streaming each account into its own subscription file
     
     Returns:
         int: 0 for success, 1 for failure.
@@ -80,56 +233,203 @@ def main() -> int:
     print("YouTube Subscription Extractor")
     print("=" * 60)
     
+    args = parse_args()
+    cache: Optional[ChannelCache] = None
+    recorder = None
+    metrics = get_metrics()
+    run_info = {
+        'command': 'youtube_extractor',
+        'engine': args.engine,
+        'workers': args.workers,
+        'output_format': args.output_format,
+        'exit_code': 1,
+    }
+    
     try:
-        # Get file path from command-line argument
-        if len(sys.argv) < 2:
-            print("❌ Error: No file path provided")
-            print("Usage: python youtube_extractor.py <file_path>")
-            return 1
-        
-        input_csv = sys.argv[1]
+        input_csv = args.file_path
         
         # Get the root directory (parent of src)
         root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         
-        # Load credentials configuration
-        print("Loading credentials configuration...")
-        credentials_config_path = os.path.join(root_dir, 'secret', 'credentials_config.json')
-        credentials_config = load_credentials_config(credentials_config_path)
-        print("✓ Credentials configuration loaded\n")
+        # Load credentials configuration, or take the accounts' OAuth
+        # clients from the cassette when replaying
+        if args.replay:
+            cassette = start_replay(args.replay, args.replay_latency)
+            credentials_config = {'account_to_client_mapping': cassette.account_clients}
+            run_info['replay'] = args.replay
+        else:
+            print("Loading credentials configuration...")
+            credentials_config_path = os.path.join(root_dir, 'secret', 'credentials_config.json')
+            credentials_config = load_credentials_config(credentials_config_path)
+            print("✓ Credentials configuration loaded\n")
+        if args.reauth:
+            forget_tokens(os.path.join(root_dir, 'secret', TOKEN_STORE_FILE), args.reauth)
+        if args.record:
+            recorder = start_recording(args.record)
+            run_info['record'] = args.record
         
         # Read accounts from CSV
         print(f"Reading accounts from CSV: {input_csv}")
         accounts = read_accounts_csv(input_csv)
         print(f"✓ Found {len(accounts)} account(s) to process\n")
         
-        # Initialize data structure for account subscriptions
-        account_channels: Dict[str, List[Dict[str, Any]]] = {}
-        
-        # Process each account
-        for idx, account in enumerate(accounts, 1):
-            process_account(
-                account,
-                credentials_config,
-                account_channels,
-                idx,
-                len(accounts)
+        output_dir = os.path.join(root_dir, 'output')
+        checkpoint_file = os.path.join(root_dir, 'cache', 'checkpoint.json')
+        ledger = QuotaLedger(os.path.join(root_dir, 'cache', 'quota_state.json'))
+        
+        # Keep this shard's accounts and write into the shard's namespace
+        if args.shard:
+            shard_index, shard_count = args.shard
+            if args.shard_plan:
+                shard_plan = load_shard_plan(args.shard_plan)
+                if shard_plan['shards'] != shard_count:
+                    raise Exception(
+                        f"Shard plan '{args.shard_plan}' has {shard_plan['shards']} shards, "
+                        f"not {shard_count}"
+                    )
+            else:
+                # Never plan from the local ledger: it only knows this machine's accounts
+                shard_plan = plan_shards(
+                    accounts, credentials_config, None, shard_count, args.daily_quota
+                )
+            accounts = select_shard(accounts, credentials_config, shard_plan, shard_index)
+            output_dir = shard_output_dir(output_dir, shard_index, shard_count)
+            checkpoint_file = os.path.join(
+                root_dir, 'cache', f'checkpoint_{shard_name(shard_index, shard_count)}.json'
+            )
+            if args.report == DEFAULT_REPORT_FILE:
+                args.report = os.path.join(output_dir, SHARD_REPORT_FILENAME)
+            run_info['shard'] = f'{shard_index}/{shard_count}'
+            write_shard_manifest(
+                output_dir,
+                shard_plan,
+                shard_index,
+                [a['username'].strip() for a in accounts],
+                args.output_format
+            )
+            print(
+                f"✓ Shard {shard_index}/{shard_count}: {len(accounts)} account(s) of "
+                f"{sum(1 for shard in shard_plan['clients'].values() if shard == shard_index)} "
+                f"OAuth client(s), writing to {output_dir}\n"
             )
         
-        # Export results
-        print(f"\n{'=' * 60}")
-        total_channels = sum(len(channels) for channels in account_channels.values())
-        print(f"Total subscriptions extracted: {total_channels}")
+        # Open the persistent channel metadata cache
+        if not args.no_cache:
+            cache = ChannelCache(
+                os.path.join(root_dir, 'cache', 'channel_cache.sqlite3'),
+                ttl_seconds=int(args.cache_ttl_days * 24 * 60 * 60),
+                max_entries=args.cache_max_entries
+            )
+        
+        # Start a new checkpoint, or pick up where an interrupted run stopped
+        usernames = [a['username'].strip() for a in accounts if a.get('username', '').strip()]
+        fingerprint = run_fingerprint(usernames, output_dir, args.output_format)
+        if args.resume:
+            checkpoint = RunCheckpoint.load(checkpoint_file, fingerprint)
+            print(
+                f"↻ Resuming: {len(checkpoint.completed)} account(s) already complete, "
+                f"{len(checkpoint.in_progress)} partially fetched\n"
+            )
+        else:
+            checkpoint = RunCheckpoint(checkpoint_file, fingerprint)
+        previously_completed = set(checkpoint.completed)
+        remaining_accounts = [
+            a for a in accounts if a.get('username', '').strip() not in previously_completed
+        ]
+        
+        # Schedule accounts within each OAuth client's daily quota; replayed
+        # runs spend no quota
+        if args.replay:
+            plan = {'scheduled': remaining_accounts}
+        else:
+            plan = plan_quota(remaining_accounts, credentials_config, ledger, args.daily_quota)
+            print_quota_plan(plan)
         
-        if account_channels:
-            output_dir = os.path.join(root_dir, 'output')
-            export_account_files(account_channels, output_dir)
+        # Phase 1: resolve all tokens up front
+        with metrics.stage('credentials'):
+            if args.replay:
+                account_credentials = replay_credentials(plan['scheduled'], cassette)
+            else:
+                account_credentials = resolve_credentials(
+                    plan['scheduled'],
+                    credentials_config,
+                    token_dir=os.path.join(root_dir, 'secret')
+                )
+        if recorder is not None:
+            recorder.add_accounts(account_credentials)
+        
+        # Phase 2: fetch subscriptions for all accounts concurrently and
+        # stream each account straight into its output
+        snapshot_dir = None if args.full_sync else os.path.join(root_dir, 'cache', 'snapshots')
+        print(f"Fetching subscriptions with {args.workers} worker(s)...")
+        if args.engine == 'async':
+            fetch_accounts = fetch_all_accounts_async
+        elif args.engine == 'pipeline':
+            fetch_accounts = functools.partial(
+                fetch_all_accounts_pipeline,
+                batch_enrichment=args.batch_enrichment,
+                enrich_workers=args.enrich_workers,
+                write_workers=args.write_workers,
+                queue_size=args.queue_size
+            )
+        else:
+            fetch_accounts = functools.partial(
+                fetch_all_accounts, batch_enrichment=args.batch_enrichment
+            )
+        try:
+            with metrics.stage('fetch_accounts'):
+                account_counts = fetch_accounts(
+                    account_credentials,
+                    workers=args.workers,
+                    cache=cache,
+                    snapshot_dir=snapshot_dir,
+                    output_dir=output_dir,
+                    checkpoint=checkpoint,
+                    output_format=args.output_format
+                )
+        finally:
+            # Charge the units actually spent, failed accounts included
+            if not args.replay:
+                ledger.record_usage(metrics.quota_usage())
+                ledger.save()
+        
+        run_info['accounts'] = len(account_counts)
+        run_info['channels'] = sum(account_counts.values())
+        
+        # Remember account sizes for the next plan
+        if not args.replay:
+            ledger.record_results({
+                username: count for username, count in account_counts.items()
+                if username not in previously_completed
+            })
+            ledger.save()
+        
+        # Keep the checkpoint until every account is done
+        if set(usernames) <= set(checkpoint.completed):
+            checkpoint.clear()
+        else:
+            print("\n💾 Some accounts are unfinished; run again with --resume to continue.")
+        
+        # Report results
+        print(f"\n{'=' * 60}")
+        print(f"Total subscriptions extracted: {sum(account_counts.values())}")
+        if cache is not None:
+            print(f"Channel cache: {cache.summary()}")
+        for line in metrics.transfer_summary():
+            print(line)
+        if args.replay:
+            print(f"Cassette: {cassette.summary()}")
         
         print("\n" + "=" * 60)
         print("✅ Process completed successfully!")
-        print("\nOutput files are in the 'output' folder.")
+        if args.shard:
+            print(f"\nOutput files are in: {output_dir}")
+            print("Run 'youtube_shards.py combine' once every shard has finished.")
+        else:
+            print("\nOutput files are in the 'output' folder.")
         print("Authentication tokens are stored in the 'secret' folder.")
         
+        run_info['exit_code'] = 0
         return 0
         
     except Exception as e:
@@ -137,6 +437,13 @@ def main() -> int:
         print("\n" + "=" * 60)
         print("❌ Process failed!")
         return 1
+    
+    finally:
+        if cache is not None:
+            cache.close()
+        if recorder is not None:
+            recorder.finish(run_info)
+        write_run_files(run_info, args.report, args.prometheus)
 
 
 if __name__ == '__main__':
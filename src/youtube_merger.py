@@ -9,62 +9,171 @@ by using specialized modules for each functionality area.
 Modules:
     - auth: Handles OAuth 2.0 authentication with Google APIs
     - youtube_api: Fetches subscription and channel data from YouTube
+    - runner: Resolves credentials and fetches accounts concurrently
+    - pipeline: Fetches, enriches and writes pages in stages with bounded queues
     - csv_handler: Reads input and exports data to CSV files
+    - merge_engine: Merges per-account CSV files with a streaming k-way merge
+    - cassette: Records API responses and replays them offline
 """
 
-import json
-import sys
+import argparse
+import functools
 import os
-from typing import Dict, Any, List
+from typing import List, Optional
 
-from auth import load_credentials_config, authenticate
-from youtube_api import fetch_subscriptions
-from csv_handler import read_accounts_csv, export_merged_channels, export_account_files
+from async_engine import fetch_all_accounts_async
+from auth import load_credentials_config
+from cassette import start_recording, start_replay, replay_credentials
+from channel_cache import ChannelCache, DEFAULT_MAX_ENTRIES
+from csv_handler import read_accounts_csv, account_output_file
+from merge_engine import (
+    account_file_label, find_account_files, merge_account_files, MERGED_FILENAME
+)
+from metrics import get_metrics, write_run_files
+from pipeline import (
+    fetch_all_accounts_pipeline, DEFAULT_ENRICH_WORKERS, DEFAULT_WRITE_WORKERS, DEFAULT_QUEUE_SIZE
+)
+from quota import QuotaLedger, plan_quota, print_quota_plan, DEFAULT_DAILY_BUDGET
+from runner import resolve_credentials, fetch_all_accounts
 
+# Default location of the JSON run report
+DEFAULT_REPORT_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'output', 'run_report.json'
+)
 
-def process_account(
-    account: Dict[str, str],
-    credentials_config: Dict[str, Any],
-    all_channels: Dict[str, Dict[str, Any]],
-    account_channels: Dict[str, List[Dict[str, Any]]],
-    account_idx: int,
-    total_accounts: int,
-) -> None:
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     """
-    Process a single YouTube account.
-    
-    Authenticates with the account, fetches subscriptions, and updates the
-    master channel list and account-specific channel list.
+    Parse command-line arguments.
     
     Args:
-        account (Dict): Account information with 'username' key.
-        credentials_config (Dict): OAuth credentials configuration.
-        all_channels (Dict): Master dictionary of all unique channels.
-        account_channels (Dict): Dictionary mapping accounts to their channels.
-        account_idx (int): Current account index (for display).
-        total_accounts (int): Total number of accounts to process.
-    """
-    username = account.get('username', '').strip()
-    if not username:
-        return
+        argv (List[str], optional): Arguments to parse (defaults to sys.argv).
     
-    print(f"\n[{account_idx}/{total_accounts}] Processing account: {username}")
-    print("=" * 60)
-    
-    try:
-        # Authenticate with the account
-        print(f"Please authenticate with account: {username}")
-        youtube = authenticate(username, credentials_config, token_dir='secret')
-        
-        # Fetch subscriptions and update master lists
-        subs, new_channels, new_account_channels = fetch_subscriptions(youtube, username)
-        
-        # Merge results into master dictionaries
-        all_channels.update(new_channels)
-        account_channels.update(new_account_channels)
-        
-    except Exception as e:
-        print(f"❌ Failed to process account '{username}': {str(e)}")
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Merge YouTube subscriptions from multiple accounts into one channel list."
+    )
+    parser.add_argument(
+        'file_path',
+        nargs='?',
+        help="CSV file with the account email IDs (optional with --offline)"
+    )
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help="Merge existing output/channels_*.csv files without calling the API"
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help="Number of accounts fetched concurrently (default: 4)"
+    )
+    parser.add_argument(
+        '--engine',
+        choices=['threads', 'async', 'pipeline'],
+        default='threads',
+        help="Fetch with a thread pool, with the asyncio engine, which needs "
+             "aiohttp, or with fetch, enrich and write stages connected by "
+             "bounded queues (default: threads)"
+    )
+    parser.add_argument(
+        '--batch-enrichment',
+        action='store_true',
+        help="Send channel lookups as batch HTTP requests shared by accounts "
+             "of the same OAuth client (threads and pipeline engines only)"
+    )
+    parser.add_argument(
+        '--enrich-workers',
+        type=int,
+        default=DEFAULT_ENRICH_WORKERS,
+        help=f"Pages enriched concurrently by the pipeline engine (default: {DEFAULT_ENRICH_WORKERS})"
+    )
+    parser.add_argument(
+        '--write-workers',
+        type=int,
+        default=DEFAULT_WRITE_WORKERS,
+        help=f"Accounts written concurrently by the pipeline engine (default: {DEFAULT_WRITE_WORKERS})"
+    )
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help="Pages buffered between two pipeline stages before the earlier "
+             f"stage waits (default: {DEFAULT_QUEUE_SIZE})"
+    )
+    parser.add_argument(
+        '--daily-quota',
+        type=int,
+        default=DEFAULT_DAILY_BUDGET,
+        help="Daily quota budget per OAuth client unless set in 'quota_budgets' "
+             f"of credentials_config.json (default: {DEFAULT_DAILY_BUDGET})"
+    )
+    parser.add_argument(
+        '--full-sync',
+        action='store_true',
+        help="Ignore stored snapshots and download every page again"
+    )
+    parser.add_argument(
+        '--cache-ttl-days',
+        type=float,
+        default=7,
+        help="Days before cached channel metadata is fetched again (default: 7)"
+    )
+    parser.add_argument(
+        '--cache-max-entries',
+        type=int,
+        default=DEFAULT_MAX_ENTRIES,
+        help=f"Maximum number of cached channels (default: {DEFAULT_MAX_ENTRIES})"
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help="Disable the persistent channel metadata cache"
+    )
+    parser.add_argument(
+        '--report',
+        default=DEFAULT_REPORT_FILE,
+        help="JSON run report with per-endpoint, per-client, per-account and "
+             "per-stage metrics (default: output/run_report.json)"
+    )
+    parser.add_argument(
+        '--prometheus',
+        metavar='FILE',
+        help="Also write the run metrics in Prometheus text format, e.g. into "
+             "the node exporter's textfile collector directory"
+    )
+    parser.add_argument(
+        '--record',
+        metavar='DIR',
+        help="Save every API response of the run as a cassette in DIR"
+    )
+    parser.add_argument(
+        '--replay',
+        metavar='DIR',
+        help="Serve the API responses from the cassette in DIR, without "
+             "network access or OAuth tokens"
+    )
+    parser.add_argument(
+        '--replay-latency',
+        action='store_true',
+        help="With --replay, wait as long as each recorded response took"
+    )
+    args = parser.parse_args(argv)
+    if args.batch_enrichment and args.engine == 'async':
+        parser.error("--batch-enrichment requires --engine threads or pipeline")
+    if args.record and args.replay:
+        parser.error("--record and --replay cannot be combined")
+    if (args.record or args.replay) and (args.engine == 'async' or args.batch_enrichment):
+        parser.error("--record and --replay require --engine threads or pipeline "
+                     "without --batch-enrichment")
+    if (args.record or args.replay) and args.offline:
+        parser.error("--record and --replay cannot be combined with --offline")
+    if args.replay_latency and not args.replay:
+        parser.error("--replay-latency requires --replay")
+    return args
 
 
 def main() -> int:
@@ -74,9 +183,12 @@ def main() -> int:
     Orchestrates the full workflow:
     1. Load credentials configuration
     2. Read accounts from CSV (file path from command-line argument)
-    3. Process each account (authenticate and fetch subscriptions)
-    4. Export merged channel list
-    5. Export individual account files
+    3. Resolve credentials, then fetch all accounts on a worker pool,
+       streaming each account into its own subscription file
+    4. Merge the account files into a deduplicated channel list
+    
+    With --offline, steps 1-3 are skipped and the existing account files in
+    the output folder are merged without calling the API.
     
     Returns:
         int: 0 for success, 1 for failure.
@@ -84,59 +196,158 @@ def main() -> int:
     print("YouTube Channel Merger")
     print("=" * 60)
     
+    args = parse_args()
+    cache: Optional[ChannelCache] = None
+    recorder = None
+    metrics = get_metrics()
+    run_info = {
+        'command': 'youtube_merger',
+        'engine': args.engine,
+        'workers': args.workers,
+        'exit_code': 1,
+    }
+    
     try:
-        # Get file path from command-line argument
-        if len(sys.argv) < 2:
-            print("❌ Error: No file path provided")
-            print("Usage: python youtube_merger.py <file_path>")
-            return 1
-        
-        input_csv = sys.argv[1]
-        
         # Get the root directory (parent of src)
         root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output_dir = os.path.join(root_dir, 'output')
         
-        # Load credentials configuration
-        print("Loading credentials configuration...")
-        credentials_config_path = os.path.join(root_dir, 'secret', 'credentials_config.json')
-        credentials_config = load_credentials_config(credentials_config_path)
-        print("✓ Credentials configuration loaded\n")
-        
-        # Read accounts from CSV
-        print(f"Reading accounts from CSV: {input_csv}")
-        accounts = read_accounts_csv(input_csv)
-        print(f"✓ Found {len(accounts)} account(s) to process\n")
-        
-        # Initialize data structures
-        all_channels: Dict[str, Dict[str, Any]] = {}
-        account_channels: Dict[str, List[Dict[str, Any]]] = {}
+        if args.offline:
+            account_files = find_account_files(output_dir)
+            if args.file_path:
+                # Only merge the accounts listed in the input file
+                wanted = {
+                    os.path.basename(account_output_file(account['username'], output_dir))
+                    for account in read_accounts_csv(args.file_path)
+                }
+                account_files = [
+                    (label, path) for label, path in account_files
+                    if os.path.basename(path) in wanted
+                ]
+            print(f"✓ Found {len(account_files)} account file(s) to merge offline\n")
+        else:
+            if not args.file_path:
+                print("❌ Error: No file path provided")
+                print("Usage: python youtube_merger.py <file_path> | --offline [file_path]")
+                return 1
+            
+            # Load credentials configuration, or take the accounts' OAuth
+            # clients from the cassette when replaying
+            if args.replay:
+                cassette = start_replay(args.replay, args.replay_latency)
+                run_info['replay'] = args.replay
+            else:
+                print("Loading credentials configuration...")
+                credentials_config_path = os.path.join(root_dir, 'secret', 'credentials_config.json')
+                credentials_config = load_credentials_config(credentials_config_path)
+                print("✓ Credentials configuration loaded\n")
+            if args.record:
+                recorder = start_recording(args.record)
+                run_info['record'] = args.record
+            
+            # Read accounts from CSV
+            print(f"Reading accounts from CSV: {args.file_path}")
+            accounts = read_accounts_csv(args.file_path)
+            print(f"✓ Found {len(accounts)} account(s) to process\n")
+            
+            # Open the persistent channel metadata cache
+            if not args.no_cache:
+                cache = ChannelCache(
+                    os.path.join(root_dir, 'cache', 'channel_cache.sqlite3'),
+                    ttl_seconds=int(args.cache_ttl_days * 24 * 60 * 60),
+                    max_entries=args.cache_max_entries
+                )
+            
+            # Phase 1: schedule accounts within each OAuth client's daily
+            # quota and resolve all tokens up front; replayed runs need neither
+            ledger = QuotaLedger(os.path.join(root_dir, 'cache', 'quota_state.json'))
+            if args.replay:
+                with metrics.stage('credentials'):
+                    account_credentials = replay_credentials(accounts, cassette)
+            else:
+                plan = plan_quota(accounts, credentials_config, ledger, args.daily_quota)
+                print_quota_plan(plan)
+                with metrics.stage('credentials'):
+                    account_credentials = resolve_credentials(
+                        plan['scheduled'],
+                        credentials_config,
+                        token_dir=os.path.join(root_dir, 'secret')
+                    )
+            if recorder is not None:
+                recorder.add_accounts(account_credentials)
+            
+            # Phase 2: fetch subscriptions for all accounts concurrently
+            snapshot_dir = None if args.full_sync else os.path.join(root_dir, 'cache', 'snapshots')
+            print(f"Fetching subscriptions with {args.workers} worker(s)...")
+            if args.engine == 'async':
+                fetch_accounts = fetch_all_accounts_async
+            elif args.engine == 'pipeline':
+                fetch_accounts = functools.partial(
+                    fetch_all_accounts_pipeline,
+                    batch_enrichment=args.batch_enrichment,
+                    enrich_workers=args.enrich_workers,
+                    write_workers=args.write_workers,
+                    queue_size=args.queue_size
+                )
+            else:
+                fetch_accounts = functools.partial(
+                    fetch_all_accounts, batch_enrichment=args.batch_enrichment
+                )
+            try:
+                with metrics.stage('fetch_accounts'):
+                    account_counts = fetch_accounts(
+                        account_credentials,
+                        workers=args.workers,
+                        cache=cache,
+                        snapshot_dir=snapshot_dir,
+                        output_dir=output_dir
+                    )
+            finally:
+                # Charge the units actually spent, failed accounts included
+                if not args.replay:
+                    ledger.record_usage(metrics.quota_usage())
+                    ledger.save()
+            
+            run_info['accounts'] = len(account_counts)
+            run_info['channels'] = sum(account_counts.values())
+            
+            # Remember account sizes for the next plan
+            if not args.replay:
+                ledger.record_results(account_counts)
+                ledger.save()
+            else:
+                print(f"Cassette: {cassette.summary()}")
+            
+            account_files = []
+            for username, count in account_counts.items():
+                path = account_output_file(username, output_dir)
+                if count and os.path.exists(path):
+                    account_files.append((account_file_label(path), path))
         
-        # Process each account
-        for idx, account in enumerate(accounts, 1):
-            process_account(
-                account,
-                credentials_config,
-                all_channels,
-                account_channels,
-                idx,
-                len(accounts)
-            )
-        
-        # Export results
+        # Merge the account files
         print(f"\n{'=' * 60}")
-        print(f"Total unique channels collected: {len(all_channels)}")
-        
-        if all_channels:
-            output_dir = os.path.join(root_dir, 'output')
-            merged_file = os.path.join(output_dir, 'merged_channels.csv')
-            export_merged_channels(all_channels, merged_file)
-            export_account_files(account_channels, output_dir)
+        if account_files:
+            merged_file = os.path.join(output_dir, MERGED_FILENAME)
+            with metrics.stage('merge'):
+                stats = merge_account_files(account_files, merged_file)
+            print(
+                f"Merged {stats['rows']} subscriptions from {stats['accounts']} account(s) "
+                f"into {stats['unique_channels']} unique channels"
+            )
+            print(f"  ✓ Exported merged channel list to: {merged_file}")
+        else:
+            print("⚠️  No account channels to merge!")
+        if cache is not None:
+            print(f"Channel cache: {cache.summary()}")
+        for line in metrics.transfer_summary():
+            print(line)
         
         print("\n" + "=" * 60)
         print("✅ Process completed successfully!")
         print("\nOutput files are in the 'output' folder.")
         print("Authentication tokens are stored in the 'secret' folder.")
         
+        run_info['exit_code'] = 0
         return 0
         
     except Exception as e:
@@ -144,6 +355,13 @@ def main() -> int:
         print("\n" + "=" * 60)
         print("❌ Process failed!")
         return 1
+    
+    finally:
+        if cache is not None:
+            cache.close()
+        if recorder is not None:
+            recorder.finish(run_info)
+        write_run_files(run_info, args.report, args.prometheus)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,163 @@
+"""
+YouTube Subscription Shards - Main Entry Point
+
+Plans how accounts are split across machines and combines the outputs of
+sharded extractor runs.
+
+    python youtube_shards.py plan youtube_accounts.csv --shards 4
+    python youtube_extractor.py youtube_accounts.csv --shard 1/4 --shard-plan output/shard_plan.json
+    python youtube_shards.py combine
+
+Modules:
+    - sharding: Assigns OAuth clients to shards and merges shard outputs
+    - quota: Estimates the quota cost of each account
+"""
+
+import argparse
+import os
+from typing import List, Optional
+
+from auth import load_credentials_config
+from csv_handler import read_accounts_csv
+from quota import QuotaLedger, DEFAULT_DAILY_BUDGET
+from sharding import plan_shards, save_shard_plan, combine_shards
+
+# Get the root directory (parent of src)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Default location of the shard plan
+DEFAULT_PLAN_FILE = os.path.join(ROOT_DIR, 'output', 'shard_plan.json')
+
+# Default location of the combined JSON run report
+DEFAULT_REPORT_FILE = os.path.join(ROOT_DIR, 'output', 'run_report.json')
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse command-line arguments.
+
+    Args:
+        argv (List[str], optional): Arguments to parse (defaults to sys.argv).
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Split extractor runs across machines and combine their outputs."
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    plan = commands.add_parser(
+        'plan', help="Assign every OAuth client, with all of its accounts, to a shard"
+    )
+    plan.add_argument('file_path', help="CSV file with the account email IDs")
+    plan.add_argument('--shards', type=int, required=True, help="Number of shards")
+    plan.add_argument(
+        '--daily-quota',
+        type=int,
+        default=DEFAULT_DAILY_BUDGET,
+        help="Daily quota budget per OAuth client unless set in 'quota_budgets' "
+             f"of credentials_config.json (default: {DEFAULT_DAILY_BUDGET})"
+    )
+    plan.add_argument(
+        '--output',
+        default=DEFAULT_PLAN_FILE,
+        help="Shard plan file to copy to every machine (default: output/shard_plan.json)"
+    )
+
+    combine = commands.add_parser(
+        'combine', help="Merge the outputs of every shard into the output folder"
+    )
+    combine.add_argument(
+        '--report',
+        default=DEFAULT_REPORT_FILE,
+        help="Combined JSON run report (default: output/run_report.json)"
+    )
+    combine.add_argument(
+        '--prometheus',
+        metavar='FILE',
+        help="Also write the combined metrics in Prometheus text format"
+    )
+    args = parser.parse_args(argv)
+    if args.command == 'plan' and args.shards < 1:
+        parser.error("--shards must be at least 1")
+    return args
+
+
+def plan(args: argparse.Namespace) -> None:
+    """
+    Create a shard plan and print the estimated load of every shard.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+    """
+    credentials_config = load_credentials_config(
+        os.path.join(ROOT_DIR, 'secret', 'credentials_config.json')
+    )
+    accounts = read_accounts_csv(args.file_path)
+    ledger = QuotaLedger(os.path.join(ROOT_DIR, 'cache', 'quota_state.json'))
+    shard_plan = plan_shards(accounts, credentials_config, ledger, args.shards, args.daily_quota)
+
+    print(f"Shard plan for {len(accounts)} account(s) on {args.shards} shard(s):")
+    for idx in range(args.shards):
+        clients = [key for key, shard in shard_plan['clients'].items() if shard == idx + 1]
+        print(
+            f"  {idx + 1}/{args.shards}: {shard_plan['shard_accounts'][idx]} account(s), "
+            f"~{shard_plan['shard_units'][idx]} units, clients: {', '.join(clients) or '-'}"
+        )
+    save_shard_plan(shard_plan, args.output)
+    print(f"\n  ✓ Shard plan written to: {args.output}")
+    print("Copy it to every machine and run the extractor with --shard I/N --shard-plan FILE.")
+
+
+def combine(args: argparse.Namespace) -> None:
+    """
+    Combine the shard outputs into the output folder.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+    """
+    output_dir = os.path.join(ROOT_DIR, 'output')
+    stats = combine_shards(output_dir, args.report, args.prometheus)
+    print(
+        f"Combined {stats['accounts']} account(s) from {stats['shards']} shard(s): "
+        f"{stats['files']} file(s), {stats['sqlite_rows']} SQLite row(s), "
+        f"{stats['reports']} run report(s)"
+    )
+    if stats['missing']:
+        print(f"\n⚠️  {len(stats['missing'])} account(s) have no output (deferred or failed):")
+        for username in stats['missing']:
+            print(f"  ⊘ {username}")
+
+
+def main() -> int:
+    """
+    Main execution function.
+
+    Returns:
+        int: 0 for success, 1 for failure.
+    """
+    print("YouTube Subscription Shards")
+    print("=" * 60)
+
+    args = parse_args()
+
+    try:
+        if args.command == 'plan':
+            plan(args)
+        else:
+            combine(args)
+
+        print("\n" + "=" * 60)
+        print("✅ Process completed successfully!")
+        return 0
+
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        print("\n" + "=" * 60)
+        print("❌ Process failed!")
+        return 1
+
+
+if __name__ == '__main__':
+    exit(main())
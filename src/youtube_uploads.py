@@ -0,0 +1,239 @@
+"""
+YouTube Uploads Crawler - Main Entry Point
+
+Fetches the recent uploads of every channel the given accounts subscribe
+to, crawling each channel once however many accounts follow it.
+
+Modules:
+    - uploads_crawler: Resolves uploads playlists and pages through them
+    - auth: Handles OAuth 2.0 authentication with Google APIs
+    - sinks: Writes the uploads as CSV, JSON Lines, Parquet or SQLite
+    - quota: Charges the crawl's quota units to the OAuth clients
+"""
+
+import argparse
+import math
+import os
+from typing import List, Optional
+
+from auth import load_credentials_config, get_client_key
+from csv_handler import read_accounts_csv
+from metrics import get_metrics, write_run_files
+from quota import QuotaLedger, get_client_budget, DEFAULT_DAILY_BUDGET
+from runner import resolve_credentials
+from sinks import SINK_FORMATS, open_uploads_sink
+from uploads_crawler import (
+    UploadsCrawler, load_channel_set, parse_since, DEFAULT_MAX_VIDEOS, DEFAULT_CRAWL_WORKERS,
+    PLAYLIST_PAGE_SIZE
+)
+from youtube_api import CHANNELS_BATCH_SIZE
+
+# Get the root directory (parent of src)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Default location of the JSON run report; kept apart from the extractor's
+DEFAULT_REPORT_FILE = os.path.join(ROOT_DIR, 'output', 'uploads_report.json')
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse command-line arguments.
+
+    Args:
+        argv (List[str], optional): Arguments to parse (defaults to sys.argv).
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Fetch the recent uploads of every channel the accounts subscribe to."
+    )
+    parser.add_argument('file_path', help="CSV file with the account email IDs")
+    parser.add_argument(
+        '--sqlite',
+        metavar='FILE',
+        help="Read the subscriptions from a subscriptions.sqlite3 written with "
+             "--format sqlite instead of the output/channels_*.csv files"
+    )
+    parser.add_argument(
+        '--since',
+        metavar='DATE',
+        help="Only keep uploads published since DATE (YYYY-MM-DD, an ISO 8601 "
+             "time, or Nd for the last N days)"
+    )
+    parser.add_argument(
+        '--max-videos',
+        type=int,
+        default=DEFAULT_MAX_VIDEOS,
+        help=f"Maximum uploads per channel, 0 for no limit (default: {DEFAULT_MAX_VIDEOS})"
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_CRAWL_WORKERS,
+        help=f"Number of channels crawled concurrently (default: {DEFAULT_CRAWL_WORKERS})"
+    )
+    parser.add_argument(
+        '--format',
+        dest='output_format',
+        choices=SINK_FORMATS,
+        default='csv',
+        help="Output format of output/uploads (default: csv)"
+    )
+    parser.add_argument(
+        '--daily-quota',
+        type=int,
+        default=DEFAULT_DAILY_BUDGET,
+        help="Daily quota budget per OAuth client unless set in 'quota_budgets' "
+             f"of credentials_config.json (default: {DEFAULT_DAILY_BUDGET})"
+    )
+    parser.add_argument(
+        '--report',
+        default=DEFAULT_REPORT_FILE,
+        help="JSON run report (default: output/uploads_report.json)"
+    )
+    parser.add_argument(
+        '--prometheus',
+        metavar='FILE',
+        help="Also write the run metrics in Prometheus text format"
+    )
+    args = parser.parse_args(argv)
+    if args.max_videos < 0:
+        parser.error("--max-videos must be 0 or more")
+    if not args.since and not args.max_videos:
+        parser.error("--max-videos 0 requires --since, or every upload of every channel is fetched")
+    if args.since:
+        try:
+            args.since = parse_since(args.since)
+        except ValueError as e:
+            parser.error(str(e))
+    return args
+
+
+def main() -> int:
+    """
+    Main execution function.
+
+    Orchestrates the crawl:
+    1. Build the deduplicated channel set from the accounts' output
+    2. Resolve the credentials of one account per OAuth client
+    3. Crawl every channel's uploads, streaming them into output/uploads
+    4. Charge the spent quota units to the clients' ledger
+
+    Returns:
+        int: 0 for success, 1 for failure.
+    """
+    print("YouTube Uploads Crawler")
+    print("=" * 60)
+
+    args = parse_args()
+    sink = None
+    metrics = get_metrics()
+    run_info = {
+        'command': 'youtube_uploads',
+        'workers': args.workers,
+        'output_format': args.output_format,
+        'max_videos': args.max_videos,
+        'since': args.since.isoformat() if args.since else None,
+        'exit_code': 1,
+    }
+
+    try:
+        output_dir = os.path.join(ROOT_DIR, 'output')
+
+        print("Loading credentials configuration...")
+        credentials_config = load_credentials_config(
+            os.path.join(ROOT_DIR, 'secret', 'credentials_config.json')
+        )
+        print("✓ Credentials configuration loaded\n")
+
+        accounts = read_accounts_csv(args.file_path)
+        usernames = [a['username'].strip() for a in accounts if a.get('username', '').strip()]
+        channels = load_channel_set(usernames, output_dir, database=args.sqlite)
+        print(f"✓ {len(channels)} unique channel(s) followed by {len(usernames)} account(s)\n")
+        run_info['channels'] = len(channels)
+        if not channels:
+            print("⚠️  No channels to crawl!")
+            run_info['exit_code'] = 0
+            return 0
+
+        # One account per OAuth client makes the calls
+        callers = {}
+        for account in accounts:
+            username = account.get('username', '').strip()
+            if username:
+                callers.setdefault(get_client_key(credentials_config, username), account)
+        with metrics.stage('credentials'):
+            account_credentials = resolve_credentials(
+                list(callers.values()),
+                credentials_config,
+                token_dir=os.path.join(ROOT_DIR, 'secret')
+            )
+
+        pages_per_channel = math.ceil(args.max_videos / PLAYLIST_PAGE_SIZE) if args.max_videos else None
+        lookups = math.ceil(len(channels) / CHANNELS_BATCH_SIZE)
+        ledger = QuotaLedger(os.path.join(ROOT_DIR, 'cache', 'quota_state.json'))
+        remaining = sum(
+            get_client_budget(credentials_config, client_key, args.daily_quota)
+            - ledger.spent_today(client_key)
+            for _, client_key, _ in account_credentials
+            if not ledger.is_exhausted(client_key)
+        )
+        print(
+            f"Estimated quota: {'up to' if pages_per_channel else 'at least'} "
+            f"{lookups + len(channels) * (pages_per_channel or 1)} unit(s) of {remaining} left "
+            f"today on {len(account_credentials)} OAuth client(s)"
+        )
+
+        cutoffs = []
+        if args.since:
+            cutoffs.append(f"since {args.since:%Y-%m-%d %H:%M} UTC")
+        if args.max_videos:
+            cutoffs.append(f"at most {args.max_videos} per channel")
+        print(f"Crawling uploads ({', '.join(cutoffs)}) with {args.workers} worker(s)...")
+
+        sink = open_uploads_sink(args.output_format, output_dir)
+        crawler = UploadsCrawler(
+            account_credentials,
+            sink,
+            since=args.since,
+            max_videos=args.max_videos,
+            workers=args.workers
+        )
+        try:
+            with metrics.stage('crawl'):
+                stats = crawler.crawl(channels)
+        finally:
+            ledger.record_usage(metrics.quota_usage())
+            ledger.save()
+        with metrics.stage('export'):
+            sink.finalize()
+        sink = None
+        run_info.update(stats)
+
+        print(f"\n{'=' * 60}")
+        print(f"Uploads: {crawler.summary()}")
+        for line in metrics.transfer_summary():
+            print(line)
+
+        print("\n" + "=" * 60)
+        print("✅ Process completed successfully!")
+        print("\nOutput files are in the 'output' folder.")
+
+        run_info['exit_code'] = 0
+        return 0
+
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        print("\n" + "=" * 60)
+        print("❌ Process failed!")
+        return 1
+
+    finally:
+        if sink is not None:
+            sink.abort()
+        write_run_files(run_info, args.report, args.prometheus)
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,79 @@
+"""
+Shared pytest setup.
+
+The modules in src/ and benchmarks/ are imported script-style, so both
+directories are put on sys.path. The fixtures serve the fake YouTube API
+over a local HTTP server or in process and give every test fresh metrics
+and circuit breakers.
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks'))
+
+import api_executor  # noqa: E402
+import pipeline  # noqa: E402
+import runner  # noqa: E402
+from fake_youtube import FakeDataset, FaultInjector, FakeYouTube, FakeYouTubeServer  # noqa: E402
+from metrics import reset_metrics  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    """Start every test with empty metrics, closed circuits and short backoff."""
+    monkeypatch.setattr(api_executor, '_breakers', {})
+    monkeypatch.setattr(api_executor, 'BASE_DELAY_SECONDS', 0.001)
+    yield reset_metrics()
+    reset_metrics()
+
+
+@pytest.fixture
+def dataset():
+    """Three accounts of 120 subscriptions, in pages of 50."""
+    return FakeDataset(3, 120, pool_size=400, page_size=50)
+
+
+@pytest.fixture
+def faults():
+    return FaultInjector()
+
+
+@pytest.fixture
+def api_server(dataset, faults):
+    """The fake API on a local port; requests authenticate with the username."""
+    server = FakeYouTubeServer(dataset, faults).start()
+    yield server
+    server.stop()
+
+
+class TokenCredentials:
+    """Credentials stand-in for the in-process fake API; the token is the username."""
+
+    valid = True
+
+    def __init__(self, token):
+        self.token = token
+
+
+@pytest.fixture
+def fake_api(dataset, faults, monkeypatch):
+    """Serve the threaded and pipeline engines from the fake API in process."""
+    def build(creds):
+        return FakeYouTube(dataset, faults, creds.token)
+    monkeypatch.setattr(runner, 'build_youtube_client', build)
+    monkeypatch.setattr(pipeline, 'build_youtube_client', build)
+    return build
+
+
+@pytest.fixture
+def fake_accounts(dataset):
+    """(username, client_key, credentials) of every account, on two OAuth clients."""
+    return [
+        (username, f'client_{idx % 2}', TokenCredentials(username))
+        for idx, username in enumerate(dataset.usernames())
+    ]
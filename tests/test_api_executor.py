@@ -0,0 +1,240 @@
+"""Tests of error classification, backoff and circuit breaking in api_executor."""
+
+import http.client
+import socket
+import ssl
+
+import httplib2
+import pytest
+
+import api_executor
+from api_executor import (
+    CircuitBreaker, CircuitOpenError, backoff_delay, classify_error, execute_request,
+    get_circuit_breaker,
+)
+from fake_youtube import FakeHttpError, error_body
+from metrics import get_metrics
+
+
+def http_error(status, retry_after=None):
+    error = FakeHttpError(status, error_body(status))
+    if retry_after is not None:
+        error.resp['retry-after'] = str(retry_after)
+    return error
+
+
+def reason_error(reason):
+    return FakeHttpError(
+        403, f'{{"error": {{"errors": [{{"reason": "{reason}"}}]}}}}'.encode('utf-8')
+    )
+
+
+class ScriptedRequest:
+    """A request whose execute() raises or returns the scripted outcomes in order."""
+
+    endpoint = 'subscriptions.list'
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(api_executor.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.mark.parametrize('error, expected', [
+    (http_error(503), (True, True)),
+    (http_error(500), (True, True)),
+    (http_error(429), (True, True)),
+    (reason_error('rateLimitExceeded'), (True, True)),
+    (reason_error('userRateLimitExceeded'), (True, True)),
+    (reason_error('quotaExceeded'), (False, True)),
+    (reason_error('dailyLimitExceeded'), (False, True)),
+    (reason_error('forbidden'), (False, False)),
+    (http_error(401), (False, False)),
+    (http_error(404), (False, False)),
+    (CircuitOpenError('open'), (False, False)),
+])
+def test_classify_http_errors(error, expected):
+    assert classify_error(error) == expected
+
+
+@pytest.mark.parametrize('error', [
+    socket.timeout('timed out'),
+    TimeoutError('timed out'),
+    ConnectionResetError('reset by peer'),
+    ConnectionRefusedError('refused'),
+    BrokenPipeError('broken pipe'),
+    ssl.SSLError('record layer failure'),
+    http.client.IncompleteRead(b'partial'),
+    http.client.RemoteDisconnected('closed'),
+    httplib2.ServerNotFoundError('Unable to find the server'),
+])
+def test_transport_errors_are_retried(error):
+    assert classify_error(error) == (True, False)
+
+
+@pytest.mark.parametrize('error', [
+    FileNotFoundError('client_secret.json'),
+    PermissionError('secret/tokens.sqlite3'),
+    IsADirectoryError('output'),
+    OSError(28, 'No space left on device'),
+    ssl.SSLCertVerificationError('certificate verify failed'),
+    httplib2.RelativeURIError('Only absolute URIs are allowed'),
+    ValueError('bad JSON'),
+    KeyError('items'),
+])
+def test_local_and_programming_errors_are_fatal(error):
+    assert classify_error(error) == (False, False)
+
+
+@pytest.mark.parametrize('attempt', range(8))
+def test_backoff_uses_full_jitter_within_cap(attempt, monkeypatch):
+    monkeypatch.setattr(api_executor, 'BASE_DELAY_SECONDS', 1.0)
+    cap = min(api_executor.MAX_DELAY_SECONDS, 2 ** attempt)
+    delays = [backoff_delay(attempt) for _ in range(500)]
+
+    assert all(0 <= delay <= cap for delay in delays)
+    # Full jitter spreads retries over the whole window
+    assert min(delays) < cap * 0.1
+    assert max(delays) > cap * 0.9
+
+
+def test_backoff_honours_retry_after_up_to_a_limit(monkeypatch):
+    monkeypatch.setattr(api_executor, 'BASE_DELAY_SECONDS', 1.0)
+    assert all(backoff_delay(0, retry_after=10) >= 10 for _ in range(100))
+    assert backoff_delay(0, retry_after=10_000) == api_executor.MAX_DELAY_SECONDS * 4
+
+
+def test_breaker_opens_after_threshold_and_half_opens(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=60)
+    for _ in range(2):
+        breaker.record_failure()
+        assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    clock.now += 59
+    assert not breaker.allow()
+
+    # After the cooldown exactly one trial request goes through
+    clock.now += 2
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # A failed trial opens the circuit for another cooldown
+    breaker.record_failure()
+    assert not breaker.allow()
+    clock.now += 61
+    assert breaker.allow()
+
+    # A successful trial closes it
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
+    assert breaker.failures == 0
+
+
+def test_breaker_success_resets_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow()
+
+
+def test_breaker_stays_open_for_retry_after(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown_seconds=60)
+    breaker.record_failure(cooldown=300)
+    clock.now += 120
+    assert not breaker.allow()
+    clock.now += 181
+    assert breaker.allow()
+
+
+def test_released_trial_lets_the_next_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown_seconds=60)
+    breaker.record_failure()
+    clock.now += 61
+    assert breaker.allow()
+    # e.g. a transport error, which says nothing about throttling
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_execute_request_retries_transient_errors():
+    delays = []
+    request = ScriptedRequest(http_error(503), ConnectionResetError('reset'),
+                              http_error(429, retry_after=2), {'items': []})
+
+    response = execute_request(request, 'client_0', log=lambda message: None, sleep=delays.append)
+
+    assert response == {'items': []}
+    assert request.calls == 4
+    assert len(delays) == 3
+    assert delays[2] >= 2
+    assert get_circuit_breaker('client_0').failures == 0
+
+
+def test_execute_request_does_not_retry_fatal_errors():
+    delays = []
+    request = ScriptedRequest(FileNotFoundError('client_secret.json'), {'items': []})
+
+    with pytest.raises(FileNotFoundError):
+        execute_request(request, 'client_0', log=lambda message: None, sleep=delays.append)
+    assert request.calls == 1
+    assert delays == []
+
+
+def test_execute_request_gives_up_after_max_retries():
+    request = ScriptedRequest(*[http_error(503) for _ in range(4)])
+
+    with pytest.raises(FakeHttpError):
+        execute_request(request, 'client_0', max_retries=3, log=lambda message: None,
+                        sleep=lambda delay: None)
+    assert request.calls == 4
+
+
+def test_execute_request_fails_fast_once_circuit_opens(monkeypatch):
+    monkeypatch.setattr(api_executor, '_breakers', {
+        'client_0': CircuitBreaker(failure_threshold=2, cooldown_seconds=60)
+    })
+    request = ScriptedRequest(*[http_error(503) for _ in range(5)])
+
+    with pytest.raises(CircuitOpenError):
+        execute_request(request, 'client_0', log=lambda message: None, sleep=lambda delay: None)
+    assert request.calls == 2
+
+    # Other clients keep their own closed circuit
+    assert execute_request(ScriptedRequest({'ok': True}), 'client_1') == {'ok': True}
+
+
+def test_quota_exceeded_trips_the_circuit():
+    request = ScriptedRequest(reason_error('quotaExceeded'), {'items': []})
+
+    with pytest.raises(FakeHttpError):
+        execute_request(request, 'client_0', log=lambda message: None, sleep=lambda delay: None)
+    with pytest.raises(CircuitOpenError):
+        execute_request(request, 'client_0')
+    assert request.calls == 1
+    assert get_metrics().quota_usage()['client_0'] == {'units': 1, 'exhausted': 1}
@@ -0,0 +1,192 @@
+"""Tests of the asyncio fetch engine against the fake YouTube API server."""
+
+import filecmp
+import os
+import threading
+
+from google.oauth2.credentials import Credentials
+
+import async_engine
+from async_engine import fetch_all_accounts_async
+from channel_cache import ChannelCache
+from checkpoint import RunCheckpoint, run_fingerprint
+from client_factory import set_client_factory, YouTubeClientFactory
+from csv_handler import account_output_file
+from metrics import get_metrics, reset_metrics
+from runner import fetch_all_accounts
+from snapshots import SubscriptionSnapshot
+
+
+class RefreshableCredentials:
+    """Credentials whose refresh() swaps a revoked token for a good one."""
+
+    def __init__(self, username, token=None):
+        self.username = username
+        self.token = token or username
+        self.valid = True
+        self.refreshes = 0
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.token = self.username
+
+
+def account_credentials(dataset, creds_type=RefreshableCredentials):
+    return [
+        (username, f'client_{idx % 2}', creds_type(username))
+        for idx, username in enumerate(dataset.usernames())
+    ]
+
+
+def counter_by(name, label):
+    """Sum a counter of the current metrics by one of its labels."""
+    totals = {}
+    for entry in get_metrics().snapshot()['counters']:
+        if entry['name'] == name:
+            key = entry['labels'][label]
+            totals[key] = totals.get(key, 0) + int(entry['value'])
+    return totals
+
+
+def test_matches_threaded_runner(dataset, api_server, tmp_path):
+    threaded_dir = tmp_path / 'threads'
+    set_client_factory(YouTubeClientFactory(cache_dir=None, api_endpoint=api_server.url))
+    try:
+        threaded_counts = fetch_all_accounts(
+            account_credentials(dataset, lambda username: Credentials(token=username)),
+            workers=2,
+            output_dir=str(threaded_dir)
+        )
+    finally:
+        set_client_factory(None)
+
+    async_dir = tmp_path / 'async'
+    async_counts = fetch_all_accounts_async(
+        account_credentials(dataset), workers=2, output_dir=str(async_dir), api_root=api_server.url
+    )
+
+    assert async_counts == threaded_counts
+    assert set(async_counts.values()) == {dataset.channels_per_account}
+    for username in dataset.usernames():
+        async_file = account_output_file(username, str(async_dir))
+        assert filecmp.cmp(
+            account_output_file(username, str(threaded_dir)), async_file, shallow=False
+        )
+    assert sorted(os.listdir(async_dir)) == sorted(os.listdir(threaded_dir))
+
+
+def test_retries_throttled_and_failed_requests(dataset, faults, api_server, tmp_path):
+    faults.fail_next('subscriptions.list', 503, 429)
+    faults.fail_next('channels.list', 429, 503)
+
+    counts = fetch_all_accounts_async(
+        account_credentials(dataset), workers=3, output_dir=str(tmp_path), api_root=api_server.url
+    )
+
+    assert counts == {username: dataset.channels_per_account for username in dataset.usernames()}
+    assert faults.errors == 4
+    assert counter_by('api_retries_total', 'endpoint') == {
+        'subscriptions.list': 2,
+        'channels.list': 2,
+    }
+
+
+def test_unauthorized_request_refreshes_token_once(dataset, api_server, tmp_path):
+    credentials = account_credentials(dataset)
+    username, _, creds = credentials[0]
+    creds.token = 'revoked-token'
+    api_server.revoked_tokens.add('revoked-token')
+
+    counts = fetch_all_accounts_async(
+        credentials, workers=3, output_dir=str(tmp_path), api_root=api_server.url
+    )
+
+    assert counts[username] == dataset.channels_per_account
+    assert creds.refreshes == 1
+    assert creds.token == username
+    assert [other.refreshes for _, _, other in credentials[1:]] == [0, 0]
+
+
+def test_unauthorized_after_refresh_fails_account(dataset, api_server, tmp_path):
+    credentials = account_credentials(dataset)
+    username, _, creds = credentials[0]
+    creds.username = creds.token = 'revoked-token'
+    api_server.revoked_tokens.add('revoked-token')
+
+    counts = fetch_all_accounts_async(
+        credentials, workers=3, output_dir=str(tmp_path), api_root=api_server.url
+    )
+
+    assert counts[username] == 0
+    assert creds.refreshes == 1
+    assert not os.path.exists(account_output_file(username, str(tmp_path)))
+
+
+def test_snapshot_not_modified_reuses_stored_records(dataset, api_server, tmp_path):
+    snapshot_dir = str(tmp_path / 'snapshots')
+    first_dir = tmp_path / 'first'
+    first = fetch_all_accounts_async(
+        account_credentials(dataset), workers=3, output_dir=str(first_dir),
+        snapshot_dir=snapshot_dir, api_root=api_server.url
+    )
+    assert api_server.not_modified == 0
+    pages = len(dataset.usernames()) * 3
+
+    reset_metrics()
+    second_dir = tmp_path / 'second'
+    second = fetch_all_accounts_async(
+        account_credentials(dataset), workers=3, output_dir=str(second_dir),
+        snapshot_dir=snapshot_dir, api_root=api_server.url
+    )
+
+    assert second == first
+    assert api_server.not_modified == pages
+    assert counter_by('pages_total', 'source') == {'snapshot': pages}
+    for username in dataset.usernames():
+        assert filecmp.cmp(
+            account_output_file(username, str(first_dir)),
+            account_output_file(username, str(second_dir)),
+            shallow=False
+        )
+
+
+def test_blocking_calls_run_off_the_event_loop(dataset, api_server, monkeypatch, tmp_path):
+    loop_thread = threading.current_thread()
+    calls = {}
+
+    def off_loop(name, function):
+        def wrapper(*args, **kwargs):
+            calls.setdefault(name, set()).add(threading.current_thread() is loop_thread)
+            return function(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(ChannelCache, 'get_many', off_loop('cache get', ChannelCache.get_many))
+    monkeypatch.setattr(ChannelCache, 'put_many', off_loop('cache put', ChannelCache.put_many))
+    monkeypatch.setattr(
+        RunCheckpoint, 'record_page', off_loop('checkpoint', RunCheckpoint.record_page)
+    )
+    monkeypatch.setattr(
+        SubscriptionSnapshot, 'save', off_loop('snapshot save', SubscriptionSnapshot.save)
+    )
+    monkeypatch.setattr(
+        async_engine.AccountRun, 'complete', off_loop('publish', async_engine.AccountRun.complete)
+    )
+    output_dir = str(tmp_path / 'output')
+    cache = ChannelCache(str(tmp_path / 'cache.sqlite3'))
+    checkpoint = RunCheckpoint(
+        str(tmp_path / 'checkpoint.json'), run_fingerprint(dataset.usernames(), output_dir)
+    )
+
+    counts = fetch_all_accounts_async(
+        account_credentials(dataset), workers=3, cache=cache, output_dir=output_dir,
+        checkpoint=checkpoint, snapshot_dir=str(tmp_path / 'snapshots'), api_root=api_server.url
+    )
+    cache.close()
+
+    assert set(counts.values()) == {dataset.channels_per_account}
+    assert calls == {
+        name: {False}
+        for name in ('cache get', 'cache put', 'checkpoint', 'snapshot save', 'publish')
+    }
+    # Metrics recorded in worker threads are still attributed to the account
+    assert counter_by('account_channels_total', 'account') == counts
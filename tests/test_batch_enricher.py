@@ -0,0 +1,111 @@
+"""Tests of the shared batching channel enricher against the in-process fake API."""
+
+import threading
+import time
+
+import pytest
+
+import batch_enricher
+from batch_enricher import BatchEnricher
+from fake_youtube import FakeDataset, FakeYouTube
+from youtube_api import _parse_channel_category
+
+
+@pytest.fixture
+def youtube(dataset, faults):
+    return FakeYouTube(dataset, faults, dataset.usernames()[0])
+
+
+@pytest.fixture
+def enricher():
+    enricher = BatchEnricher('client_0', window_seconds=0.2)
+    yield enricher
+    enricher.close()
+
+
+def channel_ids(start, stop):
+    return [FakeDataset.channel_id(index) for index in range(start, stop)]
+
+
+def expected_categories(dataset, ids):
+    return {item['id']: _parse_channel_category(item) for item in dataset.channels(ids)['items']}
+
+
+def lookup_in_thread(enricher, ids, youtube, results, key, log=lambda message: None):
+    thread = threading.Thread(
+        target=lambda: results.__setitem__(key, enricher.lookup(ids, youtube, log))
+    )
+    thread.start()
+    return thread
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+def test_in_flight_channels_are_looked_up_once(dataset, faults, youtube, enricher):
+    results = {}
+    first = lookup_in_thread(enricher, channel_ids(0, 60), youtube, results, 'first')
+    wait_for(lambda: enricher._inflight)
+    # Half of these IDs are already queued by the first account
+    second = lookup_in_thread(enricher, channel_ids(30, 90), youtube, results, 'second')
+    first.join()
+    second.join()
+
+    assert results['first'] == expected_categories(dataset, channel_ids(0, 60))
+    assert results['second'] == expected_categories(dataset, channel_ids(30, 90))
+    # 0-49, 50-59 and 60-89 instead of also asking for 30-59 again
+    assert faults.calls['channels.list'] == 3
+    assert (enricher.batches_sent, enricher.calls_sent) == (1, 3)
+    assert enricher._inflight == {}
+
+
+def test_failed_call_does_not_fail_the_batch(dataset, faults, youtube, enricher):
+    warnings = []
+    # The first call is retried after a 503; the second fails for good
+    faults.fail_next('channels.list', 503, 400)
+
+    categories = enricher.lookup(channel_ids(0, 150), youtube, warnings.append)
+
+    expected = expected_categories(dataset, channel_ids(0, 150))
+    expected.update({channel_id: 'Unknown' for channel_id in channel_ids(50, 100)})
+    assert categories == expected
+    assert (enricher.batches_sent, enricher.calls_sent) == (2, 4)
+    assert len(warnings) == 1 and 'for 50 channel(s)' in warnings[0]
+    assert faults.calls['channels.list'] == 4
+
+
+def test_backoff_does_not_hold_up_other_lookups(dataset, faults, youtube, enricher, monkeypatch):
+    monkeypatch.setattr(batch_enricher, 'backoff_delay', lambda attempt: 1.0)
+    faults.fail_next('channels.list', 503)
+    results = {}
+    start = time.monotonic()
+    retried = lookup_in_thread(enricher, channel_ids(0, 10), youtube, results, 'retried')
+    wait_for(lambda: enricher.batches_sent == 1)
+
+    other = enricher.lookup(channel_ids(10, 20), youtube)
+    other_seconds = time.monotonic() - start
+    retried.join()
+    retried_seconds = time.monotonic() - start
+
+    assert other == expected_categories(dataset, channel_ids(10, 20))
+    assert results['retried'] == expected_categories(dataset, channel_ids(0, 10))
+    assert other_seconds < 0.9 <= retried_seconds
+    assert enricher.batches_sent == 3
+
+
+def test_close_sends_retries_that_are_still_backing_off(dataset, faults, youtube, monkeypatch):
+    monkeypatch.setattr(batch_enricher, 'backoff_delay', lambda attempt: 0.3)
+    faults.fail_next('channels.list', 503)
+    enricher = BatchEnricher('client_0', window_seconds=0.01)
+    results = {}
+    thread = lookup_in_thread(enricher, channel_ids(0, 5), youtube, results, 'lookup')
+    wait_for(lambda: enricher.batches_sent == 1)
+
+    enricher.close()
+    thread.join()
+
+    assert results['lookup'] == expected_categories(dataset, channel_ids(0, 5))
@@ -0,0 +1,138 @@
+"""Tests of the SQLite channel metadata cache's TTL expiry and LRU eviction."""
+
+import pytest
+
+import channel_cache
+from channel_cache import ChannelCache
+
+
+class Clock:
+    """A time.time() replacement that only moves when told to."""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(channel_cache.time, 'time', clock)
+    return clock
+
+
+def channel_items(*channel_ids):
+    return [
+        {
+            'id': channel_id,
+            'snippet': {'title': f'Title {channel_id}'},
+            'topicDetails': {'topicCategories': [f'https://en.wikipedia.org/wiki/{channel_id}']},
+        }
+        for channel_id in channel_ids
+    ]
+
+
+def row_count(cache):
+    (count,) = cache._conn.execute("SELECT COUNT(*) FROM channels").fetchone()
+    return count
+
+
+def test_round_trip(clock, tmp_path):
+    cache = ChannelCache(str(tmp_path / 'cache.sqlite3'))
+    cache.put_many(channel_items('UC1') + [{'id': 'UC2'}])
+
+    found = cache.get_many(['UC1', 'UC2', 'UC3', 'UC1'])
+
+    assert found['UC1']['title'] == 'Title UC1'
+    assert found['UC1']['topic_categories'] == ['https://en.wikipedia.org/wiki/UC1']
+    assert found['UC2'] == {'title': None, 'topic_categories': None, 'fetched_at': clock.now}
+    assert 'UC3' not in found
+    assert (cache.hits, cache.misses) == (2, 1)
+    cache.close()
+
+
+def test_expired_entries_are_misses_until_swept(clock, tmp_path):
+    cache = ChannelCache(str(tmp_path / 'cache.sqlite3'), ttl_seconds=100)
+    cache.put_many(channel_items('UC1', 'UC2'))
+    clock.advance(50)
+    cache.put_many(channel_items('UC3'))
+    clock.advance(60)
+
+    assert set(cache.get_many(['UC1', 'UC2', 'UC3'])) == {'UC3'}
+    # Expired rows stay on disk until a sweep
+    assert row_count(cache) == 3
+
+    assert cache.evict() == 2
+    assert row_count(cache) == 1
+    cache.close()
+
+
+def test_refetch_renews_expired_entry(clock, tmp_path):
+    cache = ChannelCache(str(tmp_path / 'cache.sqlite3'), ttl_seconds=100)
+    cache.put_many(channel_items('UC1'))
+    clock.advance(150)
+    cache.put_many(channel_items('UC1'))
+
+    assert set(cache.get_many(['UC1'])) == {'UC1'}
+    assert cache._row_count == row_count(cache) == 1
+    cache.close()
+
+
+def test_sweep_runs_after_insert_threshold(clock, monkeypatch, tmp_path):
+    monkeypatch.setattr(channel_cache, 'EXPIRY_SWEEP_INSERTS', 4)
+    cache = ChannelCache(str(tmp_path / 'cache.sqlite3'), ttl_seconds=100)
+    cache.put_many(channel_items('UC1', 'UC2'))
+    clock.advance(150)
+
+    cache.put_many(channel_items('UC3'))
+    assert row_count(cache) == 3
+    cache.put_many(channel_items('UC4'))
+    assert row_count(cache) == cache._row_count == 2
+    cache.close()
+
+
+def test_lru_eviction_keeps_recently_read(clock, tmp_path):
+    cache = ChannelCache(str(tmp_path / 'cache.sqlite3'), max_entries=3)
+    for channel_id in ('UC1', 'UC2', 'UC3'):
+        cache.put_many(channel_items(channel_id))
+        clock.advance(1)
+    cache.get_many(['UC1'])
+    clock.advance(1)
+
+    cache.put_many(channel_items('UC4', 'UC5'))
+
+    assert set(cache.get_many(['UC1', 'UC2', 'UC3', 'UC4', 'UC5'])) == {'UC1', 'UC4', 'UC5'}
+    assert row_count(cache) == cache._row_count == 3
+    cache.close()
+
+
+def test_replacing_entries_does_not_trigger_eviction(clock, tmp_path):
+    cache = ChannelCache(str(tmp_path / 'cache.sqlite3'), max_entries=2)
+    cache.put_many(channel_items('UC1', 'UC2'))
+    clock.advance(1)
+    cache.put_many(channel_items('UC1', 'UC2', 'UC2'))
+
+    assert set(cache.get_many(['UC1', 'UC2'])) == {'UC1', 'UC2'}
+    assert cache._row_count == 2
+    cache.close()
+
+
+def test_row_count_survives_reopen(clock, tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = ChannelCache(path, max_entries=3)
+    for channel_id in ('UC1', 'UC2', 'UC3'):
+        cache.put_many(channel_items(channel_id))
+        clock.advance(1)
+    cache.close()
+
+    cache = ChannelCache(path, max_entries=3)
+    cache.put_many(channel_items('UC4'))
+
+    assert row_count(cache) == 3
+    assert set(cache.get_many(['UC1', 'UC2', 'UC3', 'UC4'])) == {'UC2', 'UC3', 'UC4'}
+    cache.close()
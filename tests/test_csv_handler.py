@@ -0,0 +1,140 @@
+"""Tests of the external merge sort and the spill-sort-publish account writer."""
+
+import csv
+import os
+import random
+
+import pytest
+
+import csv_handler
+from csv_handler import AccountCsvWriter, CSV_FIELDNAMES, account_output_file, external_sort
+from records import ChannelRecord
+
+
+def records(count, seed=7):
+    """Channel records with shuffled, partly duplicated, mixed-case names."""
+    rng = random.Random(seed)
+    names = [f'{rng.choice(["Alpha", "beta", "Gamma", "delta"])} {rng.randrange(count // 3)}'
+             for _ in range(count)]
+    return [ChannelRecord(f'UC{idx:04d}', name, 'Music') for idx, name in enumerate(names)]
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+
+def leftover_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith('.'))
+
+
+@pytest.mark.parametrize('count', [0, 1, 4, 5, 6, 23])
+def test_external_sort_across_run_boundaries(count, tmp_path):
+    rng = random.Random(count)
+    rows = [[str(rng.randrange(10)), str(idx)] for idx in range(count)]
+    prefix = str(tmp_path / '.sort')
+
+    with external_sort(iter(rows), key=lambda row: int(row[0]), temp_prefix=prefix,
+                       max_rows_in_memory=5) as sorted_rows:
+        runs = sorted(os.listdir(tmp_path))
+        result = list(sorted_rows)
+
+    # Every full run is spilled; a partial first run stays in memory
+    assert len(runs) == (0 if count < 5 else -(-count // 5))
+    # Equal keys keep their input order, as with a stable in-memory sort
+    assert result == sorted(rows, key=lambda row: int(row[0]))
+    assert os.listdir(tmp_path) == []
+
+
+def test_external_sort_removes_runs_when_consumer_fails(tmp_path):
+    rows = [[str(idx % 3)] for idx in range(12)]
+    with pytest.raises(RuntimeError):
+        with external_sort(iter(rows), key=lambda row: row[0], temp_prefix=str(tmp_path / '.sort'),
+                           max_rows_in_memory=4) as sorted_rows:
+            next(sorted_rows)
+            raise RuntimeError('consumer failed')
+    assert os.listdir(tmp_path) == []
+
+
+def test_writer_merges_many_runs_with_duplicate_names(tmp_path):
+    channels = records(50)
+    writer = AccountCsvWriter('someone@example.com', str(tmp_path), max_rows_in_memory=4)
+    for start in range(0, len(channels), 7):
+        writer.write_rows(channels[start:start + 7])
+
+    assert writer.finalize(log=lambda message: None) == account_output_file(
+        'someone@example.com', str(tmp_path)
+    )
+
+    rows = read_csv(writer.output_file)
+    assert rows[0] == CSV_FIELDNAMES
+    # Sorted by lowercased name; duplicate names keep arrival order
+    expected = sorted(channels, key=lambda record: record.name.lower())
+    assert [row[0] for row in rows[1:]] == [record.channel_id for record in expected]
+    assert rows[1][3:] == ['Channel', f'https://www.youtube.com/channel/{expected[0].channel_id}', 'Yes']
+    assert leftover_files(tmp_path) == []
+
+
+def test_writer_matches_in_memory_sort(tmp_path):
+    channels = records(40, seed=3)
+    small = AccountCsvWriter('a@example.com', str(tmp_path / 'small'), max_rows_in_memory=3)
+    large = AccountCsvWriter('a@example.com', str(tmp_path / 'large'))
+    for writer in (small, large):
+        writer.write_rows(channels)
+        writer.finalize(log=lambda message: None)
+
+    assert read_csv(small.output_file) == read_csv(large.output_file)
+
+
+def test_writer_without_rows_publishes_nothing(tmp_path):
+    writer = AccountCsvWriter('empty@example.com', str(tmp_path))
+    assert writer.finalize(log=lambda message: None) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_finalize_never_publishes_half_a_file(monkeypatch, tmp_path):
+    output_dir = str(tmp_path)
+    previous = AccountCsvWriter('someone@example.com', output_dir, max_rows_in_memory=4)
+    previous.write_rows(records(10, seed=1))
+    published = previous.finalize(log=lambda message: None)
+    before = read_csv(published)
+
+    writer = AccountCsvWriter('someone@example.com', output_dir, max_rows_in_memory=4)
+    writer.write_rows(records(30, seed=2))
+
+    real_read_run = csv_handler._read_run
+
+    def failing_read_run(run_file):
+        # Fail part way through the merge, after rows reached the temp file
+        for count, row in enumerate(real_read_run(run_file)):
+            if '.run' in run_file and count == 2:
+                raise OSError('disk error')
+            yield row
+
+    monkeypatch.setattr(csv_handler, '_read_run', failing_read_run)
+    with pytest.raises(OSError):
+        writer.finalize(log=lambda message: None)
+
+    # The published file is the previous run's, and no temporary files remain
+    assert read_csv(published) == before
+    assert leftover_files(tmp_path) == []
+
+
+def test_resume_truncates_spill_to_checkpointed_offset(tmp_path):
+    channels = records(12)
+    writer = AccountCsvWriter('someone@example.com', str(tmp_path), max_rows_in_memory=4)
+    writer.write_rows(channels[:6])
+    offset, rows = writer.spill_offset, writer.row_count
+    # Rows written after the last checkpoint are dropped on resume
+    writer.write_rows(channels[6:9])
+    writer.suspend()
+
+    resumed = AccountCsvWriter('someone@example.com', str(tmp_path), max_rows_in_memory=4,
+                               resume_rows=rows, resume_offset=offset)
+    resumed.write_rows(channels[6:])
+    resumed.finalize(log=lambda message: None)
+
+    fresh = AccountCsvWriter('someone@example.com', str(tmp_path / 'fresh'))
+    fresh.write_rows(channels)
+    fresh.finalize(log=lambda message: None)
+    assert read_csv(resumed.output_file) == read_csv(fresh.output_file)
@@ -0,0 +1,101 @@
+"""Tests of merging account files into merged_channels.csv, and of youtube_merger --offline."""
+
+import csv
+import os
+
+import youtube_merger
+from csv_handler import AccountCsvWriter
+from merge_engine import MERGED_FIELDNAMES, MERGED_FILENAME, find_account_files, merge_account_files
+from records import ChannelRecord
+
+ACCOUNTS = {
+    'carol@example.com': [('UC3', 'Three', 'Music'), ('UC1', 'One (carol)', 'Gaming')],
+    'alice@example.com': [('UC1', 'One', 'Music'), ('UC2', 'Two', 'Sports'),
+                          ('UC4', 'Four', 'Film')],
+    'bob@example.com': [('UC2', 'Two', 'Sports'), ('UC1', 'One (bob)', 'Music'),
+                        ('UC5', 'Five', 'News')],
+}
+
+EXPECTED_ROWS = [
+    ['UC1', 'One', 'Music', 'Channel', 'https://www.youtube.com/channel/UC1',
+     'alice;bob;carol', '3'],
+    ['UC2', 'Two', 'Sports', 'Channel', 'https://www.youtube.com/channel/UC2', 'alice;bob', '2'],
+    ['UC3', 'Three', 'Music', 'Channel', 'https://www.youtube.com/channel/UC3', 'carol', '1'],
+    ['UC4', 'Four', 'Film', 'Channel', 'https://www.youtube.com/channel/UC4', 'alice', '1'],
+    ['UC5', 'Five', 'News', 'Channel', 'https://www.youtube.com/channel/UC5', 'bob', '1'],
+]
+
+
+def write_account_files(output_dir):
+    for username, channels in ACCOUNTS.items():
+        writer = AccountCsvWriter(username, output_dir)
+        writer.write_rows([ChannelRecord(*channel) for channel in channels])
+        writer.finalize(log=lambda message: None)
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+
+def test_merge_account_files(tmp_path):
+    output_dir = str(tmp_path)
+    write_account_files(output_dir)
+    account_files = find_account_files(output_dir)
+    assert [label for label, _ in account_files] == ['alice', 'bob', 'carol']
+
+    merged_file = os.path.join(output_dir, MERGED_FILENAME)
+    # Two rows per sorted run, so the rows are merged from several runs
+    stats = merge_account_files(account_files, merged_file, max_rows_in_memory=2)
+
+    assert stats == {'accounts': 3, 'rows': 8, 'unique_channels': 5}
+    assert read_csv(merged_file) == [MERGED_FIELDNAMES] + EXPECTED_ROWS
+    assert sorted(os.listdir(output_dir)) == [
+        'channels_alice.csv', 'channels_bob.csv', 'channels_carol.csv', MERGED_FILENAME
+    ]
+
+
+def test_merge_lists_an_account_once_per_channel(tmp_path):
+    path = tmp_path / 'channels_dave.csv'
+    path.write_text(
+        'Channel ID,Channel Name,Category,Type,Channel Link,New to List\n'
+        'UC1,One,Music,Channel,https://www.youtube.com/channel/UC1,Yes\n'
+        'UC1,One,Music,Channel,https://www.youtube.com/channel/UC1,Yes\n',
+        encoding='utf-8'
+    )
+    merged_file = str(tmp_path / MERGED_FILENAME)
+
+    stats = merge_account_files([('dave', str(path))], merged_file)
+
+    assert stats['unique_channels'] == 1
+    assert read_csv(merged_file)[1][5:] == ['dave', '1']
+
+
+def test_merger_offline(monkeypatch, tmp_path, capsys):
+    # The merger finds output/ next to src/, so point it at a scratch root
+    root_dir = tmp_path / 'root'
+    output_dir = root_dir / 'output'
+    write_account_files(str(output_dir))
+    monkeypatch.setattr(youtube_merger, '__file__', str(root_dir / 'src' / 'youtube_merger.py'))
+    accounts_file = tmp_path / 'accounts.csv'
+    accounts_file.write_text('email\nalice@example.com\ncarol@example.com\n', encoding='utf-8')
+    report = tmp_path / 'run_report.json'
+
+    monkeypatch.setattr('sys.argv', ['youtube_merger.py', '--offline', '--report', str(report)])
+    assert youtube_merger.main() == 0
+    assert read_csv(output_dir / MERGED_FILENAME) == [MERGED_FIELDNAMES] + EXPECTED_ROWS
+    assert 'into 5 unique channels' in capsys.readouterr().out
+    assert report.exists()
+    # Offline merges never open the channel cache
+    assert not (root_dir / 'cache').exists()
+
+    # An accounts file limits the merge to the accounts it lists
+    monkeypatch.setattr('sys.argv', [
+        'youtube_merger.py', str(accounts_file), '--offline', '--report', str(report)
+    ])
+    assert youtube_merger.main() == 0
+    rows = read_csv(output_dir / MERGED_FILENAME)[1:]
+    assert [(row[0], row[5], row[6]) for row in rows] == [
+        ('UC1', 'alice;carol', '2'), ('UC2', 'alice', '1'), ('UC3', 'carol', '1'),
+        ('UC4', 'alice', '1'),
+    ]
@@ -0,0 +1,174 @@
+"""Tests of the staged extraction pipeline against the in-process fake API."""
+
+import os
+import threading
+import time
+
+import pipeline
+import runner
+from conftest import TokenCredentials
+from csv_handler import account_output_file
+from fake_youtube import FakeDataset, FakeYouTube, FaultInjector
+from metrics import get_metrics
+from pipeline import ExtractionPipeline, fetch_all_accounts_pipeline
+from youtube_api import page_channel_ids
+
+
+def first_page_ids(dataset, username):
+    return set(page_channel_ids(dataset.subscriptions_page(username, None)['items']))
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def serve(monkeypatch, dataset, faults):
+    """Serve another dataset than the conftest one from the in-process fake API."""
+    def build(creds):
+        return FakeYouTube(dataset, faults, creds.token)
+    monkeypatch.setattr(pipeline, 'build_youtube_client', build)
+
+
+def test_pages_are_written_in_order_when_enriched_out_of_order(
+    dataset, fake_api, fake_accounts, monkeypatch, tmp_path
+):
+    expected_dir = str(tmp_path / 'threads')
+    expected = runner.fetch_all_accounts(fake_accounts, output_dir=expected_dir)
+
+    first_pages = {frozenset(first_page_ids(dataset, username)) for username in dataset.usernames()}
+    enriched, written = [], {}
+    lock = threading.Lock()
+    real_categories = pipeline.get_channel_categories
+
+    def slow_first_page(channel_ids, *args):
+        # The first page of every account finishes enrichment last
+        if frozenset(channel_ids) in first_pages:
+            time.sleep(0.2)
+        categories = real_categories(channel_ids, *args)
+        with lock:
+            enriched.append(frozenset(channel_ids) in first_pages)
+        return categories
+
+    real_handle_page = runner.AccountRun.handle_page
+
+    def record_write(run, records, next_page_token):
+        written.setdefault(run.username, []).append(next_page_token)
+        real_handle_page(run, records, next_page_token)
+
+    monkeypatch.setattr(pipeline, 'get_channel_categories', slow_first_page)
+    monkeypatch.setattr(runner.AccountRun, 'handle_page', record_write)
+    output_dir = str(tmp_path / 'pipeline')
+    counts = fetch_all_accounts_pipeline(
+        fake_accounts, workers=3, output_dir=output_dir, enrich_workers=9
+    )
+
+    assert counts == expected
+    # Later pages were enriched before the first ones...
+    assert enriched[:6] == [False] * 6
+    # ...but every account's pages were still written in page order
+    assert written == {username: ['50', '100', None] for username in dataset.usernames()}
+    for username in dataset.usernames():
+        assert read_bytes(account_output_file(username, output_dir)) == read_bytes(
+            account_output_file(username, expected_dir)
+        )
+
+
+def test_summary_names_the_slowest_stage(dataset, fake_api, fake_accounts, monkeypatch, tmp_path):
+    real_categories = pipeline.get_channel_categories
+
+    def slow_categories(*args):
+        time.sleep(0.05)
+        return real_categories(*args)
+
+    monkeypatch.setattr(pipeline, 'get_channel_categories', slow_categories)
+    extraction = ExtractionPipeline(
+        fetch_workers=3, enrich_workers=1, write_workers=1, queue_size=2,
+        output_dir=str(tmp_path)
+    )
+    extraction.run(fake_accounts)
+
+    lines = extraction.summary()
+    pages = len(dataset.usernames()) * 3
+    assert lines[0] == 'Pipeline stages:'
+    assert [line.split()[0] for line in lines[1:4]] == ['fetch', 'enrich', 'write']
+    for line in lines[1:4]:
+        assert f'{pages} item(s)' in line
+    assert 'worker(s)' in lines[2] and lines[2].split()[1] == '1'
+    assert lines[4].startswith('  queue to enrich capacity    2')
+    assert lines[5].startswith('  queue to write  capacity    2')
+    assert lines[-1] == '  Bottleneck: enrich stage'
+    # The fetch stage waited for room in the small queue in front of enrichment
+    assert extraction.stats['fetch'].blocked > 0
+    assert extraction.enrich_queue.max_depth <= 2
+    items = {
+        entry['labels']['stage']: int(entry['value'])
+        for entry in get_metrics().snapshot()['counters'] if entry['name'] == 'pipeline_items_total'
+    }
+    assert items == {'fetch': pages, 'enrich': pages, 'write': pages}
+
+
+def test_failed_account_stops_paginating(monkeypatch, tmp_path):
+    dataset = FakeDataset(1, 500, pool_size=1000, page_size=50)
+    faults = FaultInjector(latency_ms=20)
+    serve(monkeypatch, dataset, faults)
+    username = dataset.usernames()[0]
+    first_page = first_page_ids(dataset, username)
+    finished = []
+    real_log_fetch_error = pipeline.log_fetch_error
+
+    def failing_categories(channel_ids, *args):
+        if set(channel_ids) == first_page:
+            raise RuntimeError('enrichment failed')
+        return {channel_id: 'Unknown' for channel_id in channel_ids}
+
+    def count_finish(*args):
+        finished.append(args[0])
+        real_log_fetch_error(*args)
+
+    monkeypatch.setattr(pipeline, 'get_channel_categories', failing_categories)
+    monkeypatch.setattr(pipeline, 'log_fetch_error', count_finish)
+    counts = fetch_all_accounts_pipeline(
+        [(username, 'client_0', TokenCredentials(username))], workers=1, output_dir=str(tmp_path)
+    )
+
+    assert counts == {username: 0}
+    # Ten pages exist; the fetch stage stops once the first page's enrichment failed
+    assert faults.calls['subscriptions.list'] < 10
+    # The failed first page is not mistaken for the end of the account
+    assert finished == [username]
+    assert os.listdir(tmp_path) == []
+
+
+def test_account_setup_errors_skip_only_that_account(
+    dataset, fake_api, fake_accounts, monkeypatch, tmp_path, capsys
+):
+    usernames = dataset.usernames()
+    real_account_run = runner.AccountRun
+    real_load = pipeline.SubscriptionSnapshot.load
+
+    def account_run(username, *args):
+        if username == usernames[0]:
+            raise OSError('output folder is read-only')
+        return real_account_run(username, *args)
+
+    def load_snapshot(snapshot_dir, username):
+        if username == usernames[1]:
+            raise ValueError('corrupt snapshot')
+        return real_load(snapshot_dir, username)
+
+    monkeypatch.setattr(pipeline, 'AccountRun', account_run)
+    monkeypatch.setattr(pipeline.SubscriptionSnapshot, 'load', staticmethod(load_snapshot))
+    # One fetch worker, so an error that killed it would drop the accounts after it
+    counts = fetch_all_accounts_pipeline(
+        fake_accounts, workers=1, output_dir=str(tmp_path / 'output'),
+        snapshot_dir=str(tmp_path / 'snapshots')
+    )
+
+    assert counts == {usernames[1]: 0, usernames[2]: dataset.channels_per_account}
+    out = capsys.readouterr().out
+    assert f"❌ Failed to process account '{usernames[0]}': output folder is read-only" in out
+    assert 'corrupt snapshot' in out
+    assert os.listdir(tmp_path / 'output') == [
+        os.path.basename(account_output_file(usernames[2], ''))
+    ]
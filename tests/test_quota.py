@@ -0,0 +1,117 @@
+"""Tests of the quota ledger and planner against the in-process fake API."""
+
+import json
+
+import pytest
+
+import quota
+from metrics import get_metrics
+from quota import QuotaLedger, estimate_account_cost, plan_quota
+from runner import fetch_all_accounts
+
+
+def credentials_config(usernames, **budgets):
+    return {
+        'account_to_client_mapping': {
+            username: f'client_{idx % 2}' for idx, username in enumerate(usernames)
+        },
+        'quota_budgets': budgets,
+    }
+
+
+def accounts(usernames):
+    return [{'username': username} for username in usernames]
+
+
+def test_plan_defers_accounts_over_budget(tmp_path):
+    usernames = [f'account{idx}@example.com' for idx in range(4)]
+    ledger = QuotaLedger(str(tmp_path / 'quota_state.json'))
+    for username in usernames:
+        ledger.record_account(username, 500)
+    ledger.record_units('client_1', 15)
+    cost = estimate_account_cost(500)
+
+    plan = plan_quota(
+        accounts(usernames), credentials_config(usernames, client_0=cost, client_1=2 * cost),
+        ledger
+    )
+
+    # client_0 fits one account; client_1 fits one after what it spent today
+    assert [account['username'] for account in plan['scheduled']] == usernames[:2]
+    assert [(account['username'], client_key, estimate, remaining)
+            for account, client_key, estimate, remaining in plan['deferred']] == [
+        (usernames[2], 'client_0', cost, 0),
+        (usernames[3], 'client_1', cost, cost - 15),
+    ]
+    assert plan['clients']['client_1'] == {
+        'budget': 2 * cost, 'spent': 15, 'planned': cost, 'exhausted': False
+    }
+
+
+def test_record_usage_charges_only_new_units(tmp_path):
+    ledger = QuotaLedger(str(tmp_path / 'quota_state.json'))
+    charged = {}
+
+    ledger.record_usage({'client_0': {'units': 10, 'exhausted': 0}}, charged)
+    ledger.record_usage({'client_0': {'units': 25, 'exhausted': 0},
+                         'client_1': {'units': 4, 'exhausted': 1}}, charged)
+
+    assert ledger.usage == {'client_0': 25, 'client_1': 4}
+    assert ledger.exhausted == ['client_1']
+    assert charged['client_0'] == {'units': 25, 'exhausted': 0}
+
+
+def test_quota_exceeded_client_is_deferred_until_reset(
+    dataset, faults, fake_api, fake_accounts, tmp_path, capsys
+):
+    usernames = dataset.usernames()
+    # The first subscriptions.list call goes to the first account, on client_0
+    faults.fail_next('subscriptions.list', 403)
+    counts = fetch_all_accounts(fake_accounts, workers=1)
+
+    state_file = str(tmp_path / 'quota_state.json')
+    ledger = QuotaLedger(state_file)
+    ledger.record_usage(get_metrics().quota_usage())
+    ledger.record_results(counts)
+    ledger.save()
+
+    ledger = QuotaLedger(state_file)
+    assert ledger.exhausted == ['client_0']
+    assert ledger.spent_today('client_0') > 0
+    # Every request that reached the API was charged, including the failed one
+    assert sum(ledger.usage.values()) == sum(faults.calls.values())
+    assert usernames[0] not in ledger.subscription_counts
+
+    plan = plan_quota(accounts(usernames), credentials_config(usernames), ledger)
+    assert [account['username'] for account in plan['scheduled']] == [usernames[1]]
+    assert [account['username'] for account, *_ in plan['deferred']] == [usernames[0], usernames[2]]
+    assert all(remaining == 0 for *_, remaining in plan['deferred'])
+
+    # The next quota day starts with a clean budget
+    with open(state_file, encoding='utf-8') as f:
+        state = json.load(f)
+    state['usage_day'] = '2000-01-01'
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    plan = plan_quota(accounts(usernames), credentials_config(usernames), QuotaLedger(state_file))
+    assert len(plan['scheduled']) == 3
+
+
+def test_save_keeps_previous_state_when_write_fails(monkeypatch, tmp_path):
+    state_file = tmp_path / 'quota_state.json'
+    ledger = QuotaLedger(str(state_file))
+    ledger.record_units('client_0', 7)
+    ledger.save()
+    saved = state_file.read_text(encoding='utf-8')
+
+    def broken_dump(state, f, **kwargs):
+        f.write('{"usage": ')
+        raise OSError('disk full')
+
+    ledger.record_units('client_0', 5)
+    monkeypatch.setattr(quota.json, 'dump', broken_dump)
+    with pytest.raises(OSError):
+        ledger.save()
+
+    assert state_file.read_text(encoding='utf-8') == saved
+    assert QuotaLedger(str(state_file)).spent_today('client_0') == 7
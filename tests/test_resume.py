@@ -0,0 +1,155 @@
+"""Tests of checkpointed runs that are stopped and resumed against the fake API."""
+
+import os
+import sqlite3
+
+import pytest
+
+from checkpoint import RunCheckpoint, run_fingerprint
+from records import ChannelRecord
+from runner import fetch_all_accounts
+from sinks import SQLITE_FILENAME, account_sink_file, open_account_sink
+
+
+class Interrupted(Exception):
+    """Stands in for the process dying."""
+
+
+class InterruptingCheckpoint(RunCheckpoint):
+    """Fails once, after a page was written but before it was checkpointed."""
+
+    def __init__(self, checkpoint_file, fingerprint, fail_at_page):
+        super().__init__(checkpoint_file, fingerprint)
+        self.fail_at_page = fail_at_page
+        self.pages = 0
+
+    def record_page(self, *args):
+        self.pages += 1
+        if self.pages == self.fail_at_page:
+            raise Interrupted('stopped before the page was checkpointed')
+        super().record_page(*args)
+
+
+def published_outputs(output_dir, output_format):
+    """The run's published files by name, or the SQLite rows without timestamps."""
+    if output_format == 'sqlite':
+        conn = sqlite3.connect(os.path.join(output_dir, SQLITE_FILENAME))
+        try:
+            return conn.execute(
+                "SELECT account, channel_id, channel_name, category, type, channel_link "
+                "FROM subscriptions ORDER BY account, channel_id"
+            ).fetchall()
+        finally:
+            conn.close()
+    outputs = {}
+    for name in sorted(os.listdir(output_dir)):
+        with open(os.path.join(output_dir, name), 'rb') as f:
+            outputs[name] = f.read()
+    return outputs
+
+
+@pytest.mark.parametrize('output_format', ['csv', 'jsonl', 'sqlite'])
+@pytest.mark.parametrize('stopped_accounts, fail_at_page', [
+    # Killed after the first account was published
+    (1, None),
+    # Killed on the second account's second page, after its rows reached the
+    # output but before the checkpoint recorded them
+    (2, 5),
+])
+def test_resume_matches_uninterrupted_run(
+    output_format, stopped_accounts, fail_at_page, dataset, faults, fake_api, fake_accounts,
+    tmp_path
+):
+    usernames = dataset.usernames()
+    expected_dir = str(tmp_path / 'uninterrupted')
+    expected_counts = fetch_all_accounts(
+        fake_accounts, output_dir=expected_dir, output_format=output_format
+    )
+    full_run_pages = faults.calls['subscriptions.list']
+
+    output_dir = str(tmp_path / 'interrupted')
+    checkpoint_file = str(tmp_path / 'checkpoint.json')
+    fingerprint = run_fingerprint(usernames, output_dir, output_format)
+    checkpoint = InterruptingCheckpoint(checkpoint_file, fingerprint, fail_at_page)
+    fetch_all_accounts(
+        fake_accounts[:stopped_accounts], output_dir=output_dir, checkpoint=checkpoint,
+        output_format=output_format
+    )
+
+    saved = RunCheckpoint.load(checkpoint_file, fingerprint)
+    assert list(saved.completed) == [usernames[0]]
+    if fail_at_page:
+        progress = saved.progress(usernames[1])
+        assert progress['row_count'] == dataset.page_size
+        if output_format != 'sqlite':
+            # The spill file holds a page the checkpoint does not know about
+            spill_file = os.path.join(
+                output_dir, '.' + os.path.basename(account_sink_file(output_format, usernames[1]))
+            ) + '.spill'
+            assert os.path.getsize(spill_file) > progress['spill_offset']
+    else:
+        assert saved.in_progress == {}
+
+    pages_before_resume = faults.calls['subscriptions.list']
+    counts = fetch_all_accounts(
+        fake_accounts, output_dir=output_dir, checkpoint=saved, output_format=output_format
+    )
+
+    assert counts == expected_counts
+    assert published_outputs(output_dir, output_format) == published_outputs(
+        expected_dir, output_format
+    )
+    # Only the pages after the last checkpoint are fetched again
+    pages_per_account = full_run_pages // len(usernames)
+    resumed_pages = faults.calls['subscriptions.list'] - pages_before_resume
+    assert resumed_pages == full_run_pages - pages_per_account - (1 if fail_at_page else 0)
+    assert set(saved.completed) == set(usernames)
+    assert saved.in_progress == {}
+
+
+def test_resume_of_another_run_starts_over(dataset, fake_api, fake_accounts, tmp_path, capsys):
+    output_dir = str(tmp_path / 'output')
+    checkpoint_file = str(tmp_path / 'checkpoint.json')
+    usernames = dataset.usernames()
+    fetch_all_accounts(
+        fake_accounts[:1], output_dir=output_dir,
+        checkpoint=RunCheckpoint(checkpoint_file, run_fingerprint(usernames, output_dir))
+    )
+
+    other = RunCheckpoint.load(checkpoint_file, run_fingerprint(usernames, output_dir, 'jsonl'))
+
+    assert other.completed == {} and other.in_progress == {}
+    assert 'different account list' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('output_format', ['csv', 'jsonl'])
+def test_spill_offset_truncates_after_multibyte_rows(output_format, tmp_path):
+    # The spill file is opened in text mode; its tell() offsets must still
+    # be byte positions that truncate() accepts after non-ASCII rows
+    pages = [
+        [ChannelRecord(f'UC{page}{idx}', name, 'Musique, Ñandú') for idx, name in enumerate(names)]
+        for page, names in enumerate([
+            ['Café ☕', 'Ñandú', 'naïve'], ['東京チャンネル', '🎸 Guitar'], ['Zürich', 'Ωmega'],
+        ])
+    ]
+    writer = open_account_sink(output_format, 'someone@example.com', str(tmp_path / 'resumed'))
+    writer.write_rows(pages[0])
+    offset, rows = writer.spill_offset, writer.row_count
+    assert offset == os.path.getsize(writer.spill_file)
+    writer.write_rows(pages[1])
+    writer.suspend()
+
+    resumed = open_account_sink(
+        output_format, 'someone@example.com', str(tmp_path / 'resumed'),
+        resume_rows=rows, resume_offset=offset
+    )
+    for page in pages[1:]:
+        resumed.write_rows(page)
+    resumed.finalize(log=lambda message: None)
+
+    fresh = open_account_sink(output_format, 'someone@example.com', str(tmp_path / 'fresh'))
+    for page in pages:
+        fresh.write_rows(page)
+    fresh.finalize(log=lambda message: None)
+    with open(resumed.output_file, 'rb') as f, open(fresh.output_file, 'rb') as g:
+        assert f.read() == g.read()
@@ -0,0 +1,190 @@
+"""Tests of shard planning, shard manifests and combining shards against the fake API."""
+
+import json
+import os
+import sqlite3
+
+import pytest
+
+from metrics import get_metrics, reset_metrics, write_run_files
+from quota import QuotaLedger
+from runner import fetch_all_accounts
+from sharding import (
+    MANIFEST_FILENAME, SHARD_REPORT_FILENAME, combine_shards, load_shard_manifests,
+    load_shard_plan, plan_shards, save_shard_plan, select_shard, shard_output_dir,
+    write_shard_manifest,
+)
+from sinks import SQLITE_FILENAME
+
+
+def credentials_config(usernames, clients=3):
+    return {
+        'account_to_client_mapping': {
+            username: f'client_{idx % clients}' for idx, username in enumerate(usernames)
+        }
+    }
+
+
+def accounts_of(usernames):
+    return [{'username': username} for username in usernames]
+
+
+def counters(name, label):
+    totals = {}
+    for entry in get_metrics().snapshot()['counters']:
+        if entry['name'] == name:
+            key = entry['labels'][label]
+            totals[key] = totals.get(key, 0) + int(entry['value'])
+    return totals
+
+
+def published(output_dir, output_format):
+    """Account files by name, or the SQLite rows without sync timestamps."""
+    if output_format == 'sqlite':
+        conn = sqlite3.connect(os.path.join(output_dir, SQLITE_FILENAME))
+        try:
+            return conn.execute(
+                "SELECT account, channel_id, channel_name, category, type, channel_link "
+                "FROM subscriptions ORDER BY account, channel_id"
+            ).fetchall()
+        finally:
+            conn.close()
+    outputs = {}
+    for name in sorted(os.listdir(output_dir)):
+        path = os.path.join(output_dir, name)
+        if name.startswith('channels_'):
+            with open(path, 'rb') as f:
+                outputs[name] = f.read()
+    return outputs
+
+
+def test_plan_is_the_same_on_every_machine(tmp_path):
+    usernames = [f'account{idx}@example.com' for idx in range(12)]
+    config = credentials_config(usernames, clients=5)
+    plan = plan_shards(accounts_of(usernames), config, None, 3)
+
+    # Another machine reads the accounts and the mapping in another order
+    other_config = {'account_to_client_mapping': dict(
+        reversed(list(config['account_to_client_mapping'].items()))
+    )}
+    assert plan_shards(accounts_of(usernames), other_config, None, 3) == plan
+
+    # Every client is on exactly one shard and every account on the shard of its client
+    assert sorted(plan['clients']) == [f'client_{idx}' for idx in range(5)]
+    selected = [select_shard(accounts_of(usernames), config, plan, idx) for idx in (1, 2, 3)]
+    assigned = [account['username'] for shard in selected for account in shard]
+    assert sorted(assigned) == sorted(usernames)
+    assert [len(shard) for shard in selected] == plan['shard_accounts']
+
+    # A shared plan file gives every machine the same assignment and plan ID
+    path = str(tmp_path / 'shard_plan.json')
+    save_shard_plan(plan, path)
+    assert load_shard_plan(path) == plan
+    assert os.listdir(tmp_path) == ['shard_plan.json']
+
+
+def test_plan_weighs_clients_by_ledger_when_shared(tmp_path):
+    usernames = [f'account{idx}@example.com' for idx in range(4)]
+    config = credentials_config(usernames, clients=4)
+    ledger = QuotaLedger(str(tmp_path / 'quota_state.json'))
+    ledger.record_account(usernames[3], 50_000)
+
+    plan = plan_shards(accounts_of(usernames), config, ledger, 2)
+
+    # The big client gets a shard of its own
+    assert plan['clients']['client_3'] == 1
+    assert {plan['clients'][f'client_{idx}'] for idx in range(3)} == {2}
+
+
+def run_shard(index, count, plan, usernames, fake_accounts, config, output_dir, output_format):
+    """Run one shard like youtube_extractor.py --shard I/N, with its own metrics."""
+    reset_metrics()
+    shard_accounts = select_shard(accounts_of(usernames), config, plan, index)
+    shard_usernames = [account['username'] for account in shard_accounts]
+    shard_dir = shard_output_dir(output_dir, index, count)
+    write_shard_manifest(shard_dir, plan, index, shard_usernames, output_format)
+    counts = fetch_all_accounts(
+        [entry for entry in fake_accounts if entry[0] in shard_usernames],
+        output_dir=shard_dir, output_format=output_format
+    )
+    write_run_files(
+        {'command': 'youtube_extractor', 'exit_code': 0, 'accounts': len(counts),
+         'channels': sum(counts.values())},
+        os.path.join(shard_dir, SHARD_REPORT_FILENAME)
+    )
+    return shard_dir
+
+
+@pytest.mark.parametrize('output_format', ['csv', 'sqlite'])
+def test_combined_shards_match_single_node_run(
+    output_format, dataset, fake_api, fake_accounts, tmp_path
+):
+    usernames = dataset.usernames()
+    config = {'account_to_client_mapping': {
+        username: client_key for username, client_key, _ in fake_accounts
+    }}
+
+    single_dir = str(tmp_path / 'single')
+    single_counts = fetch_all_accounts(fake_accounts, output_dir=single_dir,
+                                       output_format=output_format)
+    single_requests = counters('api_requests_total', 'endpoint')
+
+    output_dir = str(tmp_path / 'sharded')
+    plan = plan_shards(accounts_of(usernames), config, None, 2)
+    shard_dirs = [
+        run_shard(index, 2, plan, usernames, fake_accounts, config, output_dir, output_format)
+        for index in (1, 2)
+    ]
+    # Each shard only wrote its own accounts
+    assert all(published(shard_dir, output_format) for shard_dir in shard_dirs)
+
+    report = str(tmp_path / 'run_report.json')
+    stats = combine_shards(output_dir, report_path=report)
+
+    assert stats['shards'] == 2
+    assert stats['accounts'] == len(usernames)
+    assert stats['missing'] == []
+    assert published(output_dir, output_format) == published(single_dir, output_format)
+    # The merged report counts every shard's requests
+    assert counters('api_requests_total', 'endpoint') == single_requests
+    with open(report, encoding='utf-8') as f:
+        run = json.load(f)['run']
+    assert run['accounts'] == len(single_counts)
+    assert run['channels'] == sum(single_counts.values())
+
+
+def write_manifest(shards_root, directory, shard, shards=2, plan_id='plan-a', accounts=()):
+    path = os.path.join(shards_root, directory)
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump({'shard': shard, 'shards': shards, 'plan_id': plan_id,
+                   'accounts': list(accounts), 'output_format': 'csv'}, f)
+
+
+def test_manifests_of_a_complete_plan(tmp_path):
+    write_manifest(str(tmp_path), 'shard_2_of_2', 2, accounts=['b@example.com'])
+    write_manifest(str(tmp_path), 'shard_1_of_2', 1, accounts=['a@example.com'])
+
+    manifests = load_shard_manifests(str(tmp_path))
+
+    assert [manifest['shard'] for _, manifest in manifests] == [1, 2]
+
+
+@pytest.mark.parametrize('manifests, message', [
+    ([], 'No shard outputs found'),
+    ([('shard_1_of_3', 1, 3, {}), ('shard_3_of_3', 3, 3, {})], 'Missing output of shard(s) 2/3'),
+    ([('shard_1_of_2', 1, 2, {}), ('shard_2_of_2', 2, 2, {'plan_id': 'plan-b'})],
+     'come from 2 different shard plans'),
+    ([('shard_1_of_2', 1, 2, {}), ('shard_1_of_2_copy', 1, 2, {}), ('shard_2_of_2', 2, 2, {})],
+     'Shard 1/2 was found twice'),
+    ([('shard_1_of_2', 1, 2, {'accounts': ['a@example.com']}),
+      ('shard_2_of_2', 2, 2, {'accounts': ['a@example.com']})],
+     'Account a@example.com is in shards 1 and 2'),
+])
+def test_manifest_checks(manifests, message, tmp_path):
+    for directory, shard, shards, extra in manifests:
+        write_manifest(str(tmp_path), directory, shard, shards=shards, **extra)
+
+    with pytest.raises(Exception) as error:
+        load_shard_manifests(str(tmp_path))
+    assert message in str(error.value)
@@ -0,0 +1,154 @@
+"""Round-trip tests of the output sinks."""
+
+import csv
+import json
+import os
+import sqlite3
+
+import pytest
+
+import sinks
+from records import ChannelRecord
+from sinks import FIELD_NAMES, SQLITE_FILENAME, account_sink_file, open_account_sink
+
+CHANNELS = [
+    ChannelRecord('UC3', 'zebra "quoted", with comma', 'Music, Film'),
+    ChannelRecord('UC1', 'Ñandú ☕', 'Unknown'),
+    ChannelRecord('UC2', 'Apple\nsecond line', 'Gaming'),
+    ChannelRecord('UC4', 'apple', 'Sports'),
+]
+
+# Sorted by lowercased name, ties in arrival order
+EXPECTED_ROWS = [
+    [channel.channel_id, channel.name, channel.category, 'Channel',
+     f'https://www.youtube.com/channel/{channel.channel_id}', 'Yes']
+    for channel in (CHANNELS[3], CHANNELS[2], CHANNELS[0], CHANNELS[1])
+]
+
+
+def read_published(output_format, path):
+    if output_format == 'csv':
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == ['Channel ID', 'Channel Name', 'Category', 'Type', 'Channel Link',
+                           'New to List']
+        return rows[1:]
+    if output_format == 'jsonl':
+        with open(path, encoding='utf-8') as f:
+            return [[record[name] for name in FIELD_NAMES] for record in map(json.loads, f)]
+    table = pytest.importorskip('pyarrow.parquet').read_table(path)
+    assert table.column_names == FIELD_NAMES
+    return [list(row.values()) for row in table.to_pylist()]
+
+
+@pytest.mark.parametrize('output_format', ['csv', 'jsonl', 'parquet'])
+def test_file_sinks_round_trip(output_format, tmp_path):
+    if output_format == 'parquet':
+        pytest.importorskip('pyarrow')
+    writer = open_account_sink(output_format, 'someone@example.com', str(tmp_path),
+                               max_rows_in_memory=2)
+    writer.write_rows(CHANNELS[:3])
+    writer.write_rows(CHANNELS[3:])
+
+    path = writer.finalize(log=lambda message: None)
+
+    assert path == account_sink_file(output_format, 'someone@example.com', str(tmp_path))
+    assert read_published(output_format, path) == EXPECTED_ROWS
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sinks.time, 'time', clock)
+    return clock
+
+
+def sqlite_sync(output_dir, account, pages, **kwargs):
+    writer = open_account_sink('sqlite', account, output_dir, **kwargs)
+    for page in pages:
+        writer.write_rows(page)
+    messages = []
+    writer.finalize(log=messages.append)
+    return messages
+
+
+def sqlite_rows(output_dir):
+    conn = sqlite3.connect(os.path.join(output_dir, SQLITE_FILENAME))
+    try:
+        return {
+            (account, channel_id): (name, category, first_seen_at, synced_at)
+            for account, channel_id, name, category, first_seen_at, synced_at in conn.execute(
+                "SELECT account, channel_id, channel_name, category, first_seen_at, synced_at "
+                "FROM subscriptions"
+            )
+        }
+    finally:
+        conn.close()
+
+
+def test_sqlite_sink_upserts_and_removes_stale_rows(clock, tmp_path):
+    output_dir = str(tmp_path)
+    sqlite_sync(output_dir, 'a@example.com', [CHANNELS[:2], CHANNELS[2:]])
+    sqlite_sync(output_dir, 'b@example.com', [CHANNELS[:1]])
+    assert set(sqlite_rows(output_dir)) == {
+        ('a@example.com', 'UC1'), ('a@example.com', 'UC2'), ('a@example.com', 'UC3'),
+        ('a@example.com', 'UC4'), ('b@example.com', 'UC3'),
+    }
+
+    # Next sync: UC1 renamed, UC2 unsubscribed, UC5 new
+    clock.now = 2000.0
+    messages = sqlite_sync(output_dir, 'a@example.com', [[
+        ChannelRecord('UC1', 'Renamed', 'Unknown'), CHANNELS[0], CHANNELS[3],
+        ChannelRecord('UC5', 'Five', 'News'),
+    ]])
+
+    rows = sqlite_rows(output_dir)
+    assert rows == {
+        ('a@example.com', 'UC1'): ('Renamed', 'Unknown', 1000.0, 2000.0),
+        ('a@example.com', 'UC3'): (CHANNELS[0].name, 'Music, Film', 1000.0, 2000.0),
+        ('a@example.com', 'UC4'): ('apple', 'Sports', 1000.0, 2000.0),
+        ('a@example.com', 'UC5'): ('Five', 'News', 2000.0, 2000.0),
+        # Other accounts' rows are left alone
+        ('b@example.com', 'UC3'): (CHANNELS[0].name, 'Music, Film', 1000.0, 1000.0),
+    }
+    assert messages == [
+        f"  ✓ Upserted 4 channels into: {os.path.join(output_dir, SQLITE_FILENAME)} "
+        "(1 unsubscribed channel(s) removed)"
+    ]
+
+
+def test_sqlite_sink_resume_keeps_rows_written_before_interruption(clock, tmp_path):
+    output_dir = str(tmp_path)
+    sqlite_sync(output_dir, 'a@example.com', [CHANNELS])
+
+    clock.now = 2000.0
+    writer = open_account_sink('sqlite', 'a@example.com', output_dir)
+    writer.write_rows(CHANNELS[:2])
+    # A checkpoint records the rows written so far and spill offset 0
+    resume_rows, resume_offset = writer.row_count, writer.spill_offset
+    writer.write_rows(CHANNELS[2:3])
+    writer.suspend()
+
+    clock.now = 3000.0
+    messages = sqlite_sync(
+        output_dir, 'a@example.com', [CHANNELS[2:3]],
+        resume_rows=resume_rows, resume_offset=resume_offset
+    )
+
+    rows = sqlite_rows(output_dir)
+    # The sync still counts from its original start, so only UC4, not seen
+    # again since the interruption, is removed
+    assert {channel_id: row[3] for (_, channel_id), row in rows.items()} == {
+        'UC3': 2000.0, 'UC1': 2000.0, 'UC2': 2000.0,
+    }
+    assert resume_offset == 0
+    assert messages[0].startswith('  ✓ Upserted 3 channels into:')
@@ -0,0 +1,145 @@
+"""Tests of the SQLite token store."""
+
+import os
+import pickle
+import threading
+import time
+
+import pytest
+from google.oauth2.credentials import Credentials
+
+import token_store
+from token_store import TokenStore, forget_tokens
+
+
+def make_creds(token):
+    return Credentials(
+        token, refresh_token=f'refresh-{token}', token_uri='https://oauth2.googleapis.com/token',
+        client_id='client', client_secret='secret', scopes=['scope']
+    )
+
+
+def write_pickle(token_dir, username, creds):
+    path = os.path.join(token_dir, f'token_{username}.pickle')
+    with open(path, 'wb') as token:
+        pickle.dump(creds, token)
+    return path
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'secret' / token_store.TOKEN_STORE_FILE)
+
+
+def test_migrate_pickles_imports_and_renames(db_path):
+    store = TokenStore(db_path)
+    token_dir = os.path.dirname(db_path)
+    fresh = write_pickle(token_dir, 'a@example.com', make_creds('old-a'))
+    stale = write_pickle(token_dir, 'b@example.com', make_creds('old-b'))
+    broken = os.path.join(token_dir, 'token_c@example.com.pickle')
+    with open(broken, 'wb') as token:
+        token.write(b'not a pickle')
+    store.save('b@example.com', make_creds('new-b'))
+
+    assert store.migrate_pickles(token_dir) == 1
+
+    tokens = store.load_all(['a@example.com', 'b@example.com', 'c@example.com'])
+    assert tokens['a@example.com'].token == 'old-a'
+    assert tokens['a@example.com'].refresh_token == 'refresh-old-a'
+    # A token already in the store wins over its pickle file
+    assert tokens['b@example.com'].token == 'new-b'
+    assert 'c@example.com' not in tokens
+    for path in (fresh, stale):
+        assert not os.path.exists(path)
+        assert os.path.exists(path + '.migrated')
+    # Unreadable files stay where they are
+    assert os.path.exists(broken)
+    # Renamed files are not imported again
+    assert store.migrate_pickles(token_dir) == 0
+    store.close()
+
+
+def test_forget_tokens(db_path, capsys):
+    store = TokenStore(db_path)
+    store.save('a@example.com', make_creds('a'))
+    store.save('b@example.com', make_creds('b'))
+    store.close()
+    # A pickle that was never migrated must not bring the token back
+    write_pickle(os.path.dirname(db_path), 'c@example.com', make_creds('c'))
+
+    forget_tokens(db_path, ['a@example.com', 'c@example.com', 'd@example.com'])
+
+    out = capsys.readouterr().out
+    assert '🗑  Removed saved token of a@example.com' in out
+    assert '🗑  Removed saved token of c@example.com' in out
+    assert '⚠️  No saved token for d@example.com' in out
+    store = TokenStore(db_path)
+    assert set(store.load_all(['a@example.com', 'b@example.com', 'c@example.com'])) == {
+        'b@example.com'
+    }
+    store.close()
+
+
+def test_two_stores_take_turns_on_one_account(db_path, monkeypatch):
+    monkeypatch.setattr(token_store, 'LEASE_POLL_SECONDS', 0.01)
+    first, second = TokenStore(db_path), TokenStore(db_path)
+    holders, overlaps = [], []
+    active = threading.Lock()
+
+    def refresh(store, token):
+        with store.refresh_lease('a@example.com', timeout=5):
+            if not active.acquire(blocking=False):
+                overlaps.append(token)
+                return
+            try:
+                holders.append(token)
+                time.sleep(0.1)
+                store.save('a@example.com', make_creds(token))
+            finally:
+                active.release()
+
+    threads = [
+        threading.Thread(target=refresh, args=(store, token))
+        for store, token in ((first, 'first'), (second, 'second'))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert overlaps == []
+    assert sorted(holders) == ['first', 'second']
+    # The waiting store sees the token the other one saved
+    assert first.load('a@example.com').token == holders[-1]
+    first.close()
+    second.close()
+
+
+def test_lease_times_out_while_held(db_path, monkeypatch):
+    monkeypatch.setattr(token_store, 'LEASE_POLL_SECONDS', 0.01)
+    first, second = TokenStore(db_path), TokenStore(db_path)
+    with first.refresh_lease('a@example.com'):
+        with pytest.raises(Exception, match="refresh a@example.com's token"):
+            with second.refresh_lease('a@example.com', timeout=0.05):
+                pass
+        # Other accounts are not blocked
+        with second.refresh_lease('b@example.com', timeout=0.05):
+            pass
+    with second.refresh_lease('a@example.com', timeout=0.05):
+        pass
+    first.close()
+    second.close()
+
+
+def test_abandoned_lease_expires(db_path, monkeypatch):
+    monkeypatch.setattr(token_store, 'LEASE_POLL_SECONDS', 0.01)
+    crashed = TokenStore(db_path, lease_seconds=0.1)
+    assert crashed._try_acquire('a@example.com', 'crashed-process')
+    crashed.close()
+
+    store = TokenStore(db_path, lease_seconds=0.1)
+    started = time.monotonic()
+    with store.refresh_lease('a@example.com', timeout=2):
+        pass
+    assert time.monotonic() - started >= 0.05
+    store.close()